@@ -36,7 +36,7 @@
 from lazy_object_proxy import Proxy
 
 from univention.config_registry.backend import (  # noqa: F401
-    SCOPE, ConfigRegistry, Load, ReadOnlyConfigRegistry as _RCR, StrictModeException,
+    SCOPE, ConfigRegistry, Load, ReadOnlyConfigRegistry as _RCR, SnapshotConfigRegistry, StrictModeException,
 )
 from univention.config_registry.filters import filter_keys_only, filter_shell, filter_sort  # noqa: F401
 from univention.config_registry.frontend import (  # noqa: F401
@@ -52,6 +52,7 @@ from univention.debhelper import parseRfc822  # noqa: F401
 
 ucr = Proxy(lambda: _RCR().load(autoload=Load.ONCE))  # type: _RCR
 ucr_live = Proxy(lambda: _RCR().load(autoload=Load.ALWAYS))  # type: _RCR
+ucr_snapshot = Proxy(SnapshotConfigRegistry)  # type: SnapshotConfigRegistry
 
 
 def ucr_factory():  # type: () -> ConfigRegistry
@@ -36,9 +36,12 @@
 
 import errno
 import fcntl
+import mmap
 import os
 import re
+import struct
 import sys
+import threading
 import time
 from collections.abc import ItemsView, Iterator, Mapping, MutableMapping
 from enum import IntEnum
@@ -52,7 +55,7 @@ from univention.config_registry.handler import run_filter
 _T = TypeVar('_T', bound='ReadOnlyConfigRegistry')
 _VT = TypeVar('_VT')
 
-__all__ = ['SCOPE', 'ConfigRegistry', 'StrictModeException', 'exception_occured']
+__all__ = ['SCOPE', 'ConfigRegistry', 'SnapshotConfigRegistry', 'StrictModeException', 'exception_occured']
 MYPY = False
 INVALID_VALUE_CHARS = '\r\n'
 
@@ -182,6 +185,7 @@ class ReadOnlyConfigRegistry(_M, BooleanConfigRegistry):
         FORCED: 'base-forced.conf',
         DEFAULTS: 'base-defaults.conf',
     }
+    SNAPSHOT = '/var/cache/univention-config/snapshot'
 
     def __init__(self, filename: str = "") -> None:
         super().__init__()
@@ -414,8 +418,11 @@ class ConfigRegistry(ReadOnlyConfigRegistry, _MM):
         return self._registry[self.scope]
 
     def save(self) -> None:
-        """Save registry to file."""
+        """Save registry to file and update the pre-merged snapshot if enabled."""
         self._layer.save()
+        # rewriting the snapshot doubles the time to save: only if it is used
+        if self.scope != self.CUSTOM and (self.is_true('ucr/snapshot/enabled', False) or os.path.exists(self.SNAPSHOT)):
+            _write_snapshot(self.SNAPSHOT)
 
     def lock(self) -> None:
         """Lock registry file."""
@@ -503,6 +510,310 @@ class ConfigRegistry(ReadOnlyConfigRegistry, _MM):
         return value  # type: ignore
 
 
+SNAPSHOT_MAGIC = b'UCRS'
+SNAPSHOT_VERSION = 1
+# magic, version, number of layer time stamps, number of entries
+SNAPSHOT_HEADER = struct.Struct('!4sHHI')
+SNAPSHOT_STAMP = struct.Struct('!q')
+# key offset, key length, value offset, value length, scope
+SNAPSHOT_ENTRY = struct.Struct('!IIIIB')
+
+
+def _layer_stamps(ucr: ReadOnlyConfigRegistry) -> list[int]:
+    """
+    Return modification times of all layer files.
+
+    :param ucr: UCR instance.
+    :returns: List of modification times in nano seconds, `-1` for missing files.
+    """
+    stamps = []
+    for reg in ucr.LAYER_PRIORITIES:
+        try:
+            stamps.append(os.stat(ucr._registry[reg].file).st_mtime_ns)
+        except OSError:
+            stamps.append(-1)
+    return stamps
+
+
+def _write_snapshot(filename: str) -> None:
+    """
+    Atomically write pre-merged snapshot of all layers, or remove it if `ucr/snapshot/enabled` is not activated.
+
+    :param filename: File name of the snapshot.
+    """
+    try:
+        with open(filename + '.lock', 'a+', encoding='utf-8') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+
+            ucr = ReadOnlyConfigRegistry()
+            stamps = _layer_stamps(ucr)  # before loading: newer content invalidates the snapshot
+            ucr.load()
+            if not ucr.is_true('ucr/snapshot/enabled', False):
+                try:
+                    os.remove(filename)
+                except FileNotFoundError:
+                    pass
+                return
+            merge = ucr._merge(getscope=True)
+
+            entries = sorted((key.encode('utf-8'), value.encode('utf-8'), reg) for key, (reg, value) in merge.items())
+            offset = SNAPSHOT_HEADER.size + SNAPSHOT_STAMP.size * len(stamps) + SNAPSHOT_ENTRY.size * len(entries)
+            table: list[bytes] = []
+            blob: list[bytes] = []
+            for key, value, reg in entries:
+                table.append(SNAPSHOT_ENTRY.pack(offset, len(key), offset + len(key), len(value), reg))
+                blob += [key, value]
+                offset += len(key) + len(value)
+
+            temp_filename = '%s.temp' % (filename,)
+            with open(temp_filename, 'wb') as fd:
+                fd.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(stamps), len(entries)))
+                fd.write(b''.join(SNAPSHOT_STAMP.pack(stamp) for stamp in stamps))
+                fd.write(b''.join(table))
+                fd.write(b''.join(blob))
+            os.chmod(temp_filename, 0o644)
+            os.rename(temp_filename, filename)
+    except OSError as ex:
+        # suppress certain errors
+        if ex.errno not in (errno.EACCES, errno.ENOENT, errno.EROFS):
+            raise
+
+
+class _Snapshot:
+    """
+    One memory-mapped snapshot file.
+
+    The instance is never changed. A replaced snapshot gets a new instance;
+    the map of the old one is only released when the last reader dropped its
+    reference, so concurrent readers never see a closed map.
+
+    :param data: The memory-mapped file.
+    :param stamps: The modification times of the layer files in the snapshot.
+    :param count: Number of entries.
+    :param table: Offset of the entry table.
+    """
+
+    __slots__ = ('cache', 'count', 'data', 'stamps', 'table')
+
+    def __init__(self, data: mmap.mmap, stamps: list[int], count: int, table: int) -> None:
+        self.data = data
+        self.stamps = stamps
+        self.count = count
+        self.table = table
+        # only found keys are cached, so it holds at most `count` entries
+        self.cache: dict[str, tuple[int, str]] = {}
+
+    @classmethod
+    def open(cls, filename: str, layers: ReadOnlyConfigRegistry) -> '_Snapshot | None':
+        """
+        Memory-map the snapshot.
+
+        :param filename: File name of the snapshot.
+        :param layers: UCR instance to check the layer files.
+        :returns: The snapshot or `None` if it is missing, invalid or outdated.
+        """
+        try:
+            with open(filename, 'rb') as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, nstamps, count = SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(version)
+            stamps = [SNAPSHOT_STAMP.unpack_from(data, SNAPSHOT_HEADER.size + i * SNAPSHOT_STAMP.size)[0] for i in range(nstamps)]
+        except (struct.error, ValueError):
+            data.close()
+            return None
+
+        if stamps != _layer_stamps(layers):
+            data.close()
+            return None
+
+        return cls(data, stamps, count, SNAPSHOT_HEADER.size + SNAPSHOT_STAMP.size * nstamps)
+
+    def entry(self, index: int) -> tuple[str, int, str]:
+        """
+        Decode entry from snapshot.
+
+        :param index: Index of the entry.
+        :returns: 3-tuple (key, scope, value)
+        """
+        data = self.data
+        koff, klen, voff, vlen, reg = SNAPSHOT_ENTRY.unpack_from(data, self.table + index * SNAPSHOT_ENTRY.size)
+        return data[koff:koff + klen].decode('utf-8'), reg, data[voff:voff + vlen].decode('utf-8')
+
+    def lookup(self, key: str) -> tuple[int, str] | None:
+        """
+        Binary search for key in snapshot.
+
+        Found entries are cached. Missing keys are not, as callers may look
+        up arbitrary names built at run time.
+
+        :param key: UCR variable name.
+        :returns: 2-tuple (scope, value) or `None`.
+        """
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        data = self.data
+        bkey = key.encode('utf-8')
+        found = None
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            koff, klen, voff, vlen, reg = SNAPSHOT_ENTRY.unpack_from(data, self.table + mid * SNAPSHOT_ENTRY.size)
+            other = data[koff:koff + klen]
+            if other < bkey:
+                low = mid + 1
+            elif other > bkey:
+                high = mid
+            else:
+                found = self.cache[key] = (reg, data[voff:voff + vlen].decode('utf-8'))
+                break
+        return found
+
+
+class SnapshotConfigRegistry(_M, BooleanConfigRegistry):
+    """
+    Read-only view of UCR based on the pre-merged snapshot.
+
+    The snapshot is written by :py:meth:`ConfigRegistry.save` if
+    `ucr/snapshot/enabled` is activated and memory-mapped here, so neither
+    text files must be parsed nor layers must be walked. Each access checks
+    the snapshot for replacement with a single `stat()`; the layer files are
+    checked at most every `CHECK_INTERVAL` seconds. While the snapshot is
+    missing or outdated, e.g. after manually editing a layer file, a regular
+    :py:class:`ReadOnlyConfigRegistry` is used.
+
+    The instance may be shared by threads: every access works on the
+    snapshot or fallback registry which was current when it started.
+
+    :param filename: File name of the snapshot.
+
+    > ucr = SnapshotConfigRegistry()
+    > ucr.is_true('ldap/index/autorebuild')
+    """
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, filename: str = "") -> None:
+        self.filename = filename or ReadOnlyConfigRegistry.SNAPSHOT
+        self._lock = threading.Lock()
+        self._stat: tuple[int, int, int] | None = None
+        self._checked = 0.0
+        self._snapshot: _Snapshot | None = None
+        self._fallback: ReadOnlyConfigRegistry | None = None
+        self._layers = ReadOnlyConfigRegistry()
+
+    def _refresh(self) -> _Snapshot | ReadOnlyConfigRegistry:
+        """
+        Re-open the snapshot if it was replaced or became outdated.
+
+        :returns: The current snapshot or the fallback registry.
+        """
+        try:
+            stat = os.stat(self.filename)
+            key: tuple[int, int, int] | None = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            key = None
+        with self._lock:
+            if key != self._stat:
+                self._stat = key
+                self._snapshot = _Snapshot.open(self.filename, self._layers)
+                self._checked = time.monotonic()
+            elif time.monotonic() - self._checked >= self.CHECK_INTERVAL:
+                self._checked = time.monotonic()
+                if self._snapshot is not None and self._snapshot.stamps != _layer_stamps(self._layers):
+                    self._snapshot = None
+
+            if self._snapshot is not None:
+                self._fallback = None
+                return self._snapshot
+            if self._fallback is None:
+                self._fallback = ReadOnlyConfigRegistry().load(autoload=Load.ALWAYS)
+            return self._fallback
+
+    def __getitem__(self, key: str) -> str | None:  # type: ignore
+        """
+        Return registry value.
+
+        :param key: UCR variable name.
+        :returns: the value or `None`.
+        """
+        return self.get(key)
+
+    def __contains__(self, key: str) -> bool:  # type: ignore
+        """
+        Check if registry key is set.
+
+        :param key: UCR variable name.
+        :returns: `True` is set, `False` otherwise.
+        """
+        return self.get(key, self) is not self
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over all registry keys.
+
+        :returns: Iterator over all UCR variable names.
+        """
+        view = self._refresh()
+        if not isinstance(view, _Snapshot):
+            yield from view
+            return
+        for index in range(view.count):
+            yield view.entry(index)[0]
+
+    def __len__(self) -> int:
+        """
+        Return length.
+
+        :returns: Number of UCR variables set.
+        """
+        view = self._refresh()
+        if not isinstance(view, _Snapshot):
+            return len(view)
+        return view.count
+
+    def get(self, key: str, default: _VT | None = None, getscope: bool = False) -> str | tuple[int, str] | _VT | None:  # type: ignore
+        """
+        Return registry value (including optional scope).
+
+        :param key: UCR variable name.
+        :param default: Default value when the UCR variable is not set.
+        :param getscope: `True` makes the method return the scope level in addition to the value itself.
+        :returns: the value or a 2-tuple (level, value) or the default.
+        """
+        view = self._refresh()
+        if not isinstance(view, _Snapshot):
+            return view.get(key, default, getscope=getscope)
+
+        found = view.lookup(key)
+        if found is None:
+            return default
+        return found if getscope else found[1]
+
+    def items(self, getscope: bool = False) -> ItemsView[str, str] | ItemsView[str, tuple[int, str]]:  # type: ignore
+        """
+        Return all registry entries a 2-tuple (key, value) or (key, (scope, value)) if getscope is True.
+
+        :param getscope: `True` makes the method return the scope level in addition to the value itself.
+        :returns: A mapping from varibal ename to eiter the value (if `getscope` is False) or a 2-tuple (level, value).
+        """
+        view = self._refresh()
+        if not isinstance(view, _Snapshot):
+            return view.items(getscope=getscope)
+
+        merge: dict[str, str | tuple[int, str]] = {}
+        for index in range(view.count):
+            key, reg, value = view.entry(index)
+            merge[key] = (reg, value) if getscope else value
+        return merge.items()  # type: ignore
+
+
 class _ConfigRegistry(dict):
     """
     Persistent value store.
@@ -540,7 +851,8 @@ class _ConfigRegistry(dict):
 
                     reg_file.seek(0)
                     for line in reg_file:
-                        line = self.RE_COMMENT.sub("", line)
+                        if '#' in line:
+                            line = self.RE_COMMENT.sub("", line)
                         if line == '':
                             continue
                         if line.find(': ') == -1:
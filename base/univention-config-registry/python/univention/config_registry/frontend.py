@@ -316,9 +316,15 @@ def handler_commit(args: list[str], opts: dict[str, Any] = {}) -> None:
     ucr = ConfigRegistry()
     ucr.load()
 
+    try:
+        jobs = int(opts.get('jobs') or 1)
+    except ValueError:
+        print('E: invalid number of jobs: %s' % (opts['jobs'],), file=sys.stderr)
+        sys.exit(1)
+
     handlers = ConfigHandlers()
     handlers.load()
-    handlers.commit(ucr, args)
+    handlers.commit(ucr, args, jobs=jobs, timing=opts.get('timing', False))
 
 
 def handler_register(args: list[str], opts: dict[str, Any] = {}) -> None:
@@ -616,9 +622,11 @@ Actions:
     `version/version: 1.0` => `version_version="1.0"`
     (deprecated: use --shell dump instead)
 
-  commit [file1 ...]:
+  commit [--jobs <n>] [--timing] [file1 ...]:
     rebuild configuration file from univention template; if
     no file is specified ALL configuration files are rebuilt
+    --jobs: rebuild up to <n> files in parallel
+    --timing: print the time spent for each file, script and module
 
   filter [file]:
     evaluate a template file, expects Python inline code in UTF-8 or US-ASCII
@@ -716,6 +724,10 @@ OPT_COMMANDS: dict[str, dict[str, Any]] = {
         'non-empty': [BOOL, False],
         'verbose': [BOOL, False],
     },
+    'commit': {
+        'jobs': [STRING, None],
+        'timing': [BOOL, False],
+    },
     'filter': {
         'encode-utf8': [BOOL, False],
         'disallow-execution': [BOOL, False],
@@ -45,12 +45,17 @@ import random
 import re
 import subprocess
 import sys
-from collections.abc import Iterable, Mapping
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from grp import getgrnam
 from pwd import getpwnam
-from typing import IO, Any
+from typing import IO, Any, AnyStr
 
 from univention.config_registry.misc import asciify, directory_files
+from univention.config_registry.worker import PRELUDE, TemplateWorkers
 from univention.debhelper import parseRfc822  # pylint: disable-msg=W0403
 
 
@@ -65,7 +70,10 @@ __all__ = ['ConfigHandlers']
 VARIABLE_PATTERN = re.compile('@%@([^@]+)@%@')
 VARIABLE_TOKEN = re.compile('@%@')
 EXECUTE_TOKEN = re.compile(b'@!@')
+MODULE_LOCK = threading.Lock()
+_WORKERS: TemplateWorkers | None = None
 WARNING_PATTERN = re.compile('(UCRWARNING|BCWARNING|UCRWARNING_ASCII)=(.+)')
+REGEX_SPECIAL = frozenset('.^$*+?{}[]\\|()')
 
 INFO_DIR = '/etc/univention/templates/info'
 FILE_DIR = '/etc/univention/templates/files'
@@ -84,19 +92,21 @@ Warnung: Diese Datei wurde automatisch generiert und kann durch
 assert asciify(WARNING_TEXT) == WARNING_TEXT, "Only ASCII allowed in WARNING_TEXT"
 
 
-def run_filter(template: str, directory: _UCR, srcfiles: Iterable[str] = set(), opts: _OPT = {}) -> bytes:
+def run_filter(template: 'str | Template', directory: _UCR, srcfiles: Iterable[str] = set(), opts: _OPT = {}) -> bytes:
     """
     Process a template file: substitute variables.
 
-    :param template: Text string of template.
+    :param template: Text string of template or pre-tokenized template.
     :param directory: UCR instance.
     :param srcfiles: File names of source template.
     :param opts: Command line options.
     :returns: The modified template with all UCR variables and sections replaced.
     """
-    template = _replace_variables(template, directory, srcfiles)
+    if not isinstance(template, Template):
+        template = Template(template)
+    text = template.substitute(directory, srcfiles)
 
-    tmpl = template.encode("UTF-8")
+    tmpl = text.encode("UTF-8")
 
     if opts.get('disallow-execution', False):
         return tmpl
@@ -106,6 +116,122 @@ def run_filter(template: str, directory: _UCR, srcfiles: Iterable[str] = set(),
     return tmpl
 
 
+def _tokenize(text: AnyStr, token: re.Pattern) -> tuple[list[tuple[AnyStr, AnyStr, int]], AnyStr]:
+    """
+    Split text at pairs of tokens.
+
+    :param text: The text to split.
+    :param token: The delimiter.
+    :returns: 2-tuple (chunks, tail), where chunks is a list of 3-tuples (literal-text-before, enclosed-text, end-offset).
+    """
+    chunks: list[tuple[AnyStr, AnyStr, int]] = []
+    pos = 0
+    matches = token.finditer(text)
+    for start, end in zip(matches, matches):
+        chunks.append((text[pos:start.start()], text[start.end():end.start()], end.end()))
+        pos = end.end()
+    return chunks, text[pos:]
+
+
+def _substitute(text: AnyStr, token: re.Pattern, chunks: list[tuple[AnyStr, AnyStr, int]], tail: AnyStr, replace: Callable[[AnyStr], AnyStr], rescan: Callable[[AnyStr], AnyStr]) -> AnyStr:
+    """
+    Replace all enclosed texts in a single pass.
+
+    Historically the text was re-scanned from the start after each
+    replacement, so a value introducing a new token gets processed again.
+    In that rare case the remaining text is handed to `rescan`.
+
+    :param text: The original text.
+    :param token: The delimiter.
+    :param chunks: The result of :py:func:`_tokenize`.
+    :param tail: The literal text after the last pair of tokens.
+    :param replace: Function returning the replacement for the enclosed text.
+    :param rescan: Function processing the text the slow way.
+    :returns: The text with all enclosed texts replaced.
+    """
+    out: list[AnyStr] = []
+    last = text[:0]
+    for literal, inner, end in chunks:
+        value = replace(inner)
+        last = (last + literal)[-2:]
+        if token.search(last + value + text[end:end + 2]):
+            return rescan(last[:0].join(out) + literal + value + text[end:])
+        out += [literal, value]
+        last = (last + value)[-2:]
+    out.append(tail)
+    return text[:0].join(out)
+
+
+class Template:
+    """
+    Pre-tokenized UCR template.
+
+    :param text: Text string of template.
+    """
+
+    _cache: dict[str, tuple[tuple[int, int], 'Template']] = {}
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.chunks, self.tail = _tokenize(text, VARIABLE_TOKEN)
+
+    @classmethod
+    def from_file(cls, fname: str) -> 'Template':
+        """
+        Return template from file, which is cached by path and modification time.
+
+        :param fname: File name of template.
+        :returns: The template.
+        """
+        stat = os.stat(fname)
+        key = (stat.st_mtime_ns, stat.st_size)
+        try:
+            cached_key, template = cls._cache[fname]
+            if cached_key == key:
+                return template
+        except KeyError:
+            pass
+        with open(fname, encoding='utf-8') as fd:
+            template = cls(fd.read())
+        cls._cache[fname] = (key, template)
+        return template
+
+    def substitute(self, directory: _UCR, srcfiles: Iterable[str] = set()) -> str:
+        """
+        Substitute variables.
+
+        :param directory: UCR instance.
+        :param srcfiles: File names of source template.
+        :returns: The text with all UCR variables replaced.
+        """
+        return _substitute(
+            self.text, VARIABLE_TOKEN, self.chunks, self.tail,
+            lambda name: _variable_value(name, directory, srcfiles),
+            lambda text: _replace_variables(text, directory, srcfiles),
+        )
+
+
+def _variable_value(name: str, directory: _UCR, srcfiles: Iterable[str]) -> str:
+    if name in directory:
+        value = directory[name]
+        if not isinstance(value, str):
+            # Python 2 with unicode value
+            value = value.encode('UTF-8')  # important! template must not be of type unicode ever (in py2), otherwise some characters are lost in the below subprocess stdinput
+    else:
+        match = WARNING_PATTERN.match(name)
+        if match:
+            mode, prefix = match.groups()
+            value = warning_string(prefix, srcfiles=srcfiles)
+            if mode == "UCRWARNING_ASCII":
+                value = asciify(value)
+        else:
+            value = ''
+
+    if isinstance(value, list | tuple):
+        value = value[0]
+    return value
+
+
 def _replace_variables(template: str, directory: _UCR, srcfiles: Iterable[str]) -> str:
     while True:
         i = VARIABLE_TOKEN.finditer(template)
@@ -113,24 +239,7 @@ def _replace_variables(template: str, directory: _UCR, srcfiles: Iterable[str])
             start = next(i)
             end = next(i)
             name = template[start.end():end.start()]
-
-            if name in directory:
-                value = directory[name]
-                if not isinstance(value, str):
-                    # Python 2 with unicode value
-                    value = value.encode('UTF-8')  # important! template must not be of type unicode ever (in py2), otherwise some characters are lost in the below subprocess stdinput
-            else:
-                match = WARNING_PATTERN.match(name)
-                if match:
-                    mode, prefix = match.groups()
-                    value = warning_string(prefix, srcfiles=srcfiles)
-                    if mode == "UCRWARNING_ASCII":
-                        value = asciify(value)
-                else:
-                    value = ''
-
-            if isinstance(value, list | tuple):
-                value = value[0]
+            value = _variable_value(name, directory, srcfiles)
             template = template[:start.start()] + value + template[end.end():]
         except StopIteration:
             break
@@ -138,28 +247,46 @@ def _replace_variables(template: str, directory: _UCR, srcfiles: Iterable[str])
     return template
 
 
+@contextmanager
+def template_workers() -> Iterator[TemplateWorkers]:
+    """Execute all `@!@` blocks by persistent worker processes within this context."""
+    global _WORKERS
+    if _WORKERS is not None:
+        yield _WORKERS
+        return
+    with TemplateWorkers() as _WORKERS:
+        try:
+            yield _WORKERS
+        finally:
+            _WORKERS = None
+
+
+def _exec(code: bytes) -> bytes:
+    if _WORKERS is not None:
+        value = _WORKERS(code)
+        if value is not None:
+            return value
+
+    proc = subprocess.Popen(
+        (sys.executable,),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        close_fds=True)
+    return proc.communicate(PRELUDE % code)[0]
+
+
 def _replace_exec(template: bytes) -> bytes:
+    chunks, tail = _tokenize(template, EXECUTE_TOKEN)
+    return _substitute(template, EXECUTE_TOKEN, chunks, tail, _exec, _replace_exec_rescan)
+
+
+def _replace_exec_rescan(template: bytes) -> bytes:
     while True:
         i = EXECUTE_TOKEN.finditer(template)
         try:
             start = next(i)
             end = next(i)
-
-            proc = subprocess.Popen(
-                (sys.executable,),
-                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                close_fds=True)
-            value = proc.communicate(b'''\
-# -*- coding: utf-8 -*-
-import univention.config_registry
-configRegistry = univention.config_registry.ConfigRegistry()
-configRegistry.load()
-# for compatibility
-baseConfig = configRegistry
-%s
-''' % template[start.end():end.start()])[0]
+            value = _exec(template[start.end():end.start()])
             template = template[:start.start()] + value + template[end.end():]
-
         except StopIteration:
             break
 
@@ -199,15 +326,16 @@ def run_module(modpath: str, fn: str, ucr: _UCR, changes: _CHANGES) -> None:
     :param changes: Dictionary of changed UCR variables, mapping UCR variable names to 2-tuple (old-value, new-value).
     """
     # temporarily prepend MODULE_DIR to load path
-    sys.path.insert(0, MODULE_DIR)
-    module_name = os.path.splitext(modpath)[0]
-    try:
-        module = __import__(module_name.replace(os.path.sep, '.'))
-        f = getattr(module, fn)
-        f(ucr, changes)
-    except (AttributeError, ImportError) as ex:
-        print(ex, file=sys.stderr)
-    del sys.path[0]
+    with MODULE_LOCK:
+        sys.path.insert(0, MODULE_DIR)
+        module_name = os.path.splitext(modpath)[0]
+        try:
+            module = __import__(module_name.replace(os.path.sep, '.'))
+            f = getattr(module, fn)
+            f(ucr, changes)
+        except (AttributeError, ImportError) as ex:
+            print(ex, file=sys.stderr)
+        del sys.path[0]
 
 
 def warning_string(prefix: str = '# ', srcfiles: Iterable[str] = set()) -> str:
@@ -239,6 +367,9 @@ class ConfigHandler:
     def __call__(self, args: _ARG) -> None:
         raise NotImplementedError()
 
+    def __str__(self) -> str:
+        return type(self).__name__
+
 
 class ConfigHandlerDiverting(ConfigHandler):
     """
@@ -272,6 +403,9 @@ class ConfigHandlerDiverting(ConfigHandler):
             return self.to_file != other.to_file
         return NotImplemented
 
+    def __str__(self) -> str:
+        return self.to_file
+
     def _set_perm(self, stat: os.stat_result | None, to_file: str | None = None) -> None:
         """
         Set file permissions.
@@ -420,10 +554,10 @@ class ConfigHandlerMultifile(ConfigHandlerDiverting):
 
                 for from_file in sorted(self.from_files, key=os.path.basename):
                     try:
-                        with open(from_file, encoding='utf-8') as from_fp:
-                            to_fp.write(run_filter(from_fp.read(), ucr, srcfiles=self.from_files, opts=filter_opts))
+                        template = Template.from_file(from_file)
                     except OSError:
                         continue
+                    to_fp.write(run_filter(template, ucr, srcfiles=self.from_files, opts=filter_opts))
 
             try:
                 os.rename(tmp_to_file, self.to_file)
@@ -502,10 +636,11 @@ class ConfigHandlerFile(ConfigHandlerDiverting):
         try:
             filter_opts: dict[str, Any] = {}
 
-            with open(self.from_file, encoding='utf-8') as from_fp, open(tmp_to_file, 'wb') as to_fp:
+            template = Template.from_file(self.from_file)
+            with open(tmp_to_file, 'wb') as to_fp:
                 self._set_perm(stat, tmp_to_file)
 
-                to_fp.write(run_filter(from_fp.read(), ucr, srcfiles=[self.from_file], opts=filter_opts))
+                to_fp.write(run_filter(template, ucr, srcfiles=[self.from_file], opts=filter_opts))
 
             try:
                 os.rename(tmp_to_file, self.to_file)
@@ -558,6 +693,9 @@ class ConfigHandlerScript(ConfigHandler):
             return self.script != other.script
         return NotImplemented
 
+    def __str__(self) -> str:
+        return self.script
+
     def __call__(self, args: _ARG) -> None:
         """Call external programm after change."""
         _ucr, changed = args
@@ -593,6 +731,9 @@ class ConfigHandlerModule(ConfigHandler):
             return self.module != other.module
         return NotImplemented
 
+    def __str__(self) -> str:
+        return self.module
+
     def __call__(self, args: _ARG) -> None:
         """Call Python module after change."""
         ucr, changed = args
@@ -609,6 +750,76 @@ def grep_variables(text: str) -> set[str]:
     return set(VARIABLE_PATTERN.findall(text))
 
 
+class HandlerIndex:
+    """
+    Pre-compiled dispatch index from changed variable names to handlers.
+
+    Registered variable names are regular expressions, which are matched
+    against the start of the changed variable name. Plain names without any
+    regular expression meta character are resolved by dictionary lookups of
+    the variable prefixes, while all true patterns are combined into a single
+    automaton, which captures each matching pattern in its own look-ahead group.
+
+    :param handlers: Mapping of registered variable names to set of handlers.
+    """
+
+    def __init__(self, handlers: Mapping[str, set[ConfigHandler]]) -> None:
+        self.literals: dict[str, set[ConfigHandler]] = {}
+        self.patterns: list[tuple[re.Pattern, set[ConfigHandler]]] = []  # not combinable
+        combinable: list[tuple[re.Pattern, set[ConfigHandler]]] = []
+        for reg_var, v2h in handlers.items():
+            if REGEX_SPECIAL.isdisjoint(reg_var):
+                self.literals[reg_var] = v2h
+                continue
+            try:
+                _re = re.compile(reg_var)
+            except re.error as ex:
+                print('Failed to compile regular expression %s: %s' % (reg_var, ex), file=sys.stderr)
+                continue
+            # own groups would break group numbering and back references
+            (self.patterns if _re.groups else combinable).append((_re, v2h))
+
+        self.lengths = sorted({len(reg_var) for reg_var in self.literals})
+        self.groups = [(group, v2h) for group, (_re, v2h) in enumerate(combinable, start=1)]
+        self.combined: re.Pattern | None = None
+        if combinable:
+            try:
+                self.combined = re.compile(''.join('(?:(?=(%s)))?' % (_re.pattern,) for _re, _v2h in combinable))
+            except (re.error, RecursionError, OverflowError):
+                # e.g. global flags inside a pattern
+                self.patterns += combinable
+                self.groups = []
+
+    def __call__(self, variables: Iterable[str]) -> set[ConfigHandler]:
+        """
+        Find handlers registered for changes in variables.
+
+        :param variables: Changed UCR variable names.
+        :returns: Set of handlers.
+        """
+        pending_handlers: set[ConfigHandler] = set()
+        for variable in variables:
+            for length in self.lengths:
+                if length > len(variable):
+                    break
+                try:
+                    pending_handlers |= self.literals[variable[:length]]
+                except KeyError:
+                    pass
+
+            for _re, v2h in self.patterns:
+                if _re.match(variable):
+                    pending_handlers |= v2h
+
+            if self.combined is not None:
+                match = self.combined.match(variable)
+                for group, v2h in self.groups:
+                    if match.start(group) >= 0:
+                        pending_handlers |= v2h
+
+        return pending_handlers
+
+
 class ConfigHandlers:
     """Manage handlers for configuration variables."""
 
@@ -617,9 +828,10 @@ class ConfigHandlers:
     # 1: with version header
     # 2: switch to handlers mapping to set, drop file, add multifile.def_count
     # 3: split config_registry into sub modules
-    VERSION = 3
+    # 4: add pre-compiled variable index and set of all handlers
+    VERSION = 4
     VERSION_MIN = 3
-    VERSION_MAX = 3
+    VERSION_MAX = 4
     VERSION_TEXT = 'univention-config cache, version'
     VERSION_NOTICE = '%s %s\n' % (VERSION_TEXT, VERSION)
     VERSION_RE = re.compile('^%s (?P<version>[0-9]+)$' % VERSION_TEXT)
@@ -629,7 +841,8 @@ class ConfigHandlers:
     _subfiles: dict[str, list[tuple[str, set[str]]]] = {}  # multifile -> [(subfile, variables)] // pending
 
     def __init__(self) -> None:
-        pass
+        self._index: HandlerIndex | None = None
+        self._all_handlers: set[ConfigHandler] = set()
 
     @staticmethod
     def _get_cache_version(cache_file: IO) -> int:
@@ -640,6 +853,8 @@ class ConfigHandlers:
         :returns: Version.
         """
         line = cache_file.readline()    # IOError is propagated
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
         match = ConfigHandlers.VERSION_RE.match(line)
         if match:
             version = int(match.group('version'))
@@ -678,6 +893,9 @@ class ConfigHandlers:
                     pickler.load()
                 self._subfiles = pickler.load()
                 self._multifiles = pickler.load()
+                if version >= 4:
+                    self._index = pickler.load()
+                    self._all_handlers = pickler.load()
         except (Exception, pickle.UnpicklingError):
             self.update()
 
@@ -868,6 +1086,7 @@ class ConfigHandlers:
         self._handlers.clear()
         self._multifiles.clear()
         self._subfiles.clear()
+        self._index = None
 
         handlers: set[ConfigHandler] = set()
         for info in directory_files(INFO_DIR):
@@ -881,10 +1100,29 @@ class ConfigHandlers:
             for variable in handler.variables:
                 v2h = self._handlers.setdefault(variable, set())
                 v2h.add(handler)
+        self._all_handlers = set(handlers)
 
         self._save_cache()
         return handlers
 
+    def _cache_outdated(self) -> bool:
+        """
+        Check if any `.info` file is newer than the cache file.
+
+        :returns: `True` if the cache must be rebuilt.
+        """
+        try:
+            mtime = os.stat(ConfigHandlers.CACHE_FILE).st_mtime
+            if os.stat(INFO_DIR).st_mtime > mtime:
+                return True
+            return any(
+                os.stat(info).st_mtime > mtime
+                for info in directory_files(INFO_DIR)
+                if info.endswith('.info')
+            )
+        except OSError:
+            return True
+
     def update_divert(self, handlers: Iterable[ConfigHandler]) -> None:
         """
         Synchronize diversions with handlers.
@@ -921,6 +1159,13 @@ class ConfigHandlers:
         for path, handler in wanted.items():
             handler.install_divert()
 
+    @property
+    def index(self) -> HandlerIndex:
+        """Return the (lazily built) variable index."""
+        if self._index is None:
+            self._index = HandlerIndex(self._handlers)
+        return self._index
+
     def _save_cache(self) -> None:
         """Write cache file."""
         try:
@@ -930,6 +1175,8 @@ class ConfigHandlers:
                 pickler.dump(self._handlers)
                 pickler.dump(self._subfiles)
                 pickler.dump(self._multifiles)
+                pickler.dump(self.index)
+                pickler.dump(self._all_handlers)
         except OSError as ex:
             if ex.errno != errno.EACCES:
                 raise
@@ -949,6 +1196,7 @@ class ConfigHandlers:
             if handler:
                 handlers.add(handler)
 
+        self._all_handlers |= handlers
         for handler in handlers:
             if isinstance(handler, ConfigHandlerDiverting):
                 handler.install_divert()
@@ -957,6 +1205,7 @@ class ConfigHandlers:
             for variable in handler.variables:
                 v2h = self._handlers.setdefault(variable, set())
                 v2h.add(handler)
+                self._index = None
                 values[variable] = (None, ucr[variable])
                 try:
                     _re = re.compile(variable)
@@ -1030,28 +1279,25 @@ class ConfigHandlers:
         """
         if not variables:
             return
-        pending_handlers: set[ConfigHandler] = set()
-
-        for reg_var, handlers in self._handlers.items():
-            try:
-                _re = re.compile(reg_var)
-            except re.error as ex:
-                print('Failed to compile regular expression %s: %s' % (reg_var, ex), file=sys.stderr)
-                continue
 
-            for variable in variables:
-                if _re.match(variable):
-                    pending_handlers |= handlers
+        pending_handlers = self.index(variables)
+        with template_workers():
+            for handler in pending_handlers:
+                handler(arg)
 
-        for handler in pending_handlers:
-            handler(arg)
-
-    def commit(self, ucr: _UCR, filelist: Iterable[str] = []) -> None:
+    def commit(self, ucr: _UCR, filelist: Iterable[str] = [], jobs: int = 1, timing: bool = False) -> None:
         """
         Call handlers to (re-)generate files.
 
+        File and multifile handlers are independent of each other and are run
+        on a pool of `jobs` threads, while handlers for the same destination
+        file are run one after the other. Script and module handlers may have
+        arbitrary side effects and are always run sequentially afterwards.
+
         :param ucr: UCR instance.
         :param filelist: List of files to re-generate. By default *all* files will be re-generated and all modules and scripts will we re-invoked!
+        :param jobs: Number of file handlers to run in parallel.
+        :param timing: Print the time spent in each handler to `stderr`.
         """
         _filelist = []
         for fname in filelist:
@@ -1061,37 +1307,48 @@ class ConfigHandlers:
             _filelist.append(fname)
 
         # find handlers
-        pending_handlers = set()
-        for fname in directory_files(INFO_DIR):
-            if not fname.endswith('.info'):
-                continue
-            for section in self._parse_rfc822_file(fname):
-                if not section.get('Type'):
-                    continue
-                handler = None
-                if _filelist:
-                    files = section.get('File') or section.get('Multifile') or ()
-                    for filename in files:
-                        if not os.path.isabs(filename):
-                            filename = '/%s' % filename
-                        if filename in _filelist:
-                            handler = self.get_handler(section)
-                            break
-                    else:
-                        continue
-                else:
-                    handler = self.get_handler(section)
-
-                if handler:
-                    pending_handlers.add(handler)
+        if not self._all_handlers or self._cache_outdated():
+            self.update()
+        if _filelist:
+            pending_handlers = {h for h in self._all_handlers if isinstance(h, ConfigHandlerDiverting) and h.to_file in _filelist}
+        else:
+            pending_handlers = set(self._all_handlers)
 
         # print missing files
         for fname in set(_filelist) - {h.to_file for h in pending_handlers if isinstance(h, ConfigHandlerDiverting)}:
             print('Warning: The file %r is not registered as an UCR template.' % (fname,), file=sys.stderr)
 
         # call handlers
+        by_file: dict[str, list[ConfigHandler]] = {}
+        serial: list[ConfigHandler] = []
         for handler in pending_handlers:
-            self.call_handler(ucr, handler)
+            if isinstance(handler, ConfigHandlerDiverting):
+                by_file.setdefault(handler.to_file, []).append(handler)
+            else:
+                serial.append(handler)
+
+        timings: list[tuple[float, ConfigHandler]] = []
+
+        def run(handlers: Iterable[ConfigHandler]) -> None:
+            for handler in handlers:
+                start = time.monotonic()
+                self.call_handler(ucr, handler)
+                timings.append((time.monotonic() - start, handler))
+
+        with template_workers():
+            if jobs > 1 and len(by_file) > 1:
+                with ThreadPoolExecutor(max_workers=jobs) as pool:
+                    futures = [pool.submit(run, handlers) for handlers in by_file.values()]
+                    for future in futures:
+                        future.result()
+            else:
+                for handlers in by_file.values():
+                    run(handlers)
+            run(sorted(serial, key=str))
+
+        if timing:
+            for duration, handler in sorted(timings, key=lambda t: t[0], reverse=True):
+                print('%9.3fs %s: %s' % (duration, type(handler).__name__, handler), file=sys.stderr)
 
     def call_handler(self, ucr: _UCR, handler: ConfigHandler) -> None:
         """
@@ -0,0 +1,235 @@
+#
+#  persistent interpreter for Python blocks in templates
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Univention Configuration Registry template worker.
+
+Each `@!@` block of a template used to be run by its own fresh Python
+interpreter, which had to import and load UCR again. The worker is started
+once, imports UCR and then forks a child for every block sent to it. The
+child runs the block with fresh globals, a freshly loaded UCR instance and
+its file descriptor for `stdout` redirected into a capture file, so blocks
+can't change the state seen by later blocks. The `stdout` of the worker
+itself is redirected to `stderr`, so stray output can't corrupt the
+responses.
+"""
+
+import builtins
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from types import TracebackType
+from typing import IO
+
+
+PRELUDE = b'''\
+# -*- coding: utf-8 -*-
+import univention.config_registry
+configRegistry = univention.config_registry.ConfigRegistry()
+configRegistry.load()
+# for compatibility
+baseConfig = configRegistry
+%s
+'''
+HEADER = struct.Struct('!I')
+
+
+def _send(fd: IO[bytes], data: bytes) -> None:
+    fd.write(HEADER.pack(len(data)) + data)
+    fd.flush()
+
+
+def _recv(fd: IO[bytes]) -> bytes:
+    header = fd.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise EOFError()
+    size, = HEADER.unpack(header)
+    data = fd.read(size)
+    if len(data) < size:
+        raise EOFError()
+    return data
+
+
+def run_block(code: bytes) -> bytes:
+    """
+    Execute template block in a forked child and capture its output.
+
+    The child starts with the modules already imported by the worker, but
+    any change of the module state, working directory or environment is
+    lost with the child.
+
+    :param code: The Python code between the `@!@` delimiters.
+    :returns: Everything written to `stdout`.
+    """
+    with tempfile.TemporaryFile() as capture:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.dup2(capture.fileno(), 1)
+                sys.argv[:] = ['']
+                namespace = {'__name__': '__main__', '__builtins__': builtins}
+                exec(compile(PRELUDE % code, '<stdin>', 'exec'), namespace)  # noqa: S102
+                _join_threads()
+            except SystemExit as ex:
+                if ex.code is not None and not isinstance(ex.code, int):
+                    print(ex.code, file=sys.stderr)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                try:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                finally:
+                    os._exit(0)
+        os.waitpid(pid, 0)
+
+        capture.seek(0)
+        return capture.read()
+
+
+def _join_threads() -> None:
+    """Wait for the threads started by the block like the interpreter does at exit."""
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread() and not thread.daemon:
+            thread.join()
+
+
+def main() -> None:
+    """Serve template blocks from `stdin` until end of file."""
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.close(null)
+    # only the responses may be written to the pipe, anything else goes to stderr
+    os.dup2(2, 1)
+
+    while True:
+        try:
+            code = _recv(requests)
+        except EOFError:
+            break
+        _send(responses, run_block(code))
+
+
+class TemplateWorker:
+    """Handle to a persistent template worker process."""
+
+    def __init__(self) -> None:
+        self.proc: subprocess.Popen | None = None
+
+    def __call__(self, code: bytes) -> bytes | None:
+        """
+        Execute template block in worker.
+
+        :param code: The Python code between the `@!@` delimiters.
+        :returns: The output or `None` if the worker died.
+        """
+        if self.proc is None or self.proc.poll() is not None:
+            self.proc = subprocess.Popen(
+                (sys.executable, '-c', 'from %s import main; main()' % (__name__,)),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                close_fds=True)
+        try:
+            _send(self.proc.stdin, code)  # type: ignore[arg-type]
+            return _recv(self.proc.stdout)  # type: ignore[arg-type]
+        except (OSError, EOFError):
+            self.close()
+            return None
+
+    def close(self) -> None:
+        """Terminate worker process."""
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        try:
+            proc.stdin.close()  # type: ignore[union-attr]
+        except OSError:
+            pass
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()  # type: ignore[union-attr]
+
+
+class TemplateWorkers:
+    """Pool of template workers, one per concurrently rendering thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: list[TemplateWorker] = []
+        self._all: list[TemplateWorker] = []
+
+    def __call__(self, code: bytes) -> bytes | None:
+        """
+        Execute template block in an idle worker.
+
+        :param code: The Python code between the `@!@` delimiters.
+        :returns: The output or `None` if the worker died.
+        """
+        with self._lock:
+            try:
+                worker = self._idle.pop()
+            except IndexError:
+                worker = TemplateWorker()
+                self._all.append(worker)
+        try:
+            return worker(code)
+        finally:
+            with self._lock:
+                self._idle.append(worker)
+
+    def __enter__(self) -> 'TemplateWorkers':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Terminate all worker processes."""
+        with self._lock:
+            workers, self._all, self._idle = self._all, [], []
+        for worker in workers:
+            worker.close()
+
+
+if __name__ == '__main__':
+    main()
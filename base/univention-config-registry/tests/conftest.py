@@ -16,6 +16,7 @@ import univention.config_registry.handler as h  # noqa: E402
 def ucr0(tmpdir, monkeypatch, request):
     """Return an empty UCR instance."""
     monkeypatch.setattr(be.ReadOnlyConfigRegistry, "PREFIX", str(tmpdir))
+    monkeypatch.setattr(be.ReadOnlyConfigRegistry, "SNAPSHOT", str(tmpdir / "snapshot"))
     marker = request.node.get_closest_marker("ucr_layer")
     if marker is None:
         ucr = be.ConfigRegistry()
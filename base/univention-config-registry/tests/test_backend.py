@@ -6,6 +6,7 @@
 """Unit test for univention.config_registry.backend."""
 
 import os
+import threading
 import time
 from io import StringIO
 
@@ -453,3 +454,133 @@ class TestDefault:
     def test_recusrion(self, ucr0, tmpdir):
         ucr0._registry[ucr0.DEFAULTS]["key"] = "@%@key@%@"
         assert ucr0["key"] == ""
+
+
+class TestSnapshot:
+    """Unit test for py:class:`univention.config_registry.backend.SnapshotConfigRegistry`"""
+
+    @pytest.fixture()
+    def enabled(self, ucr0):
+        ucr = ConfigRegistry(write_registry=ConfigRegistry.FORCED)
+        ucr["ucr/snapshot/enabled"] = "yes"
+        ucr.save()
+
+    @pytest.fixture()
+    def snapshot(self, enabled, ucrf):
+        ucr = backend.SnapshotConfigRegistry()
+        ucr.CHECK_INTERVAL = 0.0
+        return ucr
+
+    def test_written(self, enabled, ucrf):
+        assert os.path.isfile(backend.ReadOnlyConfigRegistry.SNAPSHOT)
+
+    def test_disabled(self, ucrf):
+        assert not os.path.exists(backend.ReadOnlyConfigRegistry.SNAPSHOT)
+
+    def test_disable(self, snapshot):
+        assert snapshot["foo"] == "LDAP"
+        ucr = ConfigRegistry(write_registry=ConfigRegistry.FORCED).load()
+        ucr["ucr/snapshot/enabled"] = "no"
+        ucr.save()
+        assert not os.path.exists(backend.ReadOnlyConfigRegistry.SNAPSHOT)
+        assert snapshot["foo"] == "LDAP"
+        assert snapshot._snapshot is None
+
+    def test_get(self, snapshot):
+        assert snapshot._snapshot is None
+        assert snapshot["foo"] == "LDAP"
+        assert snapshot._snapshot is not None
+        assert snapshot.get("bar", getscope=True) == (ConfigRegistry.LDAP, "LDAP")
+        assert snapshot.get("baz") == "NORMAL"
+        assert snapshot.get("other", "default") == "default"
+        assert "baz" in snapshot
+        assert "other" not in snapshot
+
+    def test_merged(self, snapshot, ucrf):
+        assert len(snapshot) == len(ucrf)
+        assert sorted(snapshot) == sorted(ucrf)
+        assert snapshot.items() == ucrf.items()
+        assert snapshot.items(getscope=True) == ucrf.items(getscope=True)
+
+    def test_default(self, snapshot):
+        ucr = ConfigRegistry(write_registry=ConfigRegistry.DEFAULTS)
+        ucr["def"] = "@%@baz@%@"
+        ucr.save()
+        assert snapshot.get("def", getscope=True) == (ConfigRegistry.DEFAULTS, "NORMAL")
+
+    def test_reload(self, snapshot):
+        assert snapshot["new"] is None
+        ucr = ConfigRegistry()
+        ucr["new"] = "value"
+        ucr.save()
+        assert snapshot["new"] == "value"
+        assert snapshot.is_true("new") is False
+
+    def test_outdated(self, snapshot, tmpdir):
+        assert snapshot["baz"] == "NORMAL"
+        time.sleep(0.01)
+        (tmpdir / "base.conf").write("# univention_ base.conf\n\nbaz: EDITED\n")
+        assert snapshot["baz"] == "EDITED"
+        assert snapshot._snapshot is None
+
+    def test_replaced_while_reading(self, snapshot):
+        view = snapshot._refresh()
+        ucr = ConfigRegistry()
+        ucr["new"] = "value"
+        ucr.save()
+        assert snapshot["new"] == "value"
+        assert snapshot._snapshot is not view
+        assert view.lookup("foo") == (ConfigRegistry.LDAP, "LDAP")
+        assert view.lookup("new") is None
+
+    def test_threads(self, snapshot):
+        errors = []
+        stop = threading.Event()
+
+        def read():
+            try:
+                while not stop.is_set():
+                    assert snapshot["foo"] == "LDAP"
+                    assert len(snapshot.items()) >= 3
+            except Exception as exc:
+                errors.append(exc)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        ucr = ConfigRegistry()
+        for i in range(20):
+            ucr["new"] = str(i)
+            ucr.save()
+        stop.set()
+        for reader in readers:
+            reader.join()
+        assert errors == []
+
+    def test_cache_bounded(self, snapshot):
+        view = snapshot._refresh()
+        for i in range(100):
+            assert snapshot["missing/%d" % (i,)] is None
+        assert snapshot["foo"] == "LDAP"
+        assert snapshot["foo"] == "LDAP"
+        assert len(view.cache) <= view.count
+        assert "missing/0" not in view.cache
+
+    def test_missing(self, ucr0):
+        snapshot = backend.SnapshotConfigRegistry()
+        assert snapshot["foo"] is None
+        assert list(snapshot) == []
+
+    def test_invalid(self, enabled, ucrf):
+        with open(backend.ReadOnlyConfigRegistry.SNAPSHOT, "wb") as fd:
+            fd.write(b"invalid")
+        snapshot = backend.SnapshotConfigRegistry()
+        assert snapshot["foo"] == "LDAP"
+        assert snapshot._snapshot is None
+
+    def test_custom(self, tmpucr, tmpdir):
+        ucr = ConfigRegistry()
+        ucr["ucr/snapshot/enabled"] = "yes"
+        ucr["foo"] = "bar"
+        ucr.save()
+        assert not (tmpdir / "snapshot").exists()
@@ -322,6 +322,14 @@ class TestHandler:
         handlers.return_value.load.assert_called_once()
         handlers.return_value.commit.assert_called_once()
 
+    def test_handler_commit_jobs(self, handlers, mocker):
+        ucrfe.handler_commit(["/etc/hosts"], {"jobs": "4", "timing": True})
+        handlers.return_value.commit.assert_called_once_with(mocker.ANY, ["/etc/hosts"], jobs=4, timing=True)
+
+    def test_handler_commit_jobs_invalid(self, handlers):
+        with pytest.raises(SystemExit):
+            ucrfe.handler_commit([], {"jobs": "many"})
+
     def test_handler_register(self, handlers, defaults, mocker):
         ucrfe.handler_register(["INFO"])
         handlers.return_value.update.assert_called_once()
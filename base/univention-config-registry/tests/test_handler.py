@@ -7,6 +7,7 @@
 
 import sys
 from argparse import Namespace
+from io import BytesIO
 from os import stat_result
 from os.path import dirname
 
@@ -42,6 +43,67 @@ def test_filter_script(mocker, ucrf):
     Popen.return_value.communicate.assert_called_once()
 
 
+@pytest.mark.parametrize("tmpl", [
+    "",
+    "@%@",
+    "@%@a@%@",
+    "x@%@a@%@y@%@b@%@z@%@",
+    "@%@tok@%@ @%@a@%@@%@b@%@",
+    "@%@open@%@a@%@",
+    "@%@close@%@@%@b@%@",
+    "%@ @%@pct@%@%@ @%@a@%@",
+    "@@%@at@%@%@a@%@@%@",
+    "@%@empty@%@@%@@%@a@%@",
+])
+def test_template_single_pass(tmpl):
+    directory = {"a": "A", "b": "B", "tok": "@%@", "open": "a@%@", "close": "@%@b", "pct": "@%", "at": "@", "empty": ""}
+    assert ucrh.Template(tmpl).substitute(directory) == ucrh._replace_variables(tmpl, directory, set())
+
+
+@pytest.mark.parametrize("tmpl,out", [
+    (b"1@!@a@!@2@!@b@!@3", b"1A2B3"),
+    (b"@!@tok@!@a@!@", b"A"),
+    (b"@!@a@!@ @!@", b"A @!@"),
+])
+def test_exec_single_pass(tmpl, out, mocker):
+    mocker.patch.object(ucrh, "_exec", side_effect={b"a": b"A", b"b": b"B", b"tok": b"@!@", b"aA": b"aA"}.get)
+    assert ucrh._replace_exec(tmpl) == ucrh._replace_exec_rescan(tmpl) == out
+
+
+def test_template_cache(tmpdir):
+    tmpl = tmpdir / "template"
+    tmpl.write("@%@a@%@")
+    template = ucrh.Template.from_file(str(tmpl))
+    assert ucrh.Template.from_file(str(tmpl)) is template
+    tmpl.write("@%@a@%@ @%@b@%@")
+    assert ucrh.Template.from_file(str(tmpl)) is not template
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("code", [
+    b"print(42)",
+    b"print('\\u00e4')",
+    b"import os\nos.system('echo shell')\nprint('python')",
+    b"import sys\nprint(1)\nsys.exit(0)\nprint(2)",
+    b"print(1)\nraise ValueError()",
+    b"print(configRegistry.get('foo'), baseConfig.get('bar'), __name__)",
+    b"import os\nos.chdir('/')\nos.environ['X'] = '1'",
+    b"import os\nprint(os.getcwd().startswith('/'), os.environ.get('X'))",
+    b"import univention.config_registry as m\nprint(getattr(m, 'X', 0))\nm.X = 1",
+    b"import os\nos.write(1, b'raw')\nprint('python')",
+    b"import threading\nthreading.Thread(target=print, args=('thread',)).start()",
+])
+def test_template_workers(code, tmpucr, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", ":".join(sys.path))
+    tmpucr.write("foo: FOO\nbar: BAR\n")
+    template = b"<@!@%s@!@>" % code
+    expected = ucrh._replace_exec(template)
+    with ucrh.template_workers() as workers:
+        assert ucrh._replace_exec(template) == expected
+        assert ucrh._replace_exec(template) == expected
+        assert len(workers._all) == 1
+
+
 @pytest.mark.parametrize("tmpl,line", [
     ("@%@BCWARNING=// @%@", "// "),
     ("@%@UCRWARNING=# @%@", "# "),
@@ -274,6 +336,46 @@ def test_grep_variables(tmpl, vars):
     assert ucrh.grep_variables(tmpl) == vars
 
 
+class TestHandlerIndex:
+    HANDLERS = {
+        "foo": {"h_foo"},
+        "foo/bar": {"h_foobar"},
+        "interfaces/.*/address": {"h_address"},
+        "^hosts/(allow|deny)/.*": {"h_hosts"},
+        "x(y)\\1": {"h_backref"},
+        "invalid(": {"h_invalid"},
+    }
+
+    @pytest.fixture()
+    def index(self):
+        return ucrh.HandlerIndex(self.HANDLERS)
+
+    def test_split(self, index):
+        assert set(index.literals) == {"foo", "foo/bar"}
+        assert {_re.pattern for _re, _h in index.patterns} == {"^hosts/(allow|deny)/.*", "x(y)\\1"}
+        assert index.combined is not None
+
+    @pytest.mark.parametrize("variables,expected", [
+        ([], set()),
+        (["other"], set()),
+        (["fo"], set()),
+        (["foo"], {"h_foo"}),
+        (["foo/bar/baz"], {"h_foo", "h_foobar"}),
+        (["interfaces/eth0/address"], {"h_address"}),
+        (["hosts/deny/1", "foo"], {"h_hosts", "h_foo"}),
+        (["xyy"], {"h_backref"}),
+    ])
+    def test_call(self, index, variables, expected):
+        assert index(variables) == expected
+
+    def test_combined(self):
+        handlers = {"interfaces/.*/address": {"h_address"}, "hosts/[^/]+/.*": {"h_hosts"}, "foo": {"h_foo"}, "foo/b.r": {"h_foobar"}}
+        index = ucrh.HandlerIndex(handlers)
+        assert index(["interfaces/eth0/address", "hosts/allow/2"]) == {"h_address", "h_hosts"}
+        assert not index.patterns
+        assert index(["foo/bar"]) == {"h_foo", "h_foobar"}
+
+
 @pytest.fixture()
 def handler0(mocker):
     """Return empty dummy handler."""
@@ -394,9 +496,11 @@ class TestConfigHandlers:
         ("univention-config cache, version 1\n", 1),
         ("univention-config cache, version 2\n", 2),
         ("univention-config cache, version 3\n", 3),
+        ("univention-config cache, version 4\n", 4),
+        (b"univention-config cache, version 4\n", 4),
     ])
     def test_get_cache_version(self, data, version):
-        cache = StringIO(data)
+        cache = BytesIO(data) if isinstance(data, bytes) else StringIO(data)
         assert version == ucrh.ConfigHandlers._get_cache_version(cache)
 
     def test_cache(self, handlers):
@@ -428,13 +532,52 @@ class TestConfigHandlers:
     def test_unregister(self, handlers):
         pass
 
-    @pytest.mark.skip()
-    def test_call(self, handlers):
-        pass
+    def test_call(self, handlers, mocker):
+        handler = mocker.MagicMock()
+        handlers._handlers = {"foo/.*": {handler}}
+        handlers(["foo/bar"], ("ucr", "changes"))
+        handler.assert_called_once_with(("ucr", "changes"))
 
-    @pytest.mark.skip()
-    def test_commit(self, handlers):
-        pass
+    def test_call_cached(self, handlers, mocker):
+        handlers._handlers = {"foo": {"h_foo"}, "bar/.*": {"h_bar"}}
+        handlers._subfiles = {}
+        handlers._multifiles = {}
+        handlers._save_cache()
+
+        h2 = ucrh.ConfigHandlers()
+        h2.load()
+        assert h2._index is not None
+        assert h2.index(["bar/baz", "foo"]) == {"h_foo", "h_bar"}
+
+    @pytest.fixture()
+    def commit_handlers(self, handlers, mocker):
+        mocker.patch.object(handlers, "_cache_outdated", return_value=False)
+        mocker.patch.object(handlers, "call_handler")
+        file1 = ucrh.ConfigHandlerFile("/src1", "/etc/file1")
+        file2 = ucrh.ConfigHandlerFile("/src2", "/etc/file2")
+        multi = ucrh.ConfigHandlerMultifile("/src3", "/etc/file2")
+        script = ucrh.ConfigHandlerScript("/script")
+        handlers._all_handlers = {file1, file2, multi, script}
+        return handlers
+
+    @pytest.mark.parametrize("jobs", [1, 4])
+    def test_commit(self, commit_handlers, jobs, capsys):
+        commit_handlers.commit("ucr", jobs=jobs, timing=True)
+        called = [args[0][1] for args in commit_handlers.call_handler.call_args_list]
+        assert len(called) == 4
+        assert str(called[-1]) == "/script"
+        assert "Script: /script" in capsys.readouterr().err
+
+    def test_commit_files(self, commit_handlers, capsys):
+        commit_handlers.commit("ucr", ["/etc/file2", "/etc/missing"], jobs=2)
+        called = {str(args[0][1]) for args in commit_handlers.call_handler.call_args_list}
+        assert called == {"/etc/file2"}
+        assert "/etc/missing" in capsys.readouterr().err
+
+    def test_commit_outdated(self, handlers, mocker):
+        update = mocker.patch.object(handlers, "update")
+        handlers.commit("ucr")
+        update.assert_called_once_with()
 
     @pytest.mark.skip()
     def test_call_handler(self, handlers):
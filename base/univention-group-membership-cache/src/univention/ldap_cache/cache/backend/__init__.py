@@ -67,6 +67,11 @@ class Caches:
         if cache is None:
             cache = self._add_sub_cache(name, klass.single_value, klass.reverse)
         cache.add_shard(klass)
+        if klass.member_index and cache.index is None:
+            debug('Adding member index for %s', name)
+            reverse = self._add_sub_cache('%s.reverse' % name, False, False)
+            closure = self._add_sub_cache('%s.closure' % name, False, False)
+            cache.index = MemberIndex(cache, reverse, closure)
 
     def _add_sub_cache(self, name: str, single_value: bool, reverse: bool) -> Any:
         raise NotImplementedError()
@@ -80,6 +85,7 @@ class Shard:
     value: str | None = None
     attributes: list[str] = []
     reverse = False
+    member_index = False
 
     def __init__(self, cache: Any) -> None:
         self._cache = cache
@@ -91,7 +97,11 @@ class Shard:
             return
         values = self.get_values(obj)
         debug('Removing %s', key)
+        index = self._cache.index
+        old_values = (self._cache.get(key) or []) if index is not None else []
         self._cache.delete(key, values)
+        if index is not None:
+            index.update(key, old_values, [])
 
     def add_object(self, obj: tuple[str, Mapping[str, Sequence[bytes]]]) -> None:
         try:
@@ -100,10 +110,24 @@ class Shard:
             return
         debug('Adding %s', key)
         values = self.get_values(obj)
+        index = self._cache.index
+        old_values = (self._cache.get(key) or []) if index is not None else []
         if values:
             self._cache.save(key, values)
         else:
             self._cache.delete(key, [])
+        if index is not None:
+            index.update(key, old_values, values or [])
+
+    def modify_object(self, old_obj: tuple[str, Mapping[str, Sequence[bytes]]], new_obj: tuple[str, Mapping[str, Sequence[bytes]]]) -> None:
+        try:
+            renamed = self.get_key(old_obj) != self.get_key(new_obj)
+        except ValueError:
+            renamed = True
+        if renamed or self._cache.reverse:
+            self.rm_object(old_obj)
+        # saving replaces the previous values, so the member index only sees the difference
+        self.add_object(new_obj)
 
     def _get_from_object(self, obj: tuple[str, Mapping[str, Sequence[bytes]]], attr: str) -> Sequence[Any]:
         if attr == 'dn':
@@ -126,11 +150,100 @@ class LdapCache:
         self.single_value = single_value
         self.reverse = reverse
         self.shards: list[Shard] = []
+        self.index: MemberIndex | None = None
 
     def add_shard(self, shard_class: type[Shard]) -> None:
         self.shards.append(shard_class(self))
 
 
+class MemberIndex:
+    """
+    Indexes of a sub cache, which maps groups to their members.
+
+    :py:attr:`reverse` maps every member to the groups it is a direct member of,
+    :py:attr:`closure` maps every member to all groups it is a member of, including the groups of nested groups.
+    Both are updated incrementally when the members of a group change:
+    only the changed members and the members below them need to be updated.
+    All DNs are stored in lower case.
+    """
+
+    def __init__(self, members: LdapCache, reverse: LdapCache, closure: LdapCache) -> None:
+        self.members = members
+        self.reverse = reverse
+        self.closure = closure
+
+    def clear(self) -> None:
+        self.reverse.clear()
+        self.closure.clear()
+
+    def update(self, group: str, old_members: Sequence[str], new_members: Sequence[str]) -> None:
+        group = group.lower()
+        old = {member.lower() for member in old_members}
+        new = {member.lower() for member in new_members}
+        changed = old ^ new
+        if not changed:
+            return
+
+        debug('%s - Updating index of %s for %d members', self.members.name, group, len(changed))
+        with self.reverse.writing() as reverse_writer:
+            for member in changed:
+                groups = set(self.reverse.get(member, reverse_writer) or [])
+                if member in new:
+                    groups.add(group)
+                else:
+                    groups.discard(group)
+                self.reverse.save(member, sorted(groups), reverse_writer)
+
+        with self.members.reading() as members_reader:
+            affected = self._below(changed, members_reader)
+
+        # some backends allow only one writer at a time
+        parents: dict[str, list[str]] = {}
+        with self.reverse.reading() as reverse_reader, self.closure.writing() as closure_writer:
+            for member in affected:
+                self.closure.save(member, sorted(self._above(member, reverse_reader, parents)), closure_writer)
+
+    def _below(self, members: set[str], reader: Any) -> list[str]:
+        """Return the members and all their transitive members."""
+        found: list[str] = []
+        seen: set[str] = set()
+        queue = list(members)
+        while queue:
+            member = queue.pop()
+            if member in seen:
+                continue
+            seen.add(member)
+            found.append(member)
+            queue.extend(child.lower() for child in self.members.get(member, reader) or [])
+        return found
+
+    def _above(self, member: str, reader: Any, parents: dict[str, list[str]]) -> set[str]:
+        """Return all groups the member is a transitive member of."""
+        found: set[str] = set()
+        queue = [member]
+        while queue:
+            dn = queue.pop()
+            if dn not in parents:
+                parents[dn] = self.reverse.get(dn, reader) or []
+            for group in parents[dn]:
+                if group not in found:
+                    found.add(group)
+                    queue.append(group)
+        return found
+
+    def groups(self, member: str, consider_nested_groups: bool = True) -> list[str]:
+        """
+        Return the groups of a member.
+
+        :param member: The DN of the member.
+        :param consider_nested_groups: Also return the groups of the groups.
+        :returns: The sorted list of lower case group DNs.
+        """
+        if consider_nested_groups:
+            return sorted(self.closure.get(member.lower()) or [])
+        return sorted(self.reverse.get(member.lower()) or [])
+
+
 def _s(input: Any) -> Any:
     if isinstance(input, list | tuple):
         res: Any = []
@@ -84,9 +84,9 @@ class GdbmCache(LdapCache):
 
     reading = writing
 
-    def save(self, key, values):
-        # type: (str, List[str]) -> None
-        with self.writing() as writer:
+    def save(self, key, values, writer=None):
+        # type: (str, List[str], Any) -> None
+        with self.writing(writer) as writer:
             if self.reverse:
                 for value in values:
                     current = self.get(value, writer) or []
@@ -75,9 +75,9 @@ class LmdbCache(LdapCache):
             with self.env.begin(self.sub_db, write=True) as writer:
                 yield writer
 
-    def save(self, key, values):
-        # type: (str, List[str]) -> None
-        with self.writing() as writer:
+    def save(self, key, values, writer=None):
+        # type: (str, List[str], Any) -> None
+        with self.writing(writer) as writer:
             self.delete(key, writer)
             for value in values:
                 writer.put(key, value)
@@ -97,19 +97,25 @@ class LmdbCache(LdapCache):
             writer.delete(key)
 
     @contextmanager
-    def reading(self):
-        # type: () -> Iterator[Any]
-        with self.env.begin(self.sub_db) as txn, txn.cursor() as cursor:
-            yield cursor
+    def reading(self, reader=None):
+        # type: (Optional[Any]) -> Iterator[Any]
+        if isinstance(reader, lmdb.Cursor):
+            yield reader
+        elif reader is not None:
+            with reader.cursor(self.sub_db) as cursor:
+                yield cursor
+        else:
+            with self.env.begin(self.sub_db) as txn, txn.cursor() as cursor:
+                yield cursor
 
     def __iter__(self):
         # type: () -> Iterator[Tuple[str, Any]]
         with self.reading() as reader:
             yield from reader
 
-    def get(self, key):
-        # type: (str) -> Any
-        with self.reading() as reader:
+    def get(self, key, reader=None):
+        # type: (str, Any) -> Any
+        with self.reading(reader) as reader:
             if self.single_value:
                 return reader.get(key)
             else:
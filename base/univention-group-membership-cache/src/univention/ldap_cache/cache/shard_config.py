@@ -56,6 +56,7 @@ def shards_from_config():
                     db_name = data['db_name']
                     single_value = data['single_value']
                     reverse = data.get('reverse', False)
+                    member_index = data.get('member_index', False)
                     key = data['key']
                     value = data['value']
                     ldap_filter = data['ldap_filter']
@@ -78,8 +79,8 @@ def _writing_config():
         json.dump(shards, fd, sort_keys=True, indent=4)
 
 
-def add_shard_to_config(db_name, single_value, reverse, key, value, ldap_filter):
-    # type: (str, bool, bool, str, str, str) -> None
+def add_shard_to_config(db_name, single_value, reverse, key, value, ldap_filter, member_index=False):
+    # type: (str, bool, bool, str, str, str, bool) -> None
     with _writing_config() as shards:
         shard_config = {
             'db_name': db_name,
@@ -89,21 +90,26 @@ def add_shard_to_config(db_name, single_value, reverse, key, value, ldap_filter)
             'value': value,
             'ldap_filter': ldap_filter,
         }
+        if member_index:
+            shard_config['member_index'] = True
         if shard_config not in shards:
             shards.append(shard_config)
 
 
-def rm_shard_from_config(db_name, single_value, reverse, key, value, ldap_filter):
-    # type: (str, bool, bool, str, str, str) -> None
+def rm_shard_from_config(db_name, single_value, reverse, key, value, ldap_filter, member_index=False):
+    # type: (str, bool, bool, str, str, str, bool) -> None
     with _writing_config() as shards:
+        shard_config = {
+            'db_name': db_name,
+            'single_value': single_value and not reverse,
+            'reverse': reverse,
+            'key': key,
+            'value': value,
+            'ldap_filter': ldap_filter,
+        }
+        if member_index:
+            shard_config['member_index'] = True
         try:
-            shards.remove({
-                'db_name': db_name,
-                'single_value': single_value and not reverse,
-                'reverse': reverse,
-                'key': key,
-                'value': value,
-                'ldap_filter': ldap_filter,
-            })
+            shards.remove(shard_config)
         except ValueError:
             pass
@@ -53,7 +53,10 @@ def groups_for_user(user_dn: str, consider_nested_groups: bool = True, cache: di
     user_dn = user_dn.lower()
     if cache is None:
         _cache = get_cache()
-        subcache = _cache.get_sub_cache('uniqueMembers').load()
+        unique_member_cache = _cache.get_sub_cache('uniqueMembers')
+        if unique_member_cache.index is not None:
+            return unique_member_cache.index.groups(user_dn, consider_nested_groups)
+        subcache = unique_member_cache.load()
         cache = {key: {val.lower() for val in values} for key, values in subcache.items()}
     search_for_dns = [user_dn]
     found: set[str] = set()
@@ -104,6 +107,8 @@ def users_groups() -> dict[str, list[str]]:
     """
     cache = get_cache()
     member_uid_cache, unique_member_cache = (cache.get_sub_cache(name) for name in ['memberUids', 'uniqueMembers'])
+    if unique_member_cache.index is not None:
+        return _users_groups_from_index(member_uid_cache, unique_member_cache.index)
 
     group_users: dict[str, list[str]] = {}
     _group_cache: dict[str, list[str]] = {}
@@ -119,3 +124,25 @@ def users_groups() -> dict[str, list[str]]:
 
     # return groups as sorted list
     return {_extract_id_from_dn(user): sorted(groups) for user, groups in res.items()}
+
+
+def _users_groups_from_index(member_uid_cache: Cache, index: Any) -> dict[str, list[str]]:
+    """
+    Like :py:func:`users_groups`, but only reads the precomputed groups of
+    every member. A member is a user if its RDN is also contained in the
+    `memberUid` of the groups it is a direct member of.
+    """
+    group_uids: dict[str, set[str]] = {}
+    res: dict[str, list[str]] = {}
+    with member_uid_cache.reading() as member_uid_reader, index.reverse.reading() as reverse_reader:
+        for member, groups in index.closure:
+            if not groups:
+                continue
+            rdn = _extract_id_from_dn(member)
+            for group in index.reverse.get(member, reverse_reader) or []:
+                if group not in group_uids:
+                    group_uids[group] = {uid.lower() for uid in member_uid_cache.get(group, member_uid_reader) or []}
+                if rdn in group_uids[group]:
+                    res[rdn] = sorted(groups)
+                    break
+    return res
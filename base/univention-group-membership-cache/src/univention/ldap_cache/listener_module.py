@@ -63,8 +63,7 @@ class LdapCacheHandler(ListenerModuleHandler):
     def modify(self, dn, old, new, old_dn):
         # type: (str, Mapping[str, Sequence[bytes]], Mapping[str, Sequence[bytes]], Optional[str]) -> None
         for shard in get_cache().get_shards_for_query(self.config.get_ldap_filter()):
-            shard.rm_object((old_dn or dn, old))
-            shard.add_object((dn, new))
+            shard.modify_object((old_dn or dn, old), (dn, new))
         self._cleanup_cache_if_needed()
 
     def remove(self, dn, old):
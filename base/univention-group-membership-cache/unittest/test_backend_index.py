@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+#
+from contextlib import contextmanager
+
+import pytest
+from univentionunittests import import_module
+
+
+@pytest.fixture()
+def backend():
+    return import_module("univention.ldap_cache.cache.backend", "src/", "univention.ldap_cache.cache.backend", use_installed=False)
+
+
+@pytest.fixture()
+def caches(backend):
+    class MemoryCache(backend.LdapCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.data = {}
+
+        @contextmanager
+        def writing(self, writer=None):
+            yield self.data
+
+        reading = writing
+
+        def save(self, key, values, writer=None):
+            self.data[key] = list(values)
+
+        def delete(self, key, values, writer=None):
+            self.data.pop(key, None)
+
+        def clear(self):
+            self.data.clear()
+
+        def get(self, key, reader=None):
+            return self.data.get(key)
+
+    class MemoryCaches(backend.Caches):
+        def _add_sub_cache(self, name, single_value, reverse):
+            cache = MemoryCache(name, single_value, reverse)
+            self._caches[name] = cache
+            return cache
+
+    class Members(backend.Shard):
+        db_name = 'uniqueMembers'
+        key = 'dn'
+        value = 'uniqueMember'
+        ldap_filter = '(objectClass=posixGroup)'
+        member_index = True
+
+    caches = MemoryCaches()
+    caches.add(Members)
+    return caches
+
+
+@pytest.fixture()
+def shard(caches):
+    return caches.get_sub_cache('uniqueMembers').shards[0]
+
+
+@pytest.fixture()
+def index(caches):
+    return caches.get_sub_cache('uniqueMembers').index
+
+
+def group(dn, *members):
+    return (dn, {'uniqueMember': [member.encode('UTF-8') for member in members]})
+
+
+def test_sub_caches(caches, index):
+    assert caches.get_sub_cache('uniqueMembers.reverse') is index.reverse
+    assert caches.get_sub_cache('uniqueMembers.closure') is index.closure
+
+
+def test_add_members(shard, index):
+    shard.add_object(group('cn=g1', 'uid=a', 'uid=b'))
+    shard.add_object(group('cn=g2', 'uid=b'))
+    assert index.groups('uid=a') == ['cn=g1']
+    assert index.groups('UID=B') == ['cn=g1', 'cn=g2']
+    assert index.groups('uid=c') == []
+
+
+def test_remove_members(shard, index):
+    shard.add_object(group('cn=g1', 'uid=a', 'uid=b'))
+    shard.modify_object(group('cn=g1', 'uid=a', 'uid=b'), group('cn=g1', 'uid=b'))
+    assert index.groups('uid=a') == []
+    assert index.groups('uid=b') == ['cn=g1']
+    shard.rm_object(group('cn=g1', 'uid=b'))
+    assert index.groups('uid=b') == []
+
+
+def test_nested_groups(shard, index):
+    shard.add_object(group('cn=g1', 'uid=a', 'cn=g2'))
+    shard.add_object(group('cn=g2', 'uid=b', 'cn=g3'))
+    shard.add_object(group('cn=g3', 'uid=c'))
+    assert index.groups('uid=a') == ['cn=g1']
+    assert index.groups('uid=b') == ['cn=g1', 'cn=g2']
+    assert index.groups('uid=c') == ['cn=g1', 'cn=g2', 'cn=g3']
+    assert index.groups('uid=c', consider_nested_groups=False) == ['cn=g3']
+
+    # removing the nested group updates all members below it
+    shard.modify_object(group('cn=g1', 'uid=a', 'cn=g2'), group('cn=g1', 'uid=a'))
+    assert index.groups('uid=b') == ['cn=g2']
+    assert index.groups('uid=c') == ['cn=g2', 'cn=g3']
+
+    shard.rm_object(group('cn=g3', 'uid=c'))
+    assert index.groups('uid=c') == []
+    assert index.groups('cn=g3') == ['cn=g2']
+
+
+def test_nested_groups_cycle(shard, index):
+    shard.add_object(group('cn=g1', 'cn=g2', 'uid=a'))
+    shard.add_object(group('cn=g2', 'cn=g1'))
+    assert index.groups('uid=a') == ['cn=g1', 'cn=g2']
+    assert index.groups('cn=g1') == ['cn=g1', 'cn=g2']
@@ -35,14 +35,19 @@
 import logging
 import random
 import re
-from collections.abc import Callable
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
 from functools import wraps
 from typing import Any
 
 import ldap
 import ldap.sasl
 import ldap.schema
+from ldap.controls import SimplePagedResultsControl
 from ldap.controls.readentry import PostReadControl, PreReadControl
+from ldap.filter import filter_format
 from ldapurl import LDAPUrl, isLDAPUrl
 
 import univention.logging
@@ -273,6 +278,9 @@ class access:
             client_retry_count = 10
 
         self.client_connection_attempt = client_retry_count + 1
+        self._policy_resolver: PolicyResolver | None = None
+        # the Simple Paged Results state is kept per connection by slapd
+        self._paged_search_active = False
 
         self.__open(ca_certfile)
 
@@ -287,6 +295,7 @@ class access:
         self.binddn = binddn
         self.bindpw = bindpw
         log.debug('bind binddn=%s', self.binddn)
+        self._policies_changed(flush=True)
         self.lo.simple_bind_s(self.binddn, self.bindpw)
 
     @_fix_reconnect_handling
@@ -302,6 +311,7 @@ class access:
             ldap.sasl.CB_AUTHNAME: None,
             ldap.sasl.CB_PASS: bindpw,
         }, 'SAML')
+        self._policies_changed(flush=True)
         self.lo.sasl_interactive_bind_s('', saml)
         self.binddn = self.whoami()
         log.debug('SAML bind binddn=%s', self.binddn)
@@ -324,6 +334,7 @@ class access:
             ldap.sasl.CB_AUTHNAME: authzid,
             ldap.sasl.CB_PASS: bindpw,
         }, 'OAUTHBEARER')
+        self._policies_changed(flush=True)
         self.lo.sasl_interactive_bind_s('', oauth)
         self.binddn = self.whoami()
         log.debug('OAUTHBEARER bind binddn=%r', self.binddn)
@@ -485,6 +496,102 @@ class access:
         else:
             return self.lo.search_ext_s(*args, **kwargs)
 
+    def search_iter(self, filter: str = '(objectClass=*)', base: str = '', scope: str = 'sub', attr: list[str] = [], timeout: int = -1, sizelimit: int = 0, serverctrls: list[ldap.controls.LDAPControl] | None = None, page_size: int = 1000) -> Iterator[tuple[str, dict[str, list[bytes]]]]:
+        """
+        Perform LDAP search and yield the entries as they arrive.
+
+        Unlike :py:meth:`search` the result set is not buffered: the Simple
+        Paged Results control is used to fetch `page_size` entries at a time and
+        each entry is yielded as soon as it is received.
+        If `serverctrls` already contains a paged results control, only that
+        single page is returned.
+
+        Each page is received completely before its entries are yielded, so
+        no request is outstanding while the caller processes them and other
+        searches may be done in between. The server keeps the state of a paged
+        search per connection and a second paged search would invalidate the
+        cookie, therefore searches started on the same connection while a
+        paged iteration is active are done without the paged results control.
+
+        :param str filter: LDAP search filter.
+        :param str base: the starting point for the search.
+        :param str scope: Specify the scope of the search to be one of `base`, `base+one`, `one`, `sub`, or `domain` to specify a base object, base plus one-level, one-level, subtree, or children search.
+        :param attr: The list of attributes to fetch.
+        :type attr: list[str]
+        :param int timeout: wait at most timeout seconds for each page to arrive. `-1` for no limit.
+        :param int sizelimit: retrieve at most sizelimit entries for a search. `0` for no limit.
+        :param serverctrls: a list of :py:class:`ldap.controls.LDAPControl` instances sent to the server along with the LDAP request.
+        :type serverctrls: list[ldap.controls.LDAPControl]
+        :param int page_size: the number of entries requested per page.
+        :returns: An iterator of 2-tuples (dn, values) for each LDAP object, where values is a dictionary mapping attribute names to a list of values.
+        :rtype: Iterator[tuple[str, dict[str, list[bytes]]]]
+        :raises ldap.NO_SUCH_OBJECT: Indicates the target object cannot be found.
+        :raises ldap.SIZELIMIT_EXCEEDED: Indicates that more than `sizelimit` objects match.
+
+        .. note:: Connection errors are not retried, as the iteration cannot be resumed transparently.
+        """
+        log.debug('uldap.search_iter filter=%s base=%s scope=%s attr=%s timeout=%d sizelimit=%d page_size=%d', filter, base, scope, attr, timeout, sizelimit, page_size)
+
+        if not base:
+            base = self.base
+
+        count = 0
+        if scope == 'base+one':
+            for entry in self.lo.search_ext_s(base, ldap.SCOPE_BASE, filter, attr, serverctrls=serverctrls, clientctrls=None, timeout=timeout, sizelimit=sizelimit):
+                count += 1
+                yield entry
+            ldap_scope = ldap.SCOPE_ONELEVEL
+        elif scope in {'sub', 'domain'}:
+            ldap_scope = ldap.SCOPE_SUBTREE
+        elif scope == 'one':
+            ldap_scope = ldap.SCOPE_ONELEVEL
+        else:
+            ldap_scope = ldap.SCOPE_BASE
+
+        ctrls = list(serverctrls or [])
+        page = None
+        if not self._paged_search_active and not any(ctrl.controlType == SimplePagedResultsControl.controlType for ctrl in ctrls):
+            page = SimplePagedResultsControl(True, size=page_size, cookie='')
+            ctrls.append(page)
+            self._paged_search_active = True
+
+        try:
+            while True:
+                msgid = self.lo.search_ext(base, ldap_scope, filter, attr, serverctrls=ctrls, clientctrls=None, timeout=timeout, sizelimit=sizelimit)
+                entries = []
+                while True:
+                    rtype, rdata, _rmsgid, resp_ctrls = self.lo.result3(msgid, all=0, timeout=timeout)
+                    if rtype == ldap.RES_SEARCH_RESULT:
+                        break
+                    if rtype != ldap.RES_SEARCH_ENTRY:
+                        continue  # skip search references
+                    if page is None:
+                        # not paged: nothing to protect, stream the entries
+                        for entry in rdata:
+                            count += 1
+                            if sizelimit and count > sizelimit:
+                                self.lo.abandon(msgid)
+                                raise ldap.SIZELIMIT_EXCEEDED({'desc': 'Size limit exceeded'})
+                            yield entry
+                    else:
+                        entries.extend(rdata)
+
+                for entry in entries:
+                    count += 1
+                    if sizelimit and count > sizelimit:
+                        raise ldap.SIZELIMIT_EXCEEDED({'desc': 'Size limit exceeded'})
+                    yield entry
+
+                if page is None:
+                    break
+                cookie = next((ctrl.cookie for ctrl in resp_ctrls or () if ctrl.controlType == SimplePagedResultsControl.controlType), None)
+                if not cookie:
+                    break
+                page.cookie = cookie
+        finally:
+            if page is not None:
+                self._paged_search_active = False
+
     def searchDn(self, filter: str = '(objectClass=*)', base: str = '', scope: str = 'sub', unique: bool = False, required: bool = False, timeout: int = -1, sizelimit: int = 0, serverctrls: list[ldap.controls.LDAPControl] | None = None, response: dict[str, ldap.controls.LDAPControl] | None = None) -> list[str]:
         """
         Perform LDAP search and return distinguished names only.
@@ -525,84 +632,38 @@ class access:
         if not dn and not policies:  # if policies is set apply a fictionally referenced list of policies
             return {}
 
-        # get current dn
-        if 'objectClass' in attrs and 'univentionPolicyReference' in attrs:
-            oattrs = attrs
-        else:
-            oattrs = self.get(dn, ['univentionPolicyReference', 'objectClass'])
+        return self.policy_resolver.resolve(dn, policies, attrs)
 
-        if 'univentionPolicyReference' in attrs:
-            policies = [x.decode('utf-8') for x in attrs['univentionPolicyReference']]
-        elif not policies and not attrs:
-            policies = [x.decode('utf-8') for x in oattrs.get('univentionPolicyReference', [])]
+    def getPoliciesMany(self, dns: Iterable[str]) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Return |UCS| policies for many |LDAP| entries.
 
-        object_classes = {oc.lower() for oc in oattrs.get('objectClass', [])}
+        The entries are fetched in chunks and their common containers and referenced policies are only read once.
 
-        merged: dict[str, dict[str, Any]] = {}
-        if dn:
-            obj_dn = dn
-            while True:
-                for policy_dn in policies or []:
-                    self._merge_policy(policy_dn, obj_dn, object_classes, merged)
-                dn = self.parentDn(dn) or ''
-                if not dn:
-                    break
-                try:
-                    parent = self.get(dn, attr=['univentionPolicyReference'], required=True)
-                except ldap.NO_SUCH_OBJECT:
-                    break
-                policies = [x.decode('utf-8') for x in parent.get('univentionPolicyReference', [])]
+        :param dns: The distinguished names of the |LDAP| entries.
+        :returns: A mapping of each distinguished name to the mapping of policy names as returned by :py:meth:`getPolicies`.
+        """
+        return self.policy_resolver.resolve_many(dns)
 
-        univention.debug.debug(
-            univention.debug.LDAP, univention.debug.ALL,
-            "getPolicies: result: %s" % merged)
-        return merged
+    @property
+    def policy_resolver(self) -> 'PolicyResolver':
+        """The policy resolver caching the containers and policies of this connection."""
+        if self._policy_resolver is None:
+            self._policy_resolver = PolicyResolver(self)
+        return self._policy_resolver
 
-    def _merge_policy(self, policy_dn: str, obj_dn: str, object_classes: set[bytes], result: dict[str, dict[str, Any]]) -> None:
+    def _policies_changed(self, flush: bool = False) -> None:
         """
-        Merge policies into result.
+        Force the cached containers and policies to be re-validated after a write operation.
 
-        :param str policy_dn: Distinguished name of the policy object.
-        :param obj_dn: Distinguished name of the LDAP object.
-        :param set object_classes: the set of object classes of the LDAP object.
-        :param list result: A mapping, into which the policy is merged.
+        :param bool flush: Drop all cached entries, e.g. because the identity of the connection changed.
         """
-        pattrs = self.get(policy_dn)
-        if not pattrs:
-            return
-
-        try:
-            classes = set(pattrs['objectClass']) - {b'top', b'univentionPolicy', b'univentionObject'}
-            ptype = classes.pop().decode('utf-8')
-        except KeyError:
+        if self._policy_resolver is None:
             return
-
-        if pattrs.get('ldapFilter'):
-            try:
-                self.search(pattrs['ldapFilter'][0].decode('utf-8'), base=obj_dn, scope='base', unique=True, required=True)
-            except ldap.NO_SUCH_OBJECT:
-                return
-
-        if not all(oc.lower() in object_classes for oc in pattrs.get('requiredObjectClasses', [])):
-            return
-        if any(oc.lower() in object_classes for oc in pattrs.get('prohibitedObjectClasses', [])):
-            return
-
-        fixed = {x.decode('utf-8') for x in pattrs.get('fixedAttributes', ())}
-        empty = {x.decode('utf-8') for x in pattrs.get('emptyAttributes', ())}
-        values = result.setdefault(ptype, {})
-        SKIP = {'requiredObjectClasses', 'prohibitedObjectClasses', 'fixedAttributes', 'emptyAttributes', 'objectClass', 'cn', 'univentionObjectType', 'ldapFilter'}
-        for key in (empty | set(pattrs) | fixed) - SKIP:
-            if key not in values or key in fixed:
-                value = [] if key in empty else pattrs.get(key, [])
-                univention.debug.debug(
-                    univention.debug.LDAP, univention.debug.ALL,
-                    "getPolicies: %s sets: %s=%r" % (policy_dn, key, value))
-                values[key] = {
-                    'policy': policy_dn,
-                    'value': value,
-                    'fixed': key in fixed,
-                }
+        if flush:
+            self._policy_resolver.clear()
+        else:
+            self._policy_resolver.expire()
 
     @_fix_reconnect_handling
     def get_schema(self) -> ldap.schema.subentry.SubSchema:
@@ -656,6 +717,7 @@ class access:
 
         nal = [(k, list(v)) for k, v in nal.items()]
 
+        self._policies_changed()
         try:
             _rtype, _rdata, _rmsgid, resp_ctrls = self.lo.add_ext_s(dn, nal, serverctrls=serverctrls)
         except ldap.REFERRAL as exc:
@@ -759,6 +821,7 @@ class access:
         :param str dn: The distinguished name of the object to modify.
         :param ml: The modify-list of 3-tuples (attribute-name, old-values, new-values).
         """
+        self._policies_changed()
         try:
             self.lo.modify_ext_s(dn, ml)
         except ldap.REFERRAL as exc:
@@ -781,6 +844,7 @@ class access:
         if not serverctrls:
             serverctrls = []
 
+        self._policies_changed()
         try:
             _rtype, _rdata, _rmsgid, resp_ctrls = self.lo.modify_ext_s(dn, ml, serverctrls=serverctrls)
         except ldap.REFERRAL as exc:
@@ -841,6 +905,7 @@ class access:
         if not serverctrls:
             serverctrls = []
 
+        self._policies_changed()
         try:
             _rtype, _rdata, _rmsgid, resp_ctrls = self.lo.rename_s(dn, newrdn, newsuperior, serverctrls=serverctrls)
         except ldap.REFERRAL as exc:
@@ -877,6 +942,7 @@ class access:
 
         if dn:
             log.debug('delete')
+            self._policies_changed()
             try:
                 _rtype, _rdata, _rmsgid, resp_ctrls = self.lo.delete_ext_s(dn, serverctrls=serverctrls)
             except ldap.REFERRAL as exc:
@@ -991,6 +1057,252 @@ class access:
             raise ldap.CONNECT_ERROR('Bad referral "%s"' % (exc,))
 
 
+class PolicyResolver:
+    """
+    Resolve |UCS| policies using a cache of containers and policy objects.
+
+    Resolving the policies of an entry reads every container up to the |LDAP| base and all referenced policies.
+    Both are kept in a bounded LRU cache, so resolving the policies of many entries in the same containers does not read them again.
+
+    The cache is validated against the `contextCSN` of the |LDAP| base at most every :py:attr:`CHECK_INTERVAL` seconds:
+    if it changed, all entries are dropped and read again when needed.
+    Only dropping the entries with a newer `entryCSN` would miss deleted containers and policies, which are gone from the directory.
+    Write operations of the connection itself force a validation on the next access.
+    If the `contextCSN` cannot be read, the cache only lives until the next validation.
+
+    :param lo: The |LDAP| connection.
+    :param int maxsize: The maximum number of cached containers and policies each.
+    """
+
+    CHECK_INTERVAL = 1.0
+    MAXSIZE = 10000
+    CHUNK = 100
+    SKIP = {'requiredObjectClasses', 'prohibitedObjectClasses', 'fixedAttributes', 'emptyAttributes', 'objectClass', 'cn', 'univentionObjectType', 'ldapFilter'}
+
+    def __init__(self, lo: access, maxsize: int = MAXSIZE) -> None:
+        self.lo = lo
+        self.maxsize = maxsize
+        self._lock = threading.RLock()
+        self._references: OrderedDict[str, list[str] | None] = OrderedDict()
+        self._policies: OrderedDict[str, dict[str, list[bytes]]] = OrderedDict()
+        self._csn: list[bytes] = []
+        self._checked = 0.0
+
+    @staticmethod
+    def _key(dn: str) -> str:
+        try:
+            return ldap.dn.dn2str(ldap.dn.str2dn(dn)).lower()
+        except ldap.DECODING_ERROR:
+            return dn.lower()
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._references.clear()
+            self._policies.clear()
+            self._csn = []
+            self._checked = 0.0
+
+    def expire(self) -> None:
+        """Validate the cached entries on next access."""
+        self._checked = 0.0
+
+    def invalidate(self, dn: str) -> None:
+        """
+        Evict entry from cache.
+
+        :param str dn: The distinguished name of the container or policy.
+        """
+        key = self._key(dn)
+        with self._lock:
+            self._references.pop(key, None)
+            self._policies.pop(key, None)
+
+    def validate(self) -> None:
+        """Drop all entries if the directory was modified since the last validation."""
+        now = time.monotonic()
+        if now - self._checked < self.CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            self._checked = now
+            try:
+                csn = sorted(self.lo.get(self.lo.base, ['contextCSN']).get('contextCSN', []))
+            except ldap.LDAPError:
+                csn = []
+
+            if not csn or csn != self._csn:
+                self._references.clear()
+                self._policies.clear()
+            self._csn = csn
+
+    def _lookup(self, cache: OrderedDict, key: str) -> Any:
+        with self._lock:
+            value = cache[key]
+            cache.move_to_end(key)
+            return value
+
+    def _store(self, cache: OrderedDict, key: str, value: Any) -> None:
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+    def references(self, dn: str) -> list[str] | None:
+        """
+        Return policy references of container.
+
+        :param str dn: The distinguished name of the container.
+        :returns: The list of referenced policies or `None` if the container does not exist.
+        """
+        key = self._key(dn)
+        try:
+            return self._lookup(self._references, key)
+        except KeyError:
+            pass
+
+        try:
+            attrs: dict[str, list[bytes]] | None = self.lo.get(dn, attr=['univentionPolicyReference'], required=True)
+        except ldap.NO_SUCH_OBJECT:
+            attrs = None
+
+        references = None if attrs is None else [x.decode('utf-8') for x in attrs.get('univentionPolicyReference', [])]
+        self._store(self._references, key, references)
+        return references
+
+    def policy(self, dn: str) -> dict[str, list[bytes]]:
+        """
+        Return attributes of policy object.
+
+        :param str dn: The distinguished name of the policy.
+        :returns: The attributes or an empty dictionary if the policy does not exist.
+        """
+        key = self._key(dn)
+        try:
+            return self._lookup(self._policies, key)
+        except KeyError:
+            pass
+
+        pattrs = self.lo.get(dn)
+        self._store(self._policies, key, pattrs)
+        return pattrs
+
+    def resolve(self, dn: str, policies: list[str] | None = None, attrs: dict[str, list[Any]] | None = None) -> dict[str, dict[str, Any]]:
+        """
+        Return |UCS| policies for |LDAP| entry.
+
+        :param str dn: The distinguished name of the |LDAP| entry.
+        :param list policies: List of policy object classes...
+        :param dict attrs: |LDAP| attributes. If not given, the data is fetched from LDAP.
+        :returns: A mapping of policy names to
+        """
+        self.validate()
+        return self._resolve(dn, policies or [], attrs or {})
+
+    def resolve_many(self, dns: Iterable[str]) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Return |UCS| policies for many |LDAP| entries.
+
+        :param dns: The distinguished names of the |LDAP| entries.
+        :returns: A mapping of each distinguished name to the mapping of policy names.
+        """
+        self.validate()
+        dns = list(dict.fromkeys(dns))
+        entries: dict[str, dict[str, list[bytes]]] = {}
+        for i in range(0, len(dns), self.CHUNK):
+            search_filter = '(|%s)' % ''.join(filter_format('(entryDN=%s)', [dn]) for dn in dns[i:i + self.CHUNK])
+            try:
+                result = self.lo.search(search_filter, attr=['univentionPolicyReference', 'objectClass'])
+            except ldap.LDAPError as exc:
+                log.debug('getPoliciesMany: falling back to single lookups: %s', exc)
+                continue
+            for dn, attrs in result:
+                if dn:
+                    attrs.setdefault('univentionPolicyReference', [])
+                    attrs.setdefault('objectClass', [])
+                    entries[self._key(dn)] = attrs
+
+        return {dn: self._resolve(dn, [], entries.get(self._key(dn), {})) for dn in dns}
+
+    def _resolve(self, dn: str, policies: list[str], attrs: dict[str, list[Any]]) -> dict[str, dict[str, Any]]:
+        # get current dn
+        if 'objectClass' in attrs and 'univentionPolicyReference' in attrs:
+            oattrs = attrs
+        else:
+            oattrs = self.lo.get(dn, ['univentionPolicyReference', 'objectClass'])
+
+        if 'univentionPolicyReference' in attrs:
+            policies = [x.decode('utf-8') for x in attrs['univentionPolicyReference']]
+        elif not policies and not attrs:
+            policies = [x.decode('utf-8') for x in oattrs.get('univentionPolicyReference', [])]
+
+        object_classes = {oc.lower() for oc in oattrs.get('objectClass', [])}
+
+        merged: dict[str, dict[str, Any]] = {}
+        if dn:
+            obj_dn = dn
+            while True:
+                for policy_dn in policies or []:
+                    self._merge_policy(policy_dn, obj_dn, object_classes, merged)
+                dn = self.lo.parentDn(dn) or ''
+                if not dn:
+                    break
+                references = self.references(dn)
+                if references is None:
+                    break
+                policies = references
+
+        univention.debug.debug(
+            univention.debug.LDAP, univention.debug.ALL,
+            "getPolicies: result: %s" % merged)
+        return merged
+
+    def _merge_policy(self, policy_dn: str, obj_dn: str, object_classes: set[bytes], result: dict[str, dict[str, Any]]) -> None:
+        """
+        Merge policies into result.
+
+        :param str policy_dn: Distinguished name of the policy object.
+        :param obj_dn: Distinguished name of the LDAP object.
+        :param set object_classes: the set of object classes of the LDAP object.
+        :param list result: A mapping, into which the policy is merged.
+        """
+        pattrs = self.policy(policy_dn)
+        if not pattrs:
+            return
+
+        try:
+            classes = set(pattrs['objectClass']) - {b'top', b'univentionPolicy', b'univentionObject'}
+            ptype = classes.pop().decode('utf-8')
+        except KeyError:
+            return
+
+        if pattrs.get('ldapFilter'):
+            try:
+                self.lo.search(pattrs['ldapFilter'][0].decode('utf-8'), base=obj_dn, scope='base', unique=True, required=True)
+            except ldap.NO_SUCH_OBJECT:
+                return
+
+        if not all(oc.lower() in object_classes for oc in pattrs.get('requiredObjectClasses', [])):
+            return
+        if any(oc.lower() in object_classes for oc in pattrs.get('prohibitedObjectClasses', [])):
+            return
+
+        fixed = {x.decode('utf-8') for x in pattrs.get('fixedAttributes', ())}
+        empty = {x.decode('utf-8') for x in pattrs.get('emptyAttributes', ())}
+        values = result.setdefault(ptype, {})
+        for key in (empty | set(pattrs) | fixed) - self.SKIP:
+            if key not in values or key in fixed:
+                value = [] if key in empty else list(pattrs.get(key, []))
+                univention.debug.debug(
+                    univention.debug.LDAP, univention.debug.ALL,
+                    "getPolicies: %s sets: %s=%r" % (policy_dn, key, value))
+                values[key] = {
+                    'policy': policy_dn,
+                    'value': value,
+                    'fixed': key in fixed,
+                }
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2022-2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+import ldap
+import pytest
+from ldap.controls import SimplePagedResultsControl
+from univentionunittests import import_module
+
+
+uldap = import_module('uldap', 'modules/', 'univention.uldap', use_installed=False)
+
+BASE = 'dc=example,dc=com'
+
+
+class PagingLDAPObject:
+    """
+    Fake connection which implements the asynchronous search of
+    :py:class:`ldap.ldapobject.LDAPObject` and keeps the state of the Simple
+    Paged Results control per connection like slapd does: only the cookie of
+    the last paged search is valid.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.requests = []
+        self._results = {}
+        self._msgid = 0
+        self._cookie = None
+
+    def search_ext(self, base, scope, filterstr, attrlist, serverctrls=None, clientctrls=None, timeout=-1, sizelimit=0):
+        self._msgid += 1
+        page = next((ctrl for ctrl in serverctrls or () if ctrl.controlType == SimplePagedResultsControl.controlType), None)
+        self.requests.append(page and (page.size, page.cookie))
+        results = [dn for dn in self.entries if dn.endswith(base)]
+        ctrls = []
+        if page is not None:
+            if page.cookie:
+                if page.cookie != self._cookie:
+                    raise ldap.UNWILLING_TO_PERFORM({'desc': 'paged results cookie is invalid'})
+                offset = int(page.cookie)
+            else:
+                offset = 0
+            end = offset + page.size
+            self._cookie = b'%d' % (end,) if end < len(results) else None
+            results = results[offset:end]
+            ctrls.append(SimplePagedResultsControl(True, size=0, cookie=self._cookie or b''))
+        self._results[self._msgid] = [(ldap.RES_SEARCH_ENTRY, [(dn, {'cn': [dn.encode('UTF-8')]})], self._msgid, []) for dn in results]
+        self._results[self._msgid].append((ldap.RES_SEARCH_RESULT, [], self._msgid, ctrls))
+        return self._msgid
+
+    def result3(self, msgid, all=1, timeout=None):
+        return self._results[msgid].pop(0)
+
+    def abandon(self, msgid):
+        del self._results[msgid]
+
+
+@pytest.fixture()
+def lo():
+    access = uldap.access.__new__(uldap.access)
+    access.base = BASE
+    access._paged_search_active = False
+    access.lo = PagingLDAPObject(['cn=%d,%s' % (i, BASE) for i in range(10)] + ['cn=%d,cn=inner,%s' % (i, BASE) for i in range(5)])
+    return access
+
+
+def test_search_iter_pages(lo):
+    result = [dn for dn, _attrs in lo.search_iter('(objectClass=*)', 'cn=inner,%s' % (BASE,), page_size=2)]
+    assert result == ['cn=%d,cn=inner,%s' % (i, BASE) for i in range(5)]
+    assert lo.lo.requests == [(2, ''), (2, b'2'), (2, b'4')]
+    assert not lo._paged_search_active
+
+
+def test_search_iter_sizelimit(lo):
+    with pytest.raises(ldap.SIZELIMIT_EXCEEDED):
+        list(lo.search_iter(base=BASE, sizelimit=3, page_size=2))
+    assert not lo._paged_search_active
+
+
+def test_search_iter_nested(lo):
+    result = []
+    for dn, _attrs in lo.search_iter(base=BASE, page_size=4):
+        inner = [inner_dn for inner_dn, _attrs in lo.search_iter(base='cn=inner,%s' % (BASE,), page_size=2)]
+        assert len(inner) == 5
+        result.append(dn)
+    assert len(result) == 15
+    # the nested searches do not use (and invalidate) the paged results control
+    assert [request for request in lo.lo.requests if request] == [(4, ''), (4, b'4'), (4, b'8'), (4, b'12')]
+    assert not lo._paged_search_active
+
+
+def test_search_iter_abandoned(lo):
+    outer = lo.search_iter(base=BASE, page_size=2)
+    next(outer)
+    assert lo._paged_search_active
+    outer.close()
+    assert not lo._paged_search_active
+
+
+class Directory:
+    """Fake connection serving the entries needed to resolve policies, which counts the reads."""
+
+    def __init__(self):
+        self.base = BASE
+        self.csn = 1
+        self.reads = 0
+        self.entries = {
+            BASE: {'objectClass': [b'domain'], 'univentionPolicyReference': [b'cn=base,cn=policies,%s' % (BASE.encode('ASCII'),)]},
+            'cn=users,%s' % (BASE,): {'objectClass': [b'organizationalRole'], 'univentionPolicyReference': []},
+            'uid=user,cn=users,%s' % (BASE,): {'objectClass': [b'person'], 'univentionPolicyReference': []},
+            'cn=base,cn=policies,%s' % (BASE,): {'objectClass': [b'univentionPolicy', b'univentionPolicyDesktop'], 'univentionDesktopLanguage': [b'de']},
+            'cn=users,cn=policies,%s' % (BASE,): {'objectClass': [b'univentionPolicy', b'univentionPolicyDesktop'], 'univentionDesktopLanguage': [b'en']},
+        }
+
+    def modify(self, dn, key, value):
+        self.entries[dn][key] = value
+        self.csn += 1
+
+    def delete(self, dn):
+        del self.entries[dn]
+        self.csn += 1
+
+    def get(self, dn, attr=[], required=False):
+        if dn == self.base and attr == ['contextCSN']:
+            return {'contextCSN': [b'%d' % (self.csn,)]}
+        self.reads += 1
+        try:
+            attrs = self.entries[dn]
+        except KeyError:
+            if required:
+                raise ldap.NO_SUCH_OBJECT({'desc': 'no object'})
+            return {}
+        return {key: list(value) for key, value in attrs.items() if not attr or key in attr}
+
+    def parentDn(self, dn):
+        return uldap.parentDn(dn, self.base)
+
+
+@pytest.fixture()
+def directory():
+    return Directory()
+
+
+@pytest.fixture()
+def resolver(directory):
+    resolver = uldap.PolicyResolver(directory)
+    resolver.CHECK_INTERVAL = 0
+    return resolver
+
+
+def language(resolver, dn='uid=user,cn=users,%s' % (BASE,)):
+    policies = resolver.resolve(dn)
+    return policies.get('univentionPolicyDesktop', {}).get('univentionDesktopLanguage', {}).get('value')
+
+
+def test_policy_resolver_cached(directory, resolver):
+    assert language(resolver) == [b'de']
+    reads = directory.reads
+    assert language(resolver, 'cn=users,%s' % (BASE,)) == [b'de']
+    assert directory.reads == reads + 1  # only the entry itself
+
+
+def test_policy_resolver_add(directory, resolver):
+    assert language(resolver) == [b'de']
+    directory.modify('cn=users,%s' % (BASE,), 'univentionPolicyReference', [b'cn=users,cn=policies,%s' % (BASE.encode('ASCII'),)])
+    assert language(resolver) == [b'en']
+
+
+def test_policy_resolver_modify(directory, resolver):
+    assert language(resolver) == [b'de']
+    directory.modify('cn=base,cn=policies,%s' % (BASE,), 'univentionDesktopLanguage', [b'fr'])
+    assert language(resolver) == [b'fr']
+
+
+def test_policy_resolver_delete(directory, resolver):
+    assert language(resolver) == [b'de']
+    directory.delete('cn=base,cn=policies,%s' % (BASE,))
+    assert language(resolver) is None
+
+
+def test_policy_resolver_check_interval(directory, resolver):
+    resolver.CHECK_INTERVAL = 3600
+    assert language(resolver) == [b'de']
+    directory.modify('cn=base,cn=policies,%s' % (BASE,), 'univentionDesktopLanguage', [b'fr'])
+    assert language(resolver) == [b'de']
+    resolver.expire()
+    assert language(resolver) == [b'fr']
@@ -50,9 +50,9 @@ from weakref import ref
 from univention.appcenter.ini_parser import read_ini_file
 from univention.appcenter.log import get_base_logger
 from univention.appcenter.meta import UniventionMetaClass, UniventionMetaInfo
-from univention.appcenter.packages import get_package_manager, packages_are_installed
+from univention.appcenter.packages import get_package_manager, packages_are_installed, reload_package_manager
 from univention.appcenter.settings import Setting
-from univention.appcenter.ucr import ucr_get, ucr_includes, ucr_is_true, ucr_load, ucr_run_filter
+from univention.appcenter.ucr import ucr_generation, ucr_get, ucr_includes, ucr_instance, ucr_is_true, ucr_load, ucr_run_filter
 from univention.appcenter.utils import (
     _, app_ports, container_mode, get_current_ram_available, get_free_disk_space, get_locale, mkdir,
 )
@@ -64,10 +64,28 @@ LOCAL_ARCHIVE_DIR = '/usr/share/univention-appcenter/archives/'
 SHARE_DIR = '/usr/share/univention-appcenter/apps'
 DATA_DIR = '/var/lib/univention-appcenter/apps'
 CONTAINER_SCRIPTS_PATH = '/usr/share/univention-docker-container-mode/'
+INSTALLED_STATE_FILES = ('/var/lib/dpkg/status', '/etc/univention/base.conf', '/etc/univention/base-schedule.conf', '/etc/univention/base-forced.conf', '/etc/univention/base-ldap.conf', '/etc/univention/base-defaults.conf')
 
 app_logger = get_base_logger().getChild('apps')
 
 
+def installed_state():
+    # type: () -> tuple
+    """
+    Returns a snapshot token of everything :py:meth:`App.is_installed` depends
+    on: the dpkg status and UCR files on disk and the state loaded by this process.
+    """
+    token = [reload_package_manager.generation, ucr_generation(), id(ucr_instance())]  # type: list
+    for filename in INSTALLED_STATE_FILES:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            token.append(None)
+        else:
+            token.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(token)
+
+
 class LooseVersion:  # noqa: PLW1641
     """
     Represents a loose version number for comparison purposes.
@@ -1113,6 +1131,7 @@ class App(metaclass=AppMetaClass):  # noqa: PLW1641
         self._weak_ref_app_cache = None
         self._supports_ucs_version = None
         self._install_permissions_exist = None
+        self._is_installed = (None, False)
         self.set_app_cache_obj(_cache)
         for attr in self._attrs:
             setattr(self, attr.name, _attrs.get(attr.name))
@@ -1312,6 +1331,13 @@ class App(metaclass=AppMetaClass):  # noqa: PLW1641
         return self._supports_ucs_version
 
     def is_installed(self):
+        # remembered until packages or UCR variables change
+        state = installed_state()
+        if self._is_installed[0] != state:
+            self._is_installed = (state, self._check_installed())
+        return self._is_installed[1]
+
+    def _check_installed(self):
         if self.docker and not container_mode():
             return ucr_get(self.ucr_status_key) in ['installed', 'stalled'] and ucr_get(self.ucr_version_key) == self.version and ucr_get(self.ucr_ucs_version_key, self.get_ucs_version()) == self.get_ucs_version()
         else:
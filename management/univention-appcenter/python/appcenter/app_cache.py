@@ -35,14 +35,21 @@
 #
 
 
+import operator
 import os
 import os.path
 import sys
 from collections.abc import Iterable  # noqa: F401
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from configparser import NoSectionError
 from contextlib import contextmanager
+from functools import partial
 from glob import glob
+from hashlib import sha256
 from json import dump, load
+from multiprocessing import get_context
+from threading import active_count
 from time import sleep
 from urllib.parse import urlsplit
 
@@ -56,6 +63,9 @@ from univention.appcenter.utils import get_locale, mkdir
 
 
 CACHE_DIR = '/var/cache/univention-appcenter'
+CACHE_FORMAT = 2
+REBUILD_PROCESSES = 8
+REBUILD_PARALLEL_MIN = 40
 
 cache_logger = get_base_logger().getChild('cache')
 
@@ -67,18 +77,44 @@ def _cmp_mtimes(mtime1, mtime2):
     return 0 if mtime1 == mtime2 else (-1 if mtime1 < mtime2 else 1)
 
 
+class _AppIndex:
+    """Lookup tables for the apps of a cache, so that not every lookup iterates over all apps."""
+
+    def __init__(self, apps):
+        # type: (List[App]) -> None
+        self.apps = list(apps)
+        self.by_id = {}  # type: Dict[str, List[App]]
+        self.by_component_id = {}  # type: Dict[str, App]
+        for app in self.apps:
+            self.by_id.setdefault(app.id, []).append(app)
+            self.by_component_id.setdefault(app.component_id, app)
+        self.latest = {}  # type: Dict[str, App]
+        for app_id, apps_with_id in self.by_id.items():
+            latest_app = max(apps_with_id)
+            self.latest[app_id] = next(app for app in apps_with_id if app == latest_app)
+
+    def is_up_to_date(self, apps):
+        # type: (List[App]) -> bool
+        return len(apps) == len(self.apps) and all(map(operator.is_, apps, self.apps))
+
+
 class _AppCache:
+    _index = None  # type: Optional[_AppIndex]
+
     def get_every_single_app(self):
         # type: () -> Iterable[App]
         raise NotImplementedError()
 
+    def _get_index(self):
+        # type: () -> _AppIndex
+        apps = self.get_every_single_app()
+        if self._index is None or not self._index.is_up_to_date(apps):
+            self._index = _AppIndex(apps)
+        return self._index
+
     def get_all_apps_with_id(self, app_id):
         # type: (str) -> List[App]
-        ret = []
-        for app in self.get_every_single_app():
-            if app.id == app_id:
-                ret.append(app)
-        return ret
+        return list(self._get_index().by_id.get(app_id, []))
 
     def get_all_locally_installed_apps(self):
         # type: () -> List[App]
@@ -90,7 +126,8 @@ class _AppCache:
 
     def find(self, app_id, app_version=None, latest=False):
         # type: (str, Optional[str], bool) -> Optional[App]
-        apps = self.get_all_apps_with_id(app_id)
+        index = self._get_index()
+        apps = index.by_id.get(app_id, [])
         if app_version:
             for app in apps:
                 if app.version == app_version:
@@ -100,11 +137,7 @@ class _AppCache:
             for app in apps:
                 if app.is_installed():
                     return app
-        if apps:
-            latest_app = sorted(apps)[-1]
-            for app in apps:
-                if app == latest_app:
-                    return app
+        return index.latest.get(app_id)
 
     def find_candidate(self, app, prevent_docker=None):
         if prevent_docker is None:
@@ -148,9 +181,14 @@ class _AppCache:
 
     def find_by_component_id(self, component_id):
         # type: (str) -> Optional[App]
-        for app in self.get_every_single_app():
-            if app.component_id == component_id:
-                return app
+        return self._get_index().by_component_id.get(component_id)
+
+
+def _attrs_from_ini(cache_class, app_class, ucs_version, server, locale, cache_dir, ini):
+    # runs in the processes of AppCache._build_apps_from_ini_files()
+    cache = cache_class.build(app_class=app_class, ucs_version=ucs_version, server=server, locale=locale, cache_dir=cache_dir)
+    app = cache._build_app_from_ini(ini)
+    return app.attrs_dict() if app is not None else None
 
 
 class AppCache(_AppCache):
@@ -225,17 +263,31 @@ class AppCache(_AppCache):
     def get_appcenter_cache_obj(self):
         return AppCenterCache.build(server=self.get_server(), ucs_versions=[self.get_ucs_version()], locale=self.get_locale())
 
+    def _cache_schema(self):
+        # type: () -> str
+        """Identifies the format of the cache file and the attributes of the app class."""
+        app_class = self.get_app_class()
+        schema = [CACHE_FORMAT, app_class.__module__, app_class.__name__]
+        schema.extend((attr.name, type(attr).__name__) for attr in app_class._attrs)
+        return sha256(repr(schema).encode('UTF-8')).hexdigest()
+
     def _save_cache(self):
         cache_file = self.get_cache_file()
         if cache_file:
             try:
                 tmp_file = cache_file + ".tmp"
+                names = [attr.name for attr in self.get_app_class()._attrs]
+                cache = {
+                    'schema': self._cache_schema(),
+                    'attributes': names,
+                    'apps': [[attrs[name] for name in names] for attrs in (app.attrs_dict() for app in self._cache)],
+                }
                 with open(tmp_file, 'w') as fd:
-                    dump([app.attrs_dict() for app in self._cache], fd, indent=2)
+                    dump(cache, fd, separators=(',', ':'))
 
                 os.rename(tmp_file, cache_file)
                 cache_modified = self._cache_modified()
-            except (OSError, TypeError):
+            except (OSError, TypeError, ValueError):
                 return False
             else:
                 self._cache_modified_mtime = cache_modified
@@ -262,16 +314,16 @@ class AppCache(_AppCache):
             return None
         else:
             try:
-                cache_attributes = set(cache[0].keys())
-            except (TypeError, AttributeError, IndexError, KeyError):
+                schema, names, apps = cache['schema'], cache['attributes'], cache['apps']
+            except (TypeError, KeyError):
                 cache_logger.debug('Cannot load cache: Getting cached attributes failed')
                 return None
             else:
-                code_attributes = {attr.name for attr in self.get_app_class()._attrs}
-                if cache_attributes != code_attributes:
+                if schema != self._cache_schema():
                     cache_logger.debug('Cannot load cache: Attributes in cache file differ from attribute in code')
                     return None
-                return [self._build_app_from_attrs(attrs) for attrs in cache]
+                # the values were validated when the cache was built
+                return [self._build_app_from_attrs(dict(zip(names, values))) for values in apps]
 
     def _archive_modified(self):
         try:
@@ -323,6 +375,23 @@ class AppCache(_AppCache):
                 attr.post_creation(app)
         return app
 
+    def _build_apps_from_ini_files(self, ini_files):
+        # type: (List[str]) -> List[App]
+        """Parse the INI files, in forked processes if there are many of them and this process has no other threads."""
+        processes = min(REBUILD_PROCESSES, os.cpu_count() or 1)
+        # forking a process with several threads, e.g. the UMC module, may deadlock the children
+        if processes > 1 and len(ini_files) >= REBUILD_PARALLEL_MIN and active_count() == 1:
+            parse = partial(_attrs_from_ini, type(self), self.get_app_class(), self.get_ucs_version(), self.get_server(), self.get_locale(), self.get_cache_dir())
+            try:
+                with ProcessPoolExecutor(processes, mp_context=get_context('fork')) as executor:
+                    results = list(executor.map(parse, ini_files, chunksize=16))
+            except (OSError, BrokenProcessPool) as exc:
+                cache_logger.debug('Cannot parse INI files in parallel: %s' % (exc,))
+            else:
+                return [self._build_app_from_attrs(attrs) for attrs in results if attrs is not None]
+        apps = (self._build_app_from_ini(ini) for ini in ini_files)
+        return [app for app in apps if app is not None]
+
     def clear_cache(self):
         ucr_load()
         self._cache[:] = []
@@ -367,10 +436,7 @@ class AppCache(_AppCache):
                     self._cache = cached_apps
                     cache_logger.debug('Loaded %d apps from cache' % len(self._cache))
                 else:
-                    for ini in self._relevant_ini_files():
-                        app = self._build_app_from_ini(ini)
-                        if app is not None:
-                            self._cache.append(app)
+                    self._cache.extend(self._build_apps_from_ini_files(self._relevant_ini_files()))
                     self._cache.sort()
                     if self._save_cache():
                         cache_logger.debug('Saved %d apps into cache' % len(self._cache))
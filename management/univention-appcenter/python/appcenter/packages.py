@@ -83,10 +83,14 @@ get_package_manager._package_manager = None  # type: ignore
 
 def reload_package_manager():
     # type: () -> None
+    reload_package_manager.generation += 1  # type: ignore
     if get_package_manager._package_manager is not None:  # type: ignore
         get_package_manager().reopen_cache()
 
 
+reload_package_manager.generation = 0  # type: ignore
+
+
 def packages_are_installed(pkgs, strict=True):
     # type: (Iterable[str], bool) -> bool
     package_manager = get_package_manager()
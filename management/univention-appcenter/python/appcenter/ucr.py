@@ -43,10 +43,18 @@ from univention.config_registry.handler import run_filter
 
 _UCR = ConfigRegistry()
 _UCR.load()
+_GENERATION = 0
 
 
 def ucr_load():
+    global _GENERATION
     _UCR.load()
+    _GENERATION += 1
+
+
+def ucr_generation():
+    """Returns a number which changes whenever the variables are (re)loaded or saved by this process."""
+    return _GENERATION
 
 
 def ucr_get(key, default=None):
@@ -54,8 +62,10 @@ def ucr_get(key, default=None):
 
 
 def ucr_save(values):
+    global _GENERATION
     changed_values = {}
     _UCR.load()
+    _GENERATION += 1
     for k, v in values.items():
         if _UCR.get(k) != v:
             changed_values[k] = v  # noqa: PERF403
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import json
+import os.path
+import shutil
+from glob import glob
+
+import pytest
+
+from univention.config_registry.backend import ConfigRegistry
+
+
+def test_find_uses_index(custom_apps):
+    custom_apps.load('unittests/inis/install_checks/')
+    versions = [app.version for app in custom_apps.get_all_apps_with_id('oxseforucs')]
+    assert sorted(versions) == ['7.10.2-ucs3', '7.10.3-ucs3', '7.10.3-ucs6']
+    assert custom_apps.find('oxseforucs', latest=True).version == '7.10.3-ucs6'
+    assert custom_apps.find('oxseforucs', app_version='7.10.2-ucs3').version == '7.10.2-ucs3'
+    assert custom_apps.find('oxseforucs', app_version='0') is None
+    assert custom_apps.find('does-not-exist') is None
+    app = custom_apps.find('collabora')
+    assert custom_apps.find_by_component_id(app.component_id) is app
+
+
+def test_find_installed(custom_apps, mocker):
+    custom_apps.load('unittests/inis/install_checks/')
+    old_app = custom_apps.find('oxseforucs', app_version='7.10.2-ucs3')
+    mocker.patch.object(old_app, 'is_installed', return_value=True)
+    assert custom_apps.find('oxseforucs') is old_app
+    assert custom_apps.find('oxseforucs', latest=True) is not old_app
+
+
+def test_index_rebuilt(custom_apps):
+    custom_apps.load('unittests/inis/install_checks/')
+    assert custom_apps.find('kopano-webmeetings') is None
+    custom_apps.load('unittests/inis/dependencies')
+    assert custom_apps.find('kopano-webmeetings') is not None
+
+
+def test_installed_state_files(import_appcenter_module):
+    app_module = import_appcenter_module('app')
+    layers = {os.path.join(ConfigRegistry.PREFIX, name) for name in ConfigRegistry.BASES.values()}
+    assert layers <= set(app_module.INSTALLED_STATE_FILES)
+
+
+@pytest.fixture()
+def app_cache(import_appcenter_module, tmp_path):
+    cache_module = import_appcenter_module('app_cache')
+    for ini in glob('unittests/inis/install_checks/5.0/*.ini'):
+        shutil.copy(ini, str(tmp_path))
+
+    def build():
+        return cache_module.AppCache(ucs_version='5.0', server='https://appcenter.software-univention.de', locale='en', cache_dir=str(tmp_path))
+    return build
+
+
+def attrs(apps):
+    return [app.attrs_dict() for app in apps]
+
+
+def test_cache_file(app_cache):
+    cache = app_cache()
+    apps = cache.get_every_single_app()
+    assert apps
+    with open(cache.get_cache_file()) as fd:
+        assert len(json.load(fd)['apps']) == len(apps)
+    cached = app_cache()._load_cache()
+    assert attrs(cached) == attrs(apps)
+
+
+def test_cache_file_of_other_code(app_cache):
+    cache = app_cache()
+    cache.get_every_single_app()
+    with open(cache.get_cache_file()) as fd:
+        content = json.load(fd)
+    content['schema'] = 'other'
+    with open(cache.get_cache_file(), 'w') as fd:
+        json.dump(content, fd)
+    assert app_cache()._load_cache() is None
+
+
+@pytest.mark.parametrize('content', ['', '{"schema"', '[{"id": "app"}]', '{}'])
+def test_cache_file_broken(app_cache, content):
+    cache = app_cache()
+    cache.get_every_single_app()
+    with open(cache.get_cache_file(), 'w') as fd:
+        fd.write(content)
+    assert app_cache()._load_cache() is None
+    assert attrs(app_cache().get_every_single_app()) == attrs(cache.get_every_single_app())
+
+
+def test_parallel_rebuild(app_cache, import_appcenter_module, mocker):
+    cache_module = import_appcenter_module('app_cache')
+    serial = app_cache()
+    ini_files = sorted(serial._relevant_ini_files())
+    mocker.patch.object(cache_module, 'REBUILD_PARALLEL_MIN', 1)
+    mocker.patch.object(cache_module.os, 'cpu_count', return_value=2)
+    parallel = attrs(app_cache()._build_apps_from_ini_files(ini_files))
+    mocker.patch.object(cache_module, 'REBUILD_PROCESSES', 1)
+    assert parallel == attrs(serial._build_apps_from_ini_files(ini_files))
+
+
+def test_no_fork_with_threads(app_cache, import_appcenter_module, mocker):
+    cache_module = import_appcenter_module('app_cache')
+    mocker.patch.object(cache_module, 'REBUILD_PARALLEL_MIN', 1)
+    mocker.patch.object(cache_module.os, 'cpu_count', return_value=2)
+    mocker.patch.object(cache_module, 'active_count', return_value=2)
+    executor = mocker.patch.object(cache_module, 'ProcessPoolExecutor')
+    cache = app_cache()
+    assert cache._build_apps_from_ini_files(cache._relevant_ini_files())
+    executor.assert_not_called()
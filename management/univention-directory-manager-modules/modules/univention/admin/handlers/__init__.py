@@ -47,7 +47,7 @@ import inspect
 import re
 import sys
 import time
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
 from logging import getLogger
 from typing import TYPE_CHECKING, Any, Self, overload
@@ -1865,6 +1865,60 @@ class simpleLdap:
             raise univention.admin.uexceptions.noObject('lookup(base=%r, filter_s=%r)' % (base, filter_e))
         return result
 
+    @classmethod
+    def lookup_iter(
+        cls,
+        co: None,
+        lo: univention.admin.uldap.access,
+        filter_s: str,
+        base: str = '',
+        superordinate: Self | None = None,
+        scope: str = 'sub',
+        unique: bool = False,
+        required: bool = False,
+        timeout: int = -1,
+        sizelimit: int = 0,
+        serverctrls: list | None = None,
+        page_size: int = 1000,
+    ) -> Iterator[Self]:
+        """
+        Perform a paged LDAP search and yield the instances as the results arrive.
+
+        Unlike :py:meth:`lookup` neither the LDAP result set nor the list of UDM objects is kept in memory.
+
+        :param co: obsolete config
+        :param lo: UDM LDAP access object.
+        :param filter_s: LDAP filter string.
+        :param base: LDAP search base distinguished name.
+        :param superordinate: Distinguished name of a superordinate object.
+        :param scope: Specify the scope of the search to be one of `base`, `base+one`, `one`, `sub`, or `domain` to specify a base object, base plus one-level, one-level, subtree, or children search.
+        :param unique: Raise an exception if more than one object matches.
+        :param required: Raise an exception if no object matches.
+        :param timeout: wait at most `timeout` seconds for each page to arrive. `-1` for no limit.
+        :param sizelimit: retrieve at most `sizelimit` entries for a search. `0` for no limit.
+        :param serverctrls: a list of :py:class:`ldap.controls.LDAPControl` instances sent to the server along with the LDAP request.
+        :param page_size: the number of entries requested per page.
+        :return: An iterator of UDM objects.
+        """
+        filter_e = cls.lookup_filter(filter_s, lo)
+        if superordinate:
+            filter_e = cls.lookup_filter_superordinate(filter_e, superordinate)
+        filter_str = str(filter_e or '')
+        attr = cls._ldap_attributes()
+        found = 0
+        for dn, attrs in lo.search_iter(filter_str, base or cls.ldap_base, scope, attr, timeout, sizelimit, serverctrls=serverctrls, page_size=page_size):
+            found += 1
+            if unique and found > 1:
+                raise univention.admin.uexceptions.insufficientInformation('more than one object')
+            try:
+                obj = cls(co, lo, None, dn=dn, superordinate=superordinate, attributes=attrs)
+            except univention.admin.uexceptions.base as exc:
+                log.error('lookup() of object %r failed: %s', dn, exc)
+                continue
+            yield obj
+        if required and not found:
+            raise univention.admin.uexceptions.noObject('lookup(base=%r, filter_s=%r)' % (base, filter_e))
+
     @classmethod
     def lookup_filter(cls, filter_s: str | None = None, lo: univention.admin.uldap.access | None = None) -> univention.admin.filter.conjunction:
         """
@@ -55,6 +55,8 @@ from univention.admin.layout import Group, ILayoutElement, Tab
 
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from univention.admin.handlers import _Attributes, simpleLdap
 
 
@@ -918,6 +920,31 @@ def lookup(module_name: UdmName, co: None, lo: univention.admin.uldap.access, fi
     return [item for item in tmpres if item]
 
 
+def lookup_iter(module_name: UdmName, co: None, lo: univention.admin.uldap.access, filter: str = '', base: str = '', superordinate: Any = None, scope: str = 'base+one', unique: bool = False, required: bool = False, timeout: int = -1, sizelimit: int = 0) -> Iterator[Any]:
+    """
+    Yield objects of module that match the given criteria.
+
+    Modules using the generic :py:meth:`univention.admin.handlers.simpleLdap.lookup` are searched using paged results
+    and their objects are yielded as they arrive. Modules with their own `lookup` function fall back to :py:func:`lookup`.
+
+    :param module_name: the name of the |UDM| module, e.g. `users/user`.
+    """
+    from univention.admin.handlers import simpleLdap
+
+    module = get(module_name)
+    if not hasattr(module, 'lookup'):
+        return
+
+    lookup_func = getattr(module.lookup, '__func__', None)
+    if lookup_func is simpleLdap.lookup.__func__ and getattr(module.lookup, '__self__', None) is getattr(module, 'object', None):
+        tmpres = module.object.lookup_iter(co, lo, filter, base=base, superordinate=superordinate, scope=scope, unique=unique, required=required, timeout=timeout, sizelimit=sizelimit)
+    else:
+        tmpres = module.lookup(co, lo, filter, base=base, superordinate=superordinate, scope=scope, unique=unique, required=required, timeout=timeout, sizelimit=sizelimit)
+
+    # check for 'None' items just in case...
+    yield from (item for item in tmpres if item)
+
+
 def isSuperordinate(module: UdmName) -> bool:
     """
     Check if the module is a |UDM| superordinate module.
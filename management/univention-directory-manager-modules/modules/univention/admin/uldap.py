@@ -671,6 +671,45 @@ class access:
         except ldap.LDAPError as msg:
             raise univention.admin.uexceptions.ldapError(_err2str(msg), original_exception=msg)
 
+    def search_iter(self, filter='(objectClass=*)', base='', scope='sub', attr=[], timeout=-1, sizelimit=0, serverctrls=None, page_size=1000):
+        # type: (str, str, str, list[str], int, int, list[ldap.controls.LDAPControl] | None, int) -> Iterator[tuple[str, dict[str, list[bytes]]]]
+        """
+        Perform LDAP search using paged results and yield the values as they arrive.
+
+        :param str filter: LDAP search filter.
+        :param str base: the starting point for the search.
+        :param str scope: Specify the scope of the search to be one of `base`, `base+one`, `one`, `sub`, or `domain` to specify a base object, base plus one-level, one-level, subtree, or children search.
+        :param attr: The list of attributes to fetch.
+        :param int timeout: wait at most `timeout` seconds for each page to arrive. `-1` for no limit.
+        :param int sizelimit: retrieve at most `sizelimit` entries for a search. `0` for no limit.
+        :param serverctrls: a list of ldap.controls.LDAPControl instances sent to the server along with the LDAP request
+        :param int page_size: the number of entries requested per page.
+        :returns: An iterator of 2-tuples (dn, values) for each LDAP object, where values is a dictionary mapping attribute names to a list of values.
+        :raises univention.admin.uexceptions.noObject: Indicates the target object cannot be found.
+        :raises univention.admin.uexceptions.insufficientInformation: Indicates that the matching rule specified in the search filter does not match a rule defined for the attribute's syntax.
+        :raises univention.admin.uexceptions.ldapTimeout: Indicates that the time limit of the LDAP client was exceeded while waiting for a result.
+        :raises univention.admin.uexceptions.ldapSizelimitExceeded: Indicates that in a search operation, the size limit specified by the client or the server has been exceeded.
+        :raises univention.admin.uexceptions.ldapError: Indicates that the search method was called with an invalid search filter.
+        :raises univention.admin.uexceptions.ldapError: Indicates that the syntax of the DN is incorrect.
+        :raises univention.admin.uexceptions.ldapError: on any other LDAP error.
+        """
+        try:
+            yield from self.lo.search_iter(filter, base, scope, attr, timeout, sizelimit, serverctrls=serverctrls, page_size=page_size)
+        except ldap.NO_SUCH_OBJECT as msg:
+            raise univention.admin.uexceptions.noObject(_err2str(msg))
+        except ldap.INAPPROPRIATE_MATCHING as msg:
+            raise univention.admin.uexceptions.insufficientInformation(_err2str(msg))
+        except (ldap.TIMEOUT, ldap.TIMELIMIT_EXCEEDED) as msg:
+            raise univention.admin.uexceptions.ldapTimeout(_err2str(msg))
+        except (ldap.SIZELIMIT_EXCEEDED, ldap.ADMINLIMIT_EXCEEDED) as msg:
+            raise univention.admin.uexceptions.ldapSizelimitExceeded(_err2str(msg))
+        except ldap.FILTER_ERROR as msg:
+            raise univention.admin.uexceptions.ldapError('%s: %s' % (_err2str(msg), filter))
+        except ldap.INVALID_DN_SYNTAX as msg:
+            raise univention.admin.uexceptions.ldapError('%s: %s' % (_err2str(msg), base), original_exception=msg)
+        except ldap.LDAPError as msg:
+            raise univention.admin.uexceptions.ldapError(_err2str(msg), original_exception=msg)
+
     def searchDn(self, filter='(objectClass=*)', base='', scope='sub', unique=False, required=False, timeout=-1, sizelimit=0, serverctrls=None, response=None):
         # type: (str, str, str, bool, bool, int, int, list[ldap.controls.LDAPControl] | None, dict[str, ldap.controls.LDAPControl] | None) -> list[str]
         """
@@ -726,6 +765,18 @@ class access:
         udm_log.debug('getPolicies modules dn %s result', dn)
         return self.lo.getPolicies(dn, policies, attrs, result, fixedattrs)
 
+    def getPoliciesMany(self, dns):
+        # type: (Iterable[str]) -> dict[str, dict[str, dict[str, Any]]]
+        """
+        Return |UCS| policies for many |LDAP| entries.
+
+        The entries are fetched in chunks and their common containers and referenced policies are only read once.
+
+        :param dns: The distinguished names of the |LDAP| entries.
+        :returns: A mapping of each distinguished name to the mapping of policy names as returned by :py:meth:`getPolicies`.
+        """
+        return self.lo.getPoliciesMany(dns)
+
     def add(self, dn, al, exceptions=False, serverctrls=None, response=None, ignore_license=False):
         # type: (str, list[tuple[str, Any]], bool, list[ldap.controls.LDAPControl] | None, dict | None, bool) -> None
         """
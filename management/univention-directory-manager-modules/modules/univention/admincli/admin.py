@@ -973,7 +973,14 @@ class CLI:
         print(filter, file=self.stdout)
 
         try:
-            for object in univention.admin.modules.lookup(module, None, lo, scope='sub', superordinate=superordinate, base=position.getDn(), filter=filter):
+            subnets = []
+            if list_policies and module_name == 'dhcp/host':
+                # looked up once before the paged search, not for every host
+                subnet_module = univention.admin.modules._get('dhcp/subnet')
+                # TODO: sharedsubnet_module = univention.admin.modules._get('dhcp/sharedsubnet')
+                subnets = univention.admin.modules.lookup(subnet_module, None, lo, scope='sub', superordinate=superordinate, base=superordinate_dn, filter='')
+
+            for object in univention.admin.modules.lookup_iter(module, None, lo, scope='sub', superordinate=superordinate, base=position.getDn(), filter=filter):
                 print('DN: %s' % univention.admin.objects.dn(object), file=self.stdout)
                 if not univention.admin.modules.virtual(module_name):
                     object.open()
@@ -1008,12 +1015,10 @@ class CLI:
                     print('', file=self.stdout)
 
                     if module_name == 'dhcp/host':
-                        subnet_module = univention.admin.modules._get('dhcp/subnet')
-                        # TODO: sharedsubnet_module = univention.admin.modules._get('dhcp/sharedsubnet')
                         ips = object['fixedaddress']
                         for ip in ips:
                             ip_ = IPv4Address("%s" % (ip,))
-                            for subnet in univention.admin.modules.lookup(subnet_module, None, lo, scope='sub', superordinate=superordinate, base=superordinate_dn, filter=''):
+                            for subnet in subnets:
                                 if ip_ in IPv4Network("%(subnet)s/%(subnetmask)s" % subnet, strict=False):
                                     print("  Subnet-based Settings:", file=self.stdout)
                                     ddict = get_policy(subnet.dn, self.stdout, policyOptions, policies_with_DN)
@@ -320,7 +320,7 @@ class BaseModule(metaclass=ModuleMeta):
                 f'Searching in module {self.name!r} with identifying_property {self.meta.identifying_property!r} (filter: {filter_s!r}) returned {len(res)} objects.', module_name=self.name)
         return res[0]
 
-    def search(self, filter_s: str = '', base: str = '', scope: str = 'sub', sizelimit: int = 0) -> Iterator[BaseObject]:
+    def search(self, filter_s: str = '', base: str = '', scope: str = 'sub', sizelimit: int = 0, open: bool = True) -> Iterator[BaseObject]:
         """
         Get all |UDM| objects from |LDAP| that match the given filter.
 
@@ -329,6 +329,8 @@ class BaseModule(metaclass=ModuleMeta):
         :param str base: |LDAP| search base.
         :param str scope: |LDAP| search scope, e.g. `base` or `sub` or `one`.
         :param int sizelimit: |LDAP| size limit for searched results.
+        :param bool open: whether to fully load the objects. Set to `False` if
+                only the mapped properties are read.
         :return: iterator of :py:class:`BaseObject` objects
         """
         raise NotImplementedError()
@@ -561,46 +561,47 @@ class GenericModule(BaseModule, metaclass=GenericModuleMeta):
         """
         return self._load_obj(dn)
 
-    def search(self, filter_s='', base='', scope='sub', sizelimit=0):
-        # type: (str, str, str, int) -> Iterator[GenericObject]
+    def search(self, filter_s='', base='', scope='sub', sizelimit=0, open=True):
+        # type: (str, str, str, int, bool) -> Iterator[GenericObject]
         """
         Get all UDM objects from LDAP that match the given filter.
 
+        The objects are created directly from the attributes returned by a
+        single paged LDAP search, no additional LDAP request per object is
+        done to load it.
+
         :param str filter_s: LDAP filter (only object selector like uid=foo
                 required, objectClasses will be set by the UDM module)
         :param str base: subtree to search
         :param str scope: depth to search
         :param int sizelimit: LDAP size limit for searched results.
+        :param bool open: whether to call `open()` on the objects (if
+                :py:attr:`meta.auto_open` is set). Set to `False` if only
+                the mapped properties are read, to skip loading the
+                remaining properties (e.g. group memberships or policies).
         :return: generator to iterate over GenericObject objects
         """
+        udm_module = self._get_orig_udm_module()
+        ldap_base = getattr(udm_module.object, 'ldap_base', self.connection.base)
         try:
-            try:
-                udm_module_lookup_filter = str(self._orig_udm_module.lookup_filter(filter_s, self.connection))
-                dns = self.connection.searchDn(
-                    filter=udm_module_lookup_filter,
-                    base=base,
-                    scope=scope,
-                    sizelimit=sizelimit,
-                )
-            except AttributeError:
-                # not all modules have 'lookup_filter'
-                dns = (obj.dn for obj in self._orig_udm_module.lookup(
-                    None,
-                    self.connection,
-                    filter_s,
-                    base=base,
-                    scope=scope,
-                    sizelimit=sizelimit,
-                ))
+            for orig_udm_obj in univention.admin.modules.lookup_iter(
+                udm_module,
+                None,
+                self.connection,
+                filter_s,
+                base=base,
+                scope=scope,
+                sizelimit=sizelimit,
+            ):
+                orig_udm_obj.position.setDn(ldap_base)
+                self._verify_univention_object_type(orig_udm_obj)
+                if open and self.meta.auto_open:
+                    # searches done by open() run between the pages and
+                    # without paged results, see univention.uldap.access.search_iter()
+                    orig_udm_obj.open()
+                yield self._load_obj(orig_udm_obj.dn, orig_udm_object=orig_udm_obj)
         except univention.admin.uexceptions.ldapSizelimitExceeded:
             raise SearchLimitReached(module_name=self.name, search_filter=filter_s, sizelimit=sizelimit)
-        for dn in dns:
-            try:
-                retrieved_obj = self.get(dn)
-            except NoObject:
-                logging.getLogger('ADMIN').warning(f'Skipping over search result with DN {dn!r}, that does not exist anymore')
-                continue
-            yield retrieved_obj
 
     def _dn_exists(self, dn):
         # type: (str) -> bool
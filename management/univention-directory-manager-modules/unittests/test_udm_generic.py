@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import pytest
+
+import univention.admin.handlers
+import univention.admin.modules
+import univention.admin.uexceptions
+from univention.udm.exceptions import SearchLimitReached, WrongObjectType
+from univention.udm.modules.generic import GenericModule, GenericObject
+
+
+BASE = 'dc=example,dc=com'
+
+
+@pytest.fixture()
+def connection(mocker):
+    return mocker.Mock(base=BASE)
+
+
+@pytest.fixture()
+def module(mocker, connection):
+    mocker.patch.object(GenericModule, '_get_orig_udm_module')
+    mocker.patch.object(GenericObject, '_copy_from_udm_obj')
+    module = GenericModule('users/user', connection, 2)
+    module._get_orig_udm_module.return_value.object.ldap_base = BASE
+    mocker.patch.object(module, '_get_orig_udm_object', side_effect=AssertionError('objects must not be loaded one by one'))
+    return module
+
+
+def orig_obj(mocker, dn, object_type='users/user'):
+    obj = mocker.Mock(spec=univention.admin.handlers.simpleLdap)
+    obj.dn = dn
+    obj.position = mocker.Mock()
+    obj.oldinfo = {'univentionObjectType': [object_type]}
+    return obj
+
+
+@pytest.fixture()
+def lookup_iter(mocker):
+    return mocker.patch.object(univention.admin.modules, 'lookup_iter')
+
+
+def test_search_single_lookup(module, connection, lookup_iter, mocker):
+    objs = [orig_obj(mocker, 'uid=user%d,%s' % (i, BASE)) for i in range(3)]
+    lookup_iter.return_value = iter(objs)
+    results = list(module.search('uid=user*', base=BASE, scope='one', sizelimit=10))
+    lookup_iter.assert_called_once_with(module._get_orig_udm_module.return_value, None, connection, 'uid=user*', base=BASE, scope='one', sizelimit=10)
+    assert [result._orig_udm_object for result in results] == objs
+    for obj in objs:
+        obj.position.setDn.assert_called_once_with(BASE)
+        obj.open.assert_called_once_with()
+
+
+def test_search_without_open(module, lookup_iter, mocker):
+    objs = [orig_obj(mocker, 'uid=user%d,%s' % (i, BASE)) for i in range(2)]
+    lookup_iter.return_value = iter(objs)
+    assert len(list(module.search(open=False))) == 2
+    for obj in objs:
+        obj.open.assert_not_called()
+
+
+def test_search_without_auto_open(module, lookup_iter, mocker):
+    obj = orig_obj(mocker, 'uid=user1,%s' % (BASE,))
+    lookup_iter.return_value = iter([obj])
+    module.meta.auto_open = False
+    assert len(list(module.search())) == 1
+    obj.open.assert_not_called()
+
+
+def test_search_wrong_object_type(module, lookup_iter, mocker):
+    obj = orig_obj(mocker, 'cn=group1,%s' % (BASE,), 'groups/group')
+    lookup_iter.return_value = iter([obj])
+    with pytest.raises(WrongObjectType):
+        list(module.search())
+    obj.open.assert_not_called()
+
+
+def test_search_sizelimit(module, lookup_iter, mocker):
+    def results(*args, **kwargs):
+        yield orig_obj(mocker, 'uid=user1,%s' % (BASE,))
+        raise univention.admin.uexceptions.ldapSizelimitExceeded()
+
+    lookup_iter.side_effect = results
+    results = module.search('uid=*', sizelimit=1)
+    assert next(results)._orig_udm_object.dn == 'uid=user1,%s' % (BASE,)
+    with pytest.raises(SearchLimitReached):
+        next(results)
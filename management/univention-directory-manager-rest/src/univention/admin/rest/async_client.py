@@ -62,6 +62,7 @@ from __future__ import annotations
 
 import asyncio
 import copy
+import json
 from typing import TYPE_CHECKING, Any
 
 import aiohttp
@@ -69,7 +70,7 @@ import uritemplate
 
 
 if TYPE_CHECKING:
-    from collections.abc import AsyncIterator, Callable, Iterator, Mapping
+    from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Mapping
 
 try:
     aiter  # noqa: B018
@@ -232,6 +233,24 @@ class Session:
 
         return await doit()
 
+    async def request_ndjson(self, method: str, uri: str, documents: Iterable[dict], **headers: str) -> AsyncIterator[dict]:
+        """Send a stream of JSON documents, one per line, and iterate over the JSON documents of the response as they arrive."""
+        async def body():
+            for document in documents:
+                yield json.dumps(document).encode('UTF-8') + b'\n'
+
+        headers = dict(self.default_headers, **{'Accept': 'application/x-ndjson', 'Content-Type': 'application/x-ndjson'}, **headers)
+        try:
+            response = await self.get_method(method)(uri, data=body(), headers=headers)
+        except aiohttp.ClientConnectionError as exc:  # pragma: no cover
+            raise ConnectionError(exc)
+        async with response:
+            if response.status >= 399:
+                await self.eval_response(response)
+            async for line in response.content:
+                if line.strip():
+                    yield json.loads(line)
+
     async def _follow_redirection(self, response: Response) -> Response:
         location = response.headers.get('Location')
         #  aiohttp doesn't follow redirects for 202?
@@ -371,6 +390,19 @@ class UDM(Client):
             for module_info in self.client.get_relations(module, 'udm:object-types', name):
                 yield Module(self, module_info['href'], module_info['name'], module_info['title'])
 
+    async def batch(self, operations: Iterable[dict]) -> AsyncIterator[dict]:
+        """
+        Create, modify or remove many objects with one request.
+
+        :param operations: Dictionaries with the keys `action` (`create`, `modify` or `remove`), `object_type`, `dn` and optionally
+            `position`, `superordinate`, `options`, `policies`, `properties` and an `id` which is returned with the result.
+        :returns: The result of each operation, in the order they are finished. `index` is the position of the operation.
+        """
+        await self.load()
+        uri = self.client.get_relation(self.entry, 'udm:batch')['href']
+        async for result in self.client.request_ndjson('POST', uri, operations):
+            yield result
+
     async def obj_by_dn(self, dn: str) -> Object:
         await self.load()
         return Object.from_data(self, await self.client.resolve_relation(self.entry, 'udm:object/get-by-dn', template={'dn': dn}))
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Scheduling of the operations of a batch request.
+
+The operations of a batch are executed concurrently, but an operation is
+only started if it doesn't touch the objects of a running or an earlier
+waiting operation. So operations on the same object, an object and its
+container, or an object and a recursive removal of one of its ancestors are
+applied in the order of the request.
+"""
+
+import asyncio
+import collections
+import functools
+
+import ldap
+import tornado.locks
+
+
+@functools.lru_cache(maxsize=65536)
+def _normalize_dn(dn):
+    return ldap.dn.str2dn(dn.lower())
+
+
+class Scope:
+    """
+    The objects touched by an operation.
+
+    :param dns: The DNs of the object, e.g. the old and the new DN of a move.
+    :param refs: DNs of containers the operation refers to, e.g. the position.
+    :param parents: Containers in which objects with yet unknown DNs are created.
+    """
+
+    __slots__ = ('ancestors', 'barrier', 'containers', 'dns', 'parents', 'refs')
+
+    def __init__(self, dns=(), refs=(), parents=()):
+        self.dns = set()
+        self.ancestors = set()
+        self.containers = set()
+        self.refs = set()
+        self.parents = set()
+        self.barrier = False
+        try:
+            for dn in dns:
+                rdns = _normalize_dn(dn)
+                self.dns.add(ldap.dn.dn2str(rdns))
+                self.ancestors.update(ldap.dn.dn2str(rdns[i:]) for i in range(len(rdns)))
+                self.containers.add(ldap.dn.dn2str(rdns[1:]))
+            for dn in (*refs, *parents):
+                rdns = _normalize_dn(dn)
+                self.refs.update(ldap.dn.dn2str(rdns[i:]) for i in range(len(rdns)))
+            self.parents = {ldap.dn.dn2str(_normalize_dn(dn)) for dn in parents}
+        except ldap.DECODING_ERROR:
+            # we can't tell what the operation touches: run it on its own
+            self.barrier = True
+
+    @classmethod
+    def of(cls, operation):
+        """Return the scope of an operation as given in the request, before it is sanitized."""
+        if not isinstance(operation, dict):
+            return cls()
+        action = operation.get('action')
+        dn, position, superordinate = (operation.get(key) if isinstance(operation.get(key), str) else None for key in ('dn', 'position', 'superordinate'))
+        if action == 'create':
+            if dn:
+                return cls(dns=[dn], refs=[x for x in (position, superordinate) if x])
+            if position or superordinate:
+                return cls(refs=[x for x in (superordinate,) if x], parents=[position or superordinate])
+            # created in the default container of the module
+            scope = cls()
+            scope.barrier = True
+            return scope
+        if action == 'modify' and dn and position:
+            try:
+                rdn = _normalize_dn(dn)[:1]
+                moved = ldap.dn.dn2str(rdn + _normalize_dn(position))
+            except ldap.DECODING_ERROR:
+                moved = None
+            return cls(dns=[x for x in (dn, moved) if x], refs=[x for x in (position, superordinate) if x])
+        return cls(dns=[dn] if dn else [])
+
+    def conflicts(self, other):
+        """Whether the two operations must not run concurrently."""
+        return (
+            self.barrier or other.barrier
+            or not self.dns.isdisjoint(other.ancestors)
+            or not other.dns.isdisjoint(self.ancestors)
+            or not self.refs.isdisjoint(other.dns)
+            or not other.refs.isdisjoint(self.dns)
+            or not self.parents.isdisjoint(other.containers)
+            or not other.parents.isdisjoint(self.containers)
+        )
+
+
+class BatchScheduler:
+    """
+    Run the operations of a batch concurrently where possible.
+
+    :param execute: Coroutine function called with the index and the operation.
+    :param int workers: Number of concurrently running operations.
+    :param int lookahead: Number of waiting operations which are checked for
+            being startable. :py:meth:`add` blocks while as many operations
+            are waiting. Defaults to eight per worker.
+    """
+
+    def __init__(self, execute, workers, lookahead=None):
+        self.execute = execute
+        self.workers = workers
+        self.lookahead = lookahead or 8 * workers
+        self._pending = collections.deque()
+        self._running = {}
+        self._count = 0
+        self._changed = tornado.locks.Condition()
+
+    async def add(self, operation, scope):
+        """
+        Queue an operation.
+
+        :param operation: The operation passed to `execute`.
+        :param Scope scope: The objects touched by the operation.
+        """
+        while len(self._pending) >= self.lookahead:
+            await self._changed.wait()
+        self._pending.append((self._count, operation, scope))
+        self._count += 1
+        self._schedule()
+
+    async def join(self):
+        """Wait until all queued operations are finished."""
+        while self._pending or self._running:
+            await self._changed.wait()
+
+    def _schedule(self):
+        waiting = []
+        started = []
+        for position, (index, operation, scope) in enumerate(self._pending):
+            if len(self._running) >= self.workers:
+                break
+            if any(scope.conflicts(other) for _task, other in self._running.values()) or any(scope.conflicts(other) for other in waiting):
+                waiting.append(scope)
+                continue
+            self._running[index] = (asyncio.ensure_future(self._run(index, operation)), scope)
+            started.append(position)
+        for position in reversed(started):
+            del self._pending[position]
+
+    async def _run(self, index, operation):
+        try:
+            await self.execute(index, operation)
+        finally:
+            del self._running[index]
+            self._schedule()
+            self._changed.notify_all()
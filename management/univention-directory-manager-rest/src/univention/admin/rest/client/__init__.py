@@ -49,6 +49,7 @@ Sample Client for the UDM REST API.
 from __future__ import annotations
 
 import copy
+import json
 import sys
 import time
 from typing import TYPE_CHECKING, Any, Self
@@ -58,7 +59,7 @@ import uritemplate
 
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Iterator, Mapping
+    from collections.abc import Callable, Iterable, Iterator, Mapping
 
 if sys.version_info.major > 2:
     import http.client
@@ -207,6 +208,21 @@ class Session:
 
         return doit()
 
+    def request_ndjson(self, method: str, uri: str, documents: Iterable[dict], **headers: str) -> Iterator[dict]:
+        """Send a stream of JSON documents, one per line, and iterate over the JSON documents of the response as they arrive."""
+        body = (json.dumps(document).encode('UTF-8') + b'\n' for document in documents)
+        headers = dict(self.default_headers, **{'Accept': 'application/x-ndjson', 'Content-Type': 'application/x-ndjson'}, **headers)
+        try:
+            response = self.get_method(method)(uri, data=body, headers=headers, stream=True)
+        except requests.exceptions.ConnectionError as exc:
+            raise ConnectionError(exc)
+        with response:
+            if response.status_code >= 399:
+                self.eval_response(response)
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
     def _follow_redirection(self, response: Response) -> Response:
         location = response.headers.get('Location')
         # python-requests doesn't follow redirects for 202
@@ -336,6 +352,22 @@ class UDM(Client):
             for module_info in self.client.get_relations(module, 'udm:object-types', name):
                 yield Module(self, module_info['href'], module_info['name'], module_info['title'])
 
+    def batch(self, operations: Iterable[dict]) -> Iterator[dict]:
+        """
+        Create, modify or remove many objects with one request.
+
+        >>> for result in udm.batch([{'action': 'modify', 'object_type': 'users/user', 'dn': dn, 'properties': {'description': 'foo'}}]):
+        >>>     if result['status'] >= 400:
+        >>>         print(result['index'], result['error']['message'])
+
+        :param operations: Dictionaries with the keys `action` (`create`, `modify` or `remove`), `object_type`, `dn` and optionally
+            `position`, `superordinate`, `options`, `policies`, `properties` and an `id` which is returned with the result.
+        :returns: The result of each operation, in the order they are finished. `index` is the position of the operation.
+        """
+        self.load()
+        uri = self.client.get_relation(self.entry, 'udm:batch')['href']
+        return self.client.request_ndjson('POST', uri, operations)
+
     def version(self, api_version: str) -> Self:
         self._api_version = api_version
         return self
@@ -56,6 +56,15 @@ def last_modified(date):
     )
 
 
+def entity_tag(dn, module, entry_csn, entry_uuid):
+    etag = hashlib.sha1()
+    etag.update(dn.encode('utf-8', 'replace'))
+    etag.update(module.encode('utf-8', 'replace'))
+    etag.update(b''.join(entry_csn))
+    etag.update((entry_uuid or '').encode('utf-8'))
+    return '"%s"' % etag.hexdigest()
+
+
 class ConditionalResource:
 
     def set_entity_tags(self, obj, check_conditionals=True, remove_after_check=False):
@@ -73,14 +82,22 @@ class ConditionalResource:
         # generate as early as possible, to not cause side effects e.g. default values in obj.info. It must be the same value for GET and PUT
         if not obj._open:
             raise RuntimeError('Object was not opened!')
-        etag = hashlib.sha1()
-        etag.update(obj.dn.encode('utf-8', 'replace'))
-        etag.update(obj.module.encode('utf-8', 'replace'))
-        etag.update(b''.join(obj.oldattr.get('entryCSN', [])))
-        etag.update((obj.entry_uuid or '').encode('utf-8'))
         # etag.update(json.dumps({k: [v.decode('ISO8859-1', 'replace') for v in val] for k, val in obj.oldattr.items()}, sort_keys=True).encode('utf-8'))
         # etag.update(json.dumps(obj.info, sort_keys=True).encode('utf-8'))
-        return '"%s"' % etag.hexdigest()
+        return entity_tag(obj.dn, obj.module, obj.oldattr.get('entryCSN', []), obj.entry_uuid)
+
+    def check_unopened_entity_tags(self, etag, modify_timestamp):
+        """
+        Answer conditional requests without opening the object.
+
+        :param etag: The entity tag, see :py:func:`univention.admin.rest.object_cache.entity_tag_of`.
+        :param modify_timestamp: The `modifyTimestamp` of the object.
+        """
+        self.set_header('Etag', etag)
+        modified = self.modified_from_timestamp(modify_timestamp)
+        if modified:
+            self.set_header('Last-Modified', last_modified(modified))
+        self.check_conditional_requests()
 
     def modified_from_timestamp(self, timestamp):
         modified = time.strptime(timestamp, '%Y%m%d%H%M%SZ')
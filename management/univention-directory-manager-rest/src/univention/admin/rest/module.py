@@ -44,6 +44,7 @@ import logging
 import operator
 import os
 import re
+import sys
 import traceback
 import uuid
 import xml.etree.ElementTree as ET  # noqa: S405
@@ -73,6 +74,8 @@ import univention.admin.objects as udm_objects
 import univention.admin.types as udm_types
 import univention.admin.uexceptions as udm_errors
 import univention.directory.reports as udr
+from univention.admin.handlers import simpleLdap
+from univention.admin.rest.batch import BatchScheduler, Scope
 from univention.admin.rest.hal import HAL
 from univention.admin.rest.html_ui import HTML
 from univention.admin.rest.http_conditional import ConditionalResource, last_modified
@@ -80,6 +83,8 @@ from univention.admin.rest.ldap_connection import (
     get_machine_ldap_read_connection, get_user_ldap_read_connection, get_user_ldap_write_connection, reset_cache,
 )
 from univention.admin.rest.openapi import OpenAPIBase, RelationsBase, _OpenAPIBase
+from univention.admin.rest.object_cache import entity_tag_of, object_cache
+from univention.admin.rest.paging import BATCH_SIZE, search_snapshots
 from univention.admin.rest.sanitizer import (
     Body, BooleanSanitizer, BoolSanitizer, ChoicesSanitizer, DictSanitizer, DNSanitizer, EmailSanitizer,
     IntegerSanitizer, JSONPayload, LDAPFilterSanitizer, LDAPSearchSanitizer, ListSanitizer, MultiValidationError,
@@ -245,15 +250,34 @@ class ResourceBase(SanitizerBase, HAL, HTML):
 
     def get_module_object(self, object_type, dn, ldap_connection=None):
         module = self.get_module(object_type, ldap_connection=ldap_connection)
+        return module, self.open_existing_object(module, dn)
+
+    def open_existing_object(self, module, dn):
         try:
-            obj = module.get(dn)
+            obj = self.open_object(module, dn)
         except UDM_Error as exc:
             if not isinstance(exc.exc, udm_errors.noObject):
                 raise
             obj = None
         if not obj:
-            raise NotFound(object_type, dn)
-        return module, obj
+            raise NotFound(module.name, dn)
+        return obj
+
+    def open_object(self, module, dn):
+        """Open the object, or copy it from the object cache if it was not modified meanwhile"""
+        ldap_connection = module.get_ldap_connection()[0]
+        cached = object_cache.get(ldap_connection, module.name, dn)
+        if cached is not None:
+            return cached
+        obj = module.get(dn)
+        if obj:
+            object_cache.set(ldap_connection, module.name, obj)
+        return obj
+
+    def get_entity_tag(self, object_type, dn):
+        """Return the entity tag and modifyTimestamp of the object, without opening it"""
+        module = self.get_module(object_type)
+        return entity_tag_of(module.get_ldap_connection()[0], module.name, dn)
 
     def get_object_by_dn(self, dn, ldap_connection=None):
         object_type = get_module(None, dn, self.ldap_connection).module
@@ -381,6 +405,14 @@ class ResourceBase(SanitizerBase, HAL, HTML):
         if not exc_info:  # or isinstance(exc_info[1], HTTPError):
             return super().write_error(status_code, exc_info=exc_info, **kwargs)
 
+        status_code, response = self.get_error_response(status_code, exc_info)
+        self.add_link(response, 'self', self.urljoin(''), title=_('HTTP-Error %d: %s') % (status_code, response['error']['title']))
+        self.set_status(status_code)
+        self.add_caching(public=False, no_store=True, no_cache=True, must_revalidate=True)
+        self.content_negotiation(response)
+
+    def get_error_response(self, status_code, exc_info):
+        """Build the error document of an exception, as sent in error responses"""
         etype, exc, etraceback = exc_info
         if isinstance(exc, udm_errors.ldapError) and isinstance(getattr(exc, 'original_exception', None), ldap.SERVER_DOWN | ldap.CONNECT_ERROR | ldap.INVALID_CREDENTIALS):
             exc = exc.original_exception
@@ -451,11 +483,7 @@ class ResourceBase(SanitizerBase, HAL, HTML):
             'message': message,
             'error': error,  # deprecated, use embedded udm:error instead
         })
-
-        self.add_link(response, 'self', self.urljoin(''), title=_('HTTP-Error %d: %s') % (status_code, title))
-        self.set_status(status_code)
-        self.add_caching(public=False, no_store=True, no_cache=True, must_revalidate=True)
-        self.content_negotiation(response)
+        return status_code, response
 
     def add_caching(self, expires=None, public=False, must_revalidate=False, no_cache=False, no_store=False, no_transform=False, max_age=None, shared_max_age=None, proxy_revalidate=False):
         control = [
@@ -581,6 +609,7 @@ class Modules(Resource):
         self.add_link(result, 'udm:license', self.urljoin('license') + '/', name='license', title=_('UCS license'))
         self.add_link(result, 'udm:ldap-base', self.urljoin('ldap/base') + '/', title=_('LDAP base'))
         self.add_link(result, 'udm:relations', self.urljoin('relation') + '/', name='relation', title=_('All link relations'))
+        self.add_link(result, 'udm:batch', self.urljoin('batch'), title=_('Create, modify and remove many objects'), method='POST')
         self.add_caching(public=True)
         self.content_negotiation(result)
 
@@ -1387,6 +1416,10 @@ class Objects(ConditionalResource, FormBase, ReportingBase, _OpenAPIBase, Resour
                 "limit to 50": {"value": 50, "summary": "limit to 50 entries"},
             },
         ),
+        token: str = Query(
+            StringSanitizer(required=False, default=None, allow_none=True),
+            description="Opaque continuation token of a previous paged search, as contained in the `next`/`prev` links. Allows to fetch any page of the same search without searching again.",
+        ),
     ):
         """Search for {module.object_name_plural} objects"""
         module = self.get_module(object_type)
@@ -1412,7 +1445,7 @@ class Objects(ConditionalResource, FormBase, ReportingBase, _OpenAPIBase, Resour
         objects = []
         if search:  # TODO: check if searching is allowed
             try:
-                objects, last_page = await self.search(module, position, ldap_filter, superordinate, scope, hidden, items_per_page, page, by, reverse, opened)
+                objects, last_page, token = await self.search(module, position, ldap_filter, superordinate, scope, hidden, items_per_page, page, by, reverse, opened, token)
             except ObjectDoesNotExist as exc:
                 self.raise_sanitization_error('position', str(exc), type='query')
             except SuperordinateDoesNotExist as exc:
@@ -1437,13 +1470,14 @@ class Objects(ConditionalResource, FormBase, ReportingBase, _OpenAPIBase, Resour
             self.add_resource(result, 'udm:object', entry)
 
         if items_per_page:
-            self.add_link(result, 'first', self.urljoin('', page='1'), title=_('First page'))
+            paging = {'token': token} if token else {}
+            self.add_link(result, 'first', self.urljoin('', page='1', **paging), title=_('First page'))
             if page > 1:
-                self.add_link(result, 'prev', self.urljoin('', page=str(page - 1)), title=_('Previous page'))
+                self.add_link(result, 'prev', self.urljoin('', page=str(page - 1), **paging), title=_('Previous page'))
             if not last_page:
-                self.add_link(result, 'next', self.urljoin('', page=str(page + 1)), title=_('Next page'))
+                self.add_link(result, 'next', self.urljoin('', page=str(page + 1), **paging), title=_('Next page'))
             else:
-                self.add_link(result, 'last', self.urljoin('', page=str(last_page)), title=_('Last page'))
+                self.add_link(result, 'last', self.urljoin('', page=str(last_page), **paging), title=_('Last page'))
 
         if search:
             for i, report_type in enumerate(sorted(self.reports_cfg.get_report_names(object_type)), 1):
@@ -1497,42 +1531,112 @@ class Objects(ConditionalResource, FormBase, ReportingBase, _OpenAPIBase, Resour
         self.add_caching(public=False, no_cache=True, no_store=True, max_age=1, must_revalidate=True)
         self.content_negotiation(result)
 
-    async def search(self, module, container, ldap_filter, superordinate, scope, hidden, items_per_page, page, by, reverse, opened):
-        ctrls = {}
+    async def search(self, module, container, ldap_filter, superordinate, scope, hidden, items_per_page, page, by, reverse, opened, token=None):
         serverctrls = []
-        hashed = (self.request.user_dn, module.name, container or None, ldap_filter or None, superordinate or None, scope or None, hidden or None, items_per_page or None, by or None, reverse or None)
-        session = shared_memory.search_sessions.get(hashed, {})
-        last_cookie = session.get('last_cookie', '')
-        current_page = session.get('page', 0)
-        page_ctrl = SimplePagedResultsControl(True, size=items_per_page, cookie=last_cookie)  # TODO: replace with VirtualListViewRequest
-        if module.supports_pagination:
-            if items_per_page:
-                serverctrls.append(page_ctrl)
-            if by in ('uid', 'uidNumber', 'cn'):
-                rule = ':caseIgnoreOrderingMatch' if by not in ('uidNumber',) else ''
-                serverctrls.append(SSSRequestControl(ordering_rules=['%s%s%s' % ('-' if reverse else '', by, rule)]))
-        objects = []
-        # TODO: we have to store the results of the previous pages (or make them cacheable)
-        # FIXME: we have to store the session across all processes
+        if module.supports_pagination and by in ('uid', 'uidNumber', 'cn'):
+            rule = ':caseIgnoreOrderingMatch' if by not in ('uidNumber',) else ''
+            serverctrls.append(SSSRequestControl(ordering_rules=['%s%s%s' % ('-' if reverse else '', by, rule)]))
         ucr['directory/manager/web/sizelimit'] = ucr.get('ldap/sizelimit', '400000')
-        last_page = page
-        for _i in range(current_page, page or 1):
+        if not (items_per_page and module.supports_pagination):
             # TODO: if we want to improve performance one day for `opened == False` pass `simple=True`
-            objects = await self.pool_submit(module.search, container, superordinate=superordinate, filter=ldap_filter, scope=scope, hidden=hidden, serverctrls=serverctrls, response=ctrls)
-            for control in ctrls.get('ctrls', []):
-                if control.controlType == SimplePagedResultsControl.controlType:
-                    page_ctrl.cookie = control.cookie
-            if not page_ctrl.cookie:
-                shared_memory.search_sessions.pop(hashed, None)
-                break
+            objects = await self.pool_submit(module.search, container, superordinate=superordinate, filter=ldap_filter, scope=scope, hidden=hidden, serverctrls=serverctrls)
+            last_page = page
+            token = None
         else:
-            shared_memory.search_sessions[hashed] = {'last_cookie': page_ctrl.cookie, 'page': page}
+            # the DNs of the result are stored in a snapshot, every process can then serve every page of it
+            owner = self.request.user_dn
+            query = (module.name, container or None, ldap_filter or None, superordinate.dn if superordinate else None, scope or None, bool(hidden), by or None, bool(reverse))
+            offset = (page - 1) * items_per_page
+            snapshot = await self._snapshot_page(token, owner, query, offset, items_per_page) if token else None
+            if snapshot is None:
+                token = await self._create_snapshot(owner, query, module, container, ldap_filter, superordinate, scope, hidden, serverctrls, items_per_page)
+                snapshot = await self._snapshot_page(token, owner, query, offset, items_per_page)
+                if snapshot is None:
+                    raise HTTPError(503, _('The search could not be continued. Please search again.'))
+            dns, total, complete = snapshot
+            objects = await self.pool_submit(self._search_page, module, container, ldap_filter, superordinate, scope, hidden, dns)
             last_page = 0
+            if complete:
+                last_page = max(1, -(-total // items_per_page))
+                if page < last_page:
+                    last_page = 0
         # TODO: move into module.search(opened=True) and then into object.lookup()! because that does error handling.
         if opened and objects:
             for obj in objects:
                 obj.open()
-        return (objects, last_page)
+        return (objects, last_page, token)
+
+    async def _create_snapshot(self, owner, query, module, container, ldap_filter, superordinate, scope, hidden, serverctrls, items_per_page):
+        """
+        Create the snapshot of a search.
+
+        Only the DNs of the first page are searched with the paged results
+        control before the snapshot is returned, the search is continued in
+        the background by :py:meth:`_fill_snapshot`.
+
+        :returns: The token of the snapshot.
+        """
+        response = {}
+        page_ctrl = SimplePagedResultsControl(True, size=items_per_page, cookie='')
+        dns = await self.pool_submit(self._search_dns, module, container, ldap_filter, superordinate, scope, hidden, [*serverctrls, page_ctrl], response)
+        # not every UDM handler supports the paged results control, then the result is complete
+        cookie = self._paged_results_cookie(response)
+        token = search_snapshots.create(owner, query, dns, complete=not cookie)
+        if cookie:
+            self.pool.submit(self._fill_snapshot, token, module, container, ldap_filter, superordinate, scope, hidden, serverctrls, cookie)
+        return token
+
+    def _fill_snapshot(self, token, module, container, ldap_filter, superordinate, scope, hidden, serverctrls, cookie):
+        """Continue the paged search of a snapshot and append the DNs of the further pages to it."""
+        try:
+            while cookie:
+                response = {}
+                page_ctrl = SimplePagedResultsControl(True, size=BATCH_SIZE, cookie=cookie)
+                dns = self._search_dns(module, container, ldap_filter, superordinate, scope, hidden, [*serverctrls, page_ctrl], response)
+                cookie = self._paged_results_cookie(response)
+                if not search_snapshots.extend(token, dns, complete=not cookie):
+                    break  # expired
+        except Exception:
+            log.exception('Searching the DNs of the search snapshot failed:')
+            search_snapshots.discard(token)
+
+    async def _snapshot_page(self, token, owner, query, offset, limit):
+        """Return a page of a snapshot, see :py:meth:`SearchSnapshots.get`, after waiting until it is filled."""
+        while True:
+            snapshot = search_snapshots.get(token, owner, query, offset, limit)
+            if snapshot is None:
+                return None
+            dns, _total, complete = snapshot
+            if complete or len(dns) >= limit:
+                return snapshot
+            await tornado.gen.sleep(0.1)
+
+    @staticmethod
+    def _paged_results_cookie(response):
+        for control in response.get('ctrls', []):
+            if control.controlType == SimplePagedResultsControl.controlType:
+                return control.cookie
+        return b''
+
+    def _search_dns(self, module, container, ldap_filter, superordinate, scope, hidden, serverctrls, response):
+        """Search only the DNs of the matching objects, of one page if `serverctrls` contains the paged results control."""
+        if not superordinate and module.module is not None and getattr(module.module.lookup, '__func__', None) is simpleLdap.lookup.__func__:
+            # generic lookup: the module filter is all we need
+            filter_s = ldap_filter or module._object_property_filter(None, None, hidden)
+            return module.search(container or ucr['ldap/base'], filter=filter_s or None, scope=scope, hidden=hidden, serverctrls=serverctrls, response=response, simple=True)
+        return [obj.dn for obj in module.search(container, superordinate=superordinate, filter=ldap_filter, scope=scope, hidden=hidden, serverctrls=serverctrls, response=response) or []]
+
+    def _search_page(self, module, container, ldap_filter, superordinate, scope, hidden, dns):
+        """Load the objects of one page with a single search, in the order of the snapshot."""
+        if not dns:
+            return []
+        page_filter = '(|%s)' % ''.join(filter_format('(entryDN=%s)', [dn]) for dn in dns)
+        if ldap_filter:
+            page_filter = '(&%s%s)' % (ldap_filter if ldap_filter.startswith('(') else '(%s)' % (ldap_filter,), page_filter)
+        elif not hidden:
+            page_filter = module._append_hidden_filter(page_filter)
+        objects = {obj.dn.lower(): obj for obj in module.search(container, superordinate=superordinate, filter=page_filter, scope=scope, hidden=hidden)}
+        return [objects[dn.lower()] for dn in dns if dn.lower() in objects]
 
     def get_html(self, response):
         if self.request.method not in ('GET', 'HEAD'):
@@ -1743,6 +1847,11 @@ class Object(ConditionalResource, FormBase, _OpenAPIBase, Resource):
         if object_type == 'users/self' and not self.ldap_connection.compare_dn(dn, self.request.user_dn):
             raise HTTPError(403)
 
+        if self.request.headers.get('If-None-Match') or self.request.headers.get('If-Modified-Since'):
+            tag = await self.pool_submit(self.get_entity_tag, object_type, dn)
+            if tag is not None:
+                self.check_unopened_entity_tags(*tag)  # 304 Not Modified without opening the object
+
         try:
             module, obj = await self.pool_submit(self.get_module_object, object_type, dn)
         except NotFound:
@@ -2011,8 +2120,8 @@ class Object(ConditionalResource, FormBase, _OpenAPIBase, Resource):
             self.set_status(204)
         raise Finish()
 
-    async def create(self, object_type, dn=None, representation=None, result=None, **kwargs):
-        module = self.get_module(object_type, ldap_connection=self.ldap_write_connection)
+    async def create(self, object_type, dn=None, representation=None, result=None, module=None, **kwargs):
+        module = module or self.get_module(object_type, ldap_connection=self.ldap_write_connection)
         if isinstance(representation, list):
             def get_patch_replacements(field):
                 for path, pname, op, value in representation:
@@ -2363,6 +2472,177 @@ class Object(ConditionalResource, FormBase, _OpenAPIBase, Resource):
         raise Finish()
 
 
+@tornado.web.stream_request_body
+class Batch(Resource):
+    """
+    Create, modify or remove many objects with one request (POST udm/batch)
+
+    The request body is a stream of JSON documents, one per line (NDJSON), each describing one operation::
+
+        {"action": "create", "object_type": "users/user", "position": "...", "properties": {...}}
+        {"action": "modify", "object_type": "users/user", "dn": "...", "properties": {...}}
+        {"action": "remove", "object_type": "users/user", "dn": "..."}
+
+    The request body is read as a stream and the operations are started while it is received.
+    The operations are executed concurrently, but operations touching the same objects (e.g. an object and its container) are applied in the order of the request.
+    The result of each operation is sent back as one line as soon as it is finished.
+    It contains the index of the operation in the request and the optional "id" given with the operation.
+    Errors are reported in the same format as the error responses of the single object resources.
+    """
+
+    operation_sanitizer = DictSanitizer({
+        'action': ChoicesSanitizer(['create', 'modify', 'remove'], required=True),
+        'object_type': StringSanitizer(required=True),
+        'dn': DNSanitizer(required=False, allow_none=True),
+        'position': DNSanitizer(required=False, allow_none=True),
+        'superordinate': DNSanitizer(required=False, allow_none=True),
+        'options': DictSanitizer({}, default_sanitizer=BooleanSanitizer(), required=False, allow_none=True),
+        'policies': DictSanitizer({}, default_sanitizer=ListSanitizer(DNSanitizer()), required=False, allow_none=True),
+        'properties': DictSanitizer({}, required=False, allow_none=True),
+        'cleanup': BoolSanitizer(required=False, default=True),
+        'recursive': BoolSanitizer(required=False, default=True),
+    }, required=True, _copy_value=False)
+
+    def check_acceptable(self):
+        if parse_content_type(self.request.headers.get('Accept', '')) == 'application/x-ndjson':
+            return 'json'
+        return super().check_acceptable()
+
+    def decode_request_arguments(self):
+        pass  # the body is streamed, see data_received()
+
+    scheduler = None
+
+    def prepare(self):
+        super().prepare()
+        if self._finished or self.request.method != 'POST':
+            return
+        content_type = parse_content_type(self.request.headers.get('Content-Type', ''))
+        if content_type != 'application/x-ndjson':
+            raise HTTPError(415, _('The operations must be given as "application/x-ndjson".'))
+
+        self.set_header('Content-Type', 'application/x-ndjson')
+        self.add_caching(public=False, no_store=True, no_cache=True, must_revalidate=True)
+        self._buffer = b''
+        self._modules = {}
+        # results are only sent after the whole request was received
+        self._streaming = False
+        self.scheduler = BatchScheduler(self.run, int(MAX_WORKERS))
+
+    async def data_received(self, chunk):
+        if self._finished or self.scheduler is None:
+            return
+        *lines, self._buffer = (self._buffer + chunk).split(b'\n')
+        for line in lines:
+            await self.add_operation(line)
+
+    async def add_operation(self, line):
+        if not line.strip():
+            return
+        try:
+            operation = json.loads(line)
+        except ValueError as exc:
+            operation = exc
+        await self.scheduler.add(operation, Scope.of(operation))
+
+    async def post(self):
+        await self.add_operation(self._buffer)
+        self._buffer = b''
+        self._streaming = True
+        await self.flush()
+        await self.scheduler.join()
+        self.finish()
+
+    async def run(self, index, operation):
+        result = await self.execute(index, operation, self._modules)
+        self.write(json.dumps(result, cls=JsonEncoder) + '\n')
+        if self._streaming:
+            await self.flush()
+
+    async def execute(self, index, operation, modules):
+        obj = Object(self.application, self.request)
+        obj.ldap_connection, obj.ldap_position = self.ldap_connection, self.ldap_position
+        operation_id = None
+        try:
+            if isinstance(operation, ValueError):
+                raise HTTPError(400, _('Invalid JSON document: %r') % (operation,))
+            if isinstance(operation, dict):
+                operation_id = operation.get('id')
+            operation = self.sanitize_arguments(self.operation_sanitizer, 'operation', {'operation': operation}, _result_func=lambda x: {'body_arguments': x}, _fieldname='operation')
+
+            # initialize each module only once for all operations
+            object_type = operation['object_type']
+            if object_type not in modules:
+                modules[object_type] = self.get_module(object_type, ldap_connection=self.ldap_write_connection)
+            module = modules[object_type]
+
+            result = await getattr(self, f'execute_{operation["action"]}')(obj, module, operation)
+        except Exception:
+            exc_info = sys.exc_info()
+            status_code, result = obj.get_error_response(getattr(exc_info[1], 'status_code', 500), exc_info)
+            if status_code >= 500:
+                log.error('Batch operation %d failed', index, exc_info=exc_info)
+            result['status'] = status_code
+        result['index'] = index
+        if operation_id is not None:
+            result['id'] = operation_id
+        return result
+
+    async def execute_create(self, obj, module, operation):
+        if 'add' not in module.operations:
+            raise HTTPError(405, _('Objects of type %s cannot be created.') % (module.name,))
+        operation['properties'] = operation['properties'] or {}
+        serverctrls = [PostReadControl(True, ['entryUUID', 'modifyTimestamp', 'entryCSN'])]
+        response = {}
+        result = {}
+        new_obj = await obj.create(module.name, operation['dn'], operation, result, module=module, serverctrls=serverctrls, response=response)
+        result.update({
+            'status': 201,
+            'dn': new_obj.dn,
+            'uuid': _get_post_read_entry_uuid(response),
+        })
+        return result
+
+    async def execute_modify(self, obj, module, operation):
+        if not operation['dn']:
+            obj.raise_sanitization_error('dn', _('The DN of the object is required.'))
+        udm_obj = await self.pool_submit(obj.open_existing_object, module, operation['dn'])
+
+        # like PATCH: keep everything which is not given
+        entry = Object.get_representation(module, udm_obj, ['*'], self.ldap_write_connection, False)
+        for key in ('options', 'policies', 'position', 'superordinate'):
+            if operation[key] is None:
+                operation[key] = entry.get(key)
+        operation['properties'] = operation['properties'] or {}
+
+        serverctrls = [PostReadControl(True, ['entryUUID', 'modifyTimestamp', 'entryCSN'])]
+        response = {}
+        result = {}
+        udm_obj = await obj.modify(module, udm_obj, operation, result, serverctrls=serverctrls, response=response)
+        result.update({
+            'status': 200,
+            'dn': udm_obj.dn,
+            'uuid': _get_post_read_entry_uuid(response),
+        })
+        return result
+
+    async def execute_remove(self, obj, module, operation):
+        if not operation['dn']:
+            obj.raise_sanitization_error('dn', _('The DN of the object is required.'))
+        udm_obj = await self.pool_submit(obj.open_existing_object, module, operation['dn'])
+
+        def remove():
+            try:
+                log.info('Removing LDAP object %s', udm_obj.dn)
+                udm_obj.remove(remove_childs=operation['recursive'])
+                if operation['cleanup']:
+                    udm_objects.performCleanup(udm_obj)
+            except udm_errors.base as exc:
+                UDM_Error(exc).reraise()
+        await self.pool_submit(remove)
+        return {'status': 204, 'dn': udm_obj.dn}
+
+
 class UserPhoto(ConditionalResource, Resource):
     """Get a (cacheable) user profile picture in JPEG format"""
 
@@ -2568,7 +2848,7 @@ class ObjectEdit(FormBase, Resource):
         result = {}
         module.load(force_reload=True)  # reload for instant extended attributes
 
-        obj = await self.pool_submit(module.get, dn)
+        obj = await self.pool_submit(self.open_object, module, dn)
         if not obj:
             raise NotFound(object_type, dn)
 
@@ -3147,6 +3427,7 @@ class Application(tornado.web.Application):
             ("/udm/license/check", LicenseCheck),
             ("/udm/license/request", LicenseRequest),
             ("/udm/ldap/base/", LdapBase),
+            ("/udm/batch", Batch),
             (f"/udm/object/{dn}", ObjectLink),
             ("/udm/object/([a-z0-9]{8}-[a-z0-9]{4}-[a-z0-9]{4}-[a-z0-9]{4}-[a-z0-9]{12})", ObjectByUiid),
             ("/udm/directory/", Directory),
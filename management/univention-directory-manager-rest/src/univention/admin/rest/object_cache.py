@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Short-lived cache of opened UDM objects.
+
+Loading a page of the UI fetches the same object through several resources
+(the object itself, its edit form, its policies), each of which opened the
+object again. A copy of each opened object is kept here for some seconds,
+keyed by the bind DN of the connection, the module and the DN. Before an
+entry is used its `entryCSN` is compared with the one in LDAP by a cheap
+base scope read, so changes of the object are never hidden. On a hit the
+object is copied from the cached state, neither read nor opened again.
+Properties which :py:meth:`open` resolves from other objects may therefore
+be up to `ttl` seconds old.
+
+Conditional requests don't need the object at all: :py:func:`entity_tag_of`
+computes the entity tag from the operational attributes only.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from univention.admin.rest.http_conditional import entity_tag
+from univention.config_registry import ucr
+
+
+def entity_tag_of(ldap_connection, object_type: str, dn: str) -> tuple[str, str] | None:
+    """
+    Return the entity tag of an object without opening it.
+
+    :param ldap_connection: The connection used to read the object.
+    :param object_type: The UDM module name.
+    :param dn: The DN of the object.
+    :returns: The entity tag and the `modifyTimestamp` or `None` if the object
+        cannot be read or is not known to be of `object_type`; then the
+        object must be opened to check it.
+    """
+    attrs = ldap_connection.get(dn, attr=['entryCSN', 'entryUUID', 'modifyTimestamp', 'univentionObjectType'])
+    if not attrs.get('entryCSN') or not attrs.get('modifyTimestamp'):
+        return None
+    if object_type.encode('UTF-8') not in attrs.get('univentionObjectType', []):
+        return None
+    entry_uuid = attrs['entryUUID'][0].decode('ASCII') if attrs.get('entryUUID') else None
+    return entity_tag(dn, object_type, attrs['entryCSN'], entry_uuid), attrs['modifyTimestamp'][0].decode('utf-8', 'replace')
+
+
+def _copy_object(obj, ldap_connection):
+    """Copy the state of an opened object, the copy and its references use the given connection."""
+    memo = {id(obj.lo): ldap_connection}
+    # the module mapping is shared by all objects
+    if getattr(obj, 'mapping', None) is not None:
+        memo[id(obj.mapping)] = obj.mapping
+    return copy.deepcopy(obj, memo)
+
+
+class CachedObject(NamedTuple):
+    obj: Any
+    entry_csn: list[bytes]
+    expires: float
+
+    def copy_object(self, ldap_connection):
+        """Return a copy of the opened object, which the request may modify."""
+        return _copy_object(self.obj, ldap_connection)
+
+
+class ObjectCache:
+    """
+    Bounded, time based cache of opened UDM objects.
+
+    :param ttl: Seconds an object is kept at most. 0 disables the cache.
+    :param maxsize: Number of objects kept in this process.
+    """
+
+    def __init__(self, ttl: int = 10, maxsize: int = 1000) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._objects: OrderedDict[tuple[str, str, str], CachedObject] = OrderedDict()
+
+    @staticmethod
+    def _key(ldap_connection, object_type: str, dn: str) -> tuple[str, str, str]:
+        return (ldap_connection.binddn or '', object_type, dn.lower())
+
+    def get(self, ldap_connection, object_type: str, dn: str):
+        """
+        Return a copy of the cached object if it was not modified meanwhile.
+
+        :param ldap_connection: The connection used to read the object.
+        :param object_type: The UDM module name.
+        :param dn: The DN of the object.
+        :returns: The opened object or `None`.
+        """
+        if not self.ttl:
+            return None
+        key = self._key(ldap_connection, object_type, dn)
+        with self._lock:
+            cached = self._objects.get(key)
+        if cached is None:
+            return None
+        if cached.expires > time.monotonic():
+            current = ldap_connection.get(dn, attr=['entryCSN']).get('entryCSN')
+            if current and current == cached.entry_csn:
+                with self._lock:
+                    if key in self._objects:
+                        self._objects.move_to_end(key)
+                return cached.copy_object(ldap_connection)
+        with self._lock:
+            self._objects.pop(key, None)
+        return None
+
+    def set(self, ldap_connection, object_type: str, obj) -> None:
+        """
+        Remember a copy of an opened object.
+
+        :param ldap_connection: The connection used to read the object.
+        :param object_type: The UDM module name.
+        :param obj: The opened UDM object.
+        """
+        entry_csn = obj.oldattr.get('entryCSN')
+        if not self.ttl or not entry_csn:
+            return
+        key = self._key(ldap_connection, object_type, obj.dn)
+        try:
+            cached = CachedObject(_copy_object(obj, obj.lo), list(entry_csn), time.monotonic() + self.ttl)
+        except (TypeError, copy.Error):
+            return  # the state of some objects cannot be copied, they are always opened
+        with self._lock:
+            self._objects[key] = cached
+            self._objects.move_to_end(key)
+            while len(self._objects) > self.maxsize:
+                self._objects.popitem(last=False)
+
+
+object_cache = ObjectCache(
+    ucr.get_int('directory/manager/rest/object-cache/ttl', 10),
+    ucr.get_int('directory/manager/rest/object-cache/size', 1000),
+)
@@ -165,6 +165,7 @@ class RelationsBase:
             'object-type': 'the object type belonging to the current selected resource',
             'children-types': 'list of object types which can be created underneath of the container or superordinate',
             'properties': 'properties of the given object type',
+            'batch': 'create, modify and remove many objects with one request (NDJSON)',
             'layout': 'layout information for the given object type',
             'tree': 'list of tree content for providing a hierarchical navigation',
             'policy-result': 'policy result by virtual policy object containing the values that the given object or container inherits',
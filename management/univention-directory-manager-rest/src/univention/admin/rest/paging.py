@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+"""
+Search result snapshots for paging across processes.
+
+LDAP paged results cookies are bound to the LDAP connection of the process
+which started the search. Instead the DNs of the (sorted) search result are
+stored in a SQLite database shared by all processes, keyed by an opaque
+random token. Any process can then serve page N of the result by reading
+just the DNs of that page.
+
+The first page is answered directly from a paged search. The process which
+started the search then continues it in the background and appends the DNs
+of the further pages to the snapshot in batches of :py:data:`BATCH_SIZE`,
+until the snapshot is complete. A request for a page which is not filled
+yet waits for it. Snapshots expire after
+`directory/manager/rest/search/snapshot-ttl` seconds without use and are
+removed when the next snapshot is created.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from univention.config_registry import ucr
+
+
+# number of DNs searched at once while filling a snapshot
+BATCH_SIZE = 1000
+# seconds after which an incomplete snapshot which was not extended is abandoned
+STALLED = 60
+
+SCHEMA_VERSION = 2
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS snapshots (token TEXT PRIMARY KEY NOT NULL, owner TEXT NOT NULL, query TEXT NOT NULL, total INTEGER NOT NULL, complete INTEGER NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS entries (token TEXT NOT NULL, idx INTEGER NOT NULL, dn TEXT NOT NULL, PRIMARY KEY (token, idx)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS snapshots_expires ON snapshots (expires)',
+)
+
+
+class SearchSnapshots:
+    """
+    Store of search result snapshots.
+
+    :param filename: Path of the SQLite database.
+    :param ttl: Seconds a snapshot is kept after it was used the last time.
+    """
+
+    def __init__(self, filename: str, ttl: int) -> None:
+        self.filename = filename
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections must not be inherited by forked processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.filename), mode=0o700, exist_ok=True)
+            conn = sqlite3.connect(self.filename, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            with conn:
+                if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                    # the snapshots are short-lived, so those of older versions are just dropped
+                    conn.execute('DROP TABLE IF EXISTS entries')
+                    conn.execute('DROP TABLE IF EXISTS snapshots')
+                    conn.execute('PRAGMA user_version = %d' % (SCHEMA_VERSION,))
+                for statement in SCHEMA:
+                    conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _query(query: tuple) -> str:
+        return json.dumps(query)
+
+    def create(self, owner: str, query: tuple, dns: list[str], complete: bool = True) -> str:
+        """
+        Store the result of a search.
+
+        :param owner: DN of the user who searched; other users cannot use the snapshot.
+        :param query: All search parameters which influence the result.
+        :param dns: The DNs of the result in their order.
+        :param complete: `False` if further DNs are added by :py:meth:`extend`.
+        :returns: The token of the new snapshot.
+        """
+        token = secrets.token_urlsafe(24)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM entries WHERE token IN (SELECT token FROM snapshots WHERE expires < ?)', (now,))
+                conn.execute('DELETE FROM snapshots WHERE expires < ?', (now,))
+                conn.execute('INSERT INTO snapshots (token, owner, query, total, complete, updated, expires) VALUES (?, ?, ?, ?, ?, ?, ?)', (token, owner, self._query(query), len(dns), complete, now, now + self.ttl))
+                conn.executemany('INSERT INTO entries (token, idx, dn) VALUES (?, ?, ?)', ((token, idx, dn) for idx, dn in enumerate(dns)))
+        return token
+
+    def extend(self, token: str, dns: list[str], complete: bool) -> bool:
+        """
+        Append the next DNs to an incomplete snapshot.
+
+        :param token: The token returned by :py:meth:`create`.
+        :param dns: The next DNs of the result in their order.
+        :param complete: Whether these are the last DNs of the result.
+        :returns: `False` if the snapshot does not exist anymore, so the search can be stopped.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute('SELECT total FROM snapshots WHERE token = ? AND NOT complete AND expires >= ?', (token, now)).fetchone()
+                if row is None:
+                    return False
+                total, = row
+                conn.executemany('INSERT INTO entries (token, idx, dn) VALUES (?, ?, ?)', ((token, idx, dn) for idx, dn in enumerate(dns, total)))
+                conn.execute('UPDATE snapshots SET total = ?, complete = ?, updated = ?, expires = ? WHERE token = ?', (total + len(dns), complete, now, now + self.ttl, token))
+        return True
+
+    def discard(self, token: str) -> None:
+        """Remove a snapshot, e.g. if it cannot be completed."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM entries WHERE token = ?', (token,))
+                conn.execute('DELETE FROM snapshots WHERE token = ?', (token,))
+
+    def get(self, token: str, owner: str, query: tuple, offset: int, limit: int) -> tuple[list[str], int, bool] | None:
+        """
+        Return one page of a snapshot and extend its lifetime.
+
+        :param token: The token returned by :py:meth:`create`.
+        :param owner: DN of the user who searches.
+        :param query: All search parameters; must be the same as for :py:meth:`create`.
+        :param offset: Index of the first entry of the page.
+        :param limit: Size of the page.
+        :returns: The DNs of the page, the number of DNs stored so far and
+                whether the snapshot is complete, or `None` if the snapshot
+                does not exist (anymore), does not match or is not filled
+                anymore. The page may be incomplete if the snapshot is.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute('SELECT total, complete, updated FROM snapshots WHERE token = ? AND owner = ? AND query = ? AND expires >= ?', (token, owner, self._query(query), now)).fetchone()
+                if row is None:
+                    return None
+                total, complete, updated = row
+                if not complete and updated < now - STALLED:
+                    return None
+                conn.execute('UPDATE snapshots SET expires = ? WHERE token = ?', (now + self.ttl, token))
+                dns = [dn for dn, in conn.execute('SELECT dn FROM entries WHERE token = ? AND idx >= ? AND idx < ? ORDER BY idx', (token, offset, offset + limit))]
+        return dns, total, bool(complete)
+
+
+search_snapshots = SearchSnapshots(
+    ucr.get('directory/manager/rest/search/snapshot-file', '/run/univention-directory-manager-rest/search-snapshots.sqlite'),
+    ucr.get_int('directory/manager/rest/search/snapshot-ttl', 600),
+)
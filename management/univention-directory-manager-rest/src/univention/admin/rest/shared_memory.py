@@ -31,43 +31,23 @@
 # <https://www.gnu.org/licenses/>.
 
 import json
-from multiprocessing import managers
 
-from setproctitle import getproctitle, setproctitle
+from univention.management.console.shared_store import SharedDict, SharedList, SharedMemory
 
 
-proctitle = getproctitle()
+class _SharedMemory(SharedMemory):
 
+    shared_dicts = ('children', 'queue', 'authenticated')
 
-class _SharedMemory(managers.SyncManager):
 
-    children = {}
-    queue = {}
-    search_sessions = {}
-    authenticated = {}
-
-    def start(self, *args, **kwargs):
-        setproctitle(proctitle + '   # multiprocessing manager')
-        try:
-            super().start(*args, **kwargs)
-        finally:
-            setproctitle(proctitle)
-
-        # we must create the parent dictionary instance before forking but after Python importing
-        self.children = self.dict()
-        self.queue = self.dict()
-        self.search_sessions = self.dict()
-        self.authenticated = self.dict()
-
-
-shared_memory = _SharedMemory()
+shared_memory = _SharedMemory('/run/univention-directory-manager-rest', 'shared-memory')
 
 
 class JsonEncoder(json.JSONEncoder):
 
     def default(self, o):
-        if isinstance(o, managers.DictProxy):
+        if isinstance(o, SharedDict):
             return dict(o)
-        if isinstance(o, managers.ListProxy):
+        if isinstance(o, SharedList):
             return list(o)
         raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import asyncio
+
+import pytest
+
+from univention.admin.rest.batch import BatchScheduler, Scope
+
+
+BASE = 'dc=example,dc=com'
+USERS = 'cn=users,%s' % (BASE,)
+USER = 'uid=user,%s' % (USERS,)
+
+
+def create(position=USERS, **kwargs):
+    return dict({'action': 'create', 'object_type': 'users/user', 'position': position}, **kwargs)
+
+
+def modify(dn=USER, **kwargs):
+    return dict({'action': 'modify', 'object_type': 'users/user', 'dn': dn}, **kwargs)
+
+
+def remove(dn=USER):
+    return {'action': 'remove', 'object_type': 'users/user', 'dn': dn}
+
+
+@pytest.mark.parametrize('first,second,conflicts', [
+    (modify(), modify(), True),
+    (modify(), modify(USER.upper()), True),
+    (modify(), modify('uid=other,%s' % (USERS,)), False),
+    (modify(), remove(), True),
+    (remove(USERS), modify(), True),
+    (remove('cn=groups,%s' % (BASE,)), modify(), False),
+    (create(), create(), False),
+    (create(), modify(), True),
+    (create(), modify('uid=user,cn=sub,%s' % (USERS,)), False),
+    (create(), remove(USERS), True),
+    (create(), remove(BASE), True),
+    (create(dn=USER), modify(), True),
+    (create(dn=USER), modify('uid=other,%s' % (USERS,)), False),
+    (create(position=None, superordinate='cn=example.com,cn=dns,%s' % (BASE,)), modify('relativeDomainName=www,cn=example.com,cn=dns,%s' % (BASE,)), True),
+    (modify(position='cn=people,%s' % (BASE,)), modify('uid=user,cn=people,%s' % (BASE,)), True),
+    (modify(position='cn=people,%s' % (BASE,)), remove('cn=people,%s' % (BASE,)), True),
+    (create(position=None), modify('uid=other,cn=people,%s' % (BASE,)), True),
+    (modify('invalid'), modify('uid=other,cn=people,%s' % (BASE,)), True),
+    ('invalid', modify(), False),
+])
+def test_scope_conflicts(first, second, conflicts):
+    first, second = Scope.of(first), Scope.of(second)
+    assert first.conflicts(second) is conflicts
+    assert second.conflicts(first) is conflicts
+
+
+class Recorder:
+    """Execute operations which finish when they are released."""
+
+    def __init__(self):
+        self.started = []
+        self.finished = []
+        self.running = 0
+        self.max_running = 0
+        self._release = {}
+
+    async def execute(self, index, operation):
+        self.started.append(index)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        event = self._release.setdefault(index, asyncio.Event())
+        await event.wait()
+        self.running -= 1
+        self.finished.append(index)
+
+    def release(self, index):
+        self._release.setdefault(index, asyncio.Event()).set()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_scheduler_concurrent():
+    async def main():
+        recorder = Recorder()
+        scheduler = BatchScheduler(recorder.execute, 4)
+        for i in range(3):
+            await scheduler.add(modify('uid=user%d,%s' % (i, USERS)), Scope.of(modify('uid=user%d,%s' % (i, USERS))))
+        await asyncio.sleep(0)
+        assert sorted(recorder.started) == [0, 1, 2]
+        for i in (2, 0, 1):
+            recorder.release(i)
+        await scheduler.join()
+        assert recorder.finished == [2, 0, 1]
+    run(main())
+
+
+def test_scheduler_same_object_in_order():
+    async def main():
+        recorder = Recorder()
+        scheduler = BatchScheduler(recorder.execute, 4)
+        operations = [modify(), modify('uid=other,%s' % (USERS,)), remove(), modify()]
+        for operation in operations:
+            await scheduler.add(operation, Scope.of(operation))
+        await asyncio.sleep(0)
+        assert recorder.started == [0, 1]
+        recorder.release(1)
+        recorder.release(0)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert recorder.started == [0, 1, 2]
+        recorder.release(3)
+        recorder.release(2)
+        await scheduler.join()
+        assert recorder.finished == [1, 0, 2, 3]
+    run(main())
+
+
+def test_scheduler_waiting_blocks_later():
+    # the remove of the container waits for the modify of the user, the create in the container must not overtake it
+    async def main():
+        recorder = Recorder()
+        scheduler = BatchScheduler(recorder.execute, 4)
+        operations = [modify(), remove(USERS), create()]
+        for operation in operations:
+            await scheduler.add(operation, Scope.of(operation))
+        await asyncio.sleep(0)
+        assert recorder.started == [0]
+        recorder.release(0)
+        recorder.release(1)
+        recorder.release(2)
+        await scheduler.join()
+        assert recorder.finished == [0, 1, 2]
+    run(main())
+
+
+def test_scheduler_workers():
+    async def main():
+        recorder = Recorder()
+        scheduler = BatchScheduler(recorder.execute, 2)
+        for i in range(6):
+            await scheduler.add(i, Scope())
+        await asyncio.sleep(0)
+        assert recorder.started == [0, 1]
+        for i in range(6):
+            recorder.release(i)
+        await scheduler.join()
+        assert sorted(recorder.finished) == list(range(6))
+        assert recorder.max_running == 2
+    run(main())
+
+
+def test_scheduler_lookahead():
+    async def main():
+        recorder = Recorder()
+        scheduler = BatchScheduler(recorder.execute, 1, lookahead=2)
+        added = []
+
+        async def produce():
+            for i in range(5):
+                await scheduler.add(i, Scope())
+                added.append(i)
+
+        producer = asyncio.ensure_future(produce())
+        await asyncio.sleep(0.01)
+        # one running and two waiting operations
+        assert added == [0, 1, 2]
+        for i in range(5):
+            recorder.release(i)
+        await producer
+        await scheduler.join()
+        assert recorder.finished == list(range(5))
+    run(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import asyncio
+import json
+
+import tornado.testing
+import tornado.web
+
+from univention.admin.rest.module import Batch
+
+
+USER = 'uid=user%d,cn=users,dc=example,dc=com'
+
+
+class FakeBatch(Batch):
+    """Batch resource which records the operations instead of executing them."""
+
+    requires_authentication = False
+    executed = []
+
+    async def execute(self, index, operation, modules):
+        self.executed.append(index)
+        await asyncio.sleep(0.01)
+        return {'index': index, 'status': 200, 'dn': operation['dn']}
+
+
+class TestBatch(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([('/udm/batch', FakeBatch)])
+
+    def setUp(self):
+        super().setUp()
+        FakeBatch.executed = []
+
+    def post(self, body_producer, content_type='application/x-ndjson'):
+        return self.http_client.fetch(self.get_url('/udm/batch'), method='POST', body_producer=body_producer, headers={'Content-Type': content_type, 'Accept': 'application/x-ndjson'}, raise_error=False)
+
+    @tornado.testing.gen_test
+    async def test_operations_start_while_receiving(self):
+        async def body_producer(write):
+            # the line is split across chunks
+            await write(json.dumps({'action': 'modify', 'dn': USER % (0,)}).encode('UTF-8')[:10])
+            await write(json.dumps({'action': 'modify', 'dn': USER % (0,)}).encode('UTF-8')[10:] + b'\n')
+            while not FakeBatch.executed:
+                await asyncio.sleep(0.01)
+            await write(b'\n' + json.dumps({'action': 'modify', 'dn': USER % (1,)}).encode('UTF-8'))
+
+        response = await self.post(body_producer)
+        assert response.code == 200
+        assert response.headers['Content-Type'] == 'application/x-ndjson'
+        results = [json.loads(line) for line in response.body.splitlines()]
+        assert sorted(result['index'] for result in results) == [0, 1]
+        assert {result['dn'] for result in results} == {USER % (0,), USER % (1,)}
+
+    @tornado.testing.gen_test
+    async def test_same_object_in_order(self):
+        operations = [{'action': 'modify', 'dn': USER % (i % 2,)} for i in range(6)]
+
+        async def body_producer(write):
+            await write(b''.join(json.dumps(operation).encode('UTF-8') + b'\n' for operation in operations))
+
+        response = await self.post(body_producer)
+        assert response.code == 200
+        results = [json.loads(line) for line in response.body.splitlines()]
+        for dn in (USER % (0,), USER % (1,)):
+            assert [result['index'] for result in results if result['dn'] == dn] == [i for i, operation in enumerate(operations) if operation['dn'] == dn]
+
+    @tornado.testing.gen_test
+    async def test_unsupported_media_type(self):
+        async def body_producer(write):
+            await write(b'{}')
+
+        response = await self.post(body_producer, 'application/json')
+        assert response.code == 415
+        assert not FakeBatch.executed
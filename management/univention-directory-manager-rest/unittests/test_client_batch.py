@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from univention.admin.rest.client import UDM, HTTPError
+
+
+URI = 'http://localhost/univention/udm/'
+BATCH = URI + 'batch'
+
+
+class Response:
+    """Fake streamed response of the batch resource."""
+
+    def __init__(self, lines, status_code=200):
+        self.lines = lines
+        self.status_code = status_code
+        self.request = SimpleNamespace(method='POST')
+        self.url = BATCH
+        self.headers = {'Content-Type': 'application/json'}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def iter_lines(self):
+        yield from self.lines
+
+    def json(self):
+        return {'error': {'message': 'Unsupported Media Type'}}
+
+
+@pytest.fixture()
+def udm():
+    udm = UDM.http(URI, 'Administrator', 'univention')
+    udm.entry = {'_links': {'udm:batch': [{'href': BATCH}]}}
+    return udm
+
+
+def test_batch_streams_operations(udm, mocker):
+    sent = []
+
+    def post(uri, data, headers, stream):
+        assert uri == BATCH
+        assert stream
+        assert headers['Content-Type'] == 'application/x-ndjson'
+        assert headers['Accept'] == 'application/x-ndjson'
+        sent.extend(data)
+        return Response([b'{"index": 1, "status": 204}', b'', b'{"index": 0, "status": 200, "id": "a"}'])
+
+    mocker.patch.object(udm.client.session, 'post', side_effect=post)
+    operations = [
+        {'action': 'modify', 'object_type': 'users/user', 'dn': 'uid=a,dc=base', 'id': 'a'},
+        {'action': 'remove', 'object_type': 'users/user', 'dn': 'uid=b,dc=base'},
+    ]
+    results = list(udm.batch(iter(operations)))
+    assert results == [{'index': 1, 'status': 204}, {'index': 0, 'status': 200, 'id': 'a'}]
+    assert [json.loads(line) for line in sent] == operations
+    assert all(line.endswith(b'\n') for line in sent)
+
+
+def test_batch_error(udm, mocker):
+    mocker.patch.object(udm.client.session, 'post', return_value=Response([], status_code=415))
+    with pytest.raises(HTTPError) as exc:
+        list(udm.batch([{'action': 'remove', 'object_type': 'users/user', 'dn': 'uid=b,dc=base'}]))
+    assert exc.value.code == 415
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+from types import SimpleNamespace
+
+import pytest
+from tornado.web import Finish
+
+from univention.admin.rest.http_conditional import ConditionalResource, entity_tag
+from univention.admin.rest.object_cache import ObjectCache, entity_tag_of
+
+
+DN = 'uid=user,cn=users,dc=example,dc=com'
+MODULE = 'users/user'
+
+
+class Connection:
+    """Fake LDAP connection holding a single object."""
+
+    binddn = 'uid=Administrator,cn=users,dc=example,dc=com'
+
+    def __init__(self):
+        self.attrs = {
+            'uid': [b'user'],
+            'entryCSN': [b'20240101000000.000000Z#000000#000#000000'],
+            'entryUUID': [b'4f1b6c3e-0000-0000-0000-000000000000'],
+            'modifyTimestamp': [b'20240101000000Z'],
+            'univentionObjectType': [MODULE.encode('UTF-8')],
+        }
+        self.reads = []
+
+    def modify(self):
+        self.attrs['entryCSN'] = [b'20240102000000.000000Z#000000#000#000000']
+        self.attrs['modifyTimestamp'] = [b'20240102000000Z']
+
+    def get(self, dn, attr=[]):
+        self.reads.append(attr)
+        if dn.lower() != DN:
+            return {}
+        return {key: list(values) for key, values in self.attrs.items() if not attr or key in attr}
+
+    def open(self):
+        return SimpleNamespace(dn=DN, module=MODULE, lo=self, oldattr=self.get(DN), info={'username': 'user'}, entry_uuid=self.attrs['entryUUID'][0].decode('ASCII'))
+
+
+class Handler(ConditionalResource):
+    """Minimal request handler answering conditional requests."""
+
+    def __init__(self, **headers):
+        self.request = SimpleNamespace(method='GET', headers=headers)
+        self._headers = {}
+        self.status = 200
+
+    def set_header(self, name, value):
+        self._headers[name] = value
+
+    def set_status(self, status):
+        self.status = status
+
+
+@pytest.fixture()
+def connection():
+    return Connection()
+
+
+@pytest.fixture()
+def cache():
+    return ObjectCache(ttl=10, maxsize=2)
+
+
+def test_cache_hit(cache, connection):
+    obj = connection.open()
+    cache.set(connection, MODULE, obj)
+    obj.info['username'] = 'modified'
+    reads = len(connection.reads)
+    cached = cache.get(connection, MODULE, DN.upper())
+    assert cached is not obj
+    assert cached.lo is connection
+    assert cached.oldattr == obj.oldattr
+    assert cached.info == {'username': 'user'}
+    # the object is neither read nor opened again
+    assert connection.reads[reads:] == [['entryCSN']]
+    cached.info['username'] = 'modified'
+    cached.oldattr['uid'].append(b'modified')
+    cached = cache.get(connection, MODULE, DN)
+    assert cached.info == {'username': 'user'}
+    assert cached.oldattr['uid'] == [b'user']
+
+
+def test_cache_hit_other_connection(cache, connection):
+    cache.set(connection, MODULE, connection.open())
+    other = Connection()
+    assert cache.get(other, MODULE, DN).lo is other
+
+
+def test_cache_invalidated_by_modify(cache, connection):
+    cache.set(connection, MODULE, connection.open())
+    connection.modify()
+    assert cache.get(connection, MODULE, DN) is None
+    assert not cache._objects
+
+
+def test_cache_expired(cache, connection, mocker):
+    monotonic = mocker.patch('univention.admin.rest.object_cache.time.monotonic', return_value=100.0)
+    cache.set(connection, MODULE, connection.open())
+    monotonic.return_value = 111.0
+    assert cache.get(connection, MODULE, DN) is None
+
+
+def test_cache_keys(cache, connection):
+    cache.set(connection, MODULE, connection.open())
+    assert cache.get(connection, 'users/ldap', DN) is None
+    other = Connection()
+    other.binddn = 'uid=other,cn=users,dc=example,dc=com'
+    assert cache.get(other, MODULE, DN) is None
+
+
+def test_cache_disabled(connection):
+    cache = ObjectCache(ttl=0)
+    cache.set(connection, MODULE, connection.open())
+    assert cache.get(connection, MODULE, DN) is None
+
+
+def test_entity_tag_of(connection):
+    obj = connection.open()
+    etag, modify_timestamp = entity_tag_of(connection, MODULE, DN)
+    assert etag == entity_tag(obj.dn, obj.module, obj.oldattr['entryCSN'], obj.entry_uuid)
+    assert modify_timestamp == '20240101000000Z'
+    assert connection.reads[-1] == ['entryCSN', 'entryUUID', 'modifyTimestamp', 'univentionObjectType']
+    assert entity_tag_of(connection, MODULE, 'uid=missing,%s' % (DN,)) is None
+
+
+def test_entity_tag_of_other_type(connection):
+    # the object must be opened to answer with 404 Not Found instead of 304 Not Modified
+    assert entity_tag_of(connection, 'groups/group', DN) is None
+    del connection.attrs['univentionObjectType']
+    assert entity_tag_of(connection, MODULE, DN) is None
+
+
+def test_not_modified(connection):
+    etag, modify_timestamp = entity_tag_of(connection, MODULE, DN)
+    handler = Handler(**{'If-None-Match': etag})
+    with pytest.raises(Finish):
+        handler.check_unopened_entity_tags(etag, modify_timestamp)
+    assert handler.status == 304
+
+
+def test_not_modified_since(connection):
+    etag, modify_timestamp = entity_tag_of(connection, MODULE, DN)
+    handler = Handler(**{'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    with pytest.raises(Finish):
+        handler.check_unopened_entity_tags(etag, modify_timestamp)
+    assert handler.status == 304
+
+
+def test_modified(connection):
+    etag, _modify_timestamp = entity_tag_of(connection, MODULE, DN)
+    connection.modify()
+    new_etag, modify_timestamp = entity_tag_of(connection, MODULE, DN)
+    assert new_etag != etag
+    handler = Handler(**{'If-None-Match': etag, 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    handler.check_unopened_entity_tags(new_etag, modify_timestamp)
+    assert handler.status == 200
+    assert handler._headers['Etag'] == new_etag
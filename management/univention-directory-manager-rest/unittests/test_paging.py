@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from univention.admin.rest.paging import STALLED, SearchSnapshots
+
+
+OWNER = 'uid=Administrator,cn=users,dc=example,dc=com'
+QUERY = ('users/user', None, None, None, 'sub', False, 'uid', False)
+DNS = ['uid=user%d,cn=users,dc=example,dc=com' % (i,) for i in range(25)]
+
+
+@pytest.fixture()
+def snapshots(tmp_path):
+    return SearchSnapshots(str(tmp_path / 'search-snapshots.sqlite'), 600)
+
+
+def test_first_page(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS)
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) == (DNS[:10], 25, True)
+
+
+def test_next_page(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS)
+    assert snapshots.get(token, OWNER, QUERY, 10, 10) == (DNS[10:20], 25, True)
+    assert snapshots.get(token, OWNER, QUERY, 20, 10) == (DNS[20:], 25, True)
+    assert snapshots.get(token, OWNER, QUERY, 30, 10) == ([], 25, True)
+
+
+def test_other_process(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS)
+    other = SearchSnapshots(snapshots.filename, snapshots.ttl)
+    assert other.get(token, OWNER, QUERY, 10, 5) == (DNS[10:15], 25, True)
+
+
+def test_mismatch(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS)
+    assert snapshots.get('invalid', OWNER, QUERY, 0, 10) is None
+    assert snapshots.get(token, 'uid=other,cn=users,dc=example,dc=com', QUERY, 0, 10) is None
+    assert snapshots.get(token, OWNER, QUERY[:-1] + (True,), 0, 10) is None
+
+
+def test_expired(snapshots, mocker):
+    time = mocker.patch('univention.admin.rest.paging.time.time', return_value=1000.0)
+    token = snapshots.create(OWNER, QUERY, DNS)
+    time.return_value = 1500.0
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) == (DNS[:10], 25, True)
+    # using the snapshot extends its lifetime
+    time.return_value = 2000.0
+    assert snapshots.get(token, OWNER, QUERY, 10, 10) == (DNS[10:20], 25, True)
+    time.return_value = 2601.0
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) is None
+
+
+def test_expired_removed(snapshots, mocker):
+    time = mocker.patch('univention.admin.rest.paging.time.time', return_value=1000.0)
+    expired = snapshots.create(OWNER, QUERY, DNS)
+    time.return_value = 2000.0
+    snapshots.create(OWNER, QUERY, DNS[:1])
+    conn = snapshots._connect()
+    assert conn.execute('SELECT COUNT(*) FROM snapshots WHERE token = ?', (expired,)).fetchone() == (0,)
+    assert conn.execute('SELECT COUNT(*) FROM entries WHERE token = ?', (expired,)).fetchone() == (0,)
+
+
+def test_extend(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS[:10], complete=False)
+    assert snapshots.get(token, OWNER, QUERY, 10, 10) == ([], 10, False)
+    assert snapshots.extend(token, DNS[10:20], complete=False)
+    assert snapshots.get(token, OWNER, QUERY, 10, 10) == (DNS[10:20], 20, False)
+    assert snapshots.extend(token, DNS[20:], complete=True)
+    assert snapshots.get(token, OWNER, QUERY, 20, 10) == (DNS[20:], 25, True)
+    # a complete snapshot is not extended anymore
+    assert not snapshots.extend(token, DNS, complete=True)
+    assert snapshots.get(token, OWNER, QUERY, 0, 100) == (DNS, 25, True)
+
+
+def test_extend_missing(snapshots):
+    assert not snapshots.extend('invalid', DNS, complete=True)
+
+
+def test_discard(snapshots):
+    token = snapshots.create(OWNER, QUERY, DNS[:10], complete=False)
+    snapshots.discard(token)
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) is None
+    assert not snapshots.extend(token, DNS[10:], complete=True)
+
+
+def test_stalled(snapshots, mocker):
+    time = mocker.patch('univention.admin.rest.paging.time.time', return_value=1000.0)
+    token = snapshots.create(OWNER, QUERY, DNS[:10], complete=False)
+    time.return_value = 1000.0 + STALLED
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) == (DNS[:10], 10, False)
+    time.return_value = 1001.0 + STALLED
+    assert snapshots.get(token, OWNER, QUERY, 0, 10) is None
+
+
+def test_schema_upgrade(snapshots):
+    conn = snapshots._connect()
+    conn.execute('PRAGMA user_version = 1')
+    conn.execute('INSERT INTO snapshots (token, owner, query, total, complete, updated, expires) VALUES (?, ?, ?, 0, 1, 0, 0)', ('old', OWNER, '[]'))
+    conn.commit()
+    other = SearchSnapshots(snapshots.filename, snapshots.ttl)
+    assert other._connect().execute('SELECT COUNT(*) FROM snapshots').fetchone() == (0,)
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+from ldap.controls import SimplePagedResultsControl
+
+from univention.admin.rest import module
+from univention.admin.rest.module import Objects
+from univention.admin.rest.paging import SearchSnapshots
+
+
+OWNER = 'uid=Administrator,cn=users,dc=example,dc=com'
+DNS = ['uid=user%d,cn=users,dc=example,dc=com' % (i,) for i in range(45)]
+
+
+class Module:
+    """Fake UDM module with a custom lookup, which may support the paged results control."""
+
+    name = 'users/user'
+    module = None
+    supports_pagination = True
+
+    def __init__(self, paged=True):
+        self.paged = paged
+        self.page_sizes = []
+
+    def search(self, container=None, superordinate=None, filter='', scope='sub', hidden=True, serverctrls=None, response=None):
+        if filter and 'entryDN=' in filter:
+            dns = set(re.findall(r'entryDN=([^)]+)', filter))
+            return [SimpleNamespace(dn=dn) for dn in DNS if dn in dns]
+        page_ctrl = next((ctrl for ctrl in serverctrls or [] if isinstance(ctrl, SimplePagedResultsControl)), None)
+        if not self.paged or page_ctrl is None:
+            return [SimpleNamespace(dn=dn) for dn in DNS]
+        self.page_sizes.append(page_ctrl.size)
+        start = int(page_ctrl.cookie or 0)
+        end = start + page_ctrl.size
+        response['ctrls'] = [SimplePagedResultsControl(True, size=page_ctrl.size, cookie=str(end).encode('ASCII') if end < len(DNS) else b'')]
+        return [SimpleNamespace(dn=dn) for dn in DNS[start:end]]
+
+
+@pytest.fixture()
+def snapshots(tmp_path, mocker):
+    snapshots = SearchSnapshots(str(tmp_path / 'search-snapshots.sqlite'), 600)
+    mocker.patch.object(module, 'search_snapshots', snapshots)
+    mocker.patch.object(module, 'BATCH_SIZE', 10)
+    return snapshots
+
+
+@pytest.fixture()
+def resource():
+    resource = Objects.__new__(Objects)
+    resource.request = SimpleNamespace(user_dn=OWNER)
+    return resource
+
+
+def search(resource, udm_module, page, token=None):
+    return asyncio.run(resource.search(udm_module, None, None, None, 'sub', True, 10, page, None, False, False, token))
+
+
+def wait_complete(snapshots, token, udm_module):
+    query = (udm_module.name, None, None, None, 'sub', True, None, False)
+    for _i in range(100):
+        if snapshots.get(token, OWNER, query, 0, 0)[2]:
+            return
+        asyncio.run(asyncio.sleep(0.01))
+    raise AssertionError('snapshot not completed')
+
+
+def test_first_page(snapshots, resource):
+    udm_module = Module()
+    objects, last_page, token = search(resource, udm_module, 1)
+    assert [obj.dn for obj in objects] == DNS[:10]
+    assert last_page == 0
+    # only the first page is searched before answering
+    assert udm_module.page_sizes[0] == 10
+    wait_complete(snapshots, token, udm_module)
+    assert udm_module.page_sizes[1:] == [10, 10, 10, 10]
+
+
+def test_next_pages(snapshots, resource):
+    udm_module = Module()
+    _objects, _last_page, token = search(resource, udm_module, 1)
+    objects, last_page, token2 = search(resource, udm_module, 3, token)
+    assert [obj.dn for obj in objects] == DNS[20:30]
+    assert token2 == token
+    wait_complete(snapshots, token, udm_module)
+    objects, last_page, _token = search(resource, udm_module, 5, token)
+    assert [obj.dn for obj in objects] == DNS[40:]
+    assert last_page == 5
+
+
+def test_later_page_without_token(snapshots, resource):
+    objects, _last_page, token = search(resource, Module(), 4)
+    assert [obj.dn for obj in objects] == DNS[30:40]
+    assert token
+
+
+def test_not_paged(snapshots, resource):
+    objects, last_page, _token = search(resource, Module(paged=False), 1)
+    assert [obj.dn for obj in objects] == DNS[:10]
+    assert last_page == 0
+    objects, last_page, _token = search(resource, Module(paged=False), 5)
+    assert [obj.dn for obj in objects] == DNS[40:]
+    assert last_page == 5
@@ -73,6 +73,7 @@ import traceback
 from fnmatch import fnmatch
 
 import ldap
+import ldap.dn
 from ldap.filter import filter_format
 
 import univention.admin.handlers.computers.domaincontroller_backup as dc_backup
@@ -120,6 +121,62 @@ class Rule(dict):  # noqa: PLW1641
         return self.fromUser == other.fromUser and self.host == other.host and self.command == other.command and self.flavor == other.flavor and self.options == other.options
 
 
+class _RuleIndex:
+    """
+    The rules valid on one host, indexed by their command pattern.
+
+    Rules with an exact command are found by a dictionary lookup, rules
+    with a wildcard command in a trie of their command prefixes.
+    """
+
+    def __init__(self, rules):
+        self.exact = {}
+        self.trie = ({}, [])
+        self.option_keys = set()
+        for rule in rules:
+            if rule.command.endswith('*'):
+                node = self.trie
+                for char in rule.command[:-1]:
+                    node = node[0].setdefault(char, ({}, []))
+                node[1].append(rule)
+            else:
+                self.exact.setdefault(rule.command, []).append(rule)
+            for key in rule.options:
+                self.option_keys.update((key, key[1:]) if key.startswith('!') else (key,))
+        self.option_keys = tuple(sorted(self.option_keys))
+
+    def candidates(self, command):
+        """Yield all rules whose command pattern matches the command."""
+        yield from self.exact.get(command, ())
+        node = self.trie
+        yield from node[1]
+        for char in command:
+            node = node[0].get(char)
+            if node is None:
+                return
+            yield from node[1]
+
+    def options_signature(self, options):
+        """
+        The values of those options which are used by any rule.
+
+        :returns: a hashable representation or `None` if the values can not be represented.
+        """
+        signature = []
+        for key in self.option_keys:
+            if key not in options:
+                continue
+            value = options[key]
+            if isinstance(value, str):
+                value = (value,)
+            elif isinstance(value, list | tuple) and all(isinstance(val, str) for val in value):
+                value = tuple(value)
+            else:
+                return None
+            signature.append((key, value))
+        return tuple(signature)
+
+
 class ACLs:
     """
     Provides methods to determine the access rights of users to
@@ -136,11 +193,16 @@ class ACLs:
     #: list of all supported computer types for ACL rules
     _systemroles = (dc_master, dc_backup, dc_slave, memberserver)
 
+    #: number of decisions memoized per host
+    MEMO_SIZE = 4096
+
     def __init__(self, ldap_base=None, acls=None):
         self.__ldap_base = ldap_base
         self.acls = []
         if acls:
             self.acls = [Rule(x) for x in acls]
+        self._compiled = {}
+        self._compiled_for = None
 
     def reload(self):
         self.acls = []
@@ -290,12 +352,36 @@ class ACLs:
         if not hostname:
             hostname = ucr['hostname']
 
-        # first check the group rules. If the group policy allows the
-        # command there is no need to check the user policy
-        user_rules = [x for x in self.acls if x.fromUser]
-        group_rules = [x for x in self.acls if not x.fromUser]
+        index, memo = self._compile(hostname)
+        signature = index.options_signature(options)
+        if signature is None:
+            return self._is_allowed(index.candidates(command), command, None, options, flavor)
 
-        return self._is_allowed(user_rules + group_rules, command, hostname, options, flavor)
+        key = (command, flavor, signature)
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        if len(memo) >= self.MEMO_SIZE:
+            memo.clear()
+        allowed = memo[key] = self._is_allowed(index.candidates(command), command, None, options, flavor)
+        return allowed
+
+    def _compile(self, hostname):
+        """
+        Return the index of the rules valid on the host and the memoized decisions.
+
+        Both are rebuilt whenever the ACLs were reloaded or extended.
+        """
+        if self._compiled_for is None or self._compiled_for[0] is not self.acls or self._compiled_for[1] != len(self.acls):
+            self._compiled = {}
+            self._compiled_for = (self.acls, len(self.acls))
+        try:
+            return self._compiled[hostname]
+        except KeyError:
+            rules = [rule for rule in self.acls if not hostname or rule.host in ('*', hostname)]
+            compiled = self._compiled[hostname] = (_RuleIndex(rules), {})
+            return compiled
 
     def _dump(self):
         """Dumps the ACLs for the user"""
@@ -368,17 +454,22 @@ class LDAP_ACLs(ACLs):
             self._read_from_file(self.username)
 
         self._dump()
+        self._compile(ucr['hostname'])
 
-    def _get_policy_for_dn(self, lo, dn):
-        policy = lo.getPolicies(dn, policies=[], attrs={}, result={}, fixedattrs={})
+    #: number of DNs combined into one LDAP filter
+    FILTER_CHUNK_SIZE = 100
 
-        return policy.get('umcPolicy', None)
+    #: directory of the resolved operation sets of each user
+    RESOLVED_DIR = os.path.join(ACLs.CACHE_DIR, 'resolved')
+
+    _OPERATION_SET_ATTRIBUTES = ('umcOperationSetHost', 'umcOperationSetFlavor', 'umcOperationSetCommand')
 
     def _read_from_ldap(self, lo):
         # TODO: check for fixed attributes
         try:
             userdn = lo.searchDn(filter_format('(&(objectClass=person)(uid=%s))', [self.username]), unique=True)[0]
-            policy = self._get_policy_for_dn(lo, userdn)
+            groups = self._get_groups(lo, userdn)
+            operation_sets = self._get_operation_sets(lo, userdn, groups)
         except (udm_errors.base, ldap.LDAPError, IndexError) as exc:
             if not isinstance(exc, IndexError):
                 ACL.warn('Error reading credentials from LDAP for user %s: %s' % (self.username, traceback.format_exc()))
@@ -386,18 +477,8 @@ class LDAP_ACLs(ACLs):
             self._read_from_file(self.username)
             return
 
-        if policy and 'umcPolicyGrantedOperationSet' in policy:
-            for value in policy['umcPolicyGrantedOperationSet']['value']:
-                self._append(lo, LDAP_ACLs.FROM_USER, lo.get(value.decode('UTF-8')))
-
-        # TODO: check for nested groups
-        groupDNs = lo.searchDn(filter=filter_format('uniqueMember=%s', [userdn]))
-
-        for gDN in groupDNs:
-            policy = self._get_policy_for_dn(lo, gDN)
-            if policy and 'umcPolicyGrantedOperationSet' in policy:
-                for value in policy['umcPolicyGrantedOperationSet']['value']:
-                    self._append(lo, LDAP_ACLs.FROM_GROUP, lo.get(value.decode('UTF-8')))
+        for fromUser, attrs in operation_sets:
+            self._append(lo, fromUser, {key: [value.encode('UTF-8') for value in values] for key, values in attrs.items()})
 
         # make the ACLs unique
         self.acls.sort(key=operator.itemgetter('fromUser', 'host', 'command', 'flavor'))
@@ -407,3 +488,118 @@ class LDAP_ACLs(ACLs):
             result.append(next(g))
 
         self.acls[:] = result
+
+    def _chunks(self, dns):
+        dns = list(dns)
+        for i in range(0, len(dns), self.FILTER_CHUNK_SIZE):
+            yield dns[i:i + self.FILTER_CHUNK_SIZE]
+
+    def _get_groups(self, lo, userdn):
+        """
+        Returns the lower cased DNs of all groups the user is member of,
+        including nested groups. The group membership cache is used if it
+        is consistent with LDAP: its groups must be exactly the direct groups
+        of the user and the groups containing one of its groups. Otherwise,
+        e.g. if the cache is missing or the listener has not yet processed a
+        change, the groups are searched in LDAP level by level.
+        """
+        direct = self._search_groups(lo, [userdn])
+        try:
+            from univention.ldap_cache.frontend import groups_for_user
+            groups = {dn.lower() for dn in groups_for_user(userdn)}
+        except Exception as exc:
+            ACL.info('Group membership cache not usable, searching groups in LDAP: %s' % (exc,))
+        else:
+            if groups == direct | self._search_groups(lo, groups):
+                return sorted(groups)
+            ACL.info('Group membership cache is missing or outdated, searching groups in LDAP')
+
+        groups = set(direct)
+        members = sorted(direct)
+        while members:
+            found = self._search_groups(lo, members)
+            members = sorted(found - groups)
+            groups.update(found)
+        return sorted(groups)
+
+    def _search_groups(self, lo, dns):
+        """Returns the lower cased DNs of the groups which have one of the given DNs as member."""
+        found = set()
+        for chunk in self._chunks(dns):
+            search_filter = '(|%s)' % ''.join(filter_format('(uniqueMember=%s)', [dn]) for dn in chunk)
+            found.update(dn.lower() for dn in lo.searchDn(filter=search_filter))
+        return found
+
+    def _get_entry_csns(self, lo, dns):
+        """Returns the `entryCSN` of the existing entries of the given DNs, read in a few searches."""
+        csns = {}
+        for chunk in self._chunks(dns):
+            search_filter = '(|%s)' % ''.join(filter_format('(entryDN=%s)', [dn]) for dn in chunk)
+            for dn, attrs in lo.search(filter=search_filter, attr=['entryCSN']):
+                csns[dn.lower()] = attrs.get('entryCSN', [b''])[0].decode('ASCII')
+        return csns
+
+    def _get_ancestors(self, dns):
+        """Returns the DNs of all containers above the given DNs up to the LDAP base."""
+        base = ldap.dn.str2dn(ucr['ldap/base'].lower())
+        ancestors = set()
+        for dn in dns:
+            rdns = ldap.dn.str2dn(dn.lower())
+            for i in range(1, len(rdns) - len(base) + 1):
+                ancestors.add(ldap.dn.dn2str(rdns[i:]))
+        return ancestors
+
+    def _get_operation_sets(self, lo, userdn, groups):
+        """
+        Returns the attributes of all UMC operation sets granted to the user
+        and its groups as list of `(fromUser, attributes)` tuples.
+
+        The result is cached per user. It stays valid as long as the group
+        memberships and the `entryCSN` of the user, the groups, their
+        containers, the UMC policies and the operation sets do not change,
+        which is verified with a few searches for `entryCSN` only.
+        """
+        filename = os.path.join(self.RESOLVED_DIR, self.username.replace('/', ''))
+        try:
+            with open(filename) as fd:
+                cached = json.load(fd)
+        except (OSError, ValueError):
+            cached = None
+
+        if cached and cached['userdn'] == userdn and cached['groups'] == groups and self._get_entry_csns(lo, cached['csns']) == cached['csns']:
+            ACL.info('Using cached operation sets for user %s' % (self.username,))
+            return [tuple(operation_set) for operation_set in cached['operation_sets']]
+
+        dependencies = {userdn.lower(), *groups} | self._get_ancestors([userdn, *groups])
+        granted = []
+        for dn, policies in lo.getPoliciesMany([userdn, *groups]).items():
+            policy = policies.get('umcPolicy', {}).get('umcPolicyGrantedOperationSet')
+            if not policy:
+                continue
+            dependencies.add(policy['policy'].lower())
+            fromUser = LDAP_ACLs.FROM_USER if dn.lower() == userdn.lower() else LDAP_ACLs.FROM_GROUP
+            granted.extend((fromUser, value.decode('UTF-8').lower()) for value in policy['value'])
+
+        attributes = {}
+        for chunk in self._chunks({dn for _fromUser, dn in granted}):
+            search_filter = '(|%s)' % ''.join(filter_format('(entryDN=%s)', [dn]) for dn in chunk)
+            for dn, attrs in lo.search(filter=search_filter, attr=[*self._OPERATION_SET_ATTRIBUTES, 'entryCSN']):
+                attributes[dn.lower()] = {key: [value.decode('UTF-8') for value in attrs[key]] for key in self._OPERATION_SET_ATTRIBUTES if key in attrs}
+        dependencies.update(attributes)
+
+        operation_sets = [(fromUser, attributes[dn]) for fromUser, dn in granted if dn in attributes]
+        cached = {
+            'userdn': userdn,
+            'groups': groups,
+            'csns': self._get_entry_csns(lo, sorted(dependencies)),
+            'operation_sets': operation_sets,
+        }
+        try:
+            os.makedirs(self.RESOLVED_DIR, mode=0o700, exist_ok=True)
+            file = os.open(filename + '.tmp', os.O_WRONLY | os.O_TRUNC | os.O_CREAT, 0o600)
+            os.write(file, json.dumps(cached, ensure_ascii=True).encode('ASCII'))
+            os.close(file)
+            os.rename(filename + '.tmp', filename)
+        except OSError as exc:
+            ACL.error('Could not write operation set cache: %s' % (exc,))
+        return operation_sets
@@ -68,7 +68,7 @@ from tornado.web import HTTPError
 import univention.admin.uexceptions as udm_errors
 from univention.lib.i18n import I18N_Error, Locale
 
-from .config import MODULE_COMMAND, MODULE_INACTIVITY_TIMER, ucr
+from .config import MODULE_COMMAND, MODULE_DEBUG_LEVEL, MODULE_INACTIVITY_TIMER, ucr
 from .error import BadGateway, BadRequest, Forbidden, NotFound, UMC_Error, Unauthorized
 from .ldap import reset_cache as reset_ldap_connection_cache
 from .locales import I18N, I18N_Manager
@@ -79,6 +79,7 @@ from .modules.sanitizers import DictSanitizer, ListSanitizer, StringSanitizer
 from .pam import PasswordChangeFailed
 from .resource import Resource
 from .session import categoryManager, moduleManager
+from .zygote import zygote_pool
 
 
 def sanitize(*sargs, **skwargs):
@@ -191,14 +192,20 @@ class ModuleProcess(_ModuleConnection):
         super().__init__()
         self.name = module
         self.socket = '%s.socket' % (('/run/univention-management-console/%u-%s-%lu-%s' % (os.getpid(), module.replace('/', ''), int(time.time() * 1000), uuid.uuid4()))[:85],)
-        args = ['/usr/bin/python3', MODULE_COMMAND, '-m', module, '-s', self.socket, '-d', str(debug)]
-        if locale:
-            args.extend(('-l', '%s' % locale))
-        if no_daemonize_module_processes:
-            args.extend(('-f', '-L', 'stdout'))
-
-        CORE.process('running: %s' % ' '.join(quote(x) for x in args))
-        self.__process = tornado.process.Subprocess(args, stderr=subprocess.PIPE)
+        self.__process = None
+        if not no_daemonize_module_processes and str(debug) == str(MODULE_DEBUG_LEVEL):
+            self.__process = zygote_pool.fork(module, locale or '', self.socket)
+        if self.__process is not None:
+            CORE.process('forked module process %d from zygote of %s' % (self.__process.pid, module))
+        else:
+            args = ['/usr/bin/python3', MODULE_COMMAND, '-m', module, '-s', self.socket, '-d', str(debug)]
+            if locale:
+                args.extend(('-l', '%s' % locale))
+            if no_daemonize_module_processes:
+                args.extend(('-f', '-L', 'stdout'))
+
+            CORE.process('running: %s' % ' '.join(quote(x) for x in args))
+            self.__process = tornado.process.Subprocess(args, stderr=subprocess.PIPE)
         # self.__process.initialize()  # TODO: do we need SIGCHILD handler?
         self.set_exit_callback(self._died)  # default
 
@@ -240,6 +247,9 @@ class ModuleProcess(_ModuleConnection):
             self.reset_inactivity_timer()
             if request_id in self._active_requests:
                 self._active_requests.remove(request_id)
+            if not self._active_requests and self.__process and zygote_pool.recycle(self.pid()):
+                CORE.process('Module process %d of %s uses too much memory, recycling it' % (self.pid(), self.name))
+                self._mod_inactive()
 
         response = self.do_request(method, uri, headers, body, self.socket)
         response.add_done_callback(_reset)
@@ -41,7 +41,6 @@ import signal
 import sys
 from argparse import ArgumentParser
 
-import atexit
 import tornado
 from concurrent.futures import ThreadPoolExecutor
 from sdnotify import SystemdNotifier
@@ -64,13 +63,9 @@ from univention.management.console.saml import SamlACS, SamlIframeACS, SamlLogou
 from univention.management.console.session import categoryManager, moduleManager
 from univention.management.console.shared_memory import shared_memory
 from univention.management.console.sse import SSELogoutNotifer
+from univention.management.console.zygote import zygote_pool
 
 
-try:
-    from multiprocessing.util import _exit_function
-except ImportError:
-    _exit_function = None
-
 pool = ThreadPoolExecutor(max_workers=ucr.get_int('umc/http/maxthreads', 35))
 
 
@@ -179,11 +174,16 @@ class Server:
         tornado_log_reopen()
         SamlACS.reload()
         self.reload()
+        # replace the zygotes, which may have loaded outdated code
+        tornado.ioloop.IOLoop.current().add_callback_from_signal(zygote_pool.reload)
         self._inform_childs(signal)
 
     def signal_handler_stop(self, signo, frame):
         CORE.warn('Shutting down all open connections')
         self._inform_childs(signal)
+        zygote_pool.shutdown()
+        if self._child_number is None:
+            shared_memory.shutdown()
         raise SystemExit(0)
 
     @classmethod
@@ -228,10 +228,6 @@ class Server:
             # start sharing memory (before fork, before first usage, after import)
             shared_memory.start()
 
-            # stop conflicting exit function of shared_memory in this main process
-            if _exit_function is not None:
-                atexit.unregister(_exit_function)
-
             CORE.process('Starting with %r processes' % (self.options.processes,))
             n.notify("READY=1")
             try:
@@ -286,6 +282,8 @@ class Server:
             logger.addHandler(channel)
 
         self.reload()
+        # the zygotes are started in every server process, with the final configuration and logging
+        zygote_pool.start()
 
         n.notify("READY=1")
         ioloop = tornado.ioloop.IOLoop.current()
@@ -30,44 +30,12 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <https://www.gnu.org/licenses/>.
 
-import argparse
-from multiprocessing import managers
+from univention.management.console.shared_store import SharedMemory
 
-from setproctitle import getproctitle, setproctitle
 
+class _SharedMemory(SharedMemory):
 
-proctitle = getproctitle()
+    shared_dicts = ('saml_state_cache', 'children', 'pkce')
 
 
-class _SharedMemory(managers.SyncManager):
-
-    started = False
-    saml_state_cache = {}
-    children = {}
-    pkce = {}
-
-    def dict(self):
-        if self.started:
-            return super().dict()
-        return {}
-
-    def namespace(self):
-        if self.started:
-            return self.Namespace()
-        return argparse.Namespace()
-
-    def start(self, *args, **kwargs):
-        self.started = True
-        setproctitle(proctitle + '   # multiprocessing manager')
-        try:
-            super().start(*args, **kwargs)
-        finally:
-            setproctitle(proctitle)
-
-        # we must create the parent dictionary instance before forking but after python importing
-        self.saml_state_cache = self.dict()
-        self.children = self.dict()
-        self.pkce = self.dict()
-
-
-shared_memory = _SharedMemory()
+shared_memory = _SharedMemory('/run/univention-management-console', 'shared-memory')
@@ -0,0 +1,376 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+"""
+State shared between forked processes.
+
+A replacement for :py:class:`multiprocessing.managers.SyncManager`, where
+every access to a shared dictionary is sent to a separate manager process
+and answered by it one after the other. Here the data lives in a SQLite
+database in WAL mode which each process accesses directly: readers never
+wait, writers only for the short time of their own transaction.
+
+Keys and values are pickled. Shared dictionaries and lists may be nested,
+they are stored as references to their own namespace. A nested container is
+owned by the one value referencing it: when the value is removed or replaced,
+the contents of the nested container are deleted as well. A popped value
+contains local copies of its nested containers.
+"""
+
+import argparse
+import os
+import pickle  # noqa: S403
+import sqlite3
+import threading
+import uuid
+from collections.abc import Iterable, Iterator, MutableMapping, MutableSequence
+from contextlib import contextmanager
+from typing import Any
+
+
+PROTOCOL = 4
+SCHEMA = 'CREATE TABLE IF NOT EXISTS items (ns TEXT NOT NULL, key BLOB NOT NULL, value BLOB NOT NULL, PRIMARY KEY (ns, key)) WITHOUT ROWID'
+
+_stores: dict[str, 'SharedStore'] = {}
+
+
+def _dumps(obj: Any) -> bytes:
+    return pickle.dumps(obj, PROTOCOL)
+
+
+def _references(value: Any) -> set[str]:
+    """Return the namespaces of the shared containers stored in a value."""
+    if isinstance(value, SharedDict | SharedList):
+        return {value._namespace}
+    if isinstance(value, dict):
+        return _references(list(value.values()))
+    if isinstance(value, list | tuple | set | frozenset):
+        return {namespace for item in value for namespace in _references(item)}
+    return set()
+
+
+def _copy(value: Any) -> Any:
+    """Return a copy of a value where the shared containers are replaced by local ones."""
+    if isinstance(value, SharedDict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, SharedList):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list | tuple | set | frozenset):
+        return type(value)(_copy(item) for item in value)
+    return value
+
+
+def _pickled_references(values: Iterable[bytes]) -> set[str]:
+    # references are pickled as calls of _attach(), don't unpickle anything else
+    return {namespace for value in values if b'_attach' in value for namespace in _references(pickle.loads(value))}
+
+
+def _attach(filename: str, kind: str, namespace: str) -> 'SharedDict | SharedList':
+    try:
+        store = _stores[filename]
+    except KeyError:
+        store = SharedStore(filename)
+    return store.dict(namespace) if kind == 'dict' else store.list(namespace)
+
+
+class SharedStore:
+    """
+    Database holding all shared dictionaries and lists.
+
+    :param filename: Path of the SQLite database. It is created on first use.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        _stores[filename] = self
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection must not be used by a forked process
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.filename, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def execute(self, sql: str, args: tuple = ()) -> list[tuple]:
+        """Run a single statement in its own transaction and return all rows."""
+        with self._lock:
+            return self._connect().execute(sql, args).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run several statements atomically."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    def drop(self, conn: sqlite3.Connection, namespaces: set[str]) -> None:
+        """Delete the contents of shared containers and of the containers nested in them."""
+        while namespaces:
+            namespace = namespaces.pop()
+            values = [value for value, in conn.execute('SELECT value FROM items WHERE ns = ?', (namespace,))]
+            conn.execute('DELETE FROM items WHERE ns = ?', (namespace,))
+            namespaces |= _pickled_references(values)
+
+    def dict(self, namespace: str | None = None) -> 'SharedDict':
+        """Return a shared dictionary, a new one unless `namespace` is given."""
+        return SharedDict(self, namespace or uuid.uuid4().hex)
+
+    def list(self, namespace: str | None = None) -> 'SharedList':
+        """Return a shared list, a new one unless `namespace` is given."""
+        return SharedList(self, namespace or uuid.uuid4().hex)
+
+    def remove(self) -> None:
+        """Close the connection of this process and delete the database."""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.unlink(self.filename + suffix)
+                except FileNotFoundError:
+                    pass
+
+
+class SharedDict(MutableMapping):
+    """Dictionary stored in a :py:class:`SharedStore`."""
+
+    def __init__(self, store: SharedStore, namespace: str) -> None:
+        self._store = store
+        self._namespace = namespace
+
+    def __reduce__(self) -> tuple:
+        return (_attach, (self._store.filename, 'dict', self._namespace))
+
+    def __repr__(self) -> str:
+        return '%s(%r)' % (type(self).__name__, dict(self.items()))
+
+    def __getitem__(self, key: Any) -> Any:
+        rows = self._store.execute('SELECT value FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key)))
+        if not rows:
+            raise KeyError(key)
+        return pickle.loads(rows[0][0])
+
+    def _replace(self, conn: sqlite3.Connection, keys: list[bytes], values: list[Any]) -> None:
+        """Delete the nested containers of the current values of `keys`, which are not kept in the new `values`."""
+        old = [value for key in keys for value, in conn.execute('SELECT value FROM items WHERE ns = ? AND key = ?', (self._namespace, key))]
+        self._store.drop(conn, _pickled_references(old) - _references(values))
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        with self._store.transaction() as conn:
+            self._replace(conn, [_dumps(key)], [value])
+            conn.execute('INSERT OR REPLACE INTO items (ns, key, value) VALUES (?, ?, ?)', (self._namespace, _dumps(key), _dumps(value)))
+
+    def __delitem__(self, key: Any) -> None:
+        with self._store.transaction() as conn:
+            self._replace(conn, [_dumps(key)], [])
+            if not conn.execute('DELETE FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key))).rowcount:
+                raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return bool(self._store.execute('SELECT 1 FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key))))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter([pickle.loads(key) for key, in self._store.execute('SELECT key FROM items WHERE ns = ?', (self._namespace,))])
+
+    def __len__(self) -> int:
+        return self._store.execute('SELECT COUNT(*) FROM items WHERE ns = ?', (self._namespace,))[0][0]
+
+    def items(self) -> list[tuple[Any, Any]]:  # type: ignore[override]
+        return [(pickle.loads(key), pickle.loads(value)) for key, value in self._store.execute('SELECT key, value FROM items WHERE ns = ?', (self._namespace,))]
+
+    def values(self) -> list[Any]:  # type: ignore[override]
+        return [pickle.loads(value) for value, in self._store.execute('SELECT value FROM items WHERE ns = ?', (self._namespace,))]
+
+    _marker = object()
+
+    def pop(self, key: Any, default: Any = _marker) -> Any:
+        with self._store.transaction() as conn:
+            row = conn.execute('SELECT value FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key))).fetchone()
+            if row is None:
+                if default is self._marker:
+                    raise KeyError(key)
+                return default
+            conn.execute('DELETE FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key)))
+            value = pickle.loads(row[0])
+            namespaces = _references(value)
+            if namespaces:
+                value = _copy(value)
+                self._store.drop(conn, namespaces)
+        return value
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        with self._store.transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO items (ns, key, value) VALUES (?, ?, ?)', (self._namespace, _dumps(key), _dumps(default)))
+            row = conn.execute('SELECT value FROM items WHERE ns = ? AND key = ?', (self._namespace, _dumps(key))).fetchone()
+        return pickle.loads(row[0])
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        items = dict(*args, **kwargs)
+        with self._store.transaction() as conn:
+            self._replace(conn, [_dumps(key) for key in items], list(items.values()))
+            conn.executemany('INSERT OR REPLACE INTO items (ns, key, value) VALUES (?, ?, ?)', [(self._namespace, _dumps(key), _dumps(value)) for key, value in items.items()])
+
+    def clear(self) -> None:
+        with self._store.transaction() as conn:
+            self._store.drop(conn, {self._namespace})
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+
+class SharedList(MutableSequence):
+    """List stored in a :py:class:`SharedStore`. The whole list is rewritten on every change, so keep it small."""
+
+    def __init__(self, store: SharedStore, namespace: str) -> None:
+        self._store = store
+        self._namespace = namespace
+
+    def __reduce__(self) -> tuple:
+        return (_attach, (self._store.filename, 'list', self._namespace))
+
+    def __repr__(self) -> str:
+        return '%s(%r)' % (type(self).__name__, self._get())
+
+    def _get(self, conn: sqlite3.Connection | None = None) -> list:
+        sql, args = 'SELECT value FROM items WHERE ns = ? AND key = ?', (self._namespace, b'')
+        rows = conn.execute(sql, args).fetchall() if conn is not None else self._store.execute(sql, args)
+        return pickle.loads(rows[0][0]) if rows else []
+
+    @contextmanager
+    def _modify(self) -> Iterator[list]:
+        with self._store.transaction() as conn:
+            value = self._get(conn)
+            old = _references(value)
+            yield value
+            self._store.drop(conn, old - _references(value))
+            conn.execute('INSERT OR REPLACE INTO items (ns, key, value) VALUES (?, ?, ?)', (self._namespace, b'', _dumps(value)))
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._get()[index]
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        with self._modify() as items:
+            items[index] = value
+
+    def __delitem__(self, index: Any) -> None:
+        with self._modify() as items:
+            del items[index]
+
+    def __len__(self) -> int:
+        return len(self._get())
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._get())
+
+    def insert(self, index: int, value: Any) -> None:
+        with self._modify() as items:
+            items.insert(index, value)
+
+    def append(self, value: Any) -> None:
+        with self._modify() as items:
+            items.append(value)
+
+    def extend(self, values: Any) -> None:
+        values = list(values)
+        with self._modify() as items:
+            items.extend(values)
+
+
+class SharedMemory:
+    """
+    Drop-in replacement for a :py:class:`multiprocessing.managers.SyncManager`
+    holding some named shared dictionaries.
+
+    Before :py:meth:`start` is called the named dictionaries are plain,
+    process local dictionaries.
+
+    :param directory: Directory for the database; its name contains the PID
+            of the process calling :py:meth:`start`, so that independent
+            services do not share their state.
+    :param prefix: Prefix of the database file name.
+    """
+
+    shared_dicts: tuple[str, ...] = ()
+
+    def __init__(self, directory: str, prefix: str) -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self.started = False
+        self.store: SharedStore | None = None
+        for name in self.shared_dicts:
+            setattr(self, name, {})
+
+    def start(self) -> None:
+        """Create the database and the named dictionaries (before forking)."""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.store = SharedStore(os.path.join(self.directory, '%s-%d.sqlite' % (self.prefix, os.getpid())))
+        self.store.remove()
+        # the dictionaries may contain credentials; SQLite creates the WAL files with the same mode
+        os.close(os.open(self.store.filename, os.O_CREAT | os.O_WRONLY, 0o600))
+        self.started = True
+        for name in self.shared_dicts:
+            setattr(self, name, self.store.dict(name))
+
+    def shutdown(self) -> None:
+        """Delete the database (in the process which started it)."""
+        if self.store is not None:
+            self.store.remove()
+
+    def dict(self) -> dict | SharedDict:
+        if self.store is not None:
+            return self.store.dict()
+        return {}
+
+    def list(self) -> list | SharedList:
+        if self.store is not None:
+            return self.store.list()
+        return []
+
+    def namespace(self) -> argparse.Namespace:
+        return argparse.Namespace()
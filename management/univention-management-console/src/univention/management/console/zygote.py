@@ -0,0 +1,469 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+"""
+Pre-forked module processes.
+
+Starting a module process means starting a Python interpreter which imports
+the module and its dependencies (UDM, UCR, python-ldap, ...) from scratch,
+which takes seconds. Instead a *zygote* is kept for every module and
+language: a template process which has done the expensive imports and
+:py:func:`univention.admin.modules.update` once and then only waits for
+requests to fork. The forked child continues as an ordinary module process
+serving one session, so starting it only costs a :py:func:`os.fork`.
+
+The UMC server talks to a zygote via a UNIX socket: for every module
+process it opens a connection, sends the name of the socket the module
+process should bind to and receives its process ID. The connection is kept
+open and the zygote sends the exit code over it when the process ends.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .config import MODULE_COMMAND, MODULE_DEBUG_LEVEL, ucr
+from .log import CORE, MODULE
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+#: seconds the UMC server waits for a zygote to fork
+FORK_TIMEOUT = 5
+
+
+class Zygote:
+    """
+    The template process of a module.
+
+    :param str socket: UNIX socket filename to receive fork requests on
+    :param str module: name of the UMC module to preload
+    """
+
+    def __init__(self, socket: str, module: str) -> None:
+        self.socket = socket
+        self.module = module
+        self._listener: socket.socket | None = None
+        self._children: dict[int, socket.socket | None] = {}
+        self._retired = False
+
+    def preload(self) -> bool:
+        """Import everything a module process needs. Returns whether the process can be used as zygote."""
+        MODULE.process('Preloading module %s' % (self.module,))
+        import univention.management.console.modserver  # noqa: F401
+        try:
+            __import__('univention.management.console.modules.%s' % (self.module,), {}, {}, self.module)
+        except Exception as exc:
+            # the forked module process fails the same way and reports the error to the user
+            MODULE.warn('Could not preload module %s: %s' % (self.module, exc))
+        try:
+            import univention.admin.modules
+        except ImportError:
+            pass
+        else:
+            univention.admin.modules.update()
+
+        if threading.active_count() > 1:
+            MODULE.error('Module %s started threads while loading, it cannot be forked safely' % (self.module,))
+            return False
+
+        # keep the preloaded objects out of the garbage collector so that their memory pages stay shared after fork
+        gc.collect()
+        gc.freeze()
+        return True
+
+    def run(self) -> dict:
+        """
+        Serve fork requests until the zygote is retired and all its children exited.
+
+        Only returns in forked children: the request, which contains the socket
+        the module process has to bind to.
+        """
+        parent = os.getppid()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # bind to a temporary name so that the socket only appears when it is ready
+        tmp = '%s.tmp' % (self.socket,)
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        self._listener.bind(tmp)
+        self._listener.listen(64)
+        os.rename(tmp, self.socket)
+
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_r, False)
+        os.set_blocking(wakeup_w, False)
+        signal.set_wakeup_fd(wakeup_w)
+        signal.signal(signal.SIGCHLD, lambda signo, frame: None)
+        signal.signal(signal.SIGTERM, lambda signo, frame: self.retire())
+
+        selector = selectors.DefaultSelector()
+        selector.register(self._listener, selectors.EVENT_READ)
+        selector.register(wakeup_r, selectors.EVENT_READ)
+        MODULE.process('Zygote of module %s ready' % (self.module,))
+
+        while not self._retired or self._children:
+            for key, _events in selector.select(timeout=5):
+                if key.fileobj is self._listener and not self._retired:
+                    request = self._fork(selector)
+                    if request is not None:
+                        signal.set_wakeup_fd(-1)
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                        selector.close()
+                        for fd in (wakeup_r, wakeup_w):
+                            os.close(fd)
+                        return request
+                elif key.fileobj == wakeup_r:
+                    try:
+                        while os.read(wakeup_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.fileobj is not self._listener:
+                    # the UMC server closed the connection, the process continues without being watched
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    self._children[key.data] = None
+            if self._retired and self._listener.fileno() != -1:
+                selector.unregister(self._listener)
+                self._listener.close()
+            self._reap()
+            if os.getppid() != parent:
+                MODULE.process('UMC server exited')
+                self.retire()
+        MODULE.process('Zygote of module %s exits' % (self.module,))
+        sys.exit(0)
+
+    def retire(self) -> None:
+        """Stop accepting fork requests. The zygote exits when all of its children exited."""
+        if not self._retired:
+            self._retired = True
+            try:
+                os.unlink(self.socket)
+            except OSError:
+                pass
+
+    def _fork(self, selector: selectors.BaseSelector) -> dict | None:
+        conn, _address = self._listener.accept()
+        try:
+            conn.settimeout(FORK_TIMEOUT)
+            request = json.loads(_readline(conn))
+            pid = os.fork()
+        except (OSError, ValueError) as exc:
+            MODULE.error('Could not fork module process: %s' % (exc,))
+            conn.close()
+            return None
+
+        if pid == 0:
+            self._listener.close()
+            conn.close()
+            for child in self._children.values():
+                if child is not None:
+                    child.close()
+            return request
+
+        self._children[pid] = conn
+        try:
+            conn.sendall(b'%s\n' % (json.dumps({'pid': pid}).encode('ASCII'),))
+        except OSError as exc:
+            MODULE.warn('Could not report process %d: %s' % (pid, exc))
+            self._children[pid] = None
+            conn.close()
+        else:
+            selector.register(conn, selectors.EVENT_READ, pid)
+        MODULE.process('Forked module process %d' % (pid,))
+        return None
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if not pid:
+                return
+            conn = self._children.pop(pid, None)
+            if conn is None:
+                continue
+            try:
+                conn.sendall(b'%s\n' % (json.dumps({'returncode': os.waitstatus_to_exitcode(status)}).encode('ASCII'),))
+            except OSError:
+                pass
+            conn.close()
+
+
+def _readline(sock: socket.socket) -> bytes:
+    # byte by byte, so that nothing after the line is consumed
+    line = b''
+    while not line.endswith(b'\n'):
+        char = sock.recv(1)
+        if not char:
+            raise OSError('connection closed')
+        line += char
+    return line
+
+
+def memory_usage(pid: int) -> int:
+    """
+    Returns the memory used only by a process in bytes or 0 if it is unknown.
+    Pages shared with the zygote are not counted.
+    """
+    try:
+        with open('/proc/%d/smaps_rollup' % (pid,)) as fd:
+            return sum(int(line.split()[1]) * 1024 for line in fd if line.startswith(('Private_Clean:', 'Private_Dirty:')))
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ForkedProcess:
+    """
+    A module process forked by a zygote. Provides the parts of
+    :py:class:`tornado.process.Subprocess` used by
+    :py:class:`~univention.management.console.resources.ModuleProcess`.
+
+    :param int pid: the process ID
+    :param tornado.iostream.IOStream stream: the connection to the zygote
+    """
+
+    stderr = None
+
+    def __init__(self, pid, stream):
+        self.pid = pid
+        self.proc = self
+        self.returncode = None
+        self._stream = stream
+        self._exit_callback = None
+        stream.read_until(b'\n').add_done_callback(self._exited)
+
+    def set_exit_callback(self, callback):
+        self._exit_callback = callback
+        if self.returncode is not None:
+            callback(self.returncode)
+
+    def poll(self):
+        return self.returncode
+
+    def send_signal(self, signo):
+        if self.returncode is None:
+            os.kill(self.pid, signo)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def _exited(self, future):
+        try:
+            returncode = json.loads(future.result())['returncode']
+        except Exception as exc:
+            # without the zygote nobody can tell when the process exits
+            CORE.warn('Lost connection to the zygote of module process %d: %s' % (self.pid, exc))
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+            except OSError:
+                pass
+            returncode = -signal.SIGTERM
+        self._stream.close()
+        self.returncode = returncode
+        if self._exit_callback is not None:
+            self._exit_callback(returncode)
+
+
+def request_fork(zygote_socket: str, module_socket: str) -> ForkedProcess:
+    """
+    Let a zygote fork a module process.
+
+    :param str zygote_socket: UNIX socket filename of the zygote
+    :param str module_socket: UNIX socket filename the module process binds to
+    """
+    import tornado.iostream
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(FORK_TIMEOUT)
+        sock.connect(zygote_socket)
+        sock.sendall(b'%s\n' % (json.dumps({'socket': module_socket}).encode('ASCII'),))
+        pid = json.loads(_readline(sock))['pid']
+    except (OSError, ValueError, KeyError):
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return ForkedProcess(pid, tornado.iostream.IOStream(sock))
+
+
+class _ZygoteProcess:
+    """The UMC server side of a zygote."""
+
+    def __init__(self, module: str, locale: str, exit_callback: Callable[[_ZygoteProcess, int], None]) -> None:
+        import tornado.process
+        self.module = module
+        self.locale = locale
+        self.socket = '%s.socket' % (('/run/univention-management-console/zygote-%u-%s-%s' % (os.getpid(), module.replace('/', ''), locale))[:85],)
+        self.started = time.monotonic()
+        self.alive = True
+        args = ['/usr/bin/python3', MODULE_COMMAND, '-m', module, '-s', self.socket, '-d', str(MODULE_DEBUG_LEVEL), '--zygote']
+        if locale:
+            args.extend(('-l', locale))
+        CORE.process('Starting zygote: %s' % (' '.join(args),))
+        self.process = tornado.process.Subprocess(args)
+        self.process.set_exit_callback(lambda returncode: exit_callback(self, returncode))
+
+    @property
+    def ready(self) -> bool:
+        return self.alive and os.path.exists(self.socket)
+
+    def fork(self, module_socket: str) -> ForkedProcess:
+        return request_fork(self.socket, module_socket)
+
+    def retire(self) -> None:
+        """Let the zygote exit after its module processes exited."""
+        if self.alive:
+            self.alive = False
+            try:
+                self.process.proc.terminate()
+            except OSError:
+                pass
+
+
+class ZygotePool:
+    """
+    The zygotes of the UMC server process.
+
+    Zygotes are started for the modules and languages configured in
+    |UCR| by :py:meth:`start` when the server starts, by :py:meth:`reload`
+    when the server reloads, and on the first use of
+    any other module. Until a zygote is ready module processes are started
+    the traditional way.
+    """
+
+    def __init__(self):
+        self._zygotes: dict[tuple[str, str], _ZygoteProcess] = {}
+        self._unusable: set[tuple[str, str]] = set()
+        self.enabled = False
+        self.max_age = 0
+        self.max_memory = 0
+
+    def start(self) -> None:
+        """
+        Read the configuration and start the configured zygotes.
+
+        Called by the UMC server once it is set up, before it serves requests.
+        """
+        self.enabled = ucr.is_true('umc/module/prefork', True)
+        self.max_age = ucr.get_int('umc/module/prefork/max-age', 3600)
+        self.max_memory = ucr.get_int('umc/module/prefork/max-memory', 2048) * 1024 * 1024
+        if not self.enabled:
+            return
+        for module in ucr.get('umc/module/prefork/modules', 'udm').split():
+            for locale in ucr.get('umc/module/prefork/locales', 'de_DE en_US').split():
+                self._start(module, locale)
+
+    def reload(self) -> None:
+        """Re-read the configuration and replace all zygotes, e.g. after packages were updated."""
+        self.shutdown()
+        self._unusable.clear()
+        self.start()
+
+    def shutdown(self) -> None:
+        """Retire all zygotes."""
+        for zygote in self._zygotes.values():
+            zygote.retire()
+        self._zygotes.clear()
+
+    def fork(self, module: str, locale: str, module_socket: str) -> ForkedProcess | None:
+        """
+        Fork a module process from the zygote of the module.
+
+        :param str module: name of the UMC module
+        :param str locale: language of the module process
+        :param str module_socket: UNIX socket filename the module process binds to
+        :returns: The process or `None` if there is no zygote ready (yet).
+        """
+        if not self.enabled:
+            return None
+        key = (module, locale)
+        zygote = self._zygotes.get(key)
+        if zygote is not None and self.max_age and time.monotonic() - zygote.started > self.max_age:
+            CORE.info('Replacing zygote of module %s (%s)' % (module, locale))
+            self._zygotes.pop(key).retire()
+            zygote = None
+        if zygote is None:
+            self._start(module, locale)
+            return None
+        if not zygote.ready:
+            return None
+        try:
+            return zygote.fork(module_socket)
+        except (OSError, ValueError, KeyError) as exc:
+            CORE.warn('Could not fork module process from zygote of %s: %s' % (module, exc))
+            self._zygotes.pop(key).retire()
+            return None
+
+    def recycle(self, pid: int) -> bool:
+        """Returns whether an idle module process uses too much memory and should be replaced by a fresh one."""
+        return bool(self.enabled and self.max_memory and memory_usage(pid) > self.max_memory)
+
+    def _start(self, module: str, locale: str) -> None:
+        key = (module, locale)
+        if key in self._unusable or key in self._zygotes:
+            return
+        try:
+            self._zygotes[key] = _ZygoteProcess(module, locale, self._exited)
+        except OSError as exc:
+            CORE.error('Could not start zygote of module %s: %s' % (module, exc))
+            self._unusable.add(key)
+
+    def _exited(self, zygote: _ZygoteProcess, returncode: int) -> None:
+        key = (zygote.module, zygote.locale)
+        CORE.process('Zygote of module %s (%s) exited with %d' % (zygote.module, zygote.locale, returncode))
+        if self._zygotes.get(key) is zygote:
+            del self._zygotes[key]
+            if zygote.alive and returncode:
+                # don't restart it again and again
+                self._unusable.add(key)
+        zygote.alive = False
+
+
+zygote_pool = ZygotePool()
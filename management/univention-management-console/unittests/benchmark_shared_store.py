@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Compare :py:mod:`univention.management.console.shared_store` against a
+:py:class:`multiprocessing.managers.SyncManager` with concurrent processes::
+
+    python3 benchmark_shared_store.py -p 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections.abc import MutableMapping
+from multiprocessing import Process, managers
+
+from univention.management.console.shared_store import SharedStore
+
+
+def benchmark(processes: int, operations: int) -> None:
+    """Compare the SQLite store against a SyncManager dict proxy with concurrent worker processes."""
+
+    def worker(shared: MutableMapping, worker_id: int) -> None:
+        for i in range(operations):
+            key = '%d-%d' % (worker_id, i % 100)
+            shared[key] = {'value': i, 'worker': worker_id}
+            shared.get(key)
+            shared.get('missing')
+
+    def run(shared: MutableMapping) -> float:
+        start = time.monotonic()
+        workers = [Process(target=worker, args=(shared, worker_id)) for worker_id in range(processes)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        return time.monotonic() - start
+
+    total = processes * operations * 3
+    with managers.SyncManager() as manager:
+        duration = run(manager.dict())
+    print('SyncManager: %d processes, %d operations in %.2fs: %.0f operations/s' % (processes, total, duration, total / duration))
+    with tempfile.TemporaryDirectory() as directory:
+        store = SharedStore(os.path.join(directory, 'benchmark.sqlite'))
+        duration = run(store.dict())
+        store.remove()
+    print('SharedStore: %d processes, %d operations in %.2fs: %.0f operations/s' % (processes, total, duration, total / duration))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=benchmark.__doc__)
+    parser.add_argument('-p', '--processes', type=int, default=16, help='Number of concurrent worker processes')
+    parser.add_argument('-n', '--operations', type=int, default=2000, help='Number of write/read/miss rounds per process')
+    args = parser.parse_args()
+    benchmark(args.processes, args.operations)
@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import itertools
+import random
+import re
+import sys
+from types import ModuleType
+
+import pytest
+
+from univention.management.console import acl
+from univention.management.console.acl import ACLs, LDAP_ACLs, Rule
+
+
+HOSTS = ('*', 'master', 'backup')
+COMMANDS = ('udm/get', 'udm/put', 'udm/*', 'udm/query*', 'ucr/*', '*', 'lib/server/*', 'lib/server/restart')
+FLAVORS = (None, '*', 'users/user', 'users/*', 'groups/group')
+OPTIONS = ({}, {'objectType': 'users/user'}, {'objectType': 'users/*'}, {'!objectType': '*'}, {'container': 'cn=users*'}, {'objectType': 'groups/group', '!container': '*'})
+
+QUERY_COMMANDS = ('udm/get', 'udm/put', 'udm/query', 'udm/querying', 'ucr/set', 'lib/server/restart', 'lib/server/shutdown', 'appcenter/get', '')
+QUERY_FLAVORS = (None, 'users/user', 'users/ldap', 'groups/group', 'computers/linux')
+QUERY_OPTIONS = (
+    {},
+    {'objectType': 'users/user'},
+    {'objectType': 'users/ldap'},
+    {'objectType': 'groups/group'},
+    {'objectType': ['users/user', 'users/ldap']},
+    {'objectType': ['users/user', 'groups/group']},
+    {'container': 'cn=users,dc=base'},
+    {'container': 'cn=groups,dc=base', 'objectType': 'groups/group'},
+    {'other': 'value'},
+    {'objectType': {'users/user': True}},
+)
+
+
+def rule(command, host='*', flavor=None, options=None, fromUser=False):
+    return {'fromUser': fromUser, 'host': host, 'command': command, 'flavor': flavor, 'options': options or {}}
+
+
+def linear(acls, command, hostname, options, flavor):
+    """The decision of the unindexed rule list, which checks every rule."""
+    user_rules = [x for x in acls.acls if x.fromUser]
+    group_rules = [x for x in acls.acls if not x.fromUser]
+    return acls._is_allowed(user_rules + group_rules, command, hostname, options, flavor)
+
+
+def test_same_decisions_as_linear_match():
+    rng = random.Random(4711)
+    for _run in range(50):
+        acls = ACLs(acls=[
+            rule(rng.choice(COMMANDS), rng.choice(HOSTS), rng.choice(FLAVORS), rng.choice(OPTIONS), rng.random() < 0.5)
+            for _rule in range(rng.randrange(1, 8))
+        ])
+        for command, hostname, options, flavor in itertools.product(QUERY_COMMANDS, HOSTS[1:], QUERY_OPTIONS, QUERY_FLAVORS):
+            expected = linear(acls, command, hostname, options, flavor)
+            # twice: computed and memoized
+            assert acls.is_command_allowed(command, hostname, options, flavor) is expected, (acls.acls, command, hostname, options, flavor)
+            assert acls.is_command_allowed(command, hostname, options, flavor) is expected, (acls.acls, command, hostname, options, flavor)
+
+
+@pytest.mark.parametrize('host,hostname,allowed', [
+    ('*', 'master', True),
+    ('*', 'backup', True),
+    ('master', 'master', True),
+    ('master', 'backup', False),
+])
+def test_host(host, hostname, allowed):
+    acls = ACLs(acls=[rule('udm/get', host)])
+    assert acls.is_command_allowed('udm/get', hostname) is allowed
+
+
+@pytest.mark.parametrize('command,allowed', [
+    ('udm/query', True),
+    ('udm/querying', True),
+    ('udm/get', False),
+    ('udm/quer', False),
+])
+def test_wildcard_command(command, allowed):
+    acls = ACLs(acls=[rule('udm/query*')])
+    assert acls.is_command_allowed(command, 'master') is allowed
+
+
+@pytest.mark.parametrize('pattern,flavor,allowed', [
+    (None, 'users/user', True),
+    ('*', None, True),
+    ('users/*', 'users/ldap', True),
+    ('users/*', 'groups/group', False),
+    ('users/*', None, False),
+    ('users/user', 'users/user', True),
+    ('users/user', 'users/ldap', False),
+])
+def test_flavor(pattern, flavor, allowed):
+    acls = ACLs(acls=[rule('udm/get', flavor=pattern)])
+    assert acls.is_command_allowed('udm/get', 'master', flavor=flavor) is allowed
+
+
+@pytest.mark.parametrize('pattern,options,allowed', [
+    ({'objectType': 'users/*'}, {}, True),
+    ({'objectType': 'users/*'}, {'objectType': 'users/user'}, True),
+    ({'objectType': 'users/*'}, {'objectType': ['users/user', 'users/ldap']}, True),
+    ({'objectType': 'users/*'}, {'objectType': ['users/user', 'groups/group']}, False),
+    ({'objectType': 'users/user'}, {'objectType': 'users/ldap'}, False),
+    ({'!objectType': '*'}, {}, True),
+    ({'!objectType': '*'}, {'objectType': 'users/user'}, False),
+])
+def test_options(pattern, options, allowed):
+    acls = ACLs(acls=[rule('udm/put', options=pattern)])
+    assert acls.is_command_allowed('udm/put', 'master', options) is allowed
+    # memoized by the values of the options
+    assert acls.is_command_allowed('udm/put', 'master', options) is allowed
+
+
+def test_unused_options_ignored():
+    acls = ACLs(acls=[rule('udm/put', options={'objectType': 'users/*'})])
+    assert acls.is_command_allowed('udm/put', 'master', {'objectType': 'users/user', 'other': 1})
+    assert not acls.is_command_allowed('udm/put', 'master', {'objectType': 'groups/group', 'other': 2})
+
+
+def test_unhashable_options():
+    acls = ACLs(acls=[rule('udm/put', options={'objectType': 'users/*'})])
+    assert acls.is_command_allowed('udm/put', 'master', {'objectType': {'users/user': True}})
+    assert not acls.is_command_allowed('udm/put', 'master', {'objectType': {'groups/group': True}})
+
+
+def test_rules_changed():
+    acls = ACLs(acls=[rule('udm/get')])
+    assert not acls.is_command_allowed('udm/put', 'master')
+    acls.acls.append(Rule(rule('udm/put')))
+    assert acls.is_command_allowed('udm/put', 'master')
+    acls.acls = []
+    assert not acls.is_command_allowed('udm/get', 'master')
+
+
+BASE = 'dc=example,dc=com'
+USER = 'uid=user,cn=users,%s' % (BASE,)
+GROUP = 'cn=group,cn=groups,%s' % (BASE,)
+PARENT = 'cn=parent,cn=groups,%s' % (BASE,)
+OTHER = 'cn=other,cn=groups,%s' % (BASE,)
+POLICY = 'cn=policy,cn=policies,%s' % (BASE,)
+OPSET = 'cn=udm-users,cn=operations,cn=UMC,cn=univention,%s' % (BASE,)
+
+
+class Directory:
+    """Fake LDAP connection with the searches used to resolve the ACLs of a user."""
+
+    def __init__(self):
+        self.entries = {}
+        self.policies = {}
+        self.policy_lookups = 0
+        self._csn = 0
+
+    def add(self, dn, **attrs):
+        self.entries[dn] = {key: [value.encode('UTF-8') for value in values] for key, values in attrs.items()}
+        self.touch(dn)
+
+    def touch(self, dn):
+        self._csn += 1
+        self.entries[dn]['entryCSN'] = [b'%020d.000000Z#000000#000#000000' % (self._csn,)]
+
+    def searchDn(self, filter):
+        members = {dn.lower() for dn in re.findall(r'\(uniqueMember=([^()]*)\)', filter)}
+        return [dn for dn, attrs in self.entries.items() if members & {value.decode('UTF-8').lower() for value in attrs.get('uniqueMember', [])}]
+
+    def search(self, filter, attr):
+        dns = {dn.lower() for dn in re.findall(r'\(entryDN=([^()]*)\)', filter)}
+        return [(dn, {key: value for key, value in attrs.items() if key in attr}) for dn, attrs in self.entries.items() if dn.lower() in dns]
+
+    def getPoliciesMany(self, dns):
+        self.policy_lookups += 1
+        result = {}
+        for dn in dns:
+            policy = self.policies.get(dn.lower())
+            result[dn] = {}
+            if policy in self.entries:
+                result[dn] = {'umcPolicy': {'umcPolicyGrantedOperationSet': {'policy': policy, 'value': self.entries[policy]['umcPolicyGrantedOperationSet']}}}
+        return result
+
+
+@pytest.fixture()
+def directory():
+    directory = Directory()
+    for dn in (BASE, 'cn=users,%s' % (BASE,), 'cn=groups,%s' % (BASE,), 'cn=policies,%s' % (BASE,)):
+        directory.add(dn)
+    directory.add(USER, uid=['user'])
+    directory.add(GROUP, uniqueMember=[USER])
+    directory.add(PARENT, uniqueMember=[GROUP])
+    directory.add(OTHER, uniqueMember=[])
+    directory.add(POLICY, umcPolicyGrantedOperationSet=[OPSET])
+    directory.add(OPSET, umcOperationSetCommand=['udm/*'], umcOperationSetFlavor=['users/*'], umcOperationSetHost=['*'])
+    directory.policies[PARENT.lower()] = POLICY
+    return directory
+
+
+@pytest.fixture()
+def ldap_acls(tmp_path, mocker):
+    mocker.patch.object(LDAP_ACLs, 'RESOLVED_DIR', str(tmp_path / 'resolved'))
+    mocker.patch.object(acl, 'ucr', {'ldap/base': BASE, 'hostname': 'master'})
+    return LDAP_ACLs('user', BASE)
+
+
+@pytest.fixture()
+def membership_cache(monkeypatch):
+    """The groups of the user in the group membership cache."""
+    cached = {}
+    frontend = ModuleType('univention.ldap_cache.frontend')
+    frontend.groups_for_user = lambda userdn: cached[userdn.lower()]
+    monkeypatch.setitem(sys.modules, 'univention.ldap_cache.frontend', frontend)
+    return cached
+
+
+def test_groups_from_ldap(ldap_acls, directory, membership_cache):
+    assert ldap_acls._get_groups(directory, USER) == sorted([GROUP.lower(), PARENT.lower()])
+
+
+def test_groups_from_cache(ldap_acls, directory, membership_cache):
+    membership_cache[USER.lower()] = [GROUP, PARENT]
+    assert ldap_acls._get_groups(directory, USER) == sorted([GROUP.lower(), PARENT.lower()])
+
+
+@pytest.mark.parametrize('cached', [
+    [],
+    [GROUP],
+    [GROUP, PARENT, OTHER],
+    [PARENT],
+])
+def test_groups_cache_outdated(ldap_acls, directory, membership_cache, cached):
+    membership_cache[USER.lower()] = cached
+    assert ldap_acls._get_groups(directory, USER) == sorted([GROUP.lower(), PARENT.lower()])
+
+
+def operation_sets(ldap_acls, directory):
+    return ldap_acls._get_operation_sets(directory, USER, ldap_acls._get_groups(directory, USER))
+
+
+def test_operation_sets(ldap_acls, directory, membership_cache):
+    expected = [(LDAP_ACLs.FROM_GROUP, {'umcOperationSetHost': ['*'], 'umcOperationSetFlavor': ['users/*'], 'umcOperationSetCommand': ['udm/*']})]
+    assert operation_sets(ldap_acls, directory) == expected
+    assert operation_sets(ldap_acls, directory) == expected
+    assert directory.policy_lookups == 1
+
+
+def test_operation_sets_modified(ldap_acls, directory, membership_cache):
+    operation_sets(ldap_acls, directory)
+    directory.entries[OPSET]['umcOperationSetCommand'] = [b'ucr/*']
+    directory.touch(OPSET)
+    assert operation_sets(ldap_acls, directory)[0][1]['umcOperationSetCommand'] == ['ucr/*']
+    assert directory.policy_lookups == 2
+
+
+@pytest.mark.parametrize('change', [
+    pytest.param(lambda directory: directory.touch(USER), id='user'),
+    pytest.param(lambda directory: directory.touch(PARENT), id='group'),
+    pytest.param(lambda directory: directory.touch('cn=groups,%s' % (BASE,)), id='container'),
+    pytest.param(lambda directory: directory.touch(POLICY), id='policy'),
+    pytest.param(lambda directory: directory.entries.pop(POLICY), id='policy removed'),
+    pytest.param(lambda directory: directory.entries.pop(OPSET), id='operation set removed'),
+    pytest.param(lambda directory: directory.entries[OTHER].update(uniqueMember=[USER.encode('UTF-8')]), id='membership'),
+])
+def test_operation_sets_invalidated(ldap_acls, directory, membership_cache, change):
+    operation_sets(ldap_acls, directory)
+    change(directory)
+    operation_sets(ldap_acls, directory)
+    assert directory.policy_lookups == 2
+
+
+def test_operation_sets_per_user(ldap_acls, directory, membership_cache, tmp_path):
+    operation_sets(ldap_acls, directory)
+    assert (tmp_path / 'resolved' / 'user').exists()
+    other = LDAP_ACLs('other', BASE)
+    other._get_operation_sets(directory, USER, [])
+    assert (tmp_path / 'resolved' / 'other').exists()
+    assert directory.policy_lookups == 2
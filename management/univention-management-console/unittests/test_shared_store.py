@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import os
+import pickle  # noqa: S403
+
+import pytest
+
+from univention.management.console.shared_store import SharedDict, SharedList, SharedMemory, SharedStore
+
+
+@pytest.fixture()
+def store(tmp_path):
+    store = SharedStore(str(tmp_path / 'shared.sqlite'))
+    yield store
+    store.remove()
+
+
+def namespaces(store):
+    return {namespace for namespace, in store.execute('SELECT DISTINCT ns FROM items')}
+
+
+def test_dict(store):
+    shared = store.dict()
+    shared['a'] = 1
+    shared.update({'b': [2], ('c',): {'d': 3}})
+    assert shared['a'] == 1
+    assert shared[('c',)] == {'d': 3}
+    assert len(shared) == 3
+    assert sorted(shared, key=str) == sorted(['a', 'b', ('c',)], key=str)
+    assert shared.setdefault('a', 4) == 1
+    assert shared.setdefault('e', 4) == 4
+    assert shared.pop('e') == 4
+    assert shared.pop('e', None) is None
+    with pytest.raises(KeyError):
+        shared.pop('e')
+    del shared['b']
+    assert 'b' not in shared
+    with pytest.raises(KeyError):
+        del shared['b']
+    shared.clear()
+    assert shared.copy() == {}
+
+
+def test_list(store):
+    shared = store.list()
+    shared.append(1)
+    shared.extend([2, 3])
+    shared.insert(0, 0)
+    shared[1] = 'one'
+    del shared[2]
+    assert list(shared) == [0, 'one', 3]
+    assert len(shared) == 3
+
+
+def test_pickle(store):
+    shared = store.dict()
+    shared['a'] = 1
+    attached = pickle.loads(pickle.dumps(shared))  # noqa: S301
+    assert isinstance(attached, SharedDict)
+    attached['b'] = 2
+    assert dict(shared) == {'a': 1, 'b': 2}
+
+
+def test_other_process(store):
+    shared = store.dict()
+    pid = os.fork()
+    if not pid:
+        try:
+            shared['child'] = os.getpid()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert shared['child'] == pid
+
+
+def test_nested(store):
+    queue = store.dict('queue')
+    status = store.dict()
+    status.update({'finished': False, 'moved': store.list()})
+    queue['user'] = store.dict()
+    queue['user']['1'] = status
+    status['moved'].append('cn=moved')
+    assert isinstance(queue['user']['1']['moved'], SharedList)
+    assert list(queue['user']['1']['moved']) == ['cn=moved']
+
+
+@pytest.mark.parametrize('remove', [
+    lambda queue: queue['user'].pop('1', {}),
+    lambda queue: queue['user'].__delitem__('1'),
+    lambda queue: queue['user'].__setitem__('1', None),
+    lambda queue: queue['user'].update({'1': None}),
+    lambda queue: queue.clear(),
+    lambda queue: queue.pop('user'),
+])
+def test_nested_removed(store, remove):
+    queue = store.dict('queue')
+    queue['user'] = store.dict()
+    status = store.dict()
+    status.update({'finished': True, 'moved': store.list()})
+    status['moved'].append('cn=moved')
+    queue['user']['1'] = status
+    assert len(namespaces(store)) == 4
+    remove(queue)
+    assert namespaces(store) <= {'queue', queue.get('user', store.dict())._namespace}
+    assert len(status) == 0
+
+
+def test_nested_popped(store):
+    shared = store.dict()
+    nested = store.dict()
+    nested['moved'] = store.list()
+    nested['moved'].append('cn=moved')
+    shared['status'] = nested
+    assert shared.pop('status') == {'moved': ['cn=moved']}
+    assert namespaces(store) == set()
+
+
+def test_nested_kept(store):
+    shared = store.dict()
+    nested = store.dict()
+    nested['a'] = 1
+    shared['nested'] = nested
+    shared['nested'] = nested
+    shared.update({'nested': nested})
+    assert dict(shared['nested']) == {'a': 1}
+
+
+def test_list_nested_removed(store):
+    shared = store.list()
+    nested = store.dict()
+    nested['a'] = 1
+    shared.append(nested)
+    shared.append(nested)
+    del shared[0]
+    assert dict(shared[0]) == {'a': 1}
+    shared.pop()
+    assert len(nested) == 0
+
+
+def test_shared_memory(tmp_path):
+    class Memory(SharedMemory):
+        shared_dicts = ('children',)
+
+    memory = Memory(str(tmp_path / 'run'), 'test')
+    assert memory.children == {}
+    assert memory.dict() == {}
+    memory.start()
+    try:
+        assert isinstance(memory.children, SharedDict)
+        assert os.stat(memory.store.filename).st_mode & 0o777 == 0o600
+        memory.children['pid'] = 1
+        assert isinstance(memory.list(), SharedList)
+    finally:
+        memory.shutdown()
+    assert not os.path.exists(memory.store.filename)
@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from univention.management.console import zygote
+from univention.management.console.zygote import Zygote, ZygotePool, request_fork
+
+
+class FakeConfigRegistry(dict):
+
+    def is_true(self, key, default=False):
+        return self.get(key, str(default)).lower() in ('true', 'yes', '1')
+
+    def get_int(self, key, default=None):
+        return int(self.get(key, default))
+
+
+class FakeZygoteProcess:
+    """A zygote which is ready at once and forks fake processes."""
+
+    def __init__(self, module, locale, exit_callback):
+        self.module = module
+        self.locale = locale
+        self.started = time.monotonic()
+        self.ready = True
+        self.retired = False
+
+    def fork(self, module_socket):
+        return (self.module, self.locale, module_socket)
+
+    def retire(self):
+        self.retired = True
+
+
+@pytest.fixture()
+def pool(mocker):
+    mocker.patch.object(zygote, 'ucr', FakeConfigRegistry({'umc/module/prefork/modules': 'udm ucr', 'umc/module/prefork/locales': 'de_DE'}))
+    mocker.patch.object(zygote, '_ZygoteProcess', FakeZygoteProcess)
+    return ZygotePool()
+
+
+def test_fork_after_start(pool):
+    assert pool.fork('udm', 'de_DE', 'udm.socket') is None
+    pool.start()
+    assert pool.fork('udm', 'de_DE', 'udm.socket') == ('udm', 'de_DE', 'udm.socket')
+    assert pool.fork('ucr', 'de_DE', 'ucr.socket') == ('ucr', 'de_DE', 'ucr.socket')
+
+
+def test_fork_starts_zygote(pool):
+    pool.start()
+    assert pool.fork('top', 'de_DE', 'top.socket') is None
+    assert pool.fork('top', 'de_DE', 'top.socket') == ('top', 'de_DE', 'top.socket')
+
+
+def test_disabled(pool):
+    zygote.ucr['umc/module/prefork'] = 'false'
+    pool.start()
+    assert pool.fork('udm', 'de_DE', 'udm.socket') is None
+    assert pool.fork('udm', 'de_DE', 'udm.socket') is None
+
+
+def test_reload(pool):
+    pool.start()
+    old = pool._zygotes[('udm', 'de_DE')]
+    pool.reload()
+    assert old.retired
+    assert pool._zygotes[('udm', 'de_DE')] is not old
+
+
+def test_fork_from_zygote(tmp_path):
+    zygote_socket = str(tmp_path / 'zygote.socket')
+    module_socket = str(tmp_path / 'module.socket')
+    pid = os.fork()
+    if pid == 0:
+        returncode = 1
+        try:
+            request = Zygote(zygote_socket, 'test').run()
+            # the forked module process
+            with open(request['socket'], 'w') as fd:
+                fd.write(str(os.getpid()))
+            returncode = 3
+        except SystemExit:
+            returncode = 0
+        finally:
+            os._exit(returncode)
+
+    try:
+        for _i in range(100):
+            if os.path.exists(zygote_socket):
+                break
+            time.sleep(0.05)
+
+        async def fork():
+            exited = asyncio.get_running_loop().create_future()
+            process = request_fork(zygote_socket, module_socket)
+            process.set_exit_callback(exited.set_result)
+            return process.pid, await asyncio.wait_for(exited, 10)
+
+        child, returncode = asyncio.run(fork())
+        assert returncode == 3
+        with open(module_socket) as fd:
+            assert int(fd.read()) == child
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        _pid, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
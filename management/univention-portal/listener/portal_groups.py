@@ -36,14 +36,68 @@ import subprocess
 from univention.listener import ListenerModuleConfiguration, ListenerModuleHandler
 
 
-GROUP_CACHE = '/var/cache/univention-portal/groups.json'
+GROUP_DB = '/var/cache/univention-portal/groups.db'
 
 
 class PortalGroups(ListenerModuleHandler):
+    """
+    Keep the groups of every user in :py:data:`GROUP_DB` up to date.
+
+    Only the users that were added to or removed from a group (directly or
+    through a nested group) are written. The groups are taken from
+    univention-group-membership-cache, whose listener module runs before
+    this one.
+    """
+
+    def create(self, dn, new):
+        self._update_users(self._get_members(new), self._get_uids(new))
+
+    def modify(self, dn, old, new, old_dn):
+        old_members, new_members = self._get_members(old), self._get_members(new)
+        if old_dn and old_dn.lower() != dn.lower():
+            # the DN of the group is part of the groups of all of its users
+            members = old_members | new_members
+        else:
+            members = old_members ^ new_members
+        self._update_users(members, self._get_uids(old) | self._get_uids(new))
+
+    def remove(self, dn, old):
+        self._update_users(self._get_members(old), self._get_uids(old))
+
     def post_run(self):
+        # portals still configured with a GroupFileCache rebuild it completely
         with self.as_root():
             subprocess.call(['/usr/sbin/univention-portal', 'update', '--reason', 'ldap:group'])
 
+    @staticmethod
+    def _get_members(attrs):
+        return {member.decode('UTF-8').lower() for member in attrs.get('uniqueMember', [])}
+
+    @staticmethod
+    def _get_uids(attrs):
+        return {uid.decode('UTF-8').lower() for uid in attrs.get('memberUid', [])}
+
+    def _update_users(self, members, uids):
+        from univention.ldap_cache.frontend import _extract_id_from_dn, groups_for_user, users_in_group
+        from univention.portal.groups import UserGroupsDB
+
+        users = set()
+        for member in members:
+            rdn = _extract_id_from_dn(member)
+            if rdn in uids:
+                users.add(member)
+            elif '%s$' % (rdn,) in uids:
+                continue
+            else:
+                users.update(users_in_group(member))
+        if not users:
+            return
+
+        self.logger.debug('Updating groups of %d users', len(users))
+        groups = {_extract_id_from_dn(user): groups_for_user(user) for user in users}
+        with self.as_root():
+            UserGroupsDB(GROUP_DB).update(groups)
+
     class Configuration(ListenerModuleConfiguration):
         description = 'Maintain groups cache for Univention Portal'
         ldap_filter = '(univentionObjectType=groups/group)'
@@ -36,12 +36,14 @@ import base64
 import binascii
 import hashlib
 import json
+import time
 from urllib.parse import urljoin
 
 from tornado.httpclient import AsyncHTTPClient, HTTPError, HTTPRequest
 
 from univention.portal import Plugin, config
 from univention.portal.log import get_logger
+from univention.portal.sessions import SessionCache, session_key
 from univention.portal.user import User
 
 
@@ -98,13 +100,20 @@ class UMCAuthenticator(Authenticator):
             The URL where to go to with the cookie. Expects a json answer with the username.
     group_cache:
             As UMC does not return groups, we need a cache object that gets us the groups for the username.
+    session_cache_ttl:
+            Seconds the owner of a session is remembered (at most until UMC expires the session). 0 disables the cache.
+    session_cache_size:
+            Maximum number of sessions remembered.
+    session_cache_file:
+            Optional SQLite database to share the remembered sessions with other portal processes.
     """
 
-    def __init__(self, auth_mode, umc_session_url, group_cache):
+    def __init__(self, auth_mode, umc_session_url, group_cache, session_cache_ttl=30, session_cache_size=10000, session_cache_file=None):
         self.auth_mode = auth_mode
         umc_base_url = config.fetch("umc_base_url")
         self.umc_session_url = urljoin(umc_base_url, 'get/session-info')
         self.group_cache = group_cache
+        self.session_cache = SessionCache(session_cache_ttl, session_cache_size, session_cache_file)
 
     def get_auth_mode(self, request):
         return self.auth_mode
@@ -112,10 +121,16 @@ class UMCAuthenticator(Authenticator):
     def refresh(self, reason=None):
         return self.group_cache.refresh(reason=reason)
 
+    async def logout_user(self, request):
+        cookies = {key: morsel.value for key, morsel in request.cookies.items()}
+        key = session_key(cookies)
+        if key:
+            self.session_cache.invalidate(key)
+
     async def get_user(self, request):
         cookies = {key: morsel.value for key, morsel in request.cookies.items()}
         username, display_name = await self._get_username(cookies)
-        groups = self.group_cache.get().get(username, [])
+        groups = self.group_cache.get_groups(username)
         return User(username, display_name=display_name, groups=groups, headers=dict(request.request.headers))
 
     async def _get_username(self, cookies):
@@ -130,6 +145,9 @@ class UMCAuthenticator(Authenticator):
         else:
             get_logger("user").debug("no user given")
             return None, None
+        username = self.session_cache.get(session_key(cookies))
+        if username is not None:
+            return username.lower(), username
         get_logger("user").debug("searching user for cookies=%r" % cookies)
 
         username = await self._ask_umc(cookies, headers)
@@ -141,23 +159,35 @@ class UMCAuthenticator(Authenticator):
             return username.lower(), username
 
     async def _ask_umc(self, cookies, headers):
+        key = session_key(cookies)
+        start = time.monotonic()
+        success = False
         try:
             headers['Cookie'] = '; '.join('='.join(c) for c in cookies.items())
             req = HTTPRequest(self.umc_session_url, method="GET", headers=headers)
             http_client = AsyncHTTPClient()
             response = await http_client.fetch(req)
+            success = True
             data = json.loads(response.body.decode('UTF-8'))
             username = data["result"]["username"]
         except HTTPError as exc:
             get_logger("user").error("request failed: %s" % exc)
+            if exc.code == 401 and key:
+                self.session_cache.invalidate(key)
         except OSError as exc:
             get_logger("user").error("connection failed: %s" % exc)
         except ValueError:
             get_logger("user").error("malformed answer!")
         except KeyError:
             get_logger("user").warning("session unknown!")
+            if key:
+                self.session_cache.invalidate(key)
         else:
+            if key and self.session_cache.ttl:
+                self.session_cache.set(key, username, data["result"].get("remaining"))
             return username
+        finally:
+            self.session_cache.record_umc_request(time.monotonic() - start, success)
 
 
 class UMCAndSecretAuthenticator(UMCAuthenticator):
@@ -192,5 +222,5 @@ class UMCAndSecretAuthenticator(UMCAuthenticator):
             get_logger("user").warning("password mismatch: %s != %s", config_secret, password)
             return user
 
-        groups = self.group_cache.get().get(username, [])
+        groups = self.group_cache.get_groups(username)
         return User(username, display_name, groups, headers=dict(request.request.headers))
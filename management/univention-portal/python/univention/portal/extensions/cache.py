@@ -35,9 +35,12 @@
 
 import json
 import os
+import sqlite3
+from collections import OrderedDict
 from copy import deepcopy
 
 from univention.portal import Plugin
+from univention.portal.groups import UserGroupsDB
 from univention.portal.log import get_logger
 
 
@@ -102,8 +105,23 @@ class PortalFileCache(Cache):
     `get_categories`
     `get_menu_links`
     `get_announcements`
+    `get_index`: Read-only `PortalIndex` of the current content, no copies
     """
 
+    def __init__(self, cache_file, reloader=None):
+        super().__init__(cache_file, reloader)
+        self._index = None
+
+    def _load(self):
+        super()._load()
+        self._index = None
+
+    def get_index(self):
+        content = self.get()
+        if self._index is None or self._index.content is not content:
+            self._index = PortalIndex(content)
+        return self._index
+
     def get_user_links(self):
         return deepcopy(self.get()["user_links"])
 
@@ -126,9 +144,131 @@ class PortalFileCache(Cache):
         return deepcopy(self.get()["announcements"])
 
 
+class PortalIndex:
+    """
+    Precomputed lookup structures for one loaded portal content. The content
+    is shared, not copied, and must not be modified by its users.
+
+    `groups`: the (lower case) groups entries are restricted to.
+
+    `visible_dns`: entry, folder and category DNs visible for a group set;
+    memoized, as many users share the same groups.
+
+    content:
+            The content of a `PortalFileCache`
+    """
+
+    MEMO_SIZE = 1024
+
+    def __init__(self, content):
+        self.content = content
+        self.entries = content.get("entries", {})
+        self.folders = content.get("folders", {})
+        self.categories = content.get("categories", {})
+        self.announcements = content.get("announcements", {})
+        self.portal = content.get("portal", {})
+        self.user_links = content.get("user_links", [])
+        self.menu_links = content.get("menu_links", [])
+        self.folder_entries = {folder_dn: self._flatten(folder_dn) for folder_dn in self.folders}
+        self.category_entries = {category_dn: frozenset(category["entries"]) for category_dn, category in self.categories.items()}
+        # entries shown without admin mode, for users and anonymous users:
+        # (entries without group restriction, {group: restricted entries})
+        self._shown = {False: (set(), {}), True: (set(), {})}
+        for entry_dn, entry in self.entries.items():
+            if not entry["in_portal"] or not entry["activated"]:
+                continue
+            for anonymous in ((True,) if entry["anonymous"] else (False, True)):
+                public, by_group = self._shown[anonymous]
+                if entry["allowedGroups"]:
+                    for group in entry["allowedGroups"]:
+                        by_group.setdefault(group.lower(), set()).add(entry_dn)
+                else:
+                    public.add(entry_dn)
+        self.groups = frozenset(group for _public, by_group in self._shown.values() for group in by_group)
+        self._memo = OrderedDict()
+
+    def _flatten(self, folder_dn):
+        ret = set()
+        unpacked = {folder_dn}
+        todo = [folder_dn]
+        while todo:
+            for entry_dn in self.folders[todo.pop()]["entries"]:
+                if entry_dn in self.entries:
+                    ret.add(entry_dn)
+                elif entry_dn in self.folders and entry_dn not in unpacked:
+                    unpacked.add(entry_dn)
+                    todo.append(entry_dn)
+        return frozenset(ret)
+
+    def visible_dns(self, groups, anonymous, admin_mode):
+        key = (frozenset(groups), anonymous, admin_mode)
+        try:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+        except KeyError:
+            pass
+
+        if admin_mode:
+            entry_dns, folder_dns, category_dns = list(self.entries), list(self.folders), list(self.categories)
+        else:
+            public, by_group = self._shown[anonymous]
+            visible = set(public)
+            for group in key[0]:
+                visible.update(by_group.get(group, ()))
+            entry_dns = [entry_dn for entry_dn in self.entries if entry_dn in visible]
+            folder_dns = [folder_dn for folder_dn, entries in self.folder_entries.items() if not entries.isdisjoint(visible)]
+            visible.update(folder_dns)
+            category_dns = [category_dn for category_dn, entries in self.category_entries.items() if not entries.isdisjoint(visible)]
+
+        result = self._memo[key] = (tuple(entry_dns), tuple(folder_dns), tuple(category_dns))
+        if len(self._memo) > self.MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return result
+
+
 class GroupFileCache(Cache):
     """
     Caching class for groups.
     In fact it is just the same as the normal Cache and just here in case
     we want to get smarter at some point.
+
+    `get_groups`
     """
+
+    def get_groups(self, username):
+        return self.get().get(username, [])
+
+
+class GroupDBCache(Cache):
+    """
+    Caching class for groups stored per user in a database which is updated
+    incrementally by the listener module `portal_groups`. Only the groups of
+    the requested user are read; nothing is loaded into memory.
+
+    `get_groups`
+
+    cache_file:
+            Filename of the database, see `univention.portal.groups.UserGroupsDB`
+    reloader:
+            Class that handles a complete rebuild, e.g. `GroupsReloaderDB`
+    """
+
+    def __init__(self, cache_file, reloader=None):
+        super().__init__(cache_file, reloader)
+        self._db = UserGroupsDB(cache_file)
+
+    def _load(self):
+        get_logger("cache").info(f"loading cache file {self._cache_file}")
+        try:
+            self._cache = dict(self._db.items())
+        except sqlite3.Error:
+            get_logger("cache").exception(f"Error loading {self._cache_file}")
+        else:
+            self._loaded = True
+
+    def get_groups(self, username):
+        try:
+            return self._db.get(username)
+        except sqlite3.Error:
+            get_logger("cache").exception(f"Error reading groups of {username} from {self._cache_file}")
+            return []
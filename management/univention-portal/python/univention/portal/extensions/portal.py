@@ -115,82 +115,51 @@ class Portal(metaclass=Plugin):
         return await self.authenticator.logout_user(request)
 
     def get_visible_content(self, user, admin_mode):
-        entries = self.portal_cache.get_entries()
-        folders = self.portal_cache.get_folders()
-        categories = self.portal_cache.get_categories()
-        announcements = self.portal_cache.get_announcements()
-        visible_entry_dns = self._filter_entry_dns(entries.keys(), entries, user, admin_mode)
-        visible_folder_dns = [
-            folder_dn
-            for folder_dn in folders.keys()
-            if admin_mode or len(
-                [
-                    entry_dn
-                    for entry_dn in self._get_all_entries_of_folder(folder_dn, folders, entries)
-                    if entry_dn in visible_entry_dns
-                ],
-            ) > 0
-        ]
-        visible_category_dns = [
-            category_dn
-            for category_dn in categories.keys()
-            if admin_mode or len(
-                [
-                    entry_dn
-                    for entry_dn in categories[category_dn]["entries"]
-                    if entry_dn in visible_entry_dns or entry_dn in visible_folder_dns
-                ],
-            ) > 0
-        ]
+        index = self.portal_cache.get_index()
+        groups = [group for group in index.groups if user.is_member_of(group)]
+        entry_dns, folder_dns, category_dns = index.visible_dns(groups, bool(user.is_anonymous()), admin_mode)
         visible_announcement_dns = [
             announcement_dn
-            for announcement_dn, announcement in announcements.items()
+            for announcement_dn, announcement in index.announcements.items()
             if self._announcement_visible(user, announcement)
         ]
         return {
-            "entry_dns": visible_entry_dns,
-            "folder_dns": visible_folder_dns,
-            "category_dns": visible_category_dns,
+            "entry_dns": list(entry_dns),
+            "folder_dns": list(folder_dns),
+            "category_dns": list(category_dns),
             "announcement_dns": visible_announcement_dns,
         }
 
+    def _visible_dns(self, content):
+        return set(content["entry_dns"]).union(content["folder_dns"])
+
     def get_user_links(self, content):
-        links = self.portal_cache.get_user_links()
-        return [
-            dn for dn in links if dn in content["entry_dns"] or dn in content["folder_dns"]
-        ]
+        visible = self._visible_dns(content)
+        return [dn for dn in self.portal_cache.get_index().user_links if dn in visible]
 
     def get_menu_links(self, content):
-        links = self.portal_cache.get_menu_links()
-        return [
-            dn for dn in links if dn in content["entry_dns"] or dn in content["folder_dns"]
-        ]
+        visible = self._visible_dns(content)
+        return [dn for dn in self.portal_cache.get_index().menu_links if dn in visible]
 
     def get_entries(self, content):
-        entries = self.portal_cache.get_entries()
+        entries = self.portal_cache.get_index().entries
         return [entries[entry_dn] for entry_dn in content["entry_dns"]]
 
     def get_folders(self, content):
-        folders = self.portal_cache.get_folders()
-        folders = [folders[folder_dn] for folder_dn in content["folder_dns"]]
-        for folder in folders:
-            folder["entries"] = [
-                entry_dn
-                for entry_dn in folder["entries"]
-                if entry_dn in content["entry_dns"] or entry_dn in content["folder_dns"]
-            ]
-        return folders
+        folders = self.portal_cache.get_index().folders
+        visible = self._visible_dns(content)
+        return [
+            dict(folders[folder_dn], entries=[entry_dn for entry_dn in folders[folder_dn]["entries"] if entry_dn in visible])
+            for folder_dn in content["folder_dns"]
+        ]
 
     def get_categories(self, content):
-        categories = self.portal_cache.get_categories()
-        categories = [categories[category_dn] for category_dn in content["category_dns"]]
-        for category in categories:
-            category["entries"] = [
-                entry_dn
-                for entry_dn in category["entries"]
-                if entry_dn in content["entry_dns"] or entry_dn in content["folder_dns"]
-            ]
-        return categories
+        categories = self.portal_cache.get_index().categories
+        visible = self._visible_dns(content)
+        return [
+            dict(categories[category_dn], entries=[entry_dn for entry_dn in categories[category_dn]["entries"] if entry_dn in visible])
+            for category_dn in content["category_dns"]
+        ]
 
     def auth_mode(self, request):
         return self.authenticator.get_auth_mode(request)
@@ -199,14 +168,16 @@ class Portal(metaclass=Plugin):
         return config.fetch('editable') and user.is_admin()
 
     def get_meta(self, content, categories):
-        portal = self.portal_cache.get_portal()
+        portal = dict(self.portal_cache.get_index().portal)
+        visible_categories = set(content["category_dns"])
+        category_entries = {category["dn"]: category["entries"] for category in categories}
         portal["categories"] = [
             category_dn
             for category_dn in portal["categories"]
-            if category_dn in content["category_dns"]
+            if category_dn in visible_categories
         ]
         portal["content"] = [
-            [category_dn, next(category for category in categories if category["dn"] == category_dn)["entries"]]
+            [category_dn, category_entries[category_dn]]
             for category_dn in portal["categories"]
         ]
         return portal
@@ -232,45 +203,9 @@ class Portal(metaclass=Plugin):
         return visible
 
     def get_announcements(self, content):
-        announcements = self.portal_cache.get_announcements()
+        announcements = self.portal_cache.get_index().announcements
         return [announcements[announcement_dn] for announcement_dn in content["announcement_dns"]]
 
-    def _filter_entry_dns(self, entry_dns, entries, user, admin_mode):
-        filtered_dns = []
-        for entry_dn in entry_dns:
-            entry = entries.get(entry_dn)
-            if entry is None:
-                continue
-            if not admin_mode:
-                if not entry["in_portal"]:
-                    continue
-                if not entry["activated"]:
-                    continue
-                if entry["anonymous"] and not user.is_anonymous():
-                    continue
-                if entry["allowedGroups"]:
-                    for group in entry["allowedGroups"]:
-                        if user.is_member_of(group):
-                            break
-                    else:
-                        continue
-            filtered_dns.append(entry_dn)
-        return filtered_dns
-
-    def _get_all_entries_of_folder(self, folder_dn, folders, entries):
-        def _flatten(folder_dn, folders, entries, ret, already_unpacked_folder_dns):
-            for entry_dn in folders[folder_dn]["entries"]:
-                if entry_dn in entries:
-                    if entry_dn not in ret:
-                        ret.append(entry_dn)
-                elif entry_dn in folders and entry_dn not in already_unpacked_folder_dns:
-                    already_unpacked_folder_dns.append(entry_dn)
-                    _flatten(entry_dn, folders, entries, ret, already_unpacked_folder_dns)
-
-        ret = []
-        _flatten(folder_dn, folders, entries, ret, [])
-        return ret
-
     def refresh(self, reason=None):
         touched = self.portal_cache.refresh(reason=reason)
         touched = self.authenticator.refresh(reason=reason) or touched
@@ -44,6 +44,7 @@ from urllib.parse import quote
 from filetype import guess
 
 from univention.portal import Plugin, config
+from univention.portal.groups import UserGroupsDB
 from univention.portal.log import get_logger
 
 
@@ -366,3 +367,20 @@ class GroupsReloaderLDAP(MtimeBasedLazyFileReloader):
         with tempfile.NamedTemporaryFile(mode="w", delete=False) as fd:
             json.dump(users, fd, sort_keys=True, indent=4)
         return fd
+
+
+class GroupsReloaderDB(GroupsReloaderLDAP):
+    """
+    Specialized class that rebuilds the database of `GroupDBCache` from
+    univention-group-membership-cache. The database is kept up to date by
+    the listener module `portal_groups`, so it is only rebuilt completely
+    for the reason "force". Takes the same arguments as `GroupsReloaderLDAP`.
+    """
+
+    def _check_reason(self, reason, content=None):
+        return MtimeBasedLazyFileReloader._check_reason(self, reason, content)
+
+    def _refresh(self):
+        from univention.ldap_cache.frontend import users_groups
+
+        UserGroupsDB(self._cache_file).replace(users_groups())
@@ -0,0 +1,158 @@
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Per user store of group memberships.
+
+The portal used to load one JSON file mapping every user to all of its
+groups. With many users this file gets big and every group change in LDAP
+re-created it completely. This store keeps one row per user in a SQLite
+database instead: readers only fetch the row of the user they need and the
+listener only rewrites the rows of the users whose groups changed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+
+
+MMAP_SIZE = 64 * 1024 * 1024
+
+SCHEMA = 'CREATE TABLE IF NOT EXISTS groups (username TEXT PRIMARY KEY NOT NULL, groups TEXT NOT NULL) WITHOUT ROWID'
+
+
+class UserGroupsDB:
+    """
+    Access to the database holding the groups of each user.
+
+    Readers keep their connection open and re-open it only when the file
+    was removed or replaced.
+
+    :param filename: Path of the SQLite database.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._inode: tuple[int, int] | None = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            self.close()
+            return None
+        inode = (stat.st_dev, stat.st_ino)
+        if self._conn is None or self._inode != inode:
+            self.close()
+            self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+            self._conn.execute('PRAGMA mmap_size = %d' % (MMAP_SIZE,))
+            self._inode = inode
+        return self._conn
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._inode = None
+            conn.close()
+
+    def get(self, username: str) -> list[str]:
+        """
+        Return the groups of one user.
+
+        :param username: The lower case user name.
+        :returns: The lower case DNs of all groups the user is (nested) member of.
+        :raises sqlite3.Error: if the database is unusable.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            row = conn.execute('SELECT groups FROM groups WHERE username = ?', (username,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def items(self) -> Iterator[tuple[str, list[str]]]:
+        """Iterate over all users and their groups."""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute('SELECT username, groups FROM groups').fetchall() if conn is not None else []
+        for username, groups in rows:
+            yield username, json.loads(groups)
+
+    def _write(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        conn = sqlite3.connect(self.filename, timeout=30)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(SCHEMA)
+        return conn
+
+    def update(self, users: Mapping[str, Iterable[str]]) -> None:
+        """
+        Replace the groups of some users in one transaction.
+
+        :param users: Mapping of lower case user names to their groups. Users
+                without any groups are removed.
+        """
+        conn = self._write()
+        try:
+            with conn:
+                for username, groups in users.items():
+                    groups = sorted(groups)
+                    if groups:
+                        conn.execute('INSERT OR REPLACE INTO groups (username, groups) VALUES (?, ?)', (username, json.dumps(groups)))
+                    else:
+                        conn.execute('DELETE FROM groups WHERE username = ?', (username,))
+        finally:
+            conn.close()
+
+    def replace(self, users: Mapping[str, Iterable[str]]) -> None:
+        """
+        Replace the whole content in one transaction.
+
+        Readers continue to see the old content until the transaction is
+        committed, so there is no need to write a new file and rename it.
+
+        :param users: Mapping of lower case user names to their groups.
+        """
+        conn = self._write()
+        try:
+            with conn:
+                conn.execute('DELETE FROM groups')
+                conn.executemany(
+                    'INSERT INTO groups (username, groups) VALUES (?, ?)',
+                    ((username, json.dumps(sorted(groups))) for username, groups in users.items() if groups),
+                )
+        finally:
+            conn.close()
@@ -58,8 +58,8 @@ class NavigationHandler(PortalResource):
         visible_content = portal.get_visible_content(user, False)
         categories_content = portal.get_categories(visible_content)
         meta = portal.get_meta(visible_content, categories_content)
-        entries = portal.portal_cache.get_entries()
-        visible_entry_dns = portal._filter_entry_dns(entries.keys(), entries, user, False)
+        entries = portal.portal_cache.get_index().entries
+        visible_entry_dns = set(visible_content["entry_dns"])
 
         def get_category(category_dn):
             for category in categories_content:
@@ -0,0 +1,228 @@
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Cache of UMC sessions.
+
+Without it every portal request of a logged in user asks UMC who the owner
+of the session cookie is. The answer is now kept for a short time, but
+never longer than UMC says the session will live. Optionally the answers
+are shared with other portal processes through a SQLite database.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+from univention.portal.log import get_logger
+
+
+SCHEMA = 'CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY NOT NULL, username TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID'
+
+
+def session_key(cookies):
+    """
+    Build the cache key for the UMC session cookies of a request.
+
+    The raw session IDs are hashed so that they are not kept in memory or
+    written to disk as they are.
+
+    :param dict cookies: All cookies of the request.
+    :returns: The key or `None` if there is no UMC session cookie.
+    """
+    sessions = sorted((name, value) for name, value in cookies.items() if name.startswith("UMCSessionId"))
+    if not sessions:
+        return None
+    return hashlib.sha256('; '.join('%s=%s' % session for session in sessions).encode('UTF-8')).hexdigest()
+
+
+class SessionCache:
+    """
+    Bounded, time based cache mapping session keys to user names.
+
+    Counts hits, misses and the time UMC needed to answer, and logs these
+    statistics regularly.
+
+    :param int ttl: Seconds an answer of UMC is kept at most.
+    :param int maxsize: Number of sessions kept in this process.
+    :param str shared_file: Optional SQLite database to share the sessions
+            between processes.
+    """
+
+    STATS_INTERVAL = 300
+    CLEANUP_INTERVAL = 1000
+
+    def __init__(self, ttl=30, maxsize=10000, shared_file=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.shared_file = shared_file
+        self._sessions = OrderedDict()
+        self._shared = None
+        self._writes = 0
+        self._stats_logged = time.monotonic()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.umc_requests = 0
+        self.umc_errors = 0
+        self.umc_time = 0.0
+        self.umc_time_max = 0.0
+
+    def get(self, key):
+        """
+        Return the cached user name of a session.
+
+        :param str key: The key from :py:func:`session_key`.
+        :returns: The user name or `None` if unknown or expired.
+        """
+        self._log_stats()
+        now = time.time()
+        try:
+            username, expires = self._sessions[key]
+        except KeyError:
+            username, expires = self._get_shared(key, now)
+            if username is not None:
+                self.shared_hits += 1
+                self._set_local(key, username, expires)
+                return username
+        else:
+            if expires > now:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return username
+            del self._sessions[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, username, remaining=None):
+        """
+        Remember the owner of a session.
+
+        :param str key: The key from :py:func:`session_key`.
+        :param str username: The user name as returned by UMC.
+        :param int remaining: Seconds until UMC expires the session, if known.
+        """
+        ttl = self.ttl if remaining is None else max(min(self.ttl, remaining), 0)
+        if not ttl:
+            return self.invalidate(key)
+        expires = time.time() + ttl
+        self._set_local(key, username, expires)
+        self._set_shared(key, username, expires)
+
+    def invalidate(self, key):
+        """
+        Forget a session, e.g. after logout or when UMC does not know it (anymore).
+
+        :param str key: The key from :py:func:`session_key`.
+        """
+        self.invalidations += 1
+        self._sessions.pop(key, None)
+        self._set_shared(key, None, 0)
+
+    def record_umc_request(self, seconds, success):
+        """
+        Account a request to UMC.
+
+        :param float seconds: Duration of the request.
+        :param bool success: Whether UMC answered at all.
+        """
+        self.umc_requests += 1
+        if not success:
+            self.umc_errors += 1
+        self.umc_time += seconds
+        self.umc_time_max = max(self.umc_time_max, seconds)
+
+    def stats(self):
+        """Return the collected statistics."""
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._sessions),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "umc_requests": self.umc_requests,
+            "umc_errors": self.umc_errors,
+            "umc_time_avg": self.umc_time / self.umc_requests if self.umc_requests else 0.0,
+            "umc_time_max": self.umc_time_max,
+        }
+
+    def _log_stats(self):
+        now = time.monotonic()
+        if now - self._stats_logged < self.STATS_INTERVAL:
+            return
+        self._stats_logged = now
+        get_logger("session").info("session cache statistics: %s", ", ".join("%s=%s" % (key, round(value, 3)) for key, value in self.stats().items()))
+
+    def _set_local(self, key, username, expires):
+        self._sessions[key] = (username, expires)
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+
+    def _connect(self):
+        if self._shared is None:
+            os.makedirs(os.path.dirname(self.shared_file), exist_ok=True)
+            conn = sqlite3.connect(self.shared_file, timeout=5)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(SCHEMA)
+            self._shared = conn
+        return self._shared
+
+    def _get_shared(self, key, now):
+        if not self.shared_file:
+            return None, None
+        try:
+            row = self._connect().execute('SELECT username, expires FROM sessions WHERE key = ? AND expires > ?', (key, now)).fetchone()
+        except sqlite3.Error as exc:
+            get_logger("session").warning("Cannot read shared session cache %s: %s", self.shared_file, exc)
+            return None, None
+        return row if row else (None, None)
+
+    def _set_shared(self, key, username, expires):
+        if not self.shared_file:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                if username is None:
+                    conn.execute('DELETE FROM sessions WHERE key = ?', (key,))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO sessions (key, username, expires) VALUES (?, ?, ?)', (key, username, expires))
+                self._writes += 1
+                if self._writes % self.CLEANUP_INTERVAL == 0:
+                    conn.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+        except sqlite3.Error as exc:
+            get_logger("session").warning("Cannot write shared session cache %s: %s", self.shared_file, exc)
@@ -55,7 +55,7 @@ class TestUMCAuthenticator:
     def mocked_authenticator(self, dynamic_class, patch_object_module, mocker):
         Authenticator = dynamic_class("UMCAuthenticator")
         mocked_group_cache = mocker.Mock()
-        mocked_group_cache.get.return_value = {self._username.lower(): self._groups}
+        mocked_group_cache.get_groups.side_effect = lambda username: {self._username.lower(): self._groups}.get(username, [])
         authenticator = Authenticator(self._auth_mode, self._umc_session_url, mocked_group_cache)
         authenticator.httpclient_fetch = patch_object_module(authenticator, "AsyncHTTPClient.fetch")
         return authenticator
@@ -175,6 +175,27 @@ class TestUMCAuthenticator:
         assert loop.run_until_complete(mocked_authenticator._ask_umc({self._umc_cookie_name: ""}, {})) is None
         assert mocked_authenticator.httpclient_fetch.call_count == 2
 
+    def test_session_cache(self, mocked_authenticator, mocker):
+        response_mock = mocker.Mock()
+        response_mock.body = json.dumps({"result": {"username": self._username, "remaining": 300}}).encode()
+        future = asyncio.Future()
+        future.set_result(response_mock)
+        mocked_authenticator.httpclient_fetch.return_value = future
+        loop = asyncio.get_event_loop()
+        test_session = {self._umc_cookie_name: "test_session"}
+
+        assert loop.run_until_complete(mocked_authenticator._get_username(test_session)) == (self._username.lower(), self._username)
+        assert loop.run_until_complete(mocked_authenticator._get_username(test_session)) == (self._username.lower(), self._username)
+        assert mocked_authenticator.httpclient_fetch.call_count == 1
+
+        request_mock = mocker.Mock()
+        cookie_mock = mocker.Mock()
+        cookie_mock.value = "test_session"
+        request_mock.cookies = {self._umc_cookie_name: cookie_mock}
+        loop.run_until_complete(mocked_authenticator.logout_user(request_mock))
+        assert loop.run_until_complete(mocked_authenticator._get_username(test_session)) == (self._username.lower(), self._username)
+        assert mocked_authenticator.httpclient_fetch.call_count == 2
+
     def test_ask_umc_request_error(self, mocked_authenticator, mocker):
         def _side_effect(req):
             """Side effect to simulate request with a http error"""
@@ -40,6 +40,7 @@ def test_imports(dynamic_class):
     assert dynamic_class("Cache")
     assert dynamic_class("PortalFileCache")
     assert dynamic_class("GroupFileCache")
+    assert dynamic_class("GroupDBCache")
 
 
 class TestPortalFileCache:
@@ -77,3 +78,40 @@ class TestPortalFileCache:
 
 class TestGroupFileCache:
     pass
+
+
+class TestGroupDBCache:
+    @pytest.fixture()
+    def cache_file_path(self, tmp_path):
+        from univention.portal.groups import UserGroupsDB
+
+        path = str(tmp_path / "groups.db")
+        UserGroupsDB(path).replace({"user1": ["cn=b", "cn=a"], "user2": ["cn=a"], "user3": []})
+        return path
+
+    def test_missing_file(self, dynamic_class):
+        cache = dynamic_class("GroupDBCache")("/tmp/a/file/that/does/not/exist")
+        assert cache.get() == {}
+        assert cache.get_groups("user1") == []
+
+    def test_getter(self, dynamic_class, cache_file_path):
+        cache = dynamic_class("GroupDBCache")(cache_file_path)
+        assert cache.get_groups("user1") == ["cn=a", "cn=b"]
+        assert cache.get_groups("user3") == []
+        assert cache.get() == {"user1": ["cn=a", "cn=b"], "user2": ["cn=a"]}
+
+    def test_update(self, dynamic_class, cache_file_path):
+        from univention.portal.groups import UserGroupsDB
+
+        cache = dynamic_class("GroupDBCache")(cache_file_path)
+        assert cache.get_groups("user2") == ["cn=a"]
+        UserGroupsDB(cache_file_path).update({"user1": [], "user2": ["cn=c", "cn=a"], "user3": ["cn=d"]})
+        assert cache.get_groups("user1") == []
+        assert cache.get_groups("user2") == ["cn=a", "cn=c"]
+        assert cache.get_groups("user3") == ["cn=d"]
+
+    def test_reload(self, dynamic_class, cache_file_path, mocker):
+        mocked_reloader = mocker.Mock()
+        cache = dynamic_class("GroupDBCache")(cache_file_path, reloader=mocked_reloader)
+        cache.refresh(reason="force")
+        mocked_reloader.refresh.assert_called_with(reason="force", content={})
@@ -80,6 +80,13 @@ def mocked_user(mocker):
     return user
 
 
+@pytest.fixture()
+def mocked_group_user(mocked_user):
+    mocked_user.groups = ["cn=g1,cn=groups,dc=intranet,dc=example,dc=de"]
+    mocked_user.is_member_of.side_effect = lambda group: group.lower() in mocked_user.groups
+    return mocked_user
+
+
 @pytest.fixture()
 def mocked_anonymous_user(mocker):
     user = mocker.Mock()
@@ -157,6 +164,15 @@ class TestPortal:
         }
         assert content == expected_content
 
+    def test_visible_content_groups(self, mocked_group_user, standard_portal):
+        blog = "cn=univentionblog,cn=entry,cn=portals,cn=univention,dc=intranet,dc=example,dc=de"
+        assert blog in standard_portal.get_visible_content(mocked_group_user, False)["entry_dns"]
+        mocked_group_user.groups = ["cn=g3,cn=groups,dc=intranet,dc=example,dc=de"]
+        assert blog not in standard_portal.get_visible_content(mocked_group_user, False)["entry_dns"]
+        assert blog in standard_portal.get_visible_content(mocked_group_user, True)["entry_dns"]
+        mocked_group_user.groups = ["cn=g2,cn=groups,dc=intranet,dc=example,dc=de"]
+        assert blog in standard_portal.get_visible_content(mocked_group_user, False)["entry_dns"]
+
     def test_user_links(self, mocked_user, mocked_anonymous_user, standard_portal):
         content_with_user = standard_portal.get_visible_content(mocked_user, False)
         content_no_user = standard_portal.get_visible_content(mocked_anonymous_user, False)
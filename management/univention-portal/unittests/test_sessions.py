@@ -0,0 +1,82 @@
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# SPDX-FileCopyrightText: 2024 Univention GmbH
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import pytest
+
+from univention.portal.sessions import SessionCache, session_key
+
+
+def test_session_key():
+    assert session_key({}) is None
+    assert session_key({"foo": "bar"}) is None
+    key = session_key({"UMCSessionId": "secret-session-id", "foo": "bar"})
+    assert key == session_key({"UMCSessionId": "secret-session-id"})
+    assert key != session_key({"UMCSessionId": "other-session-id"})
+    assert "secret-session-id" not in key
+
+
+@pytest.fixture(params=[False, True], ids=["local", "shared"])
+def cache(request, tmp_path):
+    return SessionCache(ttl=30, maxsize=2, shared_file=str(tmp_path / "sessions.db") if request.param else None)
+
+
+def test_get_set(cache):
+    assert cache.get("k1") is None
+    cache.set("k1", "User1")
+    assert cache.get("k1") == "User1"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_remaining(cache, mocker):
+    time = mocker.patch("univention.portal.sessions.time.time", return_value=1000.0)
+    cache.set("k1", "User1", remaining=10)
+    cache.set("k2", "User2", remaining=0)
+    assert cache.get("k2") is None
+    time.return_value = 1009.0
+    assert cache.get("k1") == "User1"
+    time.return_value = 1011.0
+    assert cache.get("k1") is None
+
+
+def test_invalidate(cache):
+    cache.set("k1", "User1")
+    cache.invalidate("k1")
+    assert cache.get("k1") is None
+
+
+def test_maxsize():
+    cache = SessionCache(maxsize=2)
+    cache.set("k1", "User1")
+    cache.set("k2", "User2")
+    cache.get("k1")
+    cache.set("k3", "User3")
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "User1"
+    assert cache.get("k3") == "User3"
+
+
+def test_shared(tmp_path):
+    shared_file = str(tmp_path / "sessions.db")
+    cache1 = SessionCache(shared_file=shared_file)
+    cache2 = SessionCache(shared_file=shared_file)
+    cache1.set("k1", "User1")
+    assert cache2.get("k1") == "User1"
+    assert cache2.stats()["shared_hits"] == 1
+    cache1.invalidate("k1")
+    cache2._sessions.clear()
+    assert cache2.get("k1") is None
+
+
+def test_umc_stats():
+    cache = SessionCache()
+    cache.record_umc_request(0.5, True)
+    cache.record_umc_request(1.5, False)
+    stats = cache.stats()
+    assert stats["umc_requests"] == 2
+    assert stats["umc_errors"] == 1
+    assert stats["umc_time_avg"] == 1.0
+    assert stats["umc_time_max"] == 1.5
@@ -36,6 +36,7 @@
 
 import collections
 import copy
+import heapq
 import os
 import pickle  # noqa: S403
 import pprint
@@ -43,6 +44,7 @@ import random
 import re
 import sqlite3 as lite
 import sys
+import threading
 import traceback
 from types import FunctionType
 
@@ -57,8 +59,10 @@ import univention.admin.uldap
 import univention.debug as ud_c
 import univention.debug2 as ud
 import univention.uldap
+from univention.s4connector.journal import ChangeJournal
 from univention.s4connector.lockingdb import LockingDB
 from univention.s4connector.s4cache import S4Cache
+from univention.s4connector.workers import PerWorker, Scope, WorkerPool, synchronized
 
 
 term_signal_caught = False
@@ -66,6 +70,8 @@ term_signal_caught = False
 univention.admin.modules.update()
 
 RE_NO_RESYNC = re.compile('^<NORESYNC(=.*?)?>;')
+# number of synced journal entries which are removed from the journal at once
+JOURNAL_ACK_BATCH = 100
 
 
 def decode_guid(value):
@@ -146,8 +152,11 @@ class configdb:
 
     def __init__(self, filename):
         self.filename = filename
-        self._dbcon = lite.connect(self.filename)
+        # shared by the sync workers
+        self._lock = threading.RLock()
+        self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def get_by_value(self, section, option):
         for _i in [1, 2]:
             try:
@@ -161,8 +170,9 @@ class configdb:
             except lite.Error:
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def get(self, section, option):
         for _i in [1, 2]:
             try:
@@ -176,8 +186,9 @@ class configdb:
             except lite.Error:
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def set(self, section, option, value):
         for _i in [1, 2]:
             try:
@@ -190,8 +201,9 @@ class configdb:
                 ud.debug(ud.LDAP, ud.ERROR, "sqlite: %s" % e)
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def items(self, section):
         for _i in [1, 2]:
             try:
@@ -204,8 +216,9 @@ class configdb:
                 ud.debug(ud.LDAP, ud.WARN, "sqlite: %s" % e)
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def remove_option(self, section, option):
         for _i in [1, 2]:
             try:
@@ -218,8 +231,9 @@ class configdb:
                 ud.debug(ud.LDAP, ud.WARN, "sqlite: %s" % e)
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def has_section(self, section):
         for _i in [1, 2]:
             try:
@@ -232,8 +246,9 @@ class configdb:
                 ud.debug(ud.LDAP, ud.WARN, "sqlite: %s" % e)
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def add_section(self, section):
         for _i in [1, 2]:
             try:
@@ -246,8 +261,9 @@ class configdb:
                 ud.debug(ud.LDAP, ud.WARN, "sqlite: %s" % e)
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = lite.connect(self.filename)
+                self._dbcon = lite.connect(self.filename, check_same_thread=False)
 
+    @synchronized
     def has_option(self, section, option):
         for _i in [1, 2]:
             try:
@@ -486,9 +502,15 @@ class property:
 
 class ucs:
 
+    lo = PerWorker()
+
     def __init__(self, CONFIGBASENAME, _property, configRegistry, listener_dir, logfilename, debug_level):
 
         self.CONFIGBASENAME = CONFIGBASENAME
+        self._worker_local = threading.local()
+        self._worker_pool = None
+        # serializes the sync workers where they share state, e.g. the group member caches
+        self._lock = threading.RLock()
 
         self.configRegistry = configRegistry
         self.property = _property  # this is the mapping!
@@ -498,6 +520,7 @@ class ucs:
         self.init_debug()
 
         self.listener_dir = listener_dir
+        self.journal = ChangeJournal(listener_dir)
 
         configdbfile = '/etc/univention/%s/s4internal.sqlite' % self.CONFIGBASENAME
         self.config = configdb(configdbfile)
@@ -515,6 +538,25 @@ class ucs:
     def init_ldap_connections(self):
         self.open_ucs()
 
+    def init_worker(self):
+        """Open the LDAP connections of the current sync worker thread."""
+        self._worker_local.active = True
+        self.open_ucs()
+
+    def worker_pool(self):
+        """Return the pool of sync workers, or `None` if changes are synced one after another."""
+        if self._worker_pool is None:
+            workers = int(self.configRegistry.get('%s/s4/workers' % self.CONFIGBASENAME, 1))
+            if workers <= 1:
+                return None
+            ud.debug(ud.LDAP, ud.PROCESS, "Syncing changes with %d workers" % (workers,))
+            self._worker_pool = WorkerPool(self, workers)
+        return self._worker_pool
+
+    def in_worker(self):
+        """Whether the current thread is a sync worker."""
+        return getattr(self._worker_local, 'active', False)
+
     def __enter__(self):
         return self
 
@@ -612,7 +654,7 @@ class ucs:
         return self.list_rejected_ucs(filter_noresync=True)
 
     def _list_rejected_filenames_ucs(self):
-        return [fn for (fn, dn) in self.list_rejected_ucs()]
+        return {fn for (fn, dn) in self.list_rejected_ucs()}
 
     def _set_dn_mapping(self, dn_ucs, dn_con):
         self._set_config_option('DN Mapping UCS', dn_ucs.lower(), dn_con.lower())
@@ -695,16 +737,57 @@ class ucs:
         prefix = '[%14s] [%10s] %r' % (property_type or '?', obj.get('modtype', '?'), obj.get('dn', '?'))
         ud.debug(ud.LDAP, level, '%s: %s%s' % (direction, prefix, ': %s' % message if message else ''))
 
+    def __load_ucs_change(self, filename):
+        """
+        read the change `(dn, new, old, old_dn)` from the given file or :py:class:`ChangeJournal` entry of the listener directory
+
+        :raises OSError: if the change does not exist (anymore).
+        """
+        change_id = ChangeJournal.change_id(filename)
+        if change_id is not None:
+            return self.journal.get(change_id)
+        with open(filename, 'rb') as fob:
+            return pickle.load(fob, encoding='bytes')
+
+    def __remove_ucs_change(self, filename):
+        """remove the given file or :py:class:`ChangeJournal` entry of the listener directory"""
+        change_id = ChangeJournal.change_id(filename)
+        if change_id is not None:
+            self.journal.acknowledge([change_id])
+            return
+        try:
+            os.remove(filename)
+        except OSError:  # file not found
+            pass
+
+    def __list_ucs_changes(self, limit):
+        """
+        the names of the oldest changes in the listener directory: the pickle
+        files written by the listener module (or `resync_object_from_ucs.py`) and
+        the entries of the :py:class:`ChangeJournal`, ordered by their time
+        """
+        files = []
+        for name in os.listdir(self.listener_dir):
+            try:
+                files.append((float(name), name))
+            except ValueError:
+                continue
+        files.sort()
+        journal = []
+        if self.journal.exists():
+            journal = [(timestamp, ChangeJournal.key(change_id)) for change_id, timestamp in self.journal.entries(limit)]
+        changes = heapq.merge(files[:limit], journal, key=lambda change: change[0])
+        return [name for _timestamp, name in changes][:limit]
+
     def __sync_file_from_ucs(self, filename, append_error='', traceback_level=ud.WARN):
         """sync changes from UCS stored in given file"""
         try:
-            with open(filename, 'rb') as fob:
-                (dn, new, old, old_dn) = pickle.load(fob, encoding='bytes')
-                # With the Python 2 listener pickle files we got bytes here, otherwise already string
-                if isinstance(dn, bytes):
-                    dn = dn.decode('utf-8')
-                if isinstance(old_dn, bytes):
-                    old_dn = old_dn.decode('utf-8')
+            (dn, new, old, old_dn) = self.__load_ucs_change(filename)
+            # With the Python 2 listener pickle files we got bytes here, otherwise already string
+            if isinstance(dn, bytes):
+                dn = dn.decode('utf-8')
+            if isinstance(old_dn, bytes):
+                old_dn = old_dn.decode('utf-8')
         except OSError:
             return True  # file not found so there's nothing to sync
         except (pickle.UnpicklingError, EOFError) as exc:
@@ -913,7 +996,6 @@ class ucs:
         # load UCS Modules
         self.modules = {}
         self.modules_others = {}
-        position = univention.admin.uldap.position(self.lo.base)
 
         for key, mapping in self.property.items():
             if mapping.ucs_module:
@@ -923,16 +1005,13 @@ class ucs:
                     self.modules[key].identify = mapping.identify
             else:
                 self.modules[key] = None
-            univention.admin.modules.init(self.lo, position, self.modules[key])
 
             self.modules_others[key] = []
             if mapping.ucs_module_others:
                 for m in mapping.ucs_module_others:
                     if m:
                         self.modules_others[key].append(univention.admin.modules.get(m))
-                for m in self.modules_others[key]:
-                    if m:
-                        univention.admin.modules.init(self.lo, position, m)
+        self.init_ucs_modules()
 
         # try to resync rejected changes
         self.resync_rejected_ucs()
@@ -941,6 +1020,26 @@ class ucs:
         print("--------------------------------------")
         sys.stdout.flush()
 
+    def init_ucs_modules(self):
+        """
+        Initialize the UDM modules, e.g. load their extended attributes.
+
+        The modules are global, so the sync workers must not initialize
+        them while other workers use them. They are initialized before the
+        changes are handed to the workers instead.
+        """
+        position = univention.admin.uldap.position(self.lo.base)
+        for key, module in self.modules.items():
+            univention.admin.modules.init(self.lo, position, module)
+            for m in self.modules_others[key]:
+                if m:
+                    univention.admin.modules.init(self.lo, position, m)
+
+    def _init_ucs_module(self, module):
+        """Initialize a UDM module before an object is changed, see :py:meth:`init_ucs_modules`."""
+        if not self.in_worker():
+            univention.admin.modules.init(self.lo, univention.admin.uldap.position(self.lo.base), module)
+
     def initialize(self):
         # dummy
         pass
@@ -958,10 +1057,7 @@ class ucs:
                 ud.debug(ud.LDAP, ud.PROCESS, 'sync UCS > AD: Resync rejected file: %s' % (filename))
                 try:
                     if self.__sync_file_from_ucs(filename, append_error=' rejected'):
-                        try:
-                            os.remove(os.path.join(filename))
-                        except OSError:  # file not found
-                            pass
+                        self.__remove_ucs_change(filename)
                         self._remove_rejected_ucs(filename)
                         change_counter += 1
                 except ldap.SERVER_DOWN:
@@ -986,75 +1082,50 @@ class ucs:
         change_counter = 0
         MAX_SYNC_IN_ONE_INTERVAL = 50000
 
-        self.rejected_files = self._list_rejected_filenames_ucs()
+        self.rejected_files = frozenset(self._list_rejected_filenames_ucs())
+
+        # Only synchronize the first MAX_SYNC_IN_ONE_INTERVAL changes otherwise
+        # the change list is too long and it took too much time
+        files = self.__list_ucs_changes(MAX_SYNC_IN_ONE_INTERVAL)
 
         print("--------------------------------------")
-        print("try to sync %s changes from UCS" % (min(len(os.listdir(self.listener_dir)) - 1, MAX_SYNC_IN_ONE_INTERVAL)))
+        print("try to sync %s changes from UCS" % (len(files),))
         print("done:", end=' ')
         sys.stdout.flush()
         done_counter = 0
 
-        def _only_floats(iterable):
-            for el in iterable:
-                try:
-                    float(el)
-                    yield el
-                except ValueError:
-                    continue
-
-        files = sorted(_only_floats(os.listdir(self.listener_dir)), key=float)
-        # Only synchronize the first MAX_SYNC_IN_ONE_INTERVAL changes otherwise
-        # the change list is too long and it took too much time
-        files = files[:MAX_SYNC_IN_ONE_INTERVAL]
-
         # We may dropped the parent object, so don't show the traceback in any case
         traceback_level = ud.WARN
 
-        for listener_file in files:
-            sync_successfull = False
-            filename = os.path.join(self.listener_dir, listener_file)
-            if os.path.isdir(filename):
-                continue
-            if filename not in self.rejected_files:
-                try:
-                    with open(filename, 'rb') as fob:
-                        (dn, _new, _old, old_dn) = pickle.load(fob, encoding='bytes')
-                        if isinstance(dn, bytes):
-                            dn = dn.decode('utf-8')
-                        if isinstance(old_dn, bytes):
-                            old_dn = old_dn.decode('utf-8')
-                except OSError:
-                    continue  # file not found so there's nothing to sync
-                except (pickle.UnpicklingError, EOFError) as exc:
-                    message = 'file empty' if isinstance(exc, EOFError) else exc
-                    ud.debug(ud.LDAP, ud.ERROR, f'poll_ucs: invalid pickle file {filename}: {message}')
-                    # ignore corrupted pickle file, but save as rejected to not try again
-                    self._save_rejected_ucs(filename, 'unknown', resync=False, reason='broken file')
-                    continue
-
-                # If the list contains more than one file, the DN will be synced later
-                # but if the object was added or removed, the synchonization is required
-                for i in [0, 1]:  # do it twice if the LDAP connection was closed
-                    try:
-                        sync_successfull = self.__sync_file_from_ucs(filename, traceback_level=traceback_level)
-                    except (ldap.SERVER_DOWN, SystemExit):
-                        # once again, ldap idletimeout ...
-                        if i == 0:
-                            self.open_ucs()
-                            continue
-                        raise
-                    except Exception:
-                        self._save_rejected_ucs(filename, dn)
-                        # We may dropped the parent object, so don't show this warning
-                        self._debug_traceback(traceback_level, "sync failed, saved as rejected \n\t%s" % filename)
-                    if sync_successfull:
-                        os.remove(os.path.join(self.listener_dir, listener_file))
-                        change_counter += 1
-                    break
+        # the workers only get this snapshot of the rejected changes
+        rejected_files = self.rejected_files
+        pool = self.worker_pool()
+        if pool:
+            self.init_ucs_modules()
+            results = pool.run(lambda listener_file: self.__poll_ucs_file(listener_file, rejected_files, traceback_level), files, self.__ucs_change_scope)
+        else:
+            results = ((listener_file, self.__poll_ucs_file(listener_file, rejected_files, traceback_level)) for listener_file in files)
 
-            done_counter += 1
-            print("%s" % done_counter, end=' ')
-            sys.stdout.flush()
+        # synced journal entries are removed in batches
+        acknowledged = []
+        try:
+            for listener_file, sync_successfull in results:
+                if sync_successfull is None:
+                    continue
+                if sync_successfull:
+                    change_counter += 1
+                    change_id = ChangeJournal.change_id(listener_file)
+                    if change_id is not None:
+                        acknowledged.append(change_id)
+                        if len(acknowledged) >= JOURNAL_ACK_BATCH:
+                            self.journal.acknowledge(acknowledged)
+                            acknowledged = []
+
+                done_counter += 1
+                print("%s" % done_counter, end=' ')
+                sys.stdout.flush()
+        finally:
+            self.journal.acknowledge(acknowledged)
 
         print("")
 
@@ -1068,6 +1139,69 @@ class ucs:
         sys.stdout.flush()
         return change_counter
 
+    def __poll_ucs_file(self, listener_file, rejected_files, traceback_level):
+        """
+        sync the change from UCS stored in the given file of the listener directory
+
+        :returns: `True` if the change was synced, `False` if not and `None` if
+                it is not a change at all.
+        """
+        sync_successfull = False
+        filename = os.path.join(self.listener_dir, listener_file)
+        if os.path.isdir(filename):
+            return None
+        if filename not in rejected_files:
+            try:
+                (dn, _new, _old, old_dn) = self.__load_ucs_change(filename)
+                if isinstance(dn, bytes):
+                    dn = dn.decode('utf-8')
+                if isinstance(old_dn, bytes):
+                    old_dn = old_dn.decode('utf-8')
+            except OSError:
+                return None  # file not found so there's nothing to sync
+            except (pickle.UnpicklingError, EOFError) as exc:
+                message = 'file empty' if isinstance(exc, EOFError) else exc
+                ud.debug(ud.LDAP, ud.ERROR, f'poll_ucs: invalid pickle file {filename}: {message}')
+                # ignore corrupted pickle file, but save as rejected to not try again
+                self._save_rejected_ucs(filename, 'unknown', resync=False, reason='broken file')
+                return None
+
+            # If the list contains more than one file, the DN will be synced later
+            # but if the object was added or removed, the synchonization is required
+            for i in [0, 1]:  # do it twice if the LDAP connection was closed
+                try:
+                    sync_successfull = self.__sync_file_from_ucs(filename, traceback_level=traceback_level)
+                except (ldap.SERVER_DOWN, SystemExit):
+                    # once again, ldap idletimeout ...
+                    if i == 0:
+                        self.open_ucs()
+                        continue
+                    raise
+                except Exception:
+                    self._save_rejected_ucs(filename, dn)
+                    # We may dropped the parent object, so don't show this warning
+                    self._debug_traceback(traceback_level, "sync failed, saved as rejected \n\t%s" % filename)
+                if sync_successfull and ChangeJournal.change_id(listener_file) is None:
+                    # journal entries are removed by poll_ucs()
+                    os.remove(filename)
+                break
+        return sync_successfull
+
+    def __ucs_change_scope(self, listener_file):
+        """the objects touched by the change stored in the given file, see :py:class:`univention.s4connector.workers.Scope`"""
+        try:
+            (dn, new, old, old_dn) = self.__load_ucs_change(os.path.join(self.listener_dir, listener_file))
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return Scope()  # nothing to sync
+
+        def values(attribute):
+            for attributes in (new or {}, old or {}):
+                for value in attributes.get(attribute) or attributes.get(attribute.encode('ASCII')) or []:
+                    yield value.decode('UTF-8') if isinstance(value, bytes) else value
+
+        dns = [value.decode('UTF-8') if isinstance(value, bytes) else value for value in (dn, old_dn)]
+        return Scope(ids=values('entryUUID'), dns=dns, refs=[*values('uniqueMember'), *values('memberOf')])
+
     def poll(self, show_deleted=True):
         # dummy
         pass
@@ -1187,13 +1321,14 @@ class ucs:
             return True
 
         # reload extended attributes  # FIXME: maybe not necessary
-        univention.admin.modules.init(self.lo, univention.admin.uldap.position(self.lo.base), module)
+        self._init_ucs_module(module)
 
         ucs_object = module.object(None, self.lo, position=position)
         ucs_object.open()
         if property_type == 'group':
             ud.debug(ud.LDAP, ud.INFO, "sync_to_ucs: remove %s from ucs group cache" % object['dn'])
-            self.group_members_cache_ucs[object['dn'].lower()] = set()
+            with self._lock:
+                self.group_members_cache_ucs[object['dn'].lower()] = set()
 
         self.__set_values(property_type, object, ucs_object, modtype='add')
         for ucs_create_function in self.property[property_type].ucs_create_functions:
@@ -1217,7 +1352,7 @@ class ucs:
     def modify_in_ucs(self, property_type, object, module, position):
 
         # reload extended attributes  # FIXME: maybe not necessary
-        univention.admin.modules.init(self.lo, univention.admin.uldap.position(self.lo.base), module)
+        self._init_ucs_module(module)
 
         ucs_object_dn = object.get('olddn', object['dn'])
         ucs_object = univention.admin.objects.get(module, None, self.lo, dn=ucs_object_dn, position='')
@@ -1417,16 +1552,17 @@ class ucs:
         self.context_log(property_type, object)
 
         if object['modtype'] in ('delete', 'move'):
-            try:
-                del self.group_member_mapping_cache_ucs[object['dn'].lower()]
-                ud.debug(ud.LDAP, ud.INFO, "sync_to_ucs: %s removed from UCS group member mapping cache" % object['dn'])
-            except KeyError:
-                pass
-            try:
-                del self.group_member_mapping_cache_con[pre_mapped_s4_dn.lower()]
-                ud.debug(ud.LDAP, ud.INFO, "sync_to_ucs: %s removed from S4 group member mapping cache" % pre_mapped_s4_dn)
-            except KeyError:
-                pass
+            with self._lock:
+                try:
+                    del self.group_member_mapping_cache_ucs[object['dn'].lower()]
+                    ud.debug(ud.LDAP, ud.INFO, "sync_to_ucs: %s removed from UCS group member mapping cache" % object['dn'])
+                except KeyError:
+                    pass
+                try:
+                    del self.group_member_mapping_cache_con[pre_mapped_s4_dn.lower()]
+                    ud.debug(ud.LDAP, ud.INFO, "sync_to_ucs: %s removed from S4 group member mapping cache" % pre_mapped_s4_dn)
+                except KeyError:
+                    pass
 
         position = univention.admin.uldap.position(self.configRegistry['ldap/base'])
 
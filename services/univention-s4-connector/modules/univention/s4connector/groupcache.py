@@ -0,0 +1,288 @@
+#!/usr/bin/python3
+#
+# Univention S4 Connector
+#  persistent group member cache
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+
+import json
+import sqlite3
+import threading
+
+import univention.debug2 as ud
+
+
+class GroupMembers(dict):
+    """
+    A group member cache mapping the group DNs to the sets of member DNs,
+    which records the groups changed since it was saved.
+
+    :param groups: The initial groups and members.
+    :param on_change: Called before the first group is changed.
+    """
+
+    def __init__(self, groups=(), on_change=None):
+        super().__init__()
+        for grp, members in dict(groups).items():
+            super().__setitem__(grp, _Members(self, grp, members))
+        self.changed = set()
+        self._on_change = on_change
+
+    def _changed(self, grp):
+        if not self.changed and self._on_change is not None:
+            self._on_change()
+        self.changed.add(grp)
+
+    def __setitem__(self, grp, members):
+        super().__setitem__(grp, _Members(self, grp, members))
+        self._changed(grp)
+
+    def __delitem__(self, grp):
+        super().__delitem__(grp)
+        self._changed(grp)
+
+    def setdefault(self, grp, default=None):
+        if grp not in self:
+            self[grp] = default or ()
+        return self[grp]
+
+    def pop(self, grp, *default):
+        if grp not in self:
+            return super().pop(grp, *default)
+        members = super().pop(grp)
+        self._changed(grp)
+        return members
+
+    def popitem(self):
+        grp, members = super().popitem()
+        self._changed(grp)
+        return grp, members
+
+    def update(self, *args, **kwargs):
+        for grp, members in dict(*args, **kwargs).items():
+            self[grp] = members
+
+    def clear(self):
+        for grp in list(self):
+            del self[grp]
+
+
+class _Members(set):
+    """The members of a group in :py:class:`GroupMembers`, which reports its changes to the cache."""
+
+    def __init__(self, groups, grp, members=()):
+        super().__init__(members)
+        self._groups = groups
+        self._grp = grp
+
+    def _changed(self):
+        self._groups._changed(self._grp)
+
+    def add(self, member):
+        if member not in self:
+            super().add(member)
+            self._changed()
+
+    def discard(self, member):
+        if member in self:
+            super().discard(member)
+            self._changed()
+
+    def remove(self, member):
+        super().remove(member)
+        self._changed()
+
+    def pop(self):
+        member = super().pop()
+        self._changed()
+        return member
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def update(self, *others):
+        super().update(*others)
+        self._changed()
+
+    def difference_update(self, *others):
+        super().difference_update(*others)
+        self._changed()
+
+    def intersection_update(self, *others):
+        super().intersection_update(*others)
+        self._changed()
+
+    def symmetric_difference_update(self, other):
+        super().symmetric_difference_update(other)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+class GroupMemberCache:
+    """
+    A local database which includes the group member caches of the
+    connector, so they don't have to be rebuilt from both directories at
+    every start.
+
+    Every cache is stored together with a watermark, e.g. the last USN of
+    Samba 4 which was synced. A cache is only loaded if its watermark is
+    still the current one. The caches are kept as :py:class:`GroupMembers`,
+    which remove the watermarks before the first group is changed (see
+    :py:meth:`invalidate`), so the caches are rebuilt if the connector
+    stops before they are saved again. Only the changed groups are saved.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # the sync workers share the connection
+        self._lock = threading.RLock()
+        self._dbcon = sqlite3.connect(self.filename, check_same_thread=False)
+        self._dbcon.execute('PRAGMA journal_mode = WAL;')
+        self._dbcon.execute('PRAGMA synchronous = NORMAL;')
+        # the watermarks as saved in the database
+        self._watermarks = {}
+
+        self.__create_tables()
+
+    def __create_tables(self):
+        with self._lock, self._dbcon:
+            self._dbcon.execute("CREATE TABLE IF NOT EXISTS MEMBERS(cache TEXT NOT NULL, grp TEXT NOT NULL, members BLOB NOT NULL, PRIMARY KEY(cache, grp)) WITHOUT ROWID;")
+            self._dbcon.execute("CREATE TABLE IF NOT EXISTS WATERMARKS(cache TEXT PRIMARY KEY NOT NULL, value TEXT NOT NULL);")
+
+    def track(self, groups):
+        """
+        Return a cache which was built from the directory.
+
+        :param dict groups: Mapping of the group DNs to the sets of member DNs.
+        :returns: The groups as :py:class:`GroupMembers`, all of them are saved by :py:meth:`save`.
+        """
+        cache = GroupMembers(groups, self.invalidate)
+        cache.changed.update(cache)
+        return cache
+
+    def load(self, cache, watermark):
+        """
+        Load a cache.
+
+        :param str cache: The name of the cache, e.g. `con` or `ucs`.
+        :param str watermark: The current watermark or `None` if it is unknown.
+        :returns: The groups as :py:class:`GroupMembers` or `None` if the
+                cache was saved at another watermark or cannot be read and
+                has to be rebuilt.
+        """
+        with self._lock:
+            row = self._dbcon.execute("SELECT value FROM WATERMARKS WHERE cache = ?;", (cache,)).fetchone()
+            if watermark is None or row is None or row[0] != watermark:
+                ud.debug(ud.LDAP, ud.PROCESS, 'GroupMemberCache: saved %s cache is outdated (%s != %s)' % (cache, row and row[0], watermark))
+                self.__discard(cache)
+                return None
+            try:
+                groups = {grp: json.loads(members) for grp, members in self._dbcon.execute("SELECT grp, members FROM MEMBERS WHERE cache = ?;", (cache,))}
+            except ValueError as exc:
+                ud.debug(ud.LDAP, ud.WARN, 'GroupMemberCache: saved %s cache is broken: %s' % (cache, exc))
+                self.__discard(cache)
+                return None
+            self._watermarks[cache] = watermark
+        return GroupMembers(groups, self.invalidate)
+
+    def __discard(self, cache):
+        # the rebuilt cache is saved completely
+        with self._dbcon:
+            self._dbcon.execute("DELETE FROM MEMBERS WHERE cache = ?;", (cache,))
+            self._dbcon.execute("DELETE FROM WATERMARKS WHERE cache = ?;", (cache,))
+        self._watermarks.pop(cache, None)
+
+    def invalidate(self):
+        """Remove the watermarks before the caches are changed."""
+        with self._lock:
+            if not self._watermarks:
+                return
+            with self._dbcon:
+                self._dbcon.execute("DELETE FROM WATERMARKS;")
+            self._watermarks = {}
+
+    def save(self, caches):
+        """
+        Save the groups which changed since they were saved or loaded the last time.
+
+        Nothing is written if no group and no watermark changed.
+
+        :param dict caches: Mapping of the names of the caches to tuples
+                `(groups, watermark)` of :py:class:`GroupMembers` and the
+                current watermark. Caches with the watermark `None` are only
+                saved without a watermark, so they aren't loaded again.
+        """
+        with self._lock:
+            changes = {}
+            for cache, (groups, watermark) in caches.items():
+                changed, groups.changed = groups.changed, set()
+                if changed or self._watermarks.get(cache) != watermark:
+                    changes[cache] = (groups, changed, watermark)
+            if not changes:
+                return
+            try:
+                with self._dbcon:
+                    for cache, (groups, changed, watermark) in changes.items():
+                        removed = [grp for grp in changed if grp not in groups]
+                        self._dbcon.executemany("DELETE FROM MEMBERS WHERE cache = ? AND grp = ?;", ((cache, grp) for grp in removed))
+                        self._dbcon.executemany("INSERT OR REPLACE INTO MEMBERS(cache, grp, members) VALUES(?, ?, ?);", ((cache, grp, json.dumps(list(groups[grp]))) for grp in changed if grp in groups))
+                        if watermark is None:
+                            self._dbcon.execute("DELETE FROM WATERMARKS WHERE cache = ?;", (cache,))
+                        else:
+                            self._dbcon.execute("INSERT OR REPLACE INTO WATERMARKS(cache, value) VALUES(?, ?);", (cache, watermark))
+                        ud.debug(ud.LDAP, ud.INFO, 'GroupMemberCache: save %s cache at %s: %d groups changed, %d removed' % (cache, watermark, len(changed) - len(removed), len(removed)))
+            except BaseException:
+                # saved with the next changes
+                for groups, changed, _watermark in changes.values():
+                    groups.changed |= changed
+                raise
+            for cache, (_groups, _changed, watermark) in changes.items():
+                if watermark is None:
+                    self._watermarks.pop(cache, None)
+                else:
+                    self._watermarks[cache] = watermark
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+#
+# Univention S4 Connector
+#  journal of UCS changes
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Journal of the UCS changes handed from the listener module to the connector.
+
+Instead of one pickle file per change the listener module appends the
+changes to a SQLite database in the listener directory. The connector reads
+them in the order of their IDs and removes synced changes in batches. Every
+change is addressed by a key which looks like the name of a file in the
+listener directory (`journal.sqlite#<id>`), so it can be stored in the list
+of rejected changes like the name of a pickle file.
+
+The journal has a generation, which is renewed whenever the journal is
+created or cleared: while it stays the same, no change of UCS was dropped
+from the listener directory without being synced.
+"""
+
+import os
+import pickle  # noqa: S403
+import secrets
+import sqlite3
+import threading
+import time
+
+
+class ChangeJournal:
+    """
+    Journal of UCS changes in the listener directory.
+
+    :param directory: The listener directory.
+    """
+
+    FILENAME = 'journal.sqlite'
+
+    def __init__(self, directory):
+        self.filename = os.path.join(directory, self.FILENAME)
+        self._dbcon = None
+        # the sync workers share the connection
+        self._lock = threading.RLock()
+
+    @classmethod
+    def key(cls, change_id):
+        """Return the name used for the change in the listener directory."""
+        return '%s#%d' % (cls.FILENAME, change_id)
+
+    @classmethod
+    def change_id(cls, filename):
+        """Return the ID of the change for a name returned by :py:meth:`key`, `None` for other files."""
+        name, sep, change_id = os.path.basename(filename).partition('#')
+        if name != cls.FILENAME or not sep:
+            return None
+        try:
+            return int(change_id)
+        except ValueError:
+            return None
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def _connect(self):
+        if self._dbcon is None:
+            # the changes may contain password hashes
+            os.close(os.open(self.filename, os.O_WRONLY | os.O_CREAT, 0o600))
+            dbcon = sqlite3.connect(self.filename, timeout=30, check_same_thread=False)
+            dbcon.execute('PRAGMA journal_mode = WAL;')
+            dbcon.execute('PRAGMA synchronous = NORMAL;')
+            dbcon.execute('CREATE TABLE IF NOT EXISTS changes (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, change BLOB NOT NULL);')
+            # the listener module and the connector may create the journal at the same time
+            dbcon.execute('BEGIN IMMEDIATE;')
+            if not dbcon.execute('PRAGMA user_version;').fetchone()[0]:
+                self.__renew_generation(dbcon)
+            dbcon.commit()
+            self._dbcon = dbcon
+        return self._dbcon
+
+    def open(self):
+        """Connect to the journal and create it if needed; the connection is kept until :py:meth:`close`."""
+        with self._lock:
+            self._connect()
+
+    @staticmethod
+    def __renew_generation(dbcon):
+        dbcon.execute('PRAGMA user_version = %d;' % (secrets.randbits(31) or 1,))
+
+    def generation(self):
+        """Return the generation of the journal, see above."""
+        with self._lock:
+            return self._connect().execute('PRAGMA user_version;').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._dbcon is not None:
+                self._dbcon.close()
+                self._dbcon = None
+
+    def append(self, change):
+        """
+        Append a change.
+
+        :param change: The tuple `(dn, new, old, old_dn)`.
+        :returns: The ID of the change.
+        """
+        with self._lock:
+            dbcon = self._connect()
+            with dbcon:
+                return dbcon.execute('INSERT INTO changes (timestamp, change) VALUES (?, ?);', (time.time(), pickle.dumps(change, protocol=2))).lastrowid
+
+    def extend(self, changes):
+        """Append several changes at once."""
+        with self._lock:
+            dbcon = self._connect()
+            with dbcon:
+                dbcon.executemany('INSERT INTO changes (timestamp, change) VALUES (?, ?);', ((time.time(), pickle.dumps(change, protocol=2)) for change in changes))
+
+    def entries(self, limit=-1):
+        """Return the IDs and timestamps of the oldest changes."""
+        with self._lock:
+            return self._connect().execute('SELECT id, timestamp FROM changes ORDER BY id LIMIT ?;', (limit,)).fetchall()
+
+    def get(self, change_id):
+        """
+        Return a change.
+
+        :raises FileNotFoundError: if the change is not in the journal (anymore).
+        """
+        with self._lock:
+            row = self._connect().execute('SELECT change FROM changes WHERE id=?;', (change_id,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(self.key(change_id))
+        return pickle.loads(row[0], encoding='bytes')  # noqa: S301
+
+    def acknowledge(self, change_ids):
+        """Remove synced changes."""
+        if not change_ids:
+            return
+        with self._lock:
+            dbcon = self._connect()
+            with dbcon:
+                dbcon.executemany('DELETE FROM changes WHERE id=?;', ((change_id,) for change_id in change_ids))
+
+    def clear(self):
+        """Remove all changes and start a new generation."""
+        with self._lock:
+            dbcon = self._connect()
+            with dbcon:
+                dbcon.execute('DELETE FROM changes;')
+                self.__renew_generation(dbcon)
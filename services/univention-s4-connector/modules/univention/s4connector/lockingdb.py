@@ -35,6 +35,7 @@
 
 
 import sqlite3
+import threading
 
 import univention.debug2 as ud
 
@@ -49,7 +50,9 @@ class LockingDB:
 
     def __init__(self, filename):
         self.filename = filename
-        self._dbcon = sqlite3.connect(self.filename)
+        # the sync workers share the connection
+        self._lock = threading.RLock()
+        self._dbcon = sqlite3.connect(self.filename, check_same_thread=False)
         self.s4cache = {}
 
         self.__create_tables()
@@ -140,6 +143,10 @@ class LockingDB:
         self.__execute_sql_commands(sql_commands, fetch_result=False)
 
     def __execute_sql_commands(self, sql_commands, fetch_result=False):
+        with self._lock:
+            return self.__execute_sql_commands_locked(sql_commands, fetch_result)
+
+    def __execute_sql_commands_locked(self, sql_commands, fetch_result):
         for _i in [1, 2]:
             try:
                 cur = self._dbcon.cursor()
@@ -162,7 +169,7 @@ class LockingDB:
                 ud.debug(ud.LDAP, ud.WARN, "LockingDB: sqlite: %r. SQL command was: %r" % (exp, sql_commands))
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = sqlite3.connect(self.filename)
+                self._dbcon = sqlite3.connect(self.filename, check_same_thread=False)
 
 
 if __name__ == '__main__':
@@ -36,8 +36,10 @@
 import base64
 import calendar
 import copy
+import functools
 import os
 import re
+import sqlite3
 import string
 import sys
 import time
@@ -53,6 +55,8 @@ import univention.debug2 as ud
 import univention.s4connector
 import univention.uldap
 from univention.config_registry import ConfigRegistry
+from univention.s4connector.groupcache import GroupMemberCache, GroupMembers
+from univention.s4connector.workers import PerWorker, Scope, synchronized
 
 
 LDAP_SERVER_SHOW_DELETED_OID = "1.2.840.113556.1.4.417"
@@ -63,6 +67,10 @@ DSDB_CONTROL_REPLICATED_UPDATE_OID = '1.3.6.1.4.1.7165.4.3.3'
 
 # page results
 PAGE_SIZE = 1000
+# USNs searched at once during poll
+USN_WINDOW = 1000
+# USNs searched at once if S4 does not page the results of a window
+SIZELIMIT_USN_WINDOW = 999
 
 
 def group_members_sync_from_ucs(connector, key, object):
@@ -484,9 +492,24 @@ def format_escaped(format_string, *args, **kwargs):
     return LDAPEscapeFormatter().format(format_string, *args, **kwargs)
 
 
+def saving_group_cache(func):
+    """
+    Decorator for methods syncing changes: the changed groups of the group
+    member caches are saved after the changes were synced.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        result = func(self, *args, **kwargs)
+        self.save_group_cache()
+        return result
+    return wrapper
+
+
 class s4(univention.s4connector.ucs):
     RANGE_RETRIEVAL_PATTERN = re.compile(r"^([^;]+);range=(\d+)-(\d+|\*)$")
 
+    lo_s4 = PerWorker()
+
     @classmethod
     def main(cls, ucr=None, configbasename='connector', **kwargs):
         if ucr is None:
@@ -605,14 +628,19 @@ class s4(univention.s4connector.ucs):
         # * entry updated in group_members_sync_from_ucs and object_memberships_sync_from_ucs
         # * entry flushed for group object in sync_to_ucs / add_in_ucs
         # * entry used for decision in group_members_sync_to_ucs
-        self.group_members_cache_ucs = {}
+        self.group_members_cache_ucs = GroupMembers()
 
         # AD groups and AD members
         # * initialized during start
         # * entry updated in group_members_sync_to_ucs and object_memberships_sync_to_ucs
         # * entry flushed for group object in sync_from_ucs / ADD
         # * entry used for decision in group_members_sync_from_ucs
-        self.group_members_cache_con = {}
+        self.group_members_cache_con = GroupMembers()
+
+        # The changed groups of both caches are saved after every sync and
+        # the caches are loaded during start if they are still valid
+        groupcachedbfile = '/etc/univention/%s/groupmembers.sqlite' % self.CONFIGBASENAME
+        self.group_members_cache_db = GroupMemberCache(groupcachedbfile)
 
     def init_ldap_connections(self):
         super().init_ldap_connections()
@@ -623,8 +651,33 @@ class s4(univention.s4connector.ucs):
         for prop in self.property.values():
             prop.con_default_dn = self.dn_mapped_to_base(prop.con_default_dn, self.lo_s4.base)
 
+    def init_worker(self):
+        super().init_worker()
+        self.open_s4()
+
     def init_group_cache(self):
-        ud.debug(ud.LDAP, ud.PROCESS, 'Building internal group membership cache')
+        watermarks = self._group_cache_watermarks()
+        group_members_cache_con = self.group_members_cache_db.load('con', watermarks['con'])
+        if group_members_cache_con is None:
+            self.__build_group_cache_con()
+            self.group_members_cache_con = self.group_members_cache_db.track(self.group_members_cache_con)
+        else:
+            ud.debug(ud.LDAP, ud.PROCESS, 'Loaded internal S4 group membership cache (%d groups)' % (len(group_members_cache_con),))
+            self.group_members_cache_con = group_members_cache_con
+
+        group_members_cache_ucs = self.group_members_cache_db.load('ucs', watermarks['ucs'])
+        if group_members_cache_ucs is None:
+            self.__build_group_cache_ucs()
+            self.group_members_cache_ucs = self.group_members_cache_db.track(self.group_members_cache_ucs)
+        else:
+            ud.debug(ud.LDAP, ud.PROCESS, 'Loaded internal UCS group membership cache (%d groups)' % (len(group_members_cache_ucs),))
+            self.group_members_cache_ucs = group_members_cache_ucs
+
+        self.save_group_cache(watermarks)
+
+    def __build_group_cache_con(self):
+        ud.debug(ud.LDAP, ud.PROCESS, 'Building internal S4 group membership cache')
+        self.group_members_cache_con = {}
         s4_groups = self.__search_s4(filter='objectClass=group', attrlist=['member'])
         ud.debug(ud.LDAP, ud.ALL, "__init__: s4_groups: %s" % s4_groups)
         for s4_group in s4_groups:
@@ -640,6 +693,9 @@ class s4(univention.s4connector.ucs):
 
         ud.debug(ud.LDAP, ud.ALL, "__init__: self.group_members_cache_con: %s" % self.group_members_cache_con)
 
+    def __build_group_cache_ucs(self):
+        ud.debug(ud.LDAP, ud.PROCESS, 'Building internal UCS group membership cache')
+        self.group_members_cache_ucs = {}
         for ucs_group in self.search_ucs(filter='objectClass=univentionGroup', attr=['uniqueMember']):
             group_lower = ucs_group[0].lower()
             self.group_members_cache_ucs[group_lower] = set()
@@ -647,7 +703,35 @@ class s4(univention.s4connector.ucs):
                 for member in ucs_group[1].get('uniqueMember'):
                     self.group_members_cache_ucs[group_lower].add(member.decode('UTF-8').lower())
         ud.debug(ud.LDAP, ud.ALL, "__init__: self.group_members_cache_ucs: %s" % self.group_members_cache_ucs)
-        ud.debug(ud.LDAP, ud.PROCESS, 'Internal group membership cache was created')
+        ud.debug(ud.LDAP, ud.PROCESS, 'Internal UCS group membership cache was created')
+
+    def _group_cache_watermarks(self):
+        """
+        The positions in the change queues of both directories the group
+        member caches follow: the last synced USN of S4 and the generation
+        of the listener journal, as the UCS changes which are not synced yet
+        are still queued there.
+        """
+        generation = None
+        if self.journal.exists():
+            try:
+                generation = 'journal:%d' % (self.journal.generation(),)
+            except (OSError, sqlite3.Error) as exc:
+                ud.debug(ud.LDAP, ud.WARN, '_group_cache_watermarks: failed to read the journal generation: %s' % (exc,))
+        return {
+            'con': str(self._get_lastUSN()),
+            'ucs': generation,
+        }
+
+    @synchronized
+    def save_group_cache(self, watermarks=None):
+        """Save the group member caches, see :py:class:`univention.s4connector.groupcache.GroupMemberCache`."""
+        if watermarks is None:
+            watermarks = self._group_cache_watermarks()
+        self.group_members_cache_db.save({
+            'con': (self.group_members_cache_con, watermarks['con']),
+            'ucs': (self.group_members_cache_ucs, watermarks['ucs']),
+        })
 
     def s4_search_ext_s(self, *args, **kwargs):
         return fix_dn_in_search(self.lo_s4.lo.search_ext_s(*args, **kwargs))
@@ -889,10 +973,19 @@ class s4(univention.s4connector.ucs):
         return fix_dn_in_search(res)
 
     def __search_ad_changes(self, show_deleted=False, filter=''):
-        """search AD for changes since last update (changes greater lastUSN)"""
+        """
+        search AD for changes since last update (changes greater lastUSN)
+
+        The USNs up to highestCommittedUSN are searched in windows of
+        `connector/s4/poll/usn-window` USNs, so that only the changes of one
+        window are held in memory. Yields the last USN of each window
+        together with the changes in that window: the objects created since
+        lastUSN ordered by uSNCreated, followed by the other changed objects
+        ordered by uSNChanged.
+        """
         lastUSN = self._get_lastUSN()
-        # filter erweitern um "(|(uSNChanged>=lastUSN+1)(uSNCreated>=lastUSN+1))"
-        # +1 da suche nur nach '>=', nicht nach '>' möglich
+        highestCommittedUSN = self.__get_highestCommittedUSN()
+        usn_window = max(1, int(self.configRegistry.get('%s/s4/poll/usn-window' % self.CONFIGBASENAME, USN_WINDOW)))
 
         def _ad_changes_filter(attribute, lowerUSN, higherUSN=''):
             if higherUSN:
@@ -917,43 +1010,42 @@ class s4(univention.s4connector.ucs):
 
             if last_usn <= 0:
                 return sorted(res, key=_sortkey_ascending_usncreated)
-            else:
-                created_since_last = [x for x in res if int(x[1]['uSNCreated'][0]) > last_usn]
-                changed_since_last = [x for x in res if int(x[1]['uSNChanged'][0]) > last_usn and x not in created_since_last]
-                return sorted(created_since_last, key=_sortkey_ascending_usncreated) + sorted(changed_since_last, key=_sortkey_ascending_usnchanged)
+            created_since_last = []
+            changed_since_last = []
+            for element in res:
+                if _sortkey_ascending_usncreated(element) > last_usn:
+                    created_since_last.append(element)
+                else:
+                    changed_since_last.append(element)
+            return sorted(created_since_last, key=_sortkey_ascending_usncreated) + sorted(changed_since_last, key=_sortkey_ascending_usnchanged)
 
-        # search for objects with uSNCreated and uSNChanged in the known range
-        try:
-            usn_filter = _ad_changes_filter('uSNCreated', lastUSN + 1)
+        def search_ad_changes_in_window(lowerUSN, higherUSN):
+            ud.debug(ud.LDAP, ud.INFO, "__search_ad_changes: search between USNs %s and %s" % (lowerUSN, higherUSN))
+            # objects created in this window
+            usn_filter = _ad_changes_filter('uSNCreated', lowerUSN, higherUSN)
             if lastUSN > 0:
-                # During the init phase we have to search for created and changed objects
-                usn_filter = '(|%s%s)' % (_ad_changes_filter('uSNChanged', lastUSN + 1), usn_filter)
-            return sort_ad_changes(search_ad_changes_by_attribute(usn_filter), lastUSN)
-        except (ldap.SERVER_DOWN, SystemExit):
-            raise
-        except ldap.SIZELIMIT_EXCEEDED:
-            # The LDAP control page results was not successful. Without this control
-            # AD does not return more than 1000 results. We are going to split the
-            # search.
-            highestCommittedUSN = self.__get_highestCommittedUSN()
-            tmpUSN = lastUSN
-            ud.debug(ud.LDAP, ud.PROCESS, "Need to split results. highest USN is %s, lastUSN is %s" % (highestCommittedUSN, lastUSN))
-            returnObjects = []
-            while (tmpUSN != highestCommittedUSN):
-                tmp_lastUSN = tmpUSN
-                tmpUSN += 999
-                if tmpUSN > highestCommittedUSN:
-                    tmpUSN = highestCommittedUSN
-
-                ud.debug(ud.LDAP, ud.INFO, "__search_ad_changes: search between USNs %s and %s" % (tmp_lastUSN + 1, tmpUSN))
-
-                usn_filter = _ad_changes_filter('uSNCreated', tmp_lastUSN + 1, tmpUSN)
-                if tmp_lastUSN > 0:
-                    # During the init phase we have to search for created and changed objects
-                    usn_filter = '(|%s%s)' % (_ad_changes_filter('uSNChanged', tmp_lastUSN + 1, tmpUSN), usn_filter)
-                returnObjects += search_ad_changes_by_attribute(usn_filter)
-
-            return sort_ad_changes(returnObjects, lastUSN)
+                # During the init phase we have to search for created and changed objects.
+                # Objects created since lastUSN have already been returned with their current state in the window of their creation.
+                usn_filter = '(|(&%s%s)%s)' % (_ad_changes_filter('uSNChanged', lowerUSN, higherUSN), format_escaped('(uSNCreated<={0!e})', lastUSN), usn_filter)
+            try:
+                return search_ad_changes_by_attribute(usn_filter)
+            except ldap.SIZELIMIT_EXCEEDED:
+                # The LDAP control page results was not successful. Without this control
+                # AD does not return more than 1000 results. We are going to split the
+                # search, as every USN belongs to at most one object.
+                if higherUSN - lowerUSN < SIZELIMIT_USN_WINDOW:
+                    raise
+                ud.debug(ud.LDAP, ud.PROCESS, "Need to split results between USNs %s and %s" % (lowerUSN, higherUSN))
+                res = []
+                for tmpUSN in range(lowerUSN, higherUSN + 1, SIZELIMIT_USN_WINDOW):
+                    res += search_ad_changes_in_window(tmpUSN, min(tmpUSN + SIZELIMIT_USN_WINDOW - 1, higherUSN))
+                return res
+
+        lowerUSN = lastUSN + 1
+        while lowerUSN <= highestCommittedUSN:
+            higherUSN = min(lowerUSN + usn_window - 1, highestCommittedUSN)
+            yield higherUSN, sort_ad_changes(search_ad_changes_in_window(lowerUSN, higherUSN), lastUSN)
+            lowerUSN = higherUSN + 1
 
     def __search_ad_changeUSN(self, changeUSN, show_deleted=True, filter=''):
         """search ad for change with id"""
@@ -1167,6 +1259,7 @@ class s4(univention.s4connector.ucs):
         else:
             ud.debug(ud.LDAP, ud.INFO, "primary_group_sync_to_ucs: change of primary Group in ucs not needed")
 
+    @synchronized
     def object_memberships_sync_from_ucs(self, key, object):
         """sync group membership in AD if object was changend in UCS"""
         ud.debug(ud.LDAP, ud.ALL, "object_memberships_sync_from_ucs: object: %s" % object)
@@ -1203,12 +1296,14 @@ class s4(univention.s4connector.ucs):
 
             self.__group_cache_ucs_append_member(groupDN, object_ucs['dn'])
 
+    @synchronized
     def __group_cache_ucs_append_member(self, group, member):
         member_cache = self.group_members_cache_ucs.setdefault(group.lower(), set())
         if member.lower() not in member_cache:
             ud.debug(ud.LDAP, ud.INFO, "__group_cache_ucs_append_member: Append user %r to UCS group member cache of %r" % (member, group))
             member_cache.add(member.lower())
 
+    @synchronized
     def group_members_sync_from_ucs(self, key, object):  # object mit ad-dn
         """sync groupmembers in AD if changend in UCS"""
         ud.debug(ud.LDAP, ud.INFO, "group_members_sync_from_ucs: %s" % object)
@@ -1373,6 +1468,7 @@ class s4(univention.s4connector.ucs):
 
         return True
 
+    @synchronized
     def object_memberships_sync_to_ucs(self, key, object):
         """sync group membership in UCS if object was changend in AD"""
         # disable this debug line, see Bug #12031
@@ -1439,6 +1535,7 @@ class s4(univention.s4connector.ucs):
                 # See Bug #25709 Comment #17: https://forge.univention.org/bugzilla/show_bug.cgi?id=25709#c17
                 ud.debug(ud.LDAP, ud.INFO, "one_group_member_sync_to_ucs: User is already member of the group: %s modlist: %s" % (ucs_group_object['dn'], ml))
 
+    @synchronized
     def one_group_member_sync_from_ucs(self, s4_group_object, object):
         """sync groupmembers in AD if changend one member in AD"""
         ml = []
@@ -1459,6 +1556,7 @@ class s4(univention.s4connector.ucs):
         ud.debug(ud.LDAP, ud.INFO, "one_group_member_sync_from_ucs: Append user %s to S4 group member cache of %s" % (object['dn'].lower(), s4_group_object['dn'].lower()))
         self.group_members_cache_con.setdefault(s4_group_object['dn'].lower(), set()).add(object['dn'].lower())
 
+    @synchronized
     def __group_cache_con_append_member(self, group, member):
         group_lower = group.lower()
         member_cache = self.group_members_cache_con.setdefault(group_lower, set())
@@ -1467,6 +1565,7 @@ class s4(univention.s4connector.ucs):
             ud.debug(ud.LDAP, ud.INFO, "__group_cache_con_append_member: Append user %s to S4 group member cache of %s" % (member_lower, group_lower))
             member_cache.add(member_lower)
 
+    @synchronized
     def group_members_sync_to_ucs(self, key, object):
         """sync groupmembers in UCS if changend in AD"""
         ud.debug(ud.LDAP, ud.INFO, "group_members_sync_to_ucs: object: %s" % object)
@@ -1745,6 +1844,15 @@ class s4(univention.s4connector.ucs):
             self._commit_lastUSN()
         print("--------------------------------------")
 
+    @saving_group_cache
+    def poll_ucs(self):
+        return super().poll_ucs()
+
+    @saving_group_cache
+    def resync_rejected_ucs(self):
+        return super().resync_rejected_ucs()
+
+    @saving_group_cache
     def resync_rejected(self):
         """tries to resync rejected dn"""
         print("--------------------------------------")
@@ -1790,27 +1898,15 @@ class s4(univention.s4connector.ucs):
         print("--------------------------------------")
         sys.stdout.flush()
 
+    @saving_group_cache
     def poll(self, show_deleted=True):
         """poll for changes in AD"""
         # search from last_usn for changes
         ud.debug(ud.LDAP, ud.INFO, "sync AD > UCS: polling")
         change_count = 0
-        changes = []
-        try:
-            changes = self.__search_ad_changes(show_deleted=show_deleted)
-        except ldap.SERVER_DOWN:
-            raise
-        except Exception:  # FIXME: which exception is to be caught?
-            self._debug_traceback(ud.WARN, "Exception during search_s4_changes")
-
         print("--------------------------------------")
-        print("try to sync %s changes from S4" % len(changes))
-        print("done:", end=' ')
         sys.stdout.flush()
         done = {'counter': 0}
-        ad_object = None
-        lastUSN = self._get_lastUSN()
-        newUSN = lastUSN
 
         def print_progress(ignore=False):
             done['counter'] += 1
@@ -1825,80 +1921,40 @@ class s4(univention.s4connector.ucs):
             ud.debug(ud.LDAP, ud.INFO, "UCS LDAP connection was closed, re-open the connection.")
             self.open_ucs()
 
-        for element in changes:
-            old_element = copy.deepcopy(element)
-            ad_object = self.__object_from_element(element)
-
-            if not ad_object:
-                print_progress(True)
-                continue
-
-            property_key = self.__identify_s4_type(ad_object)
-            if not property_key:
-                self.context_log(property_key, ad_object, 'ignoring not identified object', level=ud.INFO)
-                newUSN = max(self.__get_change_usn(ad_object), newUSN)
-                print_progress(True)
-                continue
-
-            if self._ignore_object(property_key, ad_object):
-                if ad_object['modtype'] == 'move':
-                    ud.debug(ud.LDAP, ud.INFO, "object_from_element: Detected a move of an S4 object into a ignored tree: dn: %s" % ad_object['dn'])
-                    ad_object['deleted_dn'] = ad_object['olddn']
-                    ad_object['dn'] = ad_object['olddn']
-                    ad_object['modtype'] = 'delete'
-                    # check the move target
-                else:
-                    self.__update_lastUSN(ad_object)
-                    print_progress()
-                    continue
-
-            if ad_object['dn'].find('\\0ACNF:') > 0:
-                ud.debug(ud.LDAP, ud.PROCESS, 'Ignore conflicted object: %s' % ad_object['dn'])
-                self.__update_lastUSN(ad_object)
-                print_progress()
-                continue
-
-            sync_successfull = False
+        chunks = self.__search_ad_changes(show_deleted=show_deleted)
+        while True:
             try:
-                try:
-                    mapped_object = self._object_mapping(property_key, ad_object)
-                    if not self._ignore_object(property_key, mapped_object):
-                        sync_successfull = self.sync_to_ucs(property_key, mapped_object, ad_object['dn'], ad_object)
-                    else:
-                        sync_successfull = True
-                except univention.admin.uexceptions.ldapError as msg:
-                    if isinstance(msg.original_exception, ldap.SERVER_DOWN):
-                        raise msg.original_exception
-                    raise
+                highestUSN, changes = next(chunks)
+            except StopIteration:
+                break
             except ldap.SERVER_DOWN:
-                ud.debug(ud.LDAP, ud.ERROR, "Got server down during sync, re-open the connection to UCS and S4")
-                time.sleep(1)
-                self.open_ucs()
-                self.open_s4()
+                raise
             except Exception:  # FIXME: which exception is to be caught?
-                self._debug_traceback(ud.WARN, "Exception during poll/sync_to_ucs")
+                self._debug_traceback(ud.WARN, "Exception during search_s4_changes")
+                break
 
-            if sync_successfull:
-                change_count += 1
-                newUSN = max(self.__get_change_usn(ad_object), newUSN)
-                try:
-                    GUID = old_element[1]['objectGUID'][0]
-                    self._set_DN_for_GUID(GUID, old_element[0])
-                except ldap.SERVER_DOWN:
-                    raise
-                except Exception:  # FIXME: which exception is to be caught?
-                    self._debug_traceback(ud.WARN, "Exception during set_DN_for_GUID")
-            else:
-                self.context_log(property_key, ad_object, 'sync was not successful, save rejected', level=ud.INFO)
-                self.save_rejected(ad_object)
-                self.__update_lastUSN(ad_object)
+            if changes:
+                print("try to sync %s changes from S4" % len(changes))
+                print("done:", end=' ')
+                sys.stdout.flush()
 
-            print_progress()
+            with self.s4cache.transaction():
+                pool = self.worker_pool()
+                if pool:
+                    self.init_ucs_modules()
+                    results = pool.run(self.__poll_change, changes, self.__s4_change_scope)
+                else:
+                    results = ((element, self.__poll_change(element)) for element in changes)
+                for _element, sync_successfull in results:
+                    if sync_successfull:
+                        change_count += 1
+                    print_progress(sync_successfull is None)
 
-        print("")
+            if changes:
+                print("")
 
-        if newUSN != lastUSN:
-            self._set_lastUSN(newUSN)
+            # every change up to the end of this window is synced or saved as rejected
+            self._set_lastUSN(max(highestUSN, self._get_lastUSN()))
             self._commit_lastUSN()
 
         # return number of synced objects
@@ -1908,9 +1964,95 @@ class s4(univention.s4connector.ucs):
         sys.stdout.flush()
         return change_count
 
+    def __poll_change(self, element):
+        """
+        sync one change from S4
+
+        :returns: `True` if the change was synced, `False` if it was ignored or
+                saved as rejected and `None` if it is not a change of a known object.
+        """
+        ad_object = self.__object_from_element(element)
+
+        if not ad_object:
+            return None
+        # the attributes of the element may be changed by the mapping
+        s4_dn, GUID = element[0], element[1].get('objectGUID', [None])[0]
+
+        property_key = self.__identify_s4_type(ad_object)
+        if not property_key:
+            self.context_log(property_key, ad_object, 'ignoring not identified object', level=ud.INFO)
+            return None
+
+        if self._ignore_object(property_key, ad_object):
+            if ad_object['modtype'] == 'move':
+                ud.debug(ud.LDAP, ud.INFO, "object_from_element: Detected a move of an S4 object into a ignored tree: dn: %s" % ad_object['dn'])
+                ad_object['deleted_dn'] = ad_object['olddn']
+                ad_object['dn'] = ad_object['olddn']
+                ad_object['modtype'] = 'delete'
+                # check the move target
+            else:
+                return False
+
+        if ad_object['dn'].find('\\0ACNF:') > 0:
+            ud.debug(ud.LDAP, ud.PROCESS, 'Ignore conflicted object: %s' % ad_object['dn'])
+            return False
+
+        sync_successfull = False
+        try:
+            try:
+                mapped_object = self._object_mapping(property_key, ad_object)
+                if not self._ignore_object(property_key, mapped_object):
+                    sync_successfull = self.sync_to_ucs(property_key, mapped_object, ad_object['dn'], ad_object)
+                else:
+                    sync_successfull = True
+            except univention.admin.uexceptions.ldapError as msg:
+                if isinstance(msg.original_exception, ldap.SERVER_DOWN):
+                    raise msg.original_exception
+                raise
+        except ldap.SERVER_DOWN:
+            ud.debug(ud.LDAP, ud.ERROR, "Got server down during sync, re-open the connection to UCS and S4")
+            time.sleep(1)
+            self.open_ucs()
+            self.open_s4()
+        except Exception:  # FIXME: which exception is to be caught?
+            self._debug_traceback(ud.WARN, "Exception during poll/sync_to_ucs")
+
+        if sync_successfull:
+            try:
+                self._set_DN_for_GUID(GUID, s4_dn)
+            except ldap.SERVER_DOWN:
+                raise
+            except Exception:  # FIXME: which exception is to be caught?
+                self._debug_traceback(ud.WARN, "Exception during set_DN_for_GUID")
+        else:
+            self.context_log(property_key, ad_object, 'sync was not successful, save rejected', level=ud.INFO)
+            self.save_rejected(ad_object)
+
+        return sync_successfull
+
+    def __s4_change_scope(self, element):
+        """the objects touched by a change from S4, see :py:class:`univention.s4connector.workers.Scope`"""
+        dn, attributes = element
+        if dn == 'None' or dn is None:
+            return Scope()  # referrals
+
+        def values(attribute):
+            return [value.decode('UTF-8') for value in attributes.get(attribute, [])]
+
+        GUID = attributes.get('objectGUID', [None])[0]
+        dns = [dn]
+        if b'TRUE' in attributes.get('isDeleted', []):
+            last_known_parent = values('lastKnownParent')
+            if last_known_parent:
+                dns.append('%s,%s' % (dn.split('\\0ADEL:')[0], last_known_parent[0]))
+        elif GUID:
+            dns.append(self._get_DN_for_GUID(GUID))
+        return Scope(ids=[GUID], dns=dns, refs=values('member') + values('memberOf'))
+
     def __has_attribute_value_changed(self, attribute, old_ucs_object, new_ucs_object):
         return old_ucs_object.get(attribute) != new_ucs_object.get(attribute)
 
+    @synchronized
     def _remove_dn_from_group_cache(self, con_dn=None, ucs_dn=None):
         if con_dn:
             try:
@@ -1925,6 +2067,7 @@ class s4(univention.s4connector.ucs):
             except KeyError:
                 ud.debug(ud.LDAP, ud.ALL, "sync_from_ucs: %s was not present in UCS group member mapping cache" % ucs_dn)
 
+    @synchronized
     def _update_group_member_cache(self, remove_con_dn=None, remove_ucs_dn=None, add_con_dn=None, add_ucs_dn=None):
         for group in self.group_members_cache_con:
             if remove_con_dn and remove_con_dn in self.group_members_cache_con[group]:
@@ -1982,8 +2125,9 @@ class s4(univention.s4connector.ucs):
                     add_con_dn=object['dn'].lower(),
                     add_ucs_dn=pre_mapped_ucs_dn.lower())
                 ud.debug(ud.LDAP, ud.INFO, "sync_from_ucs: Updating UCS and S4 group member mapping cache for %s to %s" % (pre_mapped_ucs_dn, object['dn']))
-                self.group_member_mapping_cache_ucs[pre_mapped_ucs_dn.lower()] = object['dn']
-                self.group_member_mapping_cache_con[object['dn'].lower()] = pre_mapped_ucs_dn
+                with self._lock:
+                    self.group_member_mapping_cache_ucs[pre_mapped_ucs_dn.lower()] = object['dn']
+                    self.group_member_mapping_cache_con[object['dn'].lower()] = pre_mapped_ucs_dn
 
                 self._set_DN_for_GUID(self.s4_search_ext_s(object['dn'], ldap.SCOPE_BASE, 'objectClass=*')[0][1]['objectGUID'][0], object['dn'])
                 self._remove_dn_mapping(pre_mapped_ucs_old_dn, old_dn)
@@ -2094,7 +2238,8 @@ class s4(univention.s4connector.ucs):
                 self.update_add_cache_after_creation(entryUUID, objectGUID)
 
                 if property_type == 'group':
-                    self.group_members_cache_con[object['dn'].lower()] = set()
+                    with self._lock:
+                        self.group_members_cache_con[object['dn'].lower()] = set()
                     ud.debug(ud.LDAP, ud.INFO, "group_members_cache_con[%s]: {}" % (object['dn'].lower()))
 
                 if hasattr(self.property[property_type], "post_con_create_functions"):
@@ -197,7 +197,8 @@ def _connect(s4, poll_sleep, baseconfig_retry_rejected):
         try:
             if str(retry_rejected) == baseconfig_retry_rejected:  # FIXME: if the UCR variable is not set this compares string with integer (default value)
                 s4.resync_rejected_ucs()
-                s4.resync_rejected()
+                with s4.s4cache.transaction():
+                    s4.resync_rejected()
                 retry_rejected = 0
             else:
                 retry_rejected += 1
@@ -35,15 +35,15 @@
 
 
 import base64
+import contextlib
+import itertools
+import pickle  # noqa: S403
 import sqlite3
+import threading
 
 import univention.debug2 as ud
 
 
-def _encode_base64(val):
-    return base64.b64encode(val).decode('ASCII')
-
-
 class EntryDiff:
 
     def __init__(self, old, new):
@@ -73,21 +73,56 @@ class S4Cache:
     With this cache the connector has the possibility to create
     a diff between the new Samba 4 object and the old one from
     cache.
+
+    Every object is stored as one pickled row, the attribute names are
+    replaced by the IDs from the table `ATTRIBUTES`, which is kept in memory.
+    Changes done inside of :py:meth:`transaction` are committed together.
     """
 
+    # stored as `PRAGMA user_version`, rows of other versions are discarded
+    FORMAT_VERSION = 1
+
     def __init__(self, filename):
         self.filename = filename
-        self._dbcon = sqlite3.connect(self.filename)
-        self.s4cache = {}
-
+        self._dbcon = None
+        # the sync workers share the connection
+        self._lock = threading.RLock()
+        self._transaction = False
+        self._attr_ids = {}
+        self._attr_names = {}
+
+        self.__connect()
         self.__create_tables()
+        self.__migrate()
+        self.__load_attributes()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Commit all changes done in this context at once, e.g. of one poll cycle.
+
+        The changes are committed even if an exception occurs, as they
+        reflect the objects which were already synchronized.
+        """
+        if self._transaction:
+            yield self
+            return
+        self.__execute('BEGIN;')
+        self._transaction = True
+        try:
+            yield self
+        finally:
+            try:
+                self.__execute('COMMIT;')
+            finally:
+                self._transaction = False
 
     def add_entry(self, guid, entry):
-        if not self._guid_exists(guid):
-            self._add_entry(guid, entry)
-        else:
-            self._update_entry(guid, entry)
-        self.s4cache[guid] = entry
+        data = {}
+        with self._lock, self.transaction():
+            for attr, values in entry.items():
+                data[self._get_attr_id_and_create_if_not_exists(attr)] = list(values)
+            self.__execute("INSERT OR REPLACE INTO OBJECTS(guid, data) VALUES(?, ?);", (str(guid).strip(), self._dumps(data)))
 
     def diff_entry(self, old_entry, new_entry):
         result = {'added': None, 'removed': None, 'changed': None}
@@ -101,206 +136,114 @@ class S4Cache:
         return result
 
     def get_entry(self, guid):
-        entry = {}
-
-        guid_id = self._get_guid_id(guid)
-
-        if not guid_id:
-            return None
-
-        # The SQLite Python module should do the escaping, that's
-        # the reason why we use the tuple ? syntax.
-        # I've chosen the str call because I want to make sure
-        # that we use the same SQL value as before switching
-        # to the tuple ? syntax
-        sql_commands = [
-            ("SELECT ATTRIBUTES.attribute,data.value from data \
-                inner join ATTRIBUTES ON data.attribute_id=attributes.id where guid_id = ?;", (str(guid_id),)),
-        ]
-
-        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
-
+        rows = self.__execute("SELECT data FROM OBJECTS WHERE guid=?;", (str(guid).strip(),), fetch_result=True)
         if not rows:
             return None
 
-        for line in rows:
-            if not entry.get(line[0]):
-                entry[str(line[0])] = []
-            entry[line[0]].append(base64.b64decode(line[1]))
-
-        return entry
+        entry = {}
+        for attr_id, values in pickle.loads(rows[0][0]).items():  # noqa: S301
+            try:
+                entry[self._attr_names[attr_id]] = values
+            except KeyError:
+                ud.debug(ud.LDAP, ud.WARN, "S4Cache: Unknown attribute ID %r for %r" % (attr_id, guid))
+        return entry or None
 
     def remove_entry(self, guid):
-        guid_id = self._get_guid_id(guid)
+        self.__execute("DELETE FROM OBJECTS WHERE guid=?;", (str(guid).strip(),))
 
-        if not guid_id:
-            return
+    @staticmethod
+    def _dumps(data):
+        return pickle.dumps(data, protocol=2)
 
-        sql_commands = [
-            ("DELETE FROM data WHERE guid_id=?;", (str(guid_id),)),
-            ("DELETE FROM guids WHERE id=?;", (str(guid_id),)),
-        ]
+    def __connect(self):
+        # autocommit mode: transactions are controlled by transaction()
+        self._dbcon = sqlite3.connect(self.filename, isolation_level=None, check_same_thread=False)
+        self._dbcon.execute('PRAGMA journal_mode = WAL;')
+        self._dbcon.execute('PRAGMA synchronous = NORMAL;')
 
-        self.__execute_sql_commands(sql_commands, fetch_result=False)
+    def __execute(self, sql_command, args=(), fetch_result=False):
+        with self._lock:
+            return self.__execute_locked(sql_command, args, fetch_result)
 
-    def __execute_sql_commands(self, sql_commands, fetch_result=False):
-        for _i in [1, 2]:
+    def __execute_locked(self, sql_command, args, fetch_result):
+        for retry in (True, False):
             try:
-                cur = self._dbcon.cursor()
-                for sql_command in sql_commands:
-                    if isinstance(sql_command, tuple):
-                        ud.debug(ud.LDAP, ud.ALL, "S4Cache: Execute SQL command: '%s', '%s'" % (sql_command[0], sql_command[1]))
-                        cur.execute(sql_command[0], sql_command[1])
-                    else:
-                        ud.debug(ud.LDAP, ud.ALL, "S4Cache: Execute SQL command: '%s'" % sql_command)
-                        cur.execute(sql_command)
-                self._dbcon.commit()
-                if fetch_result:
-                    rows = cur.fetchall()
+                ud.debug(ud.LDAP, ud.ALL, "S4Cache: Execute SQL command: '%s', '%s'" % (sql_command, args))
+                cur = self._dbcon.execute(sql_command, args)
+                rows = cur.fetchall() if fetch_result else None
                 cur.close()
-                if fetch_result:
-                    ud.debug(ud.LDAP, ud.ALL, "S4Cache: Return SQL result: '%s'" % rows)
-                    return rows
-                return None
+                return rows
             except sqlite3.Error as exp:
-                ud.debug(ud.LDAP, ud.WARN, "S4Cache: sqlite: %s. SQL command was: %s" % (exp, sql_commands))
+                ud.debug(ud.LDAP, ud.WARN, "S4Cache: sqlite: %s. SQL command was: %s" % (exp, sql_command))
+                if self._transaction or not retry:
+                    # reconnecting inside of a transaction would silently discard the changes done so far
+                    raise
                 if self._dbcon:
                     self._dbcon.close()
-                self._dbcon = sqlite3.connect(self.filename)
+                self.__connect()
+                self.__load_attributes()
 
     def __create_tables(self):
-        sql_commands = [
-            "CREATE TABLE IF NOT EXISTS GUIDS (id INTEGER PRIMARY KEY, guid TEXT);",
-            "CREATE TABLE IF NOT EXISTS ATTRIBUTES (id INTEGER PRIMARY KEY, attribute TEXT);",
-            "CREATE TABLE IF NOT EXISTS DATA (id INTEGER PRIMARY KEY, guid_id INTEGER, attribute_id INTEGER, value TEXT);",
-            "CREATE INDEX IF NOT EXISTS data_foreign_keys ON data(guid_id, attribute_id);",
-            "CREATE INDEX IF NOT EXISTS attributes_attribute ON attributes(attribute);",
-            "CREATE INDEX IF NOT EXISTS guids_guid ON guids(guid);",
-        ]
-
-        self.__execute_sql_commands(sql_commands, fetch_result=False)
-
-    def _guid_exists(self, guid):
-        return self._get_guid_id(guid.strip()) is not None
-
-    def _get_guid_id(self, guid):
-        sql_commands = [
-            ("SELECT id FROM GUIDS WHERE guid=?;", (str(guid),)),
-        ]
-
-        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
-
-        if rows:
-            return rows[0][0]
-
-        return None
-
-    def _append_guid(self, guid):
-        sql_commands = [
-            ("INSERT INTO GUIDS(guid) VALUES(?);", (str(guid),)),
-        ]
-
-        self.__execute_sql_commands(sql_commands, fetch_result=False)
-
-    def _get_attr_id(self, attr):
-        sql_commands = [
-            ("SELECT id FROM ATTRIBUTES WHERE attribute=?;", (str(attr),)),
-        ]
-
-        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
-
-        if rows:
-            return rows[0][0]
-
-        return None
-
-    def _attr_exists(self, guid):
-        return self._get_attr_id(guid) is not None
-
-    def _create_attr(self, attr):
-        sql_commands = [
-            ("INSERT INTO ATTRIBUTES(attribute) VALUES(?);", (str(attr),)),
-        ]
+        self.__execute("CREATE TABLE IF NOT EXISTS ATTRIBUTES (id INTEGER PRIMARY KEY, attribute TEXT);")
+        self.__execute("CREATE INDEX IF NOT EXISTS attributes_attribute ON attributes(attribute);")
+        self.__execute("CREATE TABLE IF NOT EXISTS OBJECTS (guid TEXT PRIMARY KEY NOT NULL, data BLOB NOT NULL) WITHOUT ROWID;")
+
+    def __migrate(self):
+        """
+        Convert the rows of the former tables `GUIDS` and `DATA` into `OBJECTS`
+        and discard rows stored in another format.
+        """
+        version, = self.__execute("PRAGMA user_version;", fetch_result=True)[0]
+        if version != self.FORMAT_VERSION:
+            with self.transaction():
+                if self.__execute("SELECT 1 FROM OBJECTS LIMIT 1;", fetch_result=True):
+                    ud.debug(ud.LDAP, ud.PROCESS, "S4Cache: Discarding objects stored in format %d" % (version,))
+                    self.__execute("DELETE FROM OBJECTS;")
+                self.__execute("PRAGMA user_version = %d;" % (self.FORMAT_VERSION,))
+
+        tables = {name.upper() for name, in self.__execute("SELECT name FROM sqlite_master WHERE type='table';", fetch_result=True)}
+        if not {'GUIDS', 'DATA'} <= tables:
+            return
 
-        self.__execute_sql_commands(sql_commands, fetch_result=False)
+        ud.debug(ud.LDAP, ud.PROCESS, "S4Cache: Migrating %s to the new format" % (self.filename,))
+        with self.transaction():
+            cur = self._dbcon.execute("SELECT GUIDS.guid, DATA.attribute_id, DATA.value FROM DATA INNER JOIN GUIDS ON DATA.guid_id=GUIDS.id ORDER BY DATA.guid_id, DATA.id;")
+            objects = 0
+            for guid, rows in itertools.groupby(cur, key=lambda row: row[0]):
+                data = {}
+                for _guid, attr_id, value in rows:
+                    data.setdefault(attr_id, []).append(base64.b64decode(value))
+                self._dbcon.execute("INSERT OR REPLACE INTO OBJECTS(guid, data) VALUES(?, ?);", (guid.strip(), self._dumps(data)))
+                objects += 1
+            self.__execute("DROP TABLE DATA;")
+            self.__execute("DROP TABLE GUIDS;")
+        self.__execute("VACUUM;")
+        ud.debug(ud.LDAP, ud.PROCESS, "S4Cache: Migrated %d objects" % (objects,))
+
+    def __load_attributes(self):
+        rows = self.__execute("SELECT id, attribute FROM ATTRIBUTES;", fetch_result=True)
+        self._attr_ids = {attr: attr_id for attr_id, attr in rows}
+        self._attr_names = dict(rows)
 
     def _get_attr_id_and_create_if_not_exists(self, attr):
-        attr_id = self._get_attr_id(attr)
-        if not attr_id:
-            self._create_attr(attr)
-            attr_id = self._get_attr_id(attr)
-
-        return attr_id
-
-    def _add_entry(self, guid, entry):
-        guid = guid.strip()
-
-        self._append_guid(guid)
-        guid_id = self._get_guid_id(guid)
-
-        sql_commands = []
-        for attr in entry.keys():
-            attr_id = self._get_attr_id_and_create_if_not_exists(attr)
-            for value in entry[attr]:
-                sql_commands.append(
-                    (
-                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
-                    ),
-                )
-
-        if sql_commands:
-            self.__execute_sql_commands(sql_commands, fetch_result=False)
-
-    def _update_entry(self, guid, entry):
-        guid = guid.strip()
-        guid_id = self._get_guid_id(guid)
-        old_entry = self.get_entry(guid)
-        diff = self.diff_entry(old_entry, entry)
-
-        sql_commands = []
-        for attribute in diff['removed']:
-            sql_commands.append(
-                (
-                    "DELETE FROM data WHERE data.id IN (\
-                SELECT data.id FROM DATA INNER JOIN ATTRIBUTES ON data.attribute_id=attributes.id \
-                    where attributes.attribute=? and guid_id=? \
-                );", (str(attribute), str(guid_id)),
-                ),
-            )
-        for attribute in diff['added']:
-            attr_id = self._get_attr_id_and_create_if_not_exists(attribute)
-            for value in entry[attribute]:
-                sql_commands.append(
-                    (
-                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
-                    ),
-                )
-        for attribute in diff['changed']:
-            attr_id = self._get_attr_id_and_create_if_not_exists(attribute)
-            for value in set(old_entry.get(attribute)) - set(entry.get(attribute)):
-                sql_commands.append(
-                    (
-                        "DELETE FROM data WHERE data.id IN (\
-                            SELECT data.id FROM DATA INNER JOIN ATTRIBUTES ON data.attribute_id=attributes.id \
-                            where attributes.id=? and guid_id = ? and value = ? \
-                        );", (str(attr_id), str(guid_id), _encode_base64(value)),
-                    ),
-                )
-            for value in set(entry.get(attribute)) - set(old_entry.get(attribute)):
-                sql_commands.append(
-                    (
-                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
-                    ),
-                )
-
-        if sql_commands:
-            self.__execute_sql_commands(sql_commands, fetch_result=False)
-
-
-if __name__ == '__main__':
+        attr = str(attr)
+        try:
+            return self._attr_ids[attr]
+        except KeyError:
+            pass
+        with self._lock:
+            if attr not in self._attr_ids:
+                self.__execute("INSERT INTO ATTRIBUTES(attribute) VALUES(?);", (attr,))
+                attr_id = self.__execute("SELECT id FROM ATTRIBUTES WHERE attribute=?;", (attr,), fetch_result=True)[0][0]
+                self._attr_ids[attr] = attr_id
+                self._attr_names[attr_id] = attr
+            return self._attr_ids[attr]
+
+
+def _selftest(filename):
     print('Starting S4cache test example ', end=' ')
 
-    s4cache = S4Cache('cache.sqlite')
+    s4cache = S4Cache(filename)
 
     guid = '1234'
 
@@ -332,3 +275,7 @@ if __name__ == '__main__':
     print('.', end=' ')
 
     print(' done')
+
+
+if __name__ == '__main__':
+    _selftest('cache.sqlite')
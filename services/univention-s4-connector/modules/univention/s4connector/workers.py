@@ -0,0 +1,318 @@
+#!/usr/bin/python3
+#
+# Univention S4 Connector
+#  parallel sync workers
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Parallel synchronisation of independent changes.
+
+The changes of one poll are handed to a pool of worker threads. Every
+worker has its own LDAP connections (see :py:class:`PerWorker`). A change
+is only started when it does not conflict with a change which is running
+or which comes earlier in the list, so the order is kept for every object
+and between an object and its parents and children. State which is shared
+by the workers, e.g. the group member caches, is guarded by the lock of the
+connector (see :py:func:`synchronized`).
+"""
+
+import argparse
+import collections
+import functools
+import queue
+import random
+import threading
+import time
+
+import ldap.dn
+
+import univention.debug2 as ud
+
+
+class PerWorker:
+    """
+    Descriptor for attributes like LDAP connections, of which every worker
+    thread has its own value. Outside of a worker thread the value of the
+    instance is used.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = '_%s' % (name,)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        local = obj.__dict__.get('_worker_local')
+        if local is not None and getattr(local, 'active', False):
+            try:
+                return getattr(local, self.name)
+            except AttributeError:
+                pass
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name[1:])
+
+    def __set__(self, obj, value):
+        local = obj.__dict__.get('_worker_local')
+        if local is not None and getattr(local, 'active', False):
+            setattr(local, self.name, value)
+        else:
+            obj.__dict__[self.name] = value
+
+
+def synchronized(func):
+    """Serialize calls of the decorated method by the lock `self._lock`."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+@functools.lru_cache(maxsize=65536)
+def _normalize_dn(dn):
+    return ldap.dn.str2dn(dn.lower())
+
+
+class Scope:
+    """
+    The objects touched by a change.
+
+    :param ids: GUIDs or entryUUIDs of the object.
+    :param dns: The DNs of the object, e.g. the old and the new DN of a move.
+    :param refs: DNs of other objects the change refers to, e.g. group members.
+    """
+
+    __slots__ = ('ancestors', 'barrier', 'dns', 'ids', 'refs')
+
+    def __init__(self, ids=(), dns=(), refs=()):
+        self.ids = {i for i in ids if i}
+        self.dns = set()
+        self.ancestors = set()
+        self.refs = set()
+        self.barrier = False
+        try:
+            for dn in dns:
+                if not dn:
+                    continue
+                rdns = _normalize_dn(dn)
+                self.dns.add(ldap.dn.dn2str(rdns))
+                self.ancestors.update(ldap.dn.dn2str(rdns[i:]) for i in range(len(rdns)))
+            self.refs = {ldap.dn.dn2str(_normalize_dn(dn)) for dn in refs if dn}
+        except ldap.DECODING_ERROR:
+            # we can't tell what the change touches: run it on its own
+            self.barrier = True
+
+    def conflicts(self, other):
+        """Whether the two changes must not run concurrently."""
+        return (
+            self.barrier or other.barrier
+            or not self.ids.isdisjoint(other.ids)
+            or not self.dns.isdisjoint(other.ancestors)
+            or not other.dns.isdisjoint(self.ancestors)
+            or not self.refs.isdisjoint(other.dns)
+            or not other.refs.isdisjoint(self.dns)
+        )
+
+
+class WorkerPool:
+    """
+    Pool of threads synchronising changes concurrently.
+
+    :param connector: The connector; :py:meth:`init_worker` is called in
+            every new thread to open the connections of the worker.
+    :param int workers: Number of threads.
+    :param int lookahead: Number of waiting changes which are checked for
+            being startable. Defaults to eight per worker.
+    """
+
+    def __init__(self, connector, workers, lookahead=None):
+        self.connector = connector
+        self.workers = workers
+        self.lookahead = lookahead or 8 * workers
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._threads = []
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name='s4connector-worker-%d' % (len(self._threads),), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        initialized = False
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            index, func, item = task
+            try:
+                if not initialized:
+                    self.connector.init_worker()
+                    initialized = True
+                self._results.put((index, func(item), None))
+            except BaseException as exc:
+                self._results.put((index, None, exc))
+
+    def close(self):
+        """Stop all threads."""
+        for _thread in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run(self, func, items, scope):
+        """
+        Call `func` for every item, concurrently where possible.
+
+        If a call raises an exception, no further items are started; the
+        exception is raised after the running calls have finished.
+
+        :param func: Function synchronising one item.
+        :param items: The items in the order in which they must be applied.
+        :param scope: Function returning the :py:class:`Scope` of an item.
+        :returns: Iterator over the tuples `(item, result)` in the order of
+                completion.
+        """
+        self._start()
+        pending = collections.deque((index, item, scope(item)) for index, item in enumerate(items))
+        running = {}
+        error = None
+        while pending or running:
+            if error is None:
+                self._schedule(func, pending, running)
+            index, result, exc = self._results.get()
+            item, _scope = running.pop(index)
+            if exc is not None:
+                if error is None:
+                    ud.debug(ud.LDAP, ud.WARN, 'WorkerPool: stop after exception: %r' % (exc,))
+                    error = exc
+                    pending.clear()
+                continue
+            yield item, result
+        if error is not None:
+            raise error
+
+    def _schedule(self, func, pending, running):
+        waiting = []
+        started = []
+        for position, (index, item, scope) in enumerate(pending):
+            if len(running) >= self.workers or position >= self.lookahead:
+                break
+            if any(scope.conflicts(other) for _item, other in running.values()) or any(scope.conflicts(other) for other in waiting):
+                waiting.append(scope)
+                continue
+            running[index] = (item, scope)
+            started.append(position)
+            self._tasks.put((index, func, item))
+        for position in reversed(started):
+            del pending[position]
+
+
+def _benchmark(changes, objects, workers, latency, seed):
+    """
+    Synchronise random changes into an in-memory directory which behaves like
+    slapd or Samba: an object can only be created below an existing parent,
+    only existing objects can be modified or removed, and every operation
+    takes `latency` seconds.
+    """
+    rng = random.Random(seed)
+    base = 'dc=example,dc=com'
+    containers = ['ou=ou%d,%s' % (i, base) for i in range(max(1, objects // 100))]
+    items = []
+    created = set()
+    parents = []
+    members = []
+    for _number in range(changes):
+        if containers and (not parents or rng.random() < 0.05):
+            dn = containers.pop(0)
+            items.append(('add', dn, base, ()))
+            parents.append(dn)
+            continue
+        parent = rng.choice(parents)
+        dn = 'cn=obj%d,%s' % (rng.randrange(objects), parent)
+        if dn in created:
+            items.append(('modify', dn, parent, ()))
+            continue
+        refs = tuple(rng.sample(members, min(3, len(members)))) if rng.random() < 0.1 else ()
+        items.append(('add', dn, parent, refs))
+        created.add(dn)
+        members.append(dn)
+
+    directory = {base}
+    lock = threading.Lock()
+    rejected = []
+
+    class StandIn:
+        def init_worker(self):
+            pass
+
+    def sync(item):
+        modtype, dn, parent, members = item
+        time.sleep(latency)
+        with lock:
+            if modtype == 'add' and parent in directory and all(m in directory for m in members):
+                directory.add(dn)
+                return True
+            if modtype == 'modify' and dn in directory:
+                return True
+        rejected.append(item)
+        return False
+
+    def scope(item):
+        _modtype, dn, _parent, members = item
+        return Scope(ids=(dn,), dns=(dn,), refs=members)
+
+    pool = WorkerPool(StandIn(), workers)
+    start = time.monotonic()
+    synced = sum(1 for _item, result in pool.run(sync, items, scope) if result)
+    duration = time.monotonic() - start
+    pool.close()
+    print('%3d workers: %6d changes in %7.2fs (%8.1f/s), %d rejected' % (workers, synced, duration, len(items) / duration, len(rejected)))
+    return rejected
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Soak benchmark of the parallel sync workers against an in-memory LDAP stand-in')
+    parser.add_argument('--changes', type=int, default=20000, help='Number of changes (default: %(default)s)')
+    parser.add_argument('--objects', type=int, default=5000, help='Number of distinct objects (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.002, help='Seconds per LDAP operation (default: %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4, 8, 16], help='Numbers of workers to compare (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=1, help='Repeat with different random changes (default: %(default)s)')
+    args = parser.parse_args()
+    for round_ in range(args.rounds):
+        for workers in args.workers:
+            if _benchmark(args.changes, args.objects, workers, args.latency, seed=round_):
+                raise SystemExit('Ordering violated with %d workers' % (workers,))
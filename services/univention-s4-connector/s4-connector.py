@@ -38,10 +38,12 @@ from __future__ import annotations
 import os
 import pickle  # noqa: S403
 import shutil
+import sqlite3
 import subprocess
 import time
 
 import univention.debug as ud
+from univention.s4connector.journal import ChangeJournal
 
 import listener
 
@@ -55,6 +57,8 @@ modrdn = "1"
 s4_init_mode = False
 group_objects = []
 connector_needs_restart = False
+# one journal per listener directory, connected from prerun() until postrun()
+journals: dict[str, ChangeJournal] = {}
 
 dirs = [listener.configRegistry.get('connector/s4/listener/dir', '/var/lib/univention-connector/s4')]
 if listener.configRegistry.get('connector/listener/additionalbasenames'):
@@ -83,9 +87,41 @@ def _load_old_object(directory: str) -> tuple[str, dict[str, list[bytes]]]:
     return (old_dn, old_object)
 
 
+def _is_journal_enabled() -> bool:
+    return listener.configRegistry.is_true('connector/s4/listener/journal', True)
+
+
+def _get_journal(directory: str) -> ChangeJournal:
+    try:
+        return journals[directory]
+    except KeyError:
+        journal = journals[directory] = ChangeJournal(directory)
+        return journal
+
+
+def _close_journals() -> None:
+    for journal in journals.values():
+        journal.close()
+
+
+def _append_to_journal(directory: str, obs: list[tuple]) -> bool:
+    journal = _get_journal(directory)
+    try:
+        journal.extend(obs)
+    except sqlite3.Error as exc:
+        ud.debug(ud.LISTENER, ud.ERROR, "s4-connector: could not write to the journal in %s, falling back to files: %s" % (directory, exc))
+        # reconnect with the next change
+        journal.close()
+        return False
+    return True
+
+
 def _dump_changes_to_file_and_check_file(directory: str, dn: str, new: dict[str, list[bytes]] | None, old: dict[str, list[bytes]] | None, old_dn: str | None) -> None:
     ob = (dn, new, old, old_dn)
 
+    if _is_journal_enabled() and _append_to_journal(directory, [ob]):
+        return
+
     tmpdir = os.path.join(directory, 'tmp')
     filename = '%f' % (time.time(),)
     filepath = os.path.join(tmpdir, filename)
@@ -172,8 +208,11 @@ def clean() -> None:
             if not os.path.exists(directory):
                 continue
             for filename in os.listdir(directory):
-                if filename != "tmp":
+                if filename != "tmp" and not filename.startswith(ChangeJournal.FILENAME):
                     os.remove(os.path.join(directory, filename))
+            journal = _get_journal(directory)
+            if journal.exists():
+                journal.clear()
             if os.path.exists(os.path.join(directory, 'tmp')):
                 for filename in os.listdir(os.path.join(directory, 'tmp')):
                     os.remove(os.path.join(directory, filename))
@@ -181,17 +220,37 @@ def clean() -> None:
         listener.unsetuid()
 
 
+def prerun() -> None:
+    """Called before busy period."""
+    if _is_module_disabled() or not _is_journal_enabled():
+        return
+
+    listener.setuid(0)
+    try:
+        for directory in dirs:
+            if not os.path.isdir(directory):
+                continue
+            try:
+                _get_journal(directory).open()
+            except (OSError, sqlite3.Error) as exc:
+                ud.debug(ud.LISTENER, ud.WARN, "s4-connector: could not open the journal in %s: %s" % (directory, exc))
+    finally:
+        listener.unsetuid()
+
+
 def postrun() -> None:
     global s4_init_mode
     global group_objects
     global connector_needs_restart
 
-    if s4_init_mode:
-        listener.setuid(0)
-        try:
+    listener.setuid(0)
+    try:
+        if s4_init_mode:
             s4_init_mode = False
-            for ob in group_objects:
-                for directory in dirs:
+            for directory in dirs:
+                if _is_journal_enabled() and _append_to_journal(directory, group_objects):
+                    continue
+                for ob in group_objects:
                     filename = os.path.join(directory, "%f" % time.time())
                     with open(filename, 'wb+') as fd:
                         os.chmod(filename, 0o600)
@@ -200,8 +259,9 @@ def postrun() -> None:
                         p.clear_memo()
             del group_objects
             group_objects = []
-        finally:
-            listener.unsetuid()
+        _close_journals()
+    finally:
+        listener.unsetuid()
 
     if connector_needs_restart:
         _restart_connector()
@@ -48,6 +48,7 @@ from samba.param import LoadParm
 from samba.samdb import SamDB
 
 from univention.config_registry import ConfigRegistry
+from univention.s4connector.s4cache import S4Cache
 
 
 class GuidNotFound(BaseException):
@@ -67,16 +68,7 @@ class S4Resync:
 
     def _remove_cache_entries(self, guid):
         db_cache_file = '/etc/univention/connector/s4cache.sqlite'
-        cache_db = sqlite3.connect(db_cache_file)
-        c = cache_db.cursor()
-        c.execute("SELECT id FROM GUIDS WHERE guid=?", (str(guid),))
-        guid_ids = c.fetchone()
-        if guid_ids:
-            guid_id = guid_ids[0]
-            c.execute("DELETE from DATA where guid_id = ?", (guid_id,))
-            c.execute("DELETE from GUIDS where id = ?", (guid_id,))
-            cache_db.commit()
-        cache_db.close()
+        S4Cache(db_cache_file).remove_entry(str(guid))
         os.chmod(db_cache_file, 640)
 
     def _add_object_to_rejected(self, s4_dn, usn):
@@ -165,6 +157,9 @@ if __name__ == '__main__':
         if len(ex.args) == 3:
             treated_dns = ex.args[2]
         sys.exit(1)
+    except sqlite3.Error as ex:
+        print('ERROR: The S4 cache could not be updated: %s' % (ex,))
+        sys.exit(1)
     finally:
         for dn in treated_dns:
             print('resync triggered for %s' % dn)
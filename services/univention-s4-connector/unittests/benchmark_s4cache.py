@@ -0,0 +1,345 @@
+#!/usr/bin/python3
+#
+# Univention S4 Connector
+#  benchmark of the s4 cache
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+"""
+Compare :py:class:`univention.s4connector.s4cache.S4Cache` against the former
+implementation, which stores every attribute value in its own row::
+
+    python3 benchmark_s4cache.py 10000 100000
+"""
+
+import argparse
+import base64
+import contextlib
+import os
+import sqlite3
+import tempfile
+import time
+
+import univention.debug2 as ud
+from univention.s4connector.s4cache import EntryDiff, S4Cache
+
+
+def _encode_base64(val):
+    return base64.b64encode(val).decode('ASCII')
+
+
+class LegacyS4Cache:
+    """
+    The former implementation of :py:class:`S4Cache`, which stores every
+    attribute value in its own row and commits after every statement.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._dbcon = sqlite3.connect(self.filename)
+
+        self.__create_tables()
+
+    def add_entry(self, guid, entry):
+        if not self._guid_exists(guid):
+            self._add_entry(guid, entry)
+        else:
+            self._update_entry(guid, entry)
+
+    def diff_entry(self, old_entry, new_entry):
+        result = {'added': None, 'removed': None, 'changed': None}
+
+        diff = EntryDiff(old_entry, new_entry)
+
+        result['added'] = diff.added()
+        result['removed'] = diff.removed()
+        result['changed'] = diff.changed()
+
+        return result
+
+    def get_entry(self, guid):
+        entry = {}
+
+        guid_id = self._get_guid_id(guid)
+
+        if not guid_id:
+            return None
+
+        # The SQLite Python module should do the escaping, that's
+        # the reason why we use the tuple ? syntax.
+        # I've chosen the str call because I want to make sure
+        # that we use the same SQL value as before switching
+        # to the tuple ? syntax
+        sql_commands = [
+            ("SELECT ATTRIBUTES.attribute,data.value from data \
+                inner join ATTRIBUTES ON data.attribute_id=attributes.id where guid_id = ?;", (str(guid_id),)),
+        ]
+
+        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
+
+        if not rows:
+            return None
+
+        for line in rows:
+            if not entry.get(line[0]):
+                entry[str(line[0])] = []
+            entry[line[0]].append(base64.b64decode(line[1]))
+
+        return entry
+
+    def remove_entry(self, guid):
+        guid_id = self._get_guid_id(guid)
+
+        if not guid_id:
+            return
+
+        sql_commands = [
+            ("DELETE FROM data WHERE guid_id=?;", (str(guid_id),)),
+            ("DELETE FROM guids WHERE id=?;", (str(guid_id),)),
+        ]
+
+        self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+    def __execute_sql_commands(self, sql_commands, fetch_result=False):
+        for _i in [1, 2]:
+            try:
+                cur = self._dbcon.cursor()
+                for sql_command in sql_commands:
+                    if isinstance(sql_command, tuple):
+                        ud.debug(ud.LDAP, ud.ALL, "S4Cache: Execute SQL command: '%s', '%s'" % (sql_command[0], sql_command[1]))
+                        cur.execute(sql_command[0], sql_command[1])
+                    else:
+                        ud.debug(ud.LDAP, ud.ALL, "S4Cache: Execute SQL command: '%s'" % sql_command)
+                        cur.execute(sql_command)
+                self._dbcon.commit()
+                if fetch_result:
+                    rows = cur.fetchall()
+                cur.close()
+                if fetch_result:
+                    ud.debug(ud.LDAP, ud.ALL, "S4Cache: Return SQL result: '%s'" % rows)
+                    return rows
+                return None
+            except sqlite3.Error as exp:
+                ud.debug(ud.LDAP, ud.WARN, "S4Cache: sqlite: %s. SQL command was: %s" % (exp, sql_commands))
+                if self._dbcon:
+                    self._dbcon.close()
+                self._dbcon = sqlite3.connect(self.filename)
+
+    def __create_tables(self):
+        sql_commands = [
+            "CREATE TABLE IF NOT EXISTS GUIDS (id INTEGER PRIMARY KEY, guid TEXT);",
+            "CREATE TABLE IF NOT EXISTS ATTRIBUTES (id INTEGER PRIMARY KEY, attribute TEXT);",
+            "CREATE TABLE IF NOT EXISTS DATA (id INTEGER PRIMARY KEY, guid_id INTEGER, attribute_id INTEGER, value TEXT);",
+            "CREATE INDEX IF NOT EXISTS data_foreign_keys ON data(guid_id, attribute_id);",
+            "CREATE INDEX IF NOT EXISTS attributes_attribute ON attributes(attribute);",
+            "CREATE INDEX IF NOT EXISTS guids_guid ON guids(guid);",
+        ]
+
+        self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+    def _guid_exists(self, guid):
+        return self._get_guid_id(guid.strip()) is not None
+
+    def _get_guid_id(self, guid):
+        sql_commands = [
+            ("SELECT id FROM GUIDS WHERE guid=?;", (str(guid),)),
+        ]
+
+        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
+
+        if rows:
+            return rows[0][0]
+
+        return None
+
+    def _append_guid(self, guid):
+        sql_commands = [
+            ("INSERT INTO GUIDS(guid) VALUES(?);", (str(guid),)),
+        ]
+
+        self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+    def _get_attr_id(self, attr):
+        sql_commands = [
+            ("SELECT id FROM ATTRIBUTES WHERE attribute=?;", (str(attr),)),
+        ]
+
+        rows = self.__execute_sql_commands(sql_commands, fetch_result=True)
+
+        if rows:
+            return rows[0][0]
+
+        return None
+
+    def _attr_exists(self, guid):
+        return self._get_attr_id(guid) is not None
+
+    def _create_attr(self, attr):
+        sql_commands = [
+            ("INSERT INTO ATTRIBUTES(attribute) VALUES(?);", (str(attr),)),
+        ]
+
+        self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+    def _get_attr_id_and_create_if_not_exists(self, attr):
+        attr_id = self._get_attr_id(attr)
+        if not attr_id:
+            self._create_attr(attr)
+            attr_id = self._get_attr_id(attr)
+
+        return attr_id
+
+    def _add_entry(self, guid, entry):
+        guid = guid.strip()
+
+        self._append_guid(guid)
+        guid_id = self._get_guid_id(guid)
+
+        sql_commands = []
+        for attr in entry.keys():
+            attr_id = self._get_attr_id_and_create_if_not_exists(attr)
+            for value in entry[attr]:
+                sql_commands.append(
+                    (
+                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
+                    ),
+                )
+
+        if sql_commands:
+            self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+    def _update_entry(self, guid, entry):
+        guid = guid.strip()
+        guid_id = self._get_guid_id(guid)
+        old_entry = self.get_entry(guid)
+        diff = self.diff_entry(old_entry, entry)
+
+        sql_commands = []
+        for attribute in diff['removed']:
+            sql_commands.append(
+                (
+                    "DELETE FROM data WHERE data.id IN (\
+                SELECT data.id FROM DATA INNER JOIN ATTRIBUTES ON data.attribute_id=attributes.id \
+                    where attributes.attribute=? and guid_id=? \
+                );", (str(attribute), str(guid_id)),
+                ),
+            )
+        for attribute in diff['added']:
+            attr_id = self._get_attr_id_and_create_if_not_exists(attribute)
+            for value in entry[attribute]:
+                sql_commands.append(
+                    (
+                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
+                    ),
+                )
+        for attribute in diff['changed']:
+            attr_id = self._get_attr_id_and_create_if_not_exists(attribute)
+            for value in set(old_entry.get(attribute)) - set(entry.get(attribute)):
+                sql_commands.append(
+                    (
+                        "DELETE FROM data WHERE data.id IN (\
+                            SELECT data.id FROM DATA INNER JOIN ATTRIBUTES ON data.attribute_id=attributes.id \
+                            where attributes.id=? and guid_id = ? and value = ? \
+                        );", (str(attr_id), str(guid_id), _encode_base64(value)),
+                    ),
+                )
+            for value in set(entry.get(attribute)) - set(old_entry.get(attribute)):
+                sql_commands.append(
+                    (
+                        "INSERT INTO DATA(guid_id,attribute_id,value) VALUES(?,?,?);", (str(guid_id), str(attr_id), _encode_base64(value)),
+                    ),
+                )
+
+        if sql_commands:
+            self.__execute_sql_commands(sql_commands, fetch_result=False)
+
+
+def _benchmark_entry(number, generation):
+    name = b'user%d' % (number,)
+    return {
+        'objectClass': [b'top', b'person', b'organizationalPerson', b'user'],
+        'objectGUID': [number.to_bytes(16, 'little')],
+        'objectSid': [b'S-1-5-21-1-2-3-%d' % (number,)],
+        'cn': [name],
+        'sAMAccountName': [name],
+        'userPrincipalName': [name + b'@example.com'],
+        'givenName': [b'Given %d' % (number,)],
+        'sn': [b'Surname %d' % (number,)],
+        'displayName': [b'Given Surname %d' % (number,)],
+        'description': [b'Benchmark user in generation %d' % (generation,)],
+        'mail': [name + b'@example.com'],
+        'memberOf': [b'CN=group%d,CN=Users,DC=example,DC=com' % (group,) for group in range(1 + number % 5)],
+        'userAccountControl': [b'512'],
+        'pwdLastSet': [b'133000000000000000'],
+        'uSNCreated': [b'%d' % (number,)],
+        'uSNChanged': [b'%d' % (number + generation,)],
+        'whenChanged': [b'20240101%06d.0Z' % (generation,)],
+    }
+
+
+def benchmark(counts, cycle=1000, directory=None):
+    """
+    Compare :py:class:`LegacyS4Cache` and :py:class:`S4Cache` by adding,
+    modifying and reading `counts` objects, grouped into poll cycles of
+    `cycle` objects each.
+    """
+    for count in counts:
+        for backend in (LegacyS4Cache, S4Cache):
+            with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+                filename = os.path.join(tmpdir, 's4cache.sqlite')
+                cache = backend(filename)
+                transaction = getattr(cache, 'transaction', contextlib.nullcontext)
+                timings = []
+                for generation in (0, 1):
+                    start = time.monotonic()
+                    for offset in range(0, count, cycle):
+                        with transaction():
+                            for number in range(offset, min(offset + cycle, count)):
+                                guid = '%032x' % (number,)
+                                entry = _benchmark_entry(number, generation)
+                                cache.diff_entry(cache.get_entry(guid), entry)
+                                cache.add_entry(guid, entry)
+                    timings.append(time.monotonic() - start)
+                start = time.monotonic()
+                for number in range(count):
+                    assert cache.get_entry('%032x' % (number,)) == _benchmark_entry(number, 1)
+                timings.append(time.monotonic() - start)
+                size = sum(os.path.getsize(os.path.join(tmpdir, name)) for name in os.listdir(tmpdir))
+                print('%-14s %7d objects: add %8.2fs, modify %8.2fs, read %8.2fs, %8.1f MiB' % (backend.__name__, count, *timings, size / 1024.0 / 1024.0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the S4 connector cache")
+    parser.add_argument('counts', type=int, nargs='*', default=[10000, 100000], metavar='COUNT', help='Compare the cache backends with COUNT objects (default: 10000 100000)')
+    parser.add_argument('--cycle', type=int, default=1000, help='Objects per poll cycle (default: %(default)s)')
+    parser.add_argument('--directory', help='Directory for the benchmark databases')
+    args = parser.parse_args()
+    benchmark(args.counts, args.cycle, args.directory)
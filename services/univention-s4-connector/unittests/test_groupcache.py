@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import marshal
+import sqlite3
+
+import pytest
+from univentionunittests import import_module
+
+
+groupcache = import_module('groupcache', 'modules/univention/s4connector/', 'univention.s4connector.groupcache', use_installed=False)
+GroupMemberCache = groupcache.GroupMemberCache
+GroupMembers = groupcache.GroupMembers
+
+GROUPS = {
+    'cn=group1,dc=example,dc=com': {'uid=user1,dc=example,dc=com', 'uid=user2,dc=example,dc=com'},
+    'cn=group2,dc=example,dc=com': set(),
+}
+
+
+@pytest.fixture()
+def filename(tmp_path):
+    return str(tmp_path / 'groupmembers.sqlite')
+
+
+@pytest.fixture()
+def db(filename):
+    return GroupMemberCache(filename)
+
+
+def saved(filename):
+    with sqlite3.connect(filename) as dbcon:
+        return dict(dbcon.execute("SELECT cache, value FROM WATERMARKS;")), {grp for grp, in dbcon.execute("SELECT grp FROM MEMBERS;")}
+
+
+@pytest.mark.parametrize('change,changed', [
+    (lambda groups: groups['a'].add('x'), {'a'}),
+    (lambda groups: groups['a'].add('1'), set()),
+    (lambda groups: groups['a'].discard('1'), {'a'}),
+    (lambda groups: groups['a'].discard('x'), set()),
+    (lambda groups: groups['a'].remove('1'), {'a'}),
+    (lambda groups: groups['a'].update({'x'}), {'a'}),
+    (lambda groups: groups['a'].clear(), {'a'}),
+    (lambda groups: groups['a'].__ior__({'x'}), {'a'}),
+    (lambda groups: groups['a'].__isub__({'1'}), {'a'}),
+    (lambda groups: groups.__setitem__('c', set()), {'c'}),
+    (lambda groups: groups.setdefault('c', set()).add('x'), {'c'}),
+    (lambda groups: groups.setdefault('a', set()).add('x'), {'a'}),
+    (lambda groups: groups.__delitem__('a'), {'a'}),
+    (lambda groups: groups.pop('a'), {'a'}),
+    (lambda groups: groups.pop('c', None), set()),
+    (lambda groups: groups.update({'b': {'x'}}), {'b'}),
+    (lambda groups: groups.clear(), {'a', 'b'}),
+])
+def test_group_members_changed(change, changed):
+    calls = []
+    groups = GroupMembers({'a': {'1', '2'}, 'b': set()}, lambda: calls.append(True))
+    change(groups)
+    assert groups.changed == changed
+    assert calls == ([True] if changed else [])
+
+
+def test_group_members_on_change_once():
+    calls = []
+    groups = GroupMembers({'a': set()}, lambda: calls.append(True))
+    groups['a'].add('1')
+    groups.setdefault('b', set()).add('2')
+    assert calls == [True]
+    groups.changed = set()
+    groups['b'].add('3')
+    assert calls == [True, True]
+
+
+def test_save_load(db, filename):
+    assert db.load('ucs', 'journal:1') is None
+    db.save({'ucs': (db.track(GROUPS), 'journal:1')})
+    assert saved(filename) == ({'ucs': 'journal:1'}, set(GROUPS))
+
+    groups = GroupMemberCache(filename).load('ucs', 'journal:1')
+    assert groups == GROUPS
+    assert isinstance(groups, GroupMembers)
+    assert not groups.changed
+
+
+def test_load_other_watermark(db, filename):
+    db.save({'con': (db.track(GROUPS), '10')})
+    db = GroupMemberCache(filename)
+    assert db.load('con', '11') is None
+    assert saved(filename) == ({}, set())
+
+
+def test_load_broken(db, filename):
+    db.save({'con': (db.track(GROUPS), '10')})
+    with sqlite3.connect(filename) as dbcon:
+        dbcon.execute("UPDATE MEMBERS SET members = ?;", (marshal.dumps(['uid=user1,dc=example,dc=com']),))
+    dbcon.close()
+    assert GroupMemberCache(filename).load('con', '10') is None
+    assert saved(filename) == ({}, set())
+
+
+def test_save_without_watermark(db, filename):
+    db.save({'ucs': (db.track(GROUPS), None)})
+    assert saved(filename) == ({}, set(GROUPS))
+    assert GroupMemberCache(filename).load('ucs', None) is None
+
+
+def test_save_changed_groups(db, filename):
+    groups = db.track(GROUPS)
+    db.save({'con': (groups, '10')})
+    db = GroupMemberCache(filename)
+    groups = db.load('con', '10')
+    total_changes = db._dbcon.total_changes
+
+    # nothing to save while idle
+    db.save({'con': (groups, '10')})
+    assert db._dbcon.total_changes == total_changes
+
+    groups['cn=group2,dc=example,dc=com'].add('uid=user1,dc=example,dc=com')
+    del groups['cn=group1,dc=example,dc=com']
+    groups['cn=group3,dc=example,dc=com'] = set()
+    # the watermarks are removed until the changes are saved
+    assert saved(filename) == ({}, set(GROUPS))
+    assert GroupMemberCache(filename).load('con', '10') is None
+
+    groups = db.track(GROUPS)
+    db.save({'con': (groups, '10')})
+    groups['cn=group2,dc=example,dc=com'].add('uid=user1,dc=example,dc=com')
+    del groups['cn=group1,dc=example,dc=com']
+    groups['cn=group3,dc=example,dc=com'] = set()
+    db.save({'con': (groups, '11')})
+    assert not groups.changed
+    assert GroupMemberCache(filename).load('con', '11') == {
+        'cn=group2,dc=example,dc=com': {'uid=user1,dc=example,dc=com'},
+        'cn=group3,dc=example,dc=com': set(),
+    }
+
+
+def test_save_watermark_only(db, filename):
+    groups = db.track(GROUPS)
+    db.save({'con': (groups, '10')})
+    db.save({'con': (groups, '11')})
+    assert GroupMemberCache(filename).load('con', '11') == GROUPS
+
+
+def test_save_failure(db, filename):
+    groups = db.track(GROUPS)
+    groups['cn=broken,dc=example,dc=com'] = {object()}
+    with pytest.raises(TypeError):
+        db.save({'con': (groups, '10')})
+    assert groups.changed == {*GROUPS, 'cn=broken,dc=example,dc=com'}
+    assert saved(filename) == ({}, set())
+
+    del groups['cn=broken,dc=example,dc=com']
+    db.save({'con': (groups, '10')})
+    assert GroupMemberCache(filename).load('con', '10') == GROUPS
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import os
+import stat
+
+import pytest
+from univentionunittests import import_module
+
+
+journal = import_module('journal', 'modules/univention/s4connector/', 'univention.s4connector.journal', use_installed=False)
+ChangeJournal = journal.ChangeJournal
+
+CHANGE = ('cn=user1,dc=example,dc=com', {'cn': [b'user1']}, {}, None)
+
+
+@pytest.fixture()
+def changes(tmp_path):
+    changes = ChangeJournal(str(tmp_path))
+    yield changes
+    changes.close()
+
+
+def test_key():
+    assert ChangeJournal.key(42) == 'journal.sqlite#42'
+    assert ChangeJournal.change_id('journal.sqlite#42') == 42
+    assert ChangeJournal.change_id('/var/lib/univention-connector/s4/journal.sqlite#42') == 42
+    assert ChangeJournal.change_id('1712345678.123456') is None
+    assert ChangeJournal.change_id('journal.sqlite') is None
+    assert ChangeJournal.change_id('journal.sqlite#foo') is None
+    assert ChangeJournal.change_id('other.sqlite#42') is None
+
+
+def test_append_get(changes):
+    assert not changes.exists()
+    change_id = changes.append(CHANGE)
+    assert changes.exists()
+    assert changes.get(change_id) == CHANGE
+    with pytest.raises(FileNotFoundError):
+        changes.get(change_id + 1)
+
+
+def test_permissions(changes):
+    changes.open()
+    assert stat.S_IMODE(os.stat(changes.filename).st_mode) == 0o600
+
+
+def test_entries_in_order(changes):
+    first = changes.append(CHANGE)
+    changes.extend([('cn=user%d,dc=example,dc=com' % (number,), {}, {}, None) for number in range(2, 5)])
+    entries = changes.entries()
+    assert [change_id for change_id, _timestamp in entries] == list(range(first, first + 4))
+    assert [timestamp for _change_id, timestamp in entries] == sorted(timestamp for _change_id, timestamp in entries)
+    assert changes.entries(2) == entries[:2]
+    assert changes.get(first + 3)[0] == 'cn=user4,dc=example,dc=com'
+
+
+def test_acknowledge(changes):
+    change_ids = [changes.append(CHANGE) for _i in range(3)]
+    changes.acknowledge([])
+    changes.acknowledge(change_ids[:2])
+    assert [change_id for change_id, _timestamp in changes.entries()] == change_ids[2:]
+    with pytest.raises(FileNotFoundError):
+        changes.get(change_ids[0])
+
+
+def test_clear(changes):
+    change_id = changes.append(CHANGE)
+    changes.clear()
+    assert changes.entries() == []
+    # IDs are not reused
+    assert changes.append(CHANGE) > change_id
+
+
+def test_reopen(changes, tmp_path):
+    change_id = changes.append(CHANGE)
+    changes.close()
+    changes.close()
+    assert changes.get(change_id) == CHANGE
+    other = ChangeJournal(str(tmp_path))
+    try:
+        assert other.get(change_id) == CHANGE
+        other.acknowledge([change_id])
+    finally:
+        other.close()
+    assert changes.entries() == []
+
+
+def test_generation(changes, tmp_path):
+    generation = changes.generation()
+    assert generation
+    changes.append(CHANGE)
+    changes.close()
+    assert ChangeJournal(str(tmp_path)).generation() == generation
+    changes.clear()
+    assert changes.generation() not in (0, generation)
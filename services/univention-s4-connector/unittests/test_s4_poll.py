@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import re
+from unittest import mock
+
+import ldap
+import pytest
+
+from univention.s4connector import s4
+from univention.s4connector.journal import ChangeJournal
+
+
+def _parse_filter(filterstr, pos=0):
+    """Parse the `&`, `|`, `>=`, `<=` and `=` filters used by the poll into a predicate."""
+    assert filterstr[pos] == '('
+    if filterstr[pos + 1] in '&|':
+        combine = all if filterstr[pos + 1] == '&' else any
+        pos += 2
+        predicates = []
+        while filterstr[pos] == '(':
+            predicate, pos = _parse_filter(filterstr, pos)
+            predicates.append(predicate)
+        assert filterstr[pos] == ')'
+        return (lambda attrs: combine(predicate(attrs) for predicate in predicates)), pos + 1
+    end = filterstr.index(')', pos)
+    attribute, operator, value = re.match(r'(\w+)(>=|<=|=)(\d+)$', filterstr[pos + 1:end]).groups()
+    compare = {'>=': int.__ge__, '<=': int.__le__, '=': int.__eq__}[operator]
+    return (lambda attrs: compare(int(attrs[attribute][0]), int(value))), end + 1
+
+
+def obj(name, created, changed=None):
+    return ('CN=%s,DC=example,DC=com' % (name,), {
+        'uSNCreated': [b'%d' % (created,)],
+        'uSNChanged': [b'%d' % (changed or created,)],
+    })
+
+
+class S4(s4.s4):
+    """The poll of :py:class:`univention.s4connector.s4.s4` against a list of objects."""
+
+    def __init__(self, objects, config, highest_usn, usn_window, sizelimit=None):
+        self.CONFIGBASENAME = 'connector'
+        self.configRegistry = {'connector/s4/poll/usn-window': str(usn_window)}
+        self.s4_ldap_partitions = ['DC=example,DC=com']
+        self.s4cache = mock.MagicMock()
+        self._worker_pool = None
+        self._s4__lastUSN = int(config['lastUSN'])
+        self.config = config
+        self.objects = objects
+        self.highest_usn = highest_usn
+        self.sizelimit = sizelimit
+        self.windows = []
+        self.synced = []
+
+    def _get_config_option(self, section, option):
+        return self.config[option]
+
+    def _set_config_option(self, section, option, value):
+        self.config[option] = value
+
+    def _s4__get_highestCommittedUSN(self):
+        return self.highest_usn
+
+    def _s4__search_ad_partitions(self, scope=ldap.SCOPE_SUBTREE, filter='', attrlist=[], show_deleted=False):
+        self.windows.append(tuple(int(usn) for usn in re.search(r'\(uSNCreated>=(\d+)\)\(uSNCreated<=(\d+)\)', filter).groups()))
+        predicate, _end = _parse_filter(filter)
+        res = [(dn, attrs) for dn, attrs in self.objects if predicate(attrs)]
+        if self.sizelimit is not None and len(res) > self.sizelimit:
+            raise ldap.SIZELIMIT_EXCEEDED()
+        return res
+
+    def _s4__poll_change(self, element):
+        self.synced.append(element)
+        return True
+
+    def search_ucs(self, *args, **kwargs):
+        return []
+
+    def save_group_cache(self):
+        pass
+
+    def _list_rejected(self):
+        return []
+
+
+def names(changes):
+    return [dn.split(',')[0][3:] for dn, _attrs in changes]
+
+
+def search(connector):
+    return [(usn, names(changes)) for usn, changes in connector._s4__search_ad_changes()]
+
+
+def test_initial_windows():
+    connector = S4([obj('obj%d' % usn, usn, usn + 10) for usn in range(7, 0, -1)], {'lastUSN': '0'}, 7, 3)
+    assert search(connector) == [
+        (3, ['obj1', 'obj2', 'obj3']),
+        (6, ['obj4', 'obj5', 'obj6']),
+        (7, ['obj7']),
+    ]
+    assert connector.windows == [(1, 3), (4, 6), (7, 7)]
+
+
+def test_no_changes():
+    connector = S4([obj('old', 5)], {'lastUSN': '5'}, 5, 3)
+    assert search(connector) == []
+    assert connector.windows == []
+
+
+def test_window_boundaries():
+    connector = S4([
+        obj('synced', 1, 10),
+        obj('first', 2, 11),
+        obj('last', 3, 13),
+        obj('next', 5, 14),
+        obj('created', 12, 16),
+        obj('end', 4, 16),
+        obj('later', 6, 17),
+    ], {'lastUSN': '10'}, 16, 3)
+    assert search(connector) == [
+        (13, ['created', 'first', 'last']),
+        (16, ['next', 'end']),
+    ]
+    assert connector.windows == [(11, 13), (14, 16)]
+
+
+def test_created_before_changed():
+    connector = S4([
+        obj('changed2', 5, 24),
+        obj('created2', 22, 23),
+        obj('changed1', 6, 21),
+        obj('created1', 21, 25),
+    ], {'lastUSN': '20'}, 25, 10)
+    assert search(connector) == [
+        (25, ['created1', 'created2', 'changed1', 'changed2']),
+    ]
+
+
+def test_resume_from_checkpoint():
+    objects = [obj('obj%d' % usn, usn) for usn in range(11, 20)]
+    config = {'lastUSN': '10'}
+
+    connector = S4(objects, config, 19, 3)
+    poll_change = connector._s4__poll_change
+
+    def server_down(element):
+        if element[0].startswith('CN=obj15,'):
+            raise ldap.SERVER_DOWN()
+        return poll_change(element)
+
+    connector._s4__poll_change = server_down
+    with pytest.raises(ldap.SERVER_DOWN):
+        connector.poll()
+    assert names(connector.synced) == ['obj11', 'obj12', 'obj13', 'obj14']
+    assert config['lastUSN'] == '13'
+
+    connector = S4(objects, config, 19, 3)
+    assert connector.poll() == 6
+    assert names(connector.synced) == ['obj14', 'obj15', 'obj16', 'obj17', 'obj18', 'obj19']
+    assert connector.windows == [(14, 16), (17, 19)]
+    assert config['lastUSN'] == '19'
+
+
+def test_sizelimit_fallback():
+    connector = S4([obj('obj%d' % usn, usn) for usn in range(1, 2501)], {'lastUSN': '0'}, 2500, 2500, sizelimit=1000)
+    [(usn, changes)] = search(connector)
+    assert usn == 2500
+    assert changes == ['obj%d' % usn for usn in range(1, 2501)]
+    assert connector.windows == [(1, 2500), (1, 999), (1000, 1998), (1999, 2500)]
+
+
+def test_sizelimit_exceeded():
+    connector = S4([obj('obj%d' % usn, usn) for usn in range(1, 501)], {'lastUSN': '0'}, 500, 500, sizelimit=100)
+    with pytest.raises(ldap.SIZELIMIT_EXCEEDED):
+        search(connector)
+
+
+def test_group_cache_watermarks(tmp_path):
+    connector = S4([], {'lastUSN': '5'}, 5, 3)
+    connector.journal = ChangeJournal(str(tmp_path))
+    assert connector._group_cache_watermarks() == {'con': '5', 'ucs': None}
+    connector.journal.open()
+    watermarks = {'con': '5', 'ucs': 'journal:%d' % (connector.journal.generation(),)}
+    connector.journal.append(('cn=user1,dc=example,dc=com', {}, {}, None))
+    assert connector._group_cache_watermarks() == watermarks
+    connector.journal.clear()
+    assert connector._group_cache_watermarks() != watermarks
+    connector.journal.close()
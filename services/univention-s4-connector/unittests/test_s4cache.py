@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import base64
+import marshal
+import sqlite3
+
+import pytest
+from univentionunittests import import_module
+
+
+s4cache = import_module('s4cache', 'modules/univention/s4connector/', 'univention.s4connector.s4cache', use_installed=False)
+
+ENTRY = {
+    'objectClass': [b'top', b'user'],
+    'cn': [b'user1'],
+    'objectGUID': [b'\x00\xff' * 8],
+}
+
+
+@pytest.fixture()
+def filename(tmp_path):
+    return str(tmp_path / 's4cache.sqlite')
+
+
+@pytest.fixture()
+def cache(filename):
+    return s4cache.S4Cache(filename)
+
+
+def test_add_get_remove(cache):
+    assert cache.get_entry('guid1') is None
+    cache.add_entry('guid1', ENTRY)
+    assert cache.get_entry('guid1') == ENTRY
+    assert cache.get_entry(' guid1 ') == ENTRY
+
+    cache.add_entry('guid1', {'cn': [b'user2']})
+    assert cache.get_entry('guid1') == {'cn': [b'user2']}
+
+    cache.remove_entry('guid1')
+    assert cache.get_entry('guid1') is None
+
+
+def test_reopen(cache, filename):
+    cache.add_entry('guid1', ENTRY)
+    cache.add_entry('guid2', {'cn': [b'user2'], 'description': [b'second']})
+
+    cache = s4cache.S4Cache(filename)
+    assert cache.get_entry('guid1') == ENTRY
+    assert cache.get_entry('guid2') == {'cn': [b'user2'], 'description': [b'second']}
+
+
+def test_transaction(cache, filename):
+    with cache.transaction():
+        cache.add_entry('guid1', ENTRY)
+        with cache.transaction():
+            cache.add_entry('guid2', ENTRY)
+        assert s4cache.S4Cache(filename).get_entry('guid2') is None
+    assert s4cache.S4Cache(filename).get_entry('guid1') == ENTRY
+    assert s4cache.S4Cache(filename).get_entry('guid2') == ENTRY
+
+
+def test_transaction_commits_on_error(cache, filename):
+    with pytest.raises(ValueError), cache.transaction():
+        cache.add_entry('guid1', ENTRY)
+        raise ValueError()
+    assert s4cache.S4Cache(filename).get_entry('guid1') == ENTRY
+
+
+def test_unknown_attribute_id(cache, filename):
+    cache.add_entry('guid1', ENTRY)
+    with sqlite3.connect(filename) as dbcon:
+        dbcon.execute("DELETE FROM ATTRIBUTES WHERE attribute='cn';")
+
+    cache = s4cache.S4Cache(filename)
+    assert cache.get_entry('guid1') == {'objectClass': [b'top', b'user'], 'objectGUID': [b'\x00\xff' * 8]}
+
+
+def test_migrate(filename):
+    with sqlite3.connect(filename) as dbcon:
+        dbcon.execute("CREATE TABLE GUIDS (id INTEGER PRIMARY KEY, guid TEXT);")
+        dbcon.execute("CREATE TABLE ATTRIBUTES (id INTEGER PRIMARY KEY, attribute TEXT);")
+        dbcon.execute("CREATE TABLE DATA (id INTEGER PRIMARY KEY, guid_id INTEGER, attribute_id INTEGER, value TEXT);")
+        dbcon.executemany("INSERT INTO GUIDS(id, guid) VALUES(?, ?);", [(1, 'guid1'), (2, 'guid2 ')])
+        dbcon.executemany("INSERT INTO ATTRIBUTES(id, attribute) VALUES(?, ?);", [(1, 'cn'), (2, 'objectClass')])
+        dbcon.executemany("INSERT INTO DATA(guid_id, attribute_id, value) VALUES(?, ?, ?);", [
+            (1, 1, base64.b64encode(b'user1').decode('ASCII')),
+            (1, 2, base64.b64encode(b'top').decode('ASCII')),
+            (2, 1, base64.b64encode(b'user2').decode('ASCII')),
+            (1, 2, base64.b64encode(b'user').decode('ASCII')),
+        ])
+    dbcon.close()
+
+    cache = s4cache.S4Cache(filename)
+    assert cache.get_entry('guid1') == {'cn': [b'user1'], 'objectClass': [b'top', b'user']}
+    assert cache.get_entry('guid2') == {'cn': [b'user2']}
+    with sqlite3.connect(filename) as dbcon:
+        assert {name for name, in dbcon.execute("SELECT name FROM sqlite_master WHERE type='table';")} == {'ATTRIBUTES', 'OBJECTS'}
+    dbcon.close()
+
+    cache.add_entry('guid3', {'cn': [b'user3'], 'description': [b'third']})
+    assert s4cache.S4Cache(filename).get_entry('guid3') == {'cn': [b'user3'], 'description': [b'third']}
+
+
+def test_discard_other_format(cache, filename):
+    cache.add_entry('guid1', ENTRY)
+    with sqlite3.connect(filename) as dbcon:
+        dbcon.execute("INSERT INTO OBJECTS(guid, data) VALUES(?, ?);", ('guid2', marshal.dumps({1: [b'user2']})))
+        dbcon.execute("PRAGMA user_version = 0;")
+    dbcon.close()
+
+    cache = s4cache.S4Cache(filename)
+    assert cache.get_entry('guid1') is None
+    assert cache.get_entry('guid2') is None
+    cache.add_entry('guid1', ENTRY)
+    assert s4cache.S4Cache(filename).get_entry('guid1') == ENTRY
+
+
+def test_execute_retries(cache):
+    cache.add_entry('guid1', ENTRY)
+    dbcon = cache._dbcon
+    dbcon.close()
+    assert cache.get_entry('guid1') == ENTRY
+    assert cache._dbcon is not dbcon
+
+
+def test_execute_raises(cache, mocker):
+    connect = mocker.patch.object(s4cache.sqlite3, 'connect')
+    connect.return_value.execute.side_effect = sqlite3.OperationalError('database is locked')
+    cache._dbcon.close()
+    with pytest.raises(sqlite3.OperationalError):
+        cache.remove_entry('guid1')
+
+
+def test_execute_raises_in_transaction(cache):
+    with pytest.raises(sqlite3.ProgrammingError), cache.transaction():
+        cache.add_entry('guid1', ENTRY)
+        cache._dbcon.close()
+        cache.add_entry('guid2', ENTRY)
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import os
+import pickle  # noqa: S403
+import threading
+
+import ldap
+import pytest
+
+import univention.s4connector
+from univention.s4connector.journal import ChangeJournal
+
+
+def change(name):
+    return ('cn=%s,dc=example,dc=com' % (name,), {'cn': [name.encode('UTF-8')]}, {}, None)
+
+
+class UCS(univention.s4connector.ucs):
+    """The poll of :py:class:`univention.s4connector.ucs` against a listener directory."""
+
+    def __init__(self, listener_dir, failing=(), server_down=()):
+        self.CONFIGBASENAME = 'connector'
+        self.configRegistry = {}
+        self._worker_pool = None
+        self._lock = threading.RLock()
+        self.listener_dir = listener_dir
+        self.journal = ChangeJournal(listener_dir)
+        self.failing = set(failing)
+        self.server_down = set(server_down)
+        self.synced = []
+
+    def _list_rejected_filenames_ucs(self):
+        return set()
+
+    def open_ucs(self):
+        pass
+
+    def _ucs__sync_file_from_ucs(self, filename, append_error='', traceback_level=None):
+        dn = self._ucs__load_ucs_change(filename)[0]
+        name = dn.split(',')[0][3:]
+        if name in self.server_down:
+            raise ldap.SERVER_DOWN()
+        self.synced.append(name)
+        return name not in self.failing
+
+
+@pytest.fixture()
+def listener_dir(tmp_path):
+    os.mkdir(tmp_path / 'tmp')
+    return str(tmp_path)
+
+
+def write_file(listener_dir, timestamp, ob):
+    filename = '%f' % (timestamp,)
+    with open(os.path.join(listener_dir, filename), 'wb') as fd:
+        pickle.dump(ob, fd)
+    return filename
+
+
+def test_list_changes_by_time(listener_dir, mocker):
+    connector = UCS(listener_dir)
+    assert connector._ucs__list_ucs_changes(10) == []
+
+    mocker.patch('univention.s4connector.journal.time.time', side_effect=[20.0, 40.0, 50.0])
+    connector.journal.append(change('journal1'))
+    connector.journal.extend([change('journal2'), change('journal3')])
+    files = [write_file(listener_dir, timestamp, change('file')) for timestamp in (10.0, 30.0, 60.0)]
+
+    changes = connector._ucs__list_ucs_changes(10)
+    assert changes == [files[0], 'journal.sqlite#1', files[1], 'journal.sqlite#2', 'journal.sqlite#3', files[2]]
+    assert connector._ucs__list_ucs_changes(3) == changes[:3]
+    assert [connector._ucs__load_ucs_change(os.path.join(listener_dir, name))[0] for name in changes[:2]] == [change('file')[0], change('journal1')[0]]
+    connector.journal.close()
+
+
+def test_poll_acknowledges_in_batches(listener_dir, mocker):
+    mocker.patch.object(univention.s4connector, 'JOURNAL_ACK_BATCH', 3)
+    connector = UCS(listener_dir, failing={'obj6'})
+    connector.journal.extend([change('obj%d' % (number,)) for number in range(1, 9)])
+    filename = write_file(listener_dir, 1.0, change('file'))
+    acknowledge = mocker.spy(connector.journal, 'acknowledge')
+
+    assert connector.poll_ucs() == 8
+    assert connector.synced == ['file'] + ['obj%d' % (number,) for number in range(1, 9)]
+    assert [args for (args,), _kwargs in acknowledge.call_args_list] == [[1, 2, 3], [4, 5, 7], [8]]
+    assert [change_id for change_id, _timestamp in connector.journal.entries()] == [6]
+    assert not os.path.exists(os.path.join(listener_dir, filename))
+    connector.journal.close()
+
+
+def test_poll_acknowledges_on_error(listener_dir, mocker):
+    mocker.patch.object(univention.s4connector, 'JOURNAL_ACK_BATCH', 3)
+    connector = UCS(listener_dir, server_down={'obj5'})
+    connector.journal.extend([change('obj%d' % (number,)) for number in range(1, 8)])
+
+    with pytest.raises(ldap.SERVER_DOWN):
+        connector.poll_ucs()
+    assert connector.synced == ['obj1', 'obj2', 'obj3', 'obj4']
+    assert [change_id for change_id, _timestamp in connector.journal.entries()] == [5, 6, 7]
+    connector.journal.close()
@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+#
+# Like what you see? Join us!
+# https://www.univention.com/about-us/careers/vacancies/
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <https://www.gnu.org/licenses/>.
+
+import random
+import threading
+import time
+
+import pytest
+from univentionunittests import import_module
+
+
+workers = import_module('workers', 'modules/univention/s4connector/', 'univention.s4connector.workers', use_installed=False)
+Scope = workers.Scope
+WorkerPool = workers.WorkerPool
+
+BASE = 'dc=example,dc=com'
+TIMEOUT = 5
+
+
+class Connector:
+
+    def __init__(self):
+        self.threads = []
+
+    def init_worker(self):
+        self.threads.append(threading.current_thread())
+
+
+@pytest.fixture()
+def connector():
+    return Connector()
+
+
+@pytest.fixture()
+def pool(connector):
+    pool = WorkerPool(connector, 4)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize('first,second,conflict', [
+    (Scope(), Scope(), False),
+    (Scope(ids=['1']), Scope(ids=['1']), True),
+    (Scope(ids=['1']), Scope(ids=['2']), False),
+    (Scope(ids=[None]), Scope(ids=[None]), False),
+    (Scope(dns=['cn=a,' + BASE]), Scope(dns=['CN=A,DC=example,DC=com']), True),
+    (Scope(dns=['cn=a,' + BASE]), Scope(dns=['cn=b,' + BASE]), False),
+    (Scope(dns=['ou=a,' + BASE]), Scope(dns=['cn=b,ou=a,' + BASE]), True),
+    (Scope(dns=['cn=b,ou=a,' + BASE]), Scope(dns=['ou=a,' + BASE]), True),
+    (Scope(dns=['cn=b,ou=a,' + BASE]), Scope(dns=['cn=b,ou=c,' + BASE]), False),
+    (Scope(dns=['cn=a,ou=old,' + BASE, 'cn=a,ou=new,' + BASE]), Scope(dns=['cn=b,ou=old,' + BASE]), False),
+    (Scope(dns=['cn=a,ou=old,' + BASE, 'cn=a,ou=new,' + BASE]), Scope(dns=['ou=new,' + BASE]), True),
+    (Scope(dns=['cn=group,' + BASE], refs=['cn=user,' + BASE]), Scope(dns=['cn=user,' + BASE]), True),
+    (Scope(dns=['cn=user,' + BASE]), Scope(dns=['cn=group,' + BASE], refs=['CN=user,' + BASE]), True),
+    (Scope(dns=['cn=group,' + BASE], refs=['cn=user,' + BASE]), Scope(dns=['cn=other,' + BASE], refs=['cn=user,' + BASE]), False),
+    (Scope(dns=['cn=group,' + BASE], refs=['cn=user,' + BASE]), Scope(dns=['cn=user,ou=sub,' + BASE]), False),
+    (Scope(dns=['broken']), Scope(), True),
+    (Scope(), Scope(refs=['broken']), True),
+])
+def test_scope_conflicts(first, second, conflict):
+    assert first.conflicts(second) is conflict
+    assert second.conflicts(first) is conflict
+
+
+def test_run(pool, connector):
+    results = list(pool.run(lambda item: item * 2, range(20), lambda item: Scope(ids=[str(item)])))
+    assert sorted(results) == [(item, item * 2) for item in range(20)]
+    assert 1 <= len(set(connector.threads)) <= 4
+    assert len(connector.threads) == len(set(connector.threads))
+
+
+def test_run_concurrently(pool):
+    barrier = threading.Barrier(4, timeout=TIMEOUT)
+
+    def sync(item):
+        barrier.wait()
+        return item
+
+    assert sorted(result for _item, result in pool.run(sync, range(4), lambda item: Scope(ids=[str(item)]))) == [0, 1, 2, 3]
+
+
+def test_run_in_order(pool):
+    started = []
+    blocked = threading.Event()
+    release = threading.Event()
+
+    def sync(item):
+        started.append(item)
+        if item == 'a1':
+            blocked.set()
+            assert release.wait(TIMEOUT)
+        return item
+
+    scopes = {
+        'a1': Scope(ids=['a']),
+        'a2': Scope(ids=['a'], dns=['cn=a,' + BASE]),
+        # conflicts with the waiting a2 only
+        'group': Scope(ids=['g'], refs=['cn=a,' + BASE]),
+        'b': Scope(ids=['b']),
+    }
+    results = pool.run(sync, list(scopes), scopes.get)
+    assert next(results) == ('b', 'b')
+    assert blocked.wait(TIMEOUT)
+    assert sorted(started) == ['a1', 'b']
+    release.set()
+    assert list(results) == [('a1', 'a1'), ('a2', 'a2'), ('group', 'group')]
+    assert started[2:] == ['a2', 'group']
+
+
+def test_lookahead(connector):
+    running = []
+    concurrent = []
+
+    def sync(item):
+        running.append(item)
+        concurrent.append(len(running))
+        time.sleep(0.01)
+        running.remove(item)
+        return item
+
+    pool = WorkerPool(connector, 4, lookahead=1)
+    try:
+        assert [item for item, _result in pool.run(sync, range(5), lambda item: Scope(ids=[str(item)]))] == [0, 1, 2, 3, 4]
+    finally:
+        pool.close()
+    assert max(concurrent) == 1
+
+
+def test_exception(pool):
+    started = []
+
+    def sync(item):
+        started.append(item)
+        if item == 1:
+            raise ValueError(item)
+        return item
+
+    # every item conflicts with the previous one, so they run one after another
+    with pytest.raises(ValueError):
+        list(pool.run(sync, range(5), lambda item: Scope(ids=['same'])))
+    assert started == [0, 1]
+
+
+def test_order_of_conflicting_changes(pool):
+    """Random changes of objects in containers: conflicting changes never overlap and keep their order."""
+    rng = random.Random(0)
+    containers = ['ou=ou%d,%s' % (i, BASE) for i in range(3)]
+    items = []
+    for number in range(300):
+        container = rng.choice(containers)
+        if rng.random() < 0.05:
+            items.append((number, Scope(dns=[container])))
+        else:
+            dn = 'cn=obj%d,%s' % (rng.randrange(20), container)
+            refs = ['cn=obj%d,%s' % (rng.randrange(20), rng.choice(containers))] if rng.random() < 0.2 else []
+            items.append((number, Scope(ids=[dn], dns=[dn], refs=refs)))
+
+    lock = threading.Lock()
+    running = []
+    finished = []
+
+    def sync(item):
+        number, scope = item
+        with lock:
+            assert not any(scope.conflicts(other) for _number, other in running)
+            running.append(item)
+        time.sleep(rng.random() / 1000)
+        with lock:
+            running.remove(item)
+            finished.append(number)
+        return number
+
+    assert sorted(result for _item, result in pool.run(sync, items, lambda item: item[1])) == list(range(300))
+    for position, (number, scope) in enumerate(items):
+        for later, other in items[position + 1:]:
+            if scope.conflicts(other):
+                assert finished.index(number) < finished.index(later)
+
+
+def test_synchronized():
+    class Shared:
+        def __init__(self):
+            self._lock = threading.RLock()
+            self.value = 0
+
+        @workers.synchronized
+        def increment(self):
+            value = self.value
+            time.sleep(0)
+            self.value = value + 1
+
+    shared = Shared()
+    threads = [threading.Thread(target=lambda: [shared.increment() for _i in range(200)]) for _thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.value == 800